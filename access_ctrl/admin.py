@@ -1,4 +1,96 @@
 # access_ctrl/admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils import timezone
+
+from core.mixins import ConteoEstimadoMixin, JerarquiaFechasIndexadaMixin, ReplicaChangelistMixin
+from . import prohibiciones
+from .busqueda import buscar_visitas
 from .models import Visita, ProhibicionAcceso, Acceso
-admin.site.register(Visita); admin.site.register(ProhibicionAcceso); admin.site.register(Acceso)
+
+MOTIVO_PROHIBICION_ADMIN = "Prohibición registrada desde el admin"
+
+
+@admin.register(Visita)
+class VisitaAdmin(ReplicaChangelistMixin, ConteoEstimadoMixin, admin.ModelAdmin):
+    list_display = ("id", "nombre", "apellido", "rut", "dni_extranjero", "instalacion", "sector", "estado", "creado_en")
+    list_filter = ("estado", "es_extranjero")
+    list_select_related = ("instalacion", "sector")
+    autocomplete_fields = ("instalacion", "sector")
+    # la búsqueda va por la columna normalizada e indexada (ver busqueda.py)
+    search_fields = ("busqueda",)
+    search_help_text = "Nombre, apellido, RUT, DNI o patente"
+    ordering = ("-id",)
+    actions = ("prohibir_acceso", "habilitar_acceso")
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return buscar_visitas(queryset, search_term), False
+
+    @admin.action(description="🚫 Prohibir acceso en su instalación")
+    def prohibir_acceso(self, request, queryset):
+        ya_prohibidas = ProhibicionAcceso.objects.filter(
+            fecha_fin__isnull=True, visita_id__in=queryset.values("id")
+        ).values_list("visita_id", "instalacion_id")
+        ya_prohibidas = set(ya_prohibidas)
+
+        visitas = list(queryset.values_list("id", "instalacion_id"))
+        sin_instalacion = sum(1 for _, instalacion_id in visitas if instalacion_id is None)
+        nuevas = [
+            ProhibicionAcceso(
+                visita_id=visita_id, instalacion_id=instalacion_id,
+                motivo=MOTIVO_PROHIBICION_ADMIN, fecha_inicio=timezone.now(),
+            )
+            for visita_id, instalacion_id in visitas
+            if instalacion_id is not None and (visita_id, instalacion_id) not in ya_prohibidas
+        ]
+
+        ProhibicionAcceso.objects.bulk_create(nuevas)
+        prohibiciones.invalidar()
+        Visita.objects.filter(id__in=[p.visita_id for p in nuevas]).update(
+            estado="prohibido", actualizado_en=timezone.now()
+        )
+
+        self.message_user(request, f"Prohibiciones registradas: {len(nuevas)}.", messages.SUCCESS)
+        if sin_instalacion:
+            self.message_user(
+                request, f"{sin_instalacion} visitas sin instalación quedaron sin prohibir.", messages.WARNING
+            )
+
+    @admin.action(description="✅ Levantar prohibiciones activas")
+    def habilitar_acceso(self, request, queryset):
+        ahora = timezone.now()
+        levantadas = ProhibicionAcceso.objects.filter(
+            fecha_fin__isnull=True, visita_id__in=queryset.values("id")
+        ).update(fecha_fin=ahora)
+        prohibiciones.invalidar()
+        queryset.filter(estado="prohibido").update(estado="activo", actualizado_en=ahora)
+
+        self.message_user(request, f"Prohibiciones levantadas: {levantadas}.", messages.SUCCESS)
+
+
+@admin.register(ProhibicionAcceso)
+class ProhibicionAccesoAdmin(ReplicaChangelistMixin, ConteoEstimadoMixin, admin.ModelAdmin):
+    list_display = ("id", "visita", "instalacion", "motivo", "fecha_inicio", "fecha_fin")
+    list_select_related = ("visita", "instalacion")
+    autocomplete_fields = ("visita", "instalacion")
+    ordering = ("-fecha_inicio",)
+
+
+@admin.register(Acceso)
+class AccesoAdmin(ReplicaChangelistMixin, ConteoEstimadoMixin, JerarquiaFechasIndexadaMixin, admin.ModelAdmin):
+    list_display = ("id", "fecha_hora", "tipo", "visita", "instalacion", "sector", "empresa", "guardia")
+    list_filter = ("tipo",)
+    list_select_related = ("visita", "instalacion", "sector", "empresa", "guardia")
+    autocomplete_fields = ("visita", "instalacion", "sector", "empresa", "guardia")
+    # el date_hierarchy filtra por rango de fecha_hora: usa el índice
+    date_hierarchy = "fecha_hora"
+    ordering = ("-fecha_hora",)
+    search_fields = ("visita__busqueda",)
+    search_help_text = "Nombre, apellido, RUT, DNI o patente de la visita"
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        visitas = buscar_visitas(Visita.objects.using(queryset.db), search_term).values("id")
+        return queryset.filter(visita_id__in=visitas), False
@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def _instalar_indice_busqueda(sender, using, **kwargs):
+    from django.db import connections
+    from .busqueda import instalar_indice_busqueda
+
+    instalar_indice_busqueda(connections[using])
 
 
 class AccessCtrlConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'access_ctrl'
+
+    def ready(self):
+        # en SQLite las migraciones que reconstruyen la tabla borran los triggers FTS
+        post_migrate.connect(_instalar_indice_busqueda, sender=self)
+
+        # caché de prohibiciones de portería (los bulk_create/update llaman a invalidar() a mano)
+        from .models import ProhibicionAcceso
+        from .prohibiciones import invalidar
+        post_save.connect(invalidar, sender=ProhibicionAcceso, dispatch_uid="prohibiciones_post_save")
+        post_delete.connect(invalidar, sender=ProhibicionAcceso, dispatch_uid="prohibiciones_post_delete")
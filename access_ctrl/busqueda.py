@@ -0,0 +1,161 @@
+"""
+Búsqueda de visitas sobre la columna normalizada ``Visita.busqueda``.
+
+La columna guarda nombre, apellido, RUT, DNI y patente en minúsculas, sin
+tildes ni puntuación de documentos ("Muñoz" y "Munoz" quedan iguales,
+"12.345.678-9" queda como "123456789").
+
+Cada término busca un prefijo de palabra ("mu" encuentra "Muñoz" pero no
+"Ramuz"), igual en los dos motores:
+
+- PostgreSQL: ``LIKE 'x%' OR LIKE '% x%'`` con el índice GIN ``gin_trgm_ops``.
+- SQLite: tabla virtual FTS5 mantenida por triggers (``MATCH '"x"*'``).
+"""
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+CAMPOS_BUSQUEDA = ("nombre", "apellido", "rut", "dni_extranjero", "patente")
+# columnas derivadas que mantiene Visita.save() (y completar_normalizados en los bulk_create)
+CAMPOS_NORMALIZADOS = ("busqueda", "documento_normalizado", "patente_normalizada")
+
+TABLA_VISITA = "access_ctrl_visita"
+TABLA_FTS = "access_ctrl_visita_fts"
+INDICE_TRGM = "access_ctrl_visita_busqueda_trgm"
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+_SEPARADORES_PATENTE = re.compile(r"[\s.\-·]+")
+
+
+def normalizar_busqueda(texto):
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    # los documentos se comparan sin puntos ni guión
+    texto = texto.replace(".", "").replace("-", "")
+    return _NO_ALFANUMERICO.sub(" ", texto).strip()
+
+
+def texto_busqueda(visita):
+    partes = [getattr(visita, campo, None) or "" for campo in CAMPOS_BUSQUEDA]
+    return normalizar_busqueda(" ".join(partes))
+
+
+def normalizar_documento(doc):
+    """RUT/DNI sin puntos, guión ni espacios, en mayúsculas: "12.345.678-k" -> "12345678K"."""
+    return (doc or "").replace(".", "").replace("-", "").strip().upper()
+
+
+def normalizar_patente(patente):
+    return _SEPARADORES_PATENTE.sub("", patente or "").upper()
+
+
+def completar_normalizados(visita):
+    """Calcula las columnas de ``CAMPOS_NORMALIZADOS`` (bulk_create/COPY no pasan por save())."""
+    visita.busqueda = texto_busqueda(visita)
+    visita.documento_normalizado = normalizar_documento(
+        visita.dni_extranjero if visita.es_extranjero else visita.rut
+    )
+    visita.patente_normalizada = normalizar_patente(visita.patente)
+    return visita
+
+
+def filtrar_prefijos(qs, tokens):
+    """Cada token como prefijo de alguna palabra de ``busqueda`` (lo mismo que FTS5 con ``"tok"*``)."""
+    for token in tokens:
+        # las palabras de busqueda van separadas por un solo espacio (normalizar_busqueda)
+        qs = qs.filter(Q(busqueda__startswith=token) | Q(busqueda__contains=f" {token}"))
+    return qs
+
+
+def buscar_visitas(qs, q):
+    """
+    Filtra ``qs`` por el texto ``q`` y lo anota con ``rank_busqueda``:
+    0 si algún campo empieza con el texto buscado, 1 si sólo lo contiene.
+    """
+    termino = normalizar_busqueda(q)
+    tokens = termino.split()
+    if not tokens:
+        return qs.none()
+
+    if connections[qs.db].vendor == "sqlite":
+        match = " ".join(f'"{t}"*' for t in tokens)
+        qs = qs.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [match]
+        ))
+    else:
+        qs = filtrar_prefijos(qs, tokens)
+
+    return qs.annotate(rank_busqueda=Case(
+        When(Q(busqueda__startswith=termino) | Q(busqueda__contains=f" {termino}"), then=Value(0)),
+        default=Value(1),
+        output_field=IntegerField(),
+    ))
+
+
+def instalar_indice_busqueda(conn):
+    """
+    Crea (si no existen) el índice de búsqueda propio del motor. Es idempotente:
+    se llama desde la migración y en cada ``post_migrate``, porque en SQLite
+    las migraciones que reconstruyen la tabla eliminan los triggers.
+    """
+    if TABLA_VISITA not in conn.introspection.table_names():
+        return
+
+    with conn.cursor() as cursor:
+        columnas = [c.name for c in conn.introspection.get_table_description(cursor, TABLA_VISITA)]
+        if "busqueda" not in columnas:
+            return
+
+        if conn.vendor == "postgresql":
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {INDICE_TRGM} "
+                f"ON {TABLA_VISITA} USING gin (busqueda gin_trgm_ops)"
+            )
+            return
+
+        if conn.vendor != "sqlite":
+            return
+
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f"{TABLA_FTS}_%"],
+        )
+        if len(cursor.fetchall()) == 3:
+            return
+
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+            f"busqueda, content='{TABLA_VISITA}', content_rowid='id')"
+        )
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON {TABLA_VISITA} BEGIN
+                INSERT INTO {TABLA_FTS}(rowid, busqueda) VALUES (new.id, new.busqueda);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON {TABLA_VISITA} BEGIN
+                INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF busqueda ON {TABLA_VISITA} BEGIN
+                INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+                INSERT INTO {TABLA_FTS}(rowid, busqueda) VALUES (new.id, new.busqueda);
+            END
+        """)
+        # los triggers recién creados no conocen las filas existentes
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def eliminar_indice_busqueda(conn):
+    with conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            cursor.execute(f"DROP INDEX IF EXISTS {INDICE_TRGM}")
+        elif conn.vendor == "sqlite":
+            for sufijo in ("ai", "ad", "au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
@@ -0,0 +1,164 @@
+"""
+Campos a pedido en los listados de accesos y visitas.
+
+- ``?fields=id,tipo,fecha_hora,sector_nombre``: sólo esos campos, en el
+  orden del serializer. Sin ``fields`` la salida es la completa de siempre.
+- Con ``fields``, ``visita`` sale como el id de la visita; ``?expand=visita``
+  la trae como objeto y ``fields=visita.nombre,visita.rut`` la trae con
+  sólo esos campos (también implica expandirla).
+
+El recorte también llega al SQL: los listados de accesos arman su
+``.values()`` desde el serializer ya recortado (serializers_rapidos), así que
+una relación no pedida no se une y ``motivo_prohibicion`` sin pedir no
+consulta prohibiciones; los listados de visitas usan ``.only()``.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+PARAMETRO_CAMPOS = "fields"
+PARAMETRO_EXPANDIR = "expand"
+
+# relación anidada pedida sin expandir: sale como su id
+ID = "id"
+
+
+def _lista(valor):
+    return [v.strip() for v in (valor or "").split(",") if v.strip()]
+
+
+@lru_cache(maxsize=None)
+def _disponibles(serializer_class):
+    """``{campo: None}`` o ``{relación anidada: (subcampos,)}`` de lo que el serializer devuelve."""
+    disponibles = {}
+    for nombre, campo in serializer_class().fields.items():
+        if campo.write_only:
+            continue
+        anidado = isinstance(campo, serializers.BaseSerializer)
+        disponibles[nombre] = tuple(n for n, c in campo.fields.items() if not c.write_only) if anidado else None
+    return disponibles
+
+
+def campos_pedidos(params, serializer_class):
+    """
+    ``None`` si no se pidió ``fields`` (todo) o ``((nombre, sub), ...)`` con
+    ``sub``: ``None`` el campo tal cual, ``ID`` la relación sin expandir o
+    los ``((subcampo, None), ...)`` de la relación expandida. Es hashable:
+    serializers_rapidos cachea un plan por cada combinación.
+    """
+    pedidos = _lista(params.get(PARAMETRO_CAMPOS))
+    expandir = set(_lista(params.get(PARAMETRO_EXPANDIR)))
+    if not pedidos and not expandir:
+        return None
+
+    disponibles = _disponibles(serializer_class)
+    anidados = {nombre for nombre, sub in disponibles.items() if sub is not None}
+    if expandir - anidados:
+        raise ValidationError({
+            PARAMETRO_EXPANDIR: f"No se puede expandir: {', '.join(sorted(expandir - anidados))}. "
+                                f"Expandibles: {', '.join(sorted(anidados)) or 'ninguno'}"
+        })
+    if not pedidos:
+        # sin fields todo sale completo, las relaciones ya expandidas
+        return None
+
+    directos, subcampos, desconocidos = set(), {}, []
+    for pedido in pedidos:
+        nombre, _, subcampo = pedido.partition(".")
+        if nombre not in disponibles or (subcampo and subcampo not in (disponibles[nombre] or ())):
+            desconocidos.append(pedido)
+        elif subcampo:
+            subcampos.setdefault(nombre, set()).add(subcampo)
+        else:
+            directos.add(nombre)
+    if desconocidos:
+        raise ValidationError({
+            PARAMETRO_CAMPOS: f"Campos desconocidos: {', '.join(desconocidos)}. "
+                              f"Disponibles: {', '.join(disponibles)}"
+        })
+
+    campos = []
+    for nombre, sub in disponibles.items():
+        if sub is None:
+            if nombre in directos:
+                campos.append((nombre, None))
+        elif nombre in subcampos:
+            campos.append((nombre, tuple((s, None) for s in sub if s in subcampos[nombre])))
+        elif nombre in expandir:
+            campos.append((nombre, None))
+        elif nombre in directos:
+            campos.append((nombre, ID))
+    return tuple(campos)
+
+
+def pide(campos, nombre):
+    """¿La salida lleva ``nombre``? (``visita.motivo_prohibicion`` para uno de la relación expandida)"""
+    nombre, _, subcampo = nombre.partition(".")
+    if campos is None:
+        return True
+    for n, sub in campos:
+        if n == nombre:
+            return not subcampo or (sub != ID and pide(sub, subcampo))
+    return False
+
+
+def columnas(serializer_class, campos):
+    """Columnas del modelo que leen los campos pedidos, para ``.only()`` (siempre con la pk)."""
+    meta = serializer_class.Meta.model._meta
+    fields = serializer_class().fields
+    salida = [meta.pk.name]
+    for nombre, _ in campos:
+        try:
+            salida.append(meta.get_field(fields[nombre].source.split(".")[0]).name)
+        except FieldDoesNotExist:
+            continue
+    return list(dict.fromkeys(salida))
+
+
+class CamposPedidosMixin:
+    """
+    Para serializers: ``campos`` (de ``campos_pedidos``) deja sólo esos
+    campos; la relación anidada sin expandir pasa a ser su id. Un serializer
+    recortado no usa el caché de representaciones (representaciones.py).
+    """
+
+    def __init__(self, *args, campos=None, **kwargs):
+        self.campos = campos
+        super().__init__(*args, **kwargs)
+        if campos is not None and getattr(self, "cache_nombre", None):
+            self.cache_nombre = None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.campos is None:
+            return fields
+
+        recortados = {}
+        for nombre, sub in self.campos:
+            campo = fields[nombre]
+            # DRF no acepta un source igual al nombre del campo
+            source = {} if campo.source in (None, nombre) else {"source": campo.source}
+            if sub == ID:
+                campo = serializers.PrimaryKeyRelatedField(read_only=True, **source)
+            elif sub is not None:
+                campo = type(campo)(read_only=True, campos=sub, **source)
+            recortados[nombre] = campo
+        return recortados
+
+
+class CamposPedidosViewMixin:
+    """Para vistas genéricas: lee ``?fields=``/``?expand=`` y se los pasa al serializer."""
+
+    @cached_property
+    def campos(self):
+        request = getattr(self, "request", None)
+        if request is None:
+            return None
+        return campos_pedidos(request.query_params, self.get_serializer_class())
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("campos", self.campos)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,122 @@
+"""
+Derivadas de las fotos de evidencia (ver access_ctrl/fotos.py): miniatura,
+tamaño medio y la foto completa en WebP, para que los listados no bajen las
+fotos originales del teléfono.
+
+Se generan con Pillow en un pool de threads fuera de la petición (al
+completarse la subida) y quedan en disco junto a las originales, con nombre
+derivado del hash: ``fotos/derivadas/<ab>/<sha256>_<variante>.webp``. Como el
+contenido de esa URL nunca cambia se sirven con caché ``private, immutable``
+y sólo a usuarios de la empresa que subió la original.
+"""
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+from . import fotos
+
+logger = logging.getLogger(__name__)
+
+# variante -> lado mayor en píxeles (None: tamaño original)
+VARIANTES = {"mini": 320, "media": 1280, "webp": None}
+CALIDAD_WEBP = 80
+
+_pool = None
+_pendientes = set()
+_lock = threading.Lock()
+
+
+def nombre_derivada(sha256, variante):
+    return f"fotos/derivadas/{sha256[:2]}/{sha256}_{variante}.webp"
+
+
+def ruta_derivada(sha256, variante):
+    return Path(settings.MEDIA_ROOT) / nombre_derivada(sha256, variante)
+
+
+def _url_foto_propia():
+    return re.compile(re.escape(settings.MEDIA_URL) + r"fotos/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})\.(?:jpg|png|webp)$")
+
+
+def url_derivada(url, variante):
+    """URL de la variante para una foto guardada acá; las URLs externas quedan igual."""
+    coincidencia = _url_foto_propia().search(url or "")
+    if not coincidencia:
+        return url
+    return url[:coincidencia.start()] + settings.MEDIA_URL + nombre_derivada(coincidencia["sha256"], variante)
+
+
+def faltantes(sha256):
+    return [v for v in VARIANTES if not ruta_derivada(sha256, v).exists()]
+
+
+def generar(sha256, extension):
+    """Genera las variantes que falten. Devuelve las que se crearon."""
+    pendientes = faltantes(sha256)
+    if not pendientes:
+        return []
+
+    # Pillow sólo se carga en el worker que llega a generar algo
+    from PIL import Image, ImageOps
+
+    with Image.open(fotos.ruta_foto(sha256, extension)) as original:
+        # las fotos de teléfono vienen rotadas por EXIF
+        imagen = ImageOps.exif_transpose(original)
+        if imagen.mode not in ("RGB", "RGBA"):
+            imagen = imagen.convert("RGBA" if "transparency" in imagen.info else "RGB")
+
+        # de mayor a menor: cada una se reduce desde la anterior
+        for variante in sorted(pendientes, key=lambda v: -(VARIANTES[v] or 10 ** 6)):
+            lado = VARIANTES[variante]
+            if lado:
+                imagen = imagen.copy()
+                imagen.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+
+            destino = ruta_derivada(sha256, variante)
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            temporal = destino.with_name(f"{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            imagen.save(temporal, "WEBP", quality=CALIDAD_WEBP, method=4)
+            os.replace(temporal, destino)
+
+    return pendientes
+
+
+def _pool_derivadas():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.FOTOS_DERIVADAS_WORKERS, thread_name_prefix="derivadas",
+            )
+        return _pool
+
+
+def _generar_en_pool(sha256, extension):
+    try:
+        return generar(sha256, extension)
+    except Exception:
+        logger.exception("No se pudieron generar las derivadas de %s", sha256)
+        raise
+    finally:
+        with _lock:
+            _pendientes.discard(sha256)
+
+
+def encolar(sha256, extension):
+    """
+    Pide las derivadas de una foto al pool. Devuelve el ``Future`` o None si
+    ya existen o ya están en cola.
+    """
+    if not faltantes(sha256):
+        return None
+    pool = _pool_derivadas()
+    with _lock:
+        if sha256 in _pendientes:
+            return None
+        _pendientes.add(sha256)
+    return pool.submit(_generar_en_pool, sha256, extension)
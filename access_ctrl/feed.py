@@ -0,0 +1,212 @@
+"""
+Feed en vivo de accesos (Server-Sent Events).
+
+- ``publicar_acceso`` se llama al registrar un Acceso. En PostgreSQL emite un
+  ``NOTIFY`` dentro de la misma transacción, así sólo se entrega si hace
+  commit y llega a todos los workers. En otros motores publica directo en el
+  hub local al hacer commit.
+- Cada worker con suscriptores mantiene un hilo con ``LISTEN`` que recibe las
+  notificaciones, serializa el acceso UNA vez y lo reparte a las colas de
+  los suscriptores que correspondan según empresa/instalación.
+- La reconexión con ``Last-Event-ID`` se resuelve contra la base de datos
+  (el id del evento es el id del Acceso).
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+
+from config.renderers import ORJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+CANAL = "accesos_feed"
+
+
+class Evento:
+    __slots__ = ("id", "empresa_id", "instalacion_id", "mensaje")
+
+    def __init__(self, id, empresa_id, instalacion_id, mensaje):
+        self.id = id
+        self.empresa_id = empresa_id
+        self.instalacion_id = instalacion_id
+        self.mensaje = mensaje
+
+
+def formatear_evento(acceso_id, data):
+    cuerpo = ORJSONRenderer().render(data).decode("utf-8")
+    return f"id: {acceso_id}\nevent: acceso\ndata: {cuerpo}\n\n".encode("utf-8")
+
+
+def evento_desde_acceso(acceso):
+    from .serializers import AccesoSerializer
+
+    return Evento(
+        acceso.id,
+        acceso.empresa_id,
+        acceso.instalacion_id,
+        formatear_evento(acceso.id, AccesoSerializer(acceso).data),
+    )
+
+
+class Suscripcion:
+    def __init__(self, hub, filtro, loop):
+        self.hub = hub
+        self.filtro = filtro
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=settings.FEED_ACCESOS_COLA_MAX)
+        self.atrasada = False
+
+    def acepta(self, evento):
+        return all(getattr(evento, campo) == valor for campo, valor in self.filtro.items())
+
+    def _entregar(self, evento):
+        if self.atrasada:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # el cliente no da abasto: se corta y reconecta con Last-Event-ID
+            self.atrasada = True
+
+    def cerrar(self):
+        self.hub.desuscribir(self)
+
+
+class HubAccesos:
+    """
+    Reparto en memoria del proceso. Los suscriptores viven en el event loop
+    de ASGI y las publicaciones pueden venir de cualquier hilo.
+    """
+
+    def __init__(self):
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+        self._escucha = None
+
+    def suscribir(self, filtro):
+        sub = Suscripcion(self, filtro, asyncio.get_running_loop())
+        with self._lock:
+            self._suscripciones.add(sub)
+        self._asegurar_escucha()
+        return sub
+
+    def desuscribir(self, sub):
+        with self._lock:
+            self._suscripciones.discard(sub)
+
+    def hay_suscriptores(self):
+        return bool(self._suscripciones)
+
+    def repartir(self, evento):
+        with self._lock:
+            destinos = [s for s in self._suscripciones if s.acepta(evento)]
+        for sub in destinos:
+            try:
+                sub.loop.call_soon_threadsafe(sub._entregar, evento)
+            except RuntimeError:
+                # el event loop del suscriptor ya terminó sin desuscribirlo
+                self.desuscribir(sub)
+
+    def recibir(self, acceso_id):
+        """Carga y serializa el acceso una sola vez para todos los suscriptores."""
+        if not self.hay_suscriptores():
+            return
+        from .models import Acceso
+
+        acceso = Acceso.objects.select_related(
+            "visita", "instalacion", "sector", "empresa"
+        ).filter(id=acceso_id).first()
+        if acceso:
+            self.repartir(evento_desde_acceso(acceso))
+
+    def _asegurar_escucha(self):
+        if connection.vendor != "postgresql":
+            return
+        with self._lock:
+            if self._escucha is None or not self._escucha.is_alive():
+                self._escucha = EscuchaPostgres(self)
+                self._escucha.start()
+
+    def detener(self):
+        if self._escucha is not None:
+            self._escucha.detener()
+            self._escucha = None
+
+
+class EscuchaPostgres(threading.Thread):
+    """Hilo con una conexión dedicada en LISTEN sobre el canal del feed."""
+
+    def __init__(self, hub):
+        super().__init__(name="feed-accesos-listen", daemon=True)
+        self.hub = hub
+        self._detener = threading.Event()
+
+    def detener(self):
+        self._detener.set()
+
+    def run(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        params = connections["default"].get_connection_params()
+        while not self._detener.is_set():
+            try:
+                conn = psycopg2.connect(**params)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL}")
+                self._escuchar(conn)
+            except Exception:
+                logger.exception("Error en LISTEN del feed de accesos; reintentando")
+                self._detener.wait(2)
+            finally:
+                close_old_connections()
+
+    def _escuchar(self, conn):
+        try:
+            while not self._detener.is_set():
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                close_old_connections()
+                while conn.notifies:
+                    notificacion = conn.notifies.pop(0)
+                    self.hub.recibir(json.loads(notificacion.payload)["id"])
+        finally:
+            conn.close()
+
+
+hub = HubAccesos()
+
+
+def publicar_acceso(acceso):
+    """
+    Anuncia un acceso nuevo. Debe llamarse dentro de la transacción que lo crea.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CANAL, json.dumps({"id": acceso.id})])
+        return
+
+    transaction.on_commit(lambda: hub.recibir(acceso.id))
+
+
+def publicar_accesos(accesos):
+    """Como ``publicar_acceso`` para varios accesos, con un solo ``pg_notify`` por lote."""
+    ids = [acceso.id for acceso in accesos]
+    if not ids:
+        return
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, json_build_object('id', id)::text) FROM unnest(%s::bigint[]) AS id",
+                [CANAL, ids],
+            )
+        return
+
+    transaction.on_commit(lambda: [hub.recibir(id) for id in ids])
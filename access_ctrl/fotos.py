@@ -0,0 +1,208 @@
+"""
+Almacenamiento de fotos de evidencia de salida en ``MEDIA_ROOT/fotos``,
+direccionado por contenido: cada foto se guarda una sola vez como
+``fotos/<ab>/<sha256>.<ext>`` y su URL nunca cambia.
+
+Las subidas son reanudables (al estilo tus): se declara el tamaño, los bytes
+llegan en uno o más PATCH con ``Upload-Offset`` y se escriben a un archivo
+parcial en bloques, sin juntar el archivo en memoria. Si la conexión se corta
+el cliente consulta el offset y sigue desde ahí. Al recibir el último byte se
+calcula el hash y el parcial pasa a su lugar definitivo (o se descarta si la
+misma foto ya estaba guardada).
+"""
+import fcntl
+import hashlib
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+BLOQUE = 64 * 1024
+
+# firma de los primeros bytes -> extensión
+_FIRMAS = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+)
+TIPOS = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+
+class ErrorSubida(Exception):
+    def __init__(self, error, status=400, **extra):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+        self.extra = extra
+
+
+def directorio_fotos():
+    return Path(settings.MEDIA_ROOT) / "fotos"
+
+
+def ruta_parcial(subida):
+    return directorio_fotos() / "subidas" / f"{subida.id}.part"
+
+
+def nombre_foto(sha256, extension):
+    return f"fotos/{sha256[:2]}/{sha256}.{extension}"
+
+
+def ruta_foto(sha256, extension):
+    return Path(settings.MEDIA_ROOT) / nombre_foto(sha256, extension)
+
+
+def url_foto(sha256, extension):
+    return f"{settings.MEDIA_URL}{nombre_foto(sha256, extension)}"
+
+
+def extension_de(cabecera):
+    for firma, extension in _FIRMAS:
+        if cabecera.startswith(firma):
+            return extension
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def recibidos(subida):
+    if subida.completada_en:
+        return subida.tamano
+    try:
+        return ruta_parcial(subida).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _subidas_de(usuario):
+    # las del propio usuario y las de otros usuarios de su empresa
+    condicion = Q(usuario=usuario)
+    if usuario.empresa_id:
+        condicion |= Q(usuario__empresa_id=usuario.empresa_id)
+    return condicion
+
+
+def foto_existente(sha256, usuario=None):
+    """
+    Extensión de la foto ya guardada con ese hash, o None. Con ``usuario``
+    sólo cuentan las que subió él o alguien de su empresa.
+    """
+    from .models import SubidaFoto
+
+    previas = SubidaFoto.objects.filter(sha256=sha256, completada_en__isnull=False)
+    if usuario is not None:
+        previas = previas.filter(_subidas_de(usuario))
+    previa = previas.first()
+    if previa and ruta_foto(sha256, previa.extension).exists():
+        return previa.extension
+    return None
+
+
+def puede_ver(usuario, sha256):
+    """
+    Si ``usuario`` puede ver la foto: superadmin y administradora general
+    todas, el resto sólo las subidas por su empresa.
+    """
+    from .models import SubidaFoto
+
+    if usuario.role == "superadmin" or (usuario.empresa and usuario.empresa.es_administradora_general):
+        return True
+    return SubidaFoto.objects.filter(sha256=sha256, completada_en__isnull=False).filter(_subidas_de(usuario)).exists()
+
+
+def agregar_bloques(subida, stream, offset):
+    """
+    Escribe lo que venga en ``stream`` a partir de ``offset`` (que debe ser lo
+    ya recibido). Devuelve el nuevo offset; si completa el tamaño declarado
+    finaliza la subida.
+    """
+    ruta = ruta_parcial(subida)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(ruta, "ab") as parcial:
+        try:
+            # un solo PATCH a la vez por subida (p. ej. un reintento con el anterior colgado)
+            fcntl.flock(parcial, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ErrorSubida("subida_en_curso", status=409)
+
+        actual = parcial.seek(0, os.SEEK_END)
+        if offset != actual:
+            raise ErrorSubida("offset_no_coincide", status=409, offset=actual)
+
+        while actual < subida.tamano:
+            bloque = stream.read(min(BLOQUE, subida.tamano - actual))
+            if not bloque:
+                break
+            parcial.write(bloque)
+            actual += len(bloque)
+
+        # más bytes que los declarados
+        if actual >= subida.tamano and stream.read(1):
+            parcial.truncate(offset)
+            raise ErrorSubida("excede_tamano_declarado", status=413, offset=offset)
+
+        parcial.flush()
+
+    if actual == subida.tamano:
+        finalizar(subida)
+    return actual
+
+
+def _hash_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        cabecera = f.read(16)
+        sha.update(cabecera)
+        for bloque in iter(lambda: f.read(BLOQUE * 16), b""):
+            sha.update(bloque)
+    return sha.hexdigest(), cabecera
+
+
+def finalizar(subida):
+    ruta = ruta_parcial(subida)
+    sha256, cabecera = _hash_archivo(ruta)
+
+    extension = extension_de(cabecera)
+    if extension is None:
+        ruta.unlink(missing_ok=True)
+        subida.delete()
+        raise ErrorSubida("formato_no_soportado", status=415)
+
+    # el cliente puede declarar el hash al crear la subida: se verifica
+    if subida.sha256 and subida.sha256 != sha256:
+        ruta.unlink(missing_ok=True)
+        subida.delete()
+        raise ErrorSubida("hash_no_coincide", status=422)
+
+    destino = ruta_foto(sha256, extension)
+    if destino.exists():
+        ruta.unlink()
+    else:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(ruta, destino)
+
+    subida.sha256 = sha256
+    subida.extension = extension
+    subida.completada_en = timezone.now()
+    subida.save(update_fields=["sha256", "extension", "completada_en"])
+
+    # miniatura y demás derivadas, fuera de la petición
+    from . import derivadas
+    transaction.on_commit(lambda: derivadas.encolar(sha256, extension))
+    return subida
+
+
+def limpiar_subidas(antes_de):
+    """Borra las subidas sin completar creadas antes de ``antes_de``. Devuelve cuántas."""
+    from .models import SubidaFoto
+
+    viejas = SubidaFoto.objects.filter(completada_en__isnull=True, creada_en__lt=antes_de)
+    cantidad = 0
+    for subida in viejas.iterator():
+        ruta_parcial(subida).unlink(missing_ok=True)
+        subida.delete()
+        cantidad += 1
+    return cantidad
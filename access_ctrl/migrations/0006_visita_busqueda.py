@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+from access_ctrl.busqueda import eliminar_indice_busqueda, instalar_indice_busqueda, texto_busqueda
+
+
+def poblar_busqueda(apps, schema_editor):
+    Visita = apps.get_model("access_ctrl", "Visita")
+    db = schema_editor.connection.alias
+
+    lote = []
+    for visita in Visita.objects.using(db).only("id", "nombre", "apellido", "rut", "dni_extranjero", "patente").iterator(chunk_size=2000):
+        visita.busqueda = texto_busqueda(visita)
+        lote.append(visita)
+        if len(lote) >= 2000:
+            Visita.objects.using(db).bulk_update(lote, ["busqueda"])
+            lote = []
+    if lote:
+        Visita.objects.using(db).bulk_update(lote, ["busqueda"])
+
+
+def instalar_indice(apps, schema_editor):
+    instalar_indice_busqueda(schema_editor.connection)
+
+
+def eliminar_indice(apps, schema_editor):
+    eliminar_indice_busqueda(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_ctrl', '0005_visita_instalacion_visita_sector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visita',
+            name='busqueda',
+            field=models.CharField(blank=True, default='', editable=False, max_length=512),
+        ),
+        migrations.RunPython(poblar_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(instalar_indice, eliminar_indice),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from access_ctrl.particiones import particionar_tabla
+
+
+def particionar(apps, schema_editor):
+    # sólo PostgreSQL; en SQLite la tabla queda igual
+    particionar_tabla(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_ctrl', '0006_visita_busqueda'),
+    ]
+
+    operations = [
+        # al revertir la tabla sigue particionada, pero es compatible con el modelo
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
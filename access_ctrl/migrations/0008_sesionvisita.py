@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_ctrl', '0007_particionar_acceso'),
+        ('core', '0003_empresa_es_administradora_general'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SesionVisita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_ingreso', models.DateTimeField()),
+                ('fecha_salida', models.DateTimeField(blank=True, null=True)),
+                ('duracion_segundos', models.PositiveIntegerField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones', to='core.empresa')),
+                ('ingreso', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='access_ctrl.acceso')),
+                ('instalacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones', to='core.instalacion')),
+                ('salida', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='access_ctrl.acceso')),
+                ('sector', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones', to='core.sector')),
+                ('visita', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones', to='access_ctrl.visita')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['instalacion', 'fecha_ingreso'], name='access_ctrl_instala_770bf4_idx'), models.Index(fields=['sector', 'fecha_ingreso'], name='access_ctrl_sector__963ad0_idx'), models.Index(fields=['empresa', 'fecha_ingreso'], name='access_ctrl_empresa_0fd406_idx'), models.Index(condition=models.Q(('fecha_salida__isnull', True)), fields=['visita', 'instalacion'], name='sesion_abierta_visita_idx'), models.Index(condition=models.Q(('fecha_salida__isnull', True)), fields=['instalacion', 'fecha_ingreso'], name='sesion_abierta_inst_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_ctrl', '0008_sesionvisita'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaFoto',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tamano', models.PositiveIntegerField()),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64, null=True)),
+                ('extension', models.CharField(blank=True, max_length=5)),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('completada_en', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas_foto', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
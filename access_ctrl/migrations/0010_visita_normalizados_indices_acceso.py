@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+from access_ctrl.busqueda import normalizar_documento, normalizar_patente
+
+
+def poblar_normalizados(apps, schema_editor):
+    Visita = apps.get_model("access_ctrl", "Visita")
+    db = schema_editor.connection.alias
+
+    lote = []
+    campos = ["documento_normalizado", "patente_normalizada"]
+    for visita in Visita.objects.using(db).only("id", "rut", "dni_extranjero", "es_extranjero", "patente").iterator(chunk_size=2000):
+        visita.documento_normalizado = normalizar_documento(visita.dni_extranjero if visita.es_extranjero else visita.rut)
+        visita.patente_normalizada = normalizar_patente(visita.patente)
+        lote.append(visita)
+        if len(lote) >= 2000:
+            Visita.objects.using(db).bulk_update(lote, campos)
+            lote = []
+    if lote:
+        Visita.objects.using(db).bulk_update(lote, campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_ctrl', '0009_subidafoto'),
+        ('core', '0003_empresa_es_administradora_general'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visita',
+            name='documento_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='visita',
+            name='patente_normalizada',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(poblar_normalizados, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='acceso',
+            index=models.Index(fields=['sector', 'fecha_hora'], name='access_ctrl_sector__078a44_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='acceso',
+            index=models.Index(fields=['guardia', 'fecha_hora'], name='access_ctrl_guardia_49e464_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='acceso',
+            index=models.Index(fields=['visita', 'fecha_hora'], name='access_ctrl_visita__45f380_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='acceso',
+            index=models.Index(condition=models.Q(('comentario__isnull', False)), fields=['fecha_hora'], name='acceso_con_comentario_idx'),
+        ),
+    ]
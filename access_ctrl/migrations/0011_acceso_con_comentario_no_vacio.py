@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_ctrl', '0010_visita_normalizados_indices_acceso'),
+        ('core', '0003_empresa_es_administradora_general'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='acceso',
+            name='acceso_con_comentario_idx',
+        ),
+        migrations.AddIndex(
+            model_name='acceso',
+            index=models.Index(condition=models.Q(('comentario__isnull', False), models.Q(('comentario', ''), _negated=True)), fields=['fecha_hora'], name='acceso_con_comentario_idx'),
+        ),
+    ]
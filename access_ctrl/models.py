@@ -1,7 +1,11 @@
+import uuid
+
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.conf import settings
 
+from .busqueda import CAMPOS_BUSQUEDA, CAMPOS_NORMALIZADOS, completar_normalizados
+
 class Visita(models.Model):
     rut = models.CharField(max_length=12, blank=True, null=True, db_index=True)
     dni_extranjero = models.CharField(max_length=32, blank=True, null=True, db_index=True)
@@ -37,10 +41,25 @@ class Visita(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    # nombre, apellido, documentos y patente normalizados (ver busqueda.py)
+    busqueda = models.CharField(max_length=512, blank=True, default="", editable=False)
+    # RUT (o DNI si es extranjero) y patente normalizados, para buscarlos por índice
+    documento_normalizado = models.CharField(max_length=32, blank=True, default="", editable=False, db_index=True)
+    patente_normalizada = models.CharField(max_length=12, blank=True, default="", editable=False, db_index=True)
+
     def __str__(self):
         doc = self.dni_extranjero if self.es_extranjero else self.rut
         return f"{self.nombre} {self.apellido or ''} - {doc or 's/doc'}"
 
+    def save(self, *args, **kwargs):
+        completar_normalizados(self)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & {*CAMPOS_BUSQUEDA, "es_extranjero"}:
+            kwargs["update_fields"] = {*update_fields, *CAMPOS_NORMALIZADOS}
+
+        super().save(*args, **kwargs)
+
 class ProhibicionAcceso(models.Model):
     visita = models.ForeignKey(Visita, on_delete=models.CASCADE, related_name="prohibiciones")
     instalacion = models.ForeignKey("core.Instalacion", on_delete=models.CASCADE, related_name="prohibiciones")
@@ -51,6 +70,12 @@ class ProhibicionAcceso(models.Model):
     class Meta:
         indexes = [models.Index(fields=["instalacion","fecha_inicio"])]
 
+
+# accesos con comentario: condición del índice parcial y del filtro ?con_comentario=1,
+# escrita una sola vez para que el SQL de ambos coincida y el planificador use el índice
+CON_COMENTARIO = models.Q(comentario__isnull=False) & ~models.Q(comentario="")
+
+
 class Acceso(models.Model):
     TIPO = (("ingreso","Ingreso"), ("salida","Salida"))
 
@@ -76,4 +101,65 @@ class Acceso(models.Model):
             models.Index(fields=["instalacion","fecha_hora"]),
             models.Index(fields=["empresa","fecha_hora"]),
             models.Index(fields=["tipo","fecha_hora"]),
+            # filtros de AccesoListView (ver views_accesos.filtrar_accesos)
+            models.Index(fields=["sector", "fecha_hora"]),
+            models.Index(fields=["guardia", "fecha_hora"]),
+            models.Index(fields=["visita", "fecha_hora"]),
+            models.Index(fields=["fecha_hora"], condition=CON_COMENTARIO, name="acceso_con_comentario_idx"),
         ]
+
+
+class SesionVisita(models.Model):
+    """
+    Estadía de una visita: el ingreso que la abre y la salida que la cierra.
+    Se escribe junto con cada Acceso para no tener que emparejar el log después.
+    """
+    visita = models.ForeignKey(Visita, on_delete=models.CASCADE, related_name="sesiones")
+    instalacion = models.ForeignKey("core.Instalacion", on_delete=models.CASCADE, related_name="sesiones")
+    sector = models.ForeignKey("core.Sector", on_delete=models.CASCADE, related_name="sesiones")
+    empresa = models.ForeignKey("core.Empresa", on_delete=models.CASCADE, related_name="sesiones")
+
+    # sin FK real: en PostgreSQL la PK de Acceso particionado es (id, fecha_hora)
+    ingreso = models.ForeignKey(
+        Acceso, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    salida = models.ForeignKey(
+        Acceso, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name="+"
+    )
+
+    fecha_ingreso = models.DateTimeField()
+    fecha_salida = models.DateTimeField(blank=True, null=True)
+    duracion_segundos = models.PositiveIntegerField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["instalacion", "fecha_ingreso"]),
+            models.Index(fields=["sector", "fecha_ingreso"]),
+            models.Index(fields=["empresa", "fecha_ingreso"]),
+            # sesiones abiertas: cierre en SalidaView y listado de permanencias excedidas
+            models.Index(
+                fields=["visita", "instalacion"],
+                condition=models.Q(fecha_salida__isnull=True),
+                name="sesion_abierta_visita_idx",
+            ),
+            models.Index(
+                fields=["instalacion", "fecha_ingreso"],
+                condition=models.Q(fecha_salida__isnull=True),
+                name="sesion_abierta_inst_idx",
+            ),
+        ]
+
+
+class SubidaFoto(models.Model):
+    """
+    Subida reanudable de una foto de evidencia (ver access_ctrl/fotos.py).
+    Los bytes recibidos viven en un archivo parcial; al completarse la foto
+    queda guardada por su hash y ``sha256`` identifica el archivo final.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="subidas_foto")
+    tamano = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    extension = models.CharField(max_length=5, blank=True)
+    creada_en = models.DateTimeField(auto_now_add=True)
+    completada_en = models.DateTimeField(blank=True, null=True)
@@ -0,0 +1,275 @@
+"""
+Particionado mensual de ``Acceso`` por ``fecha_hora`` (sólo PostgreSQL) y
+archivo en frío de los meses fuera de la ventana de retención.
+
+- La tabla ``access_ctrl_acceso`` queda como tabla particionada por rango;
+  cada mes vive en ``access_ctrl_acceso_pAAAA_MM``. Las consultas del ORM
+  siguen apuntando a la tabla padre y PostgreSQL descarta las particiones
+  que no calzan con el filtro de ``fecha_hora``.
+- ``crear_particiones_accesos`` crea por adelantado los meses futuros.
+- ``archivar_accesos`` separa los meses antiguos y los guarda como CSV
+  comprimido en ``ACCESOS_ARCHIVO_DIR``; se pueden leer con ``leer_archivo``.
+
+En SQLite todo esto es un no-op salvo la lectura de archivos.
+"""
+import csv
+import gzip
+import json
+import re
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+TABLA = "access_ctrl_acceso"
+TABLA_SIN_PARTICION = "access_ctrl_acceso_sin_particion"
+SECUENCIA = "access_ctrl_acceso_pid_seq"
+PARTICION_DEFAULT = f"{TABLA}_pdefault"
+
+_NOMBRE_PARTICION = re.compile(rf"^{TABLA}_p(\d{{4}})_(\d{{2}})$")
+
+
+def nombre_particion(anio, mes):
+    return f"{TABLA}_p{anio:04d}_{mes:02d}"
+
+
+def mes_siguiente(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def sumar_meses(anio, mes, meses):
+    total = anio * 12 + (mes - 1) + meses
+    return total // 12, total % 12 + 1
+
+
+def inicio_mes(anio, mes):
+    """Inicio del mes en hora local, igual que los reportes mensuales."""
+    return timezone.make_aware(datetime(anio, mes, 1), timezone.get_current_timezone())
+
+
+def rango_mes(anio, mes):
+    return inicio_mes(anio, mes), inicio_mes(*mes_siguiente(anio, mes))
+
+
+def esta_particionada(conn=connection):
+    if conn.vendor != "postgresql":
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s",
+            [TABLA],
+        )
+        return cursor.fetchone() is not None
+
+
+def particiones_existentes(conn=connection):
+    """Lista ordenada de ``(anio, mes)`` con partición activa."""
+    if not esta_particionada(conn):
+        return []
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [TABLA],
+        )
+        meses = []
+        for (relname,) in cursor.fetchall():
+            match = _NOMBRE_PARTICION.match(relname)
+            if match:
+                meses.append((int(match.group(1)), int(match.group(2))))
+    return sorted(meses)
+
+
+def crear_particion(anio, mes, conn=connection):
+    """
+    Crea la partición del mes si no existe. Devuelve True si la creó.
+
+    Si la partición por defecto ya tiene filas de ese mes (un cron que no
+    corrió, un histórico importado) PostgreSQL no deja crearla: en una sola
+    transacción se separa la por defecto, se crea la del mes, se le pasan
+    esas filas y se vuelve a adjuntar. Mientras tanto las escrituras en
+    accesos esperan el lock de la tabla.
+    """
+    if (anio, mes) in particiones_existentes(conn):
+        return False
+    nombre = nombre_particion(anio, mes)
+    desde, hasta = rango_mes(anio, mes)
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [PARTICION_DEFAULT])
+        (hay_default,) = cursor.fetchone()
+        pendientes = False
+        if hay_default:
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {PARTICION_DEFAULT} WHERE fecha_hora >= %s AND fecha_hora < %s)",
+                [desde, hasta],
+            )
+            (pendientes,) = cursor.fetchone()
+
+        if pendientes:
+            cursor.execute(f"ALTER TABLE {TABLA} DETACH PARTITION {PARTICION_DEFAULT}")
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {nombre} PARTITION OF {TABLA} FOR VALUES FROM (%s) TO (%s)",
+            [desde, hasta],
+        )
+        if pendientes:
+            cursor.execute(
+                f"INSERT INTO {nombre} SELECT * FROM {PARTICION_DEFAULT} WHERE fecha_hora >= %s AND fecha_hora < %s",
+                [desde, hasta],
+            )
+            cursor.execute(
+                f"DELETE FROM {PARTICION_DEFAULT} WHERE fecha_hora >= %s AND fecha_hora < %s",
+                [desde, hasta],
+            )
+            cursor.execute(f"ALTER TABLE {TABLA} ATTACH PARTITION {PARTICION_DEFAULT} DEFAULT")
+    return True
+
+
+def crear_particiones_futuras(meses_adelante=3, conn=connection):
+    hoy = timezone.localdate()
+    creadas = []
+    for i in range(meses_adelante + 1):
+        anio, mes = sumar_meses(hoy.year, hoy.month, i)
+        if crear_particion(anio, mes, conn):
+            creadas.append((anio, mes))
+    return creadas
+
+
+def particionar_tabla(conn):
+    """
+    Convierte ``access_ctrl_acceso`` en tabla particionada conservando datos,
+    nombres de índices y FKs (para que las migraciones posteriores sigan
+    encontrándolos). Se ejecuta una sola vez desde la migración.
+    """
+    if conn.vendor != "postgresql" or esta_particionada(conn):
+        return
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLA} RENAME TO {TABLA_SIN_PARTICION}")
+
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s",
+            [TABLA_SIN_PARTICION],
+        )
+        indices = [(n, d) for n, d in cursor.fetchall() if not n.endswith("_pkey")]
+
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLA_SIN_PARTICION],
+        )
+        fks = cursor.fetchall()
+
+        for nombre, _ in fks:
+            cursor.execute(f'ALTER TABLE {TABLA_SIN_PARTICION} DROP CONSTRAINT "{nombre}"')
+        for nombre, _ in indices:
+            cursor.execute(f'DROP INDEX "{nombre}"')
+
+        # la clave primaria de una tabla particionada debe incluir fecha_hora
+        cursor.execute(
+            f"CREATE TABLE {TABLA} (LIKE {TABLA_SIN_PARTICION} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (fecha_hora)"
+        )
+        cursor.execute(f"CREATE SEQUENCE {SECUENCIA} OWNED BY {TABLA}.id")
+        cursor.execute(f"ALTER TABLE {TABLA} ALTER COLUMN id SET DEFAULT nextval('{SECUENCIA}')")
+        cursor.execute(f"ALTER TABLE {TABLA} ADD PRIMARY KEY (id, fecha_hora)")
+
+        for nombre, definicion in indices:
+            definicion = re.sub(
+                rf" ON (\w+\.)?{TABLA_SIN_PARTICION} ", f" ON {TABLA} ", definicion
+            )
+            cursor.execute(definicion)
+        for nombre, definicion in fks:
+            cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT "{nombre}" {definicion}')
+
+        cursor.execute(f"CREATE TABLE {PARTICION_DEFAULT} PARTITION OF {TABLA} DEFAULT")
+
+        cursor.execute(f"SELECT MIN(fecha_hora) FROM {TABLA_SIN_PARTICION}")
+        (minima,) = cursor.fetchone()
+
+    desde = timezone.localtime(minima) if minima else timezone.localtime()
+    anio, mes = desde.year, desde.month
+    hoy = timezone.localdate()
+    while (anio, mes) <= (hoy.year, hoy.month):
+        crear_particion(anio, mes, conn)
+        anio, mes = mes_siguiente(anio, mes)
+    crear_particiones_futuras(conn=conn)
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLA} SELECT * FROM {TABLA_SIN_PARTICION}")
+        cursor.execute(
+            f"SELECT setval('{SECUENCIA}', COALESCE((SELECT MAX(id) FROM {TABLA}), 0) + 1, false)"
+        )
+        cursor.execute(f"DROP TABLE {TABLA_SIN_PARTICION}")
+
+
+# =======================
+# Archivo en frío
+# =======================
+
+def directorio_archivo():
+    return settings.ACCESOS_ARCHIVO_DIR
+
+
+def ruta_archivo(anio, mes):
+    return directorio_archivo() / f"accesos_{anio:04d}_{mes:02d}.csv.gz"
+
+
+def mes_archivado(anio, mes):
+    return ruta_archivo(anio, mes).exists()
+
+
+def meses_a_archivar(retencion_meses, conn=connection):
+    hoy = timezone.localdate()
+    limite = sumar_meses(hoy.year, hoy.month, -retencion_meses)
+    return [m for m in particiones_existentes(conn) if m < limite]
+
+
+def archivar_particion(anio, mes, conn=connection):
+    """
+    Separa la partición del mes, la vuelca a CSV comprimido y la elimina.
+    Si algo falla antes de terminar, la partición vuelve a quedar adjunta.
+    """
+    nombre = nombre_particion(anio, mes)
+    ruta = ruta_archivo(anio, mes)
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        with transaction.atomic(using=conn.alias):
+            with conn.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {TABLA} DETACH PARTITION {nombre}")
+                with gzip.open(temporal, "wt", encoding="utf-8", newline="") as fh:
+                    cursor.copy_expert(
+                        f"COPY (SELECT * FROM {nombre} ORDER BY fecha_hora) TO STDOUT WITH (FORMAT csv, HEADER)",
+                        fh,
+                    )
+                temporal.replace(ruta)
+                cursor.execute(f"DROP TABLE {nombre}")
+    finally:
+        if temporal.exists():
+            temporal.unlink()
+
+    return ruta
+
+
+_ENTEROS = ("id", "visita_id", "instalacion_id", "sector_id", "guardia_id", "empresa_id")
+
+
+def leer_archivo(anio, mes):
+    """
+    Recorre un mes archivado fila a fila, con los mismos nombres de columna
+    que la tabla (``visita_id``, ``fecha_hora``...).
+    """
+    with gzip.open(ruta_archivo(anio, mes), "rt", encoding="utf-8", newline="") as fh:
+        for fila in csv.DictReader(fh):
+            for campo in _ENTEROS:
+                fila[campo] = int(fila[campo]) if fila.get(campo) else None
+            fila["fecha_hora"] = parse_datetime(fila["fecha_hora"])
+            fila["foto_url"] = json.loads(fila["foto_url"]) if fila.get("foto_url") else []
+            fila["comentario"] = fila.get("comentario") or None
+            yield fila
@@ -0,0 +1,53 @@
+"""
+Pases QR firmados para visitas preinscritas.
+
+El token lleva visita, instalación, sector y la ventana de validez en base62,
+firmados con HMAC-SHA256 (``django.core.signing.Signer`` con la SECRET_KEY):
+
+    <visita>.<instalacion>.<sector>.<desde>.<hasta>:<firma>
+
+Verificarlo es recalcular una firma y comparar dos enteros, sin JSON, sin
+compresión y sin tocar la base; al escanearlo en portería sólo se consulta
+el caché de prohibiciones (prohibiciones.py) y el último acceso de la visita.
+"""
+import time
+from collections import namedtuple
+
+from django.core import signing
+
+SALT = "access_ctrl.pases"
+
+Pase = namedtuple("Pase", "visita_id instalacion_id sector_id desde hasta")
+
+_signer = signing.Signer(salt=SALT)
+
+
+class PaseInvalido(Exception):
+    def __init__(self, error, status=400):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+
+
+def emitir(visita_id, instalacion_id, sector_id, desde, hasta):
+    """Token del pase; ``desde`` y ``hasta`` son datetimes con zona horaria."""
+    campos = (visita_id, instalacion_id, sector_id, int(desde.timestamp()), int(hasta.timestamp()))
+    return _signer.sign(".".join(signing.b62_encode(c) for c in campos))
+
+
+def verificar(token, ahora=None):
+    """
+    El ``Pase`` del token si la firma es válida y está dentro de su ventana;
+    si no, ``PaseInvalido`` con el motivo.
+    """
+    try:
+        pase = Pase(*(signing.b62_decode(c) for c in _signer.unsign(token).split(".")))
+    except (signing.BadSignature, TypeError, ValueError):
+        raise PaseInvalido("pase_invalido")
+
+    ahora = time.time() if ahora is None else ahora
+    if ahora < pase.desde:
+        raise PaseInvalido("pase_aun_no_vigente", status=403)
+    if ahora > pase.hasta:
+        raise PaseInvalido("pase_vencido", status=403)
+    return pase
@@ -0,0 +1,105 @@
+"""
+Caché en memoria de las prohibiciones por instalación, para chequear una
+prohibición en portería sin ir a la base (ver pases.py).
+
+Cada proceso guarda, por instalación, las prohibiciones vigentes o futuras
+(``visita_id -> [(inicio, fin, motivo)]``) y las compara con la hora actual
+al consultar, así las que vencen o empiezan no necesitan invalidación.
+
+Cualquier alta, baja o cambio de una ``ProhibicionAcceso`` incrementa
+``VERSION`` en el caché de Django, al cambiar y al hacer commit (señales del modelo, y
+``invalidar()`` explícito después de ``bulk_create``/``update``). Los demás
+workers lo ven en la consulta siguiente porque con más de un worker el caché
+de Django es compartido (Redis con ``REDIS_URL``, o en disco entre los workers
+de un host; ver "Caché" en config/settings.py). Sin Redis, los de otro host
+recargan a más tardar a los ``PROHIBICIONES_CACHE_SEGUNDOS``.
+
+Si la clave de versión no está (caché recién levantado, reiniciado o que la
+desalojó) se crea con un valor nuevo, nunca con uno que algún worker pudo
+haber visto antes, así ninguno sigue usando lo que cargó con la versión vieja.
+"""
+from time import monotonic, time_ns
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from config.metricas import registrar_cache
+
+from .models import ProhibicionAcceso
+
+VERSION = "prohibiciones:version"
+
+# instalacion_id -> (version, cargado_en, {visita_id: [(inicio, fin, motivo), ...]})
+_por_instalacion = {}
+
+
+def version():
+    actual = cache.get(VERSION)
+    if actual is None:
+        nueva = time_ns()
+        # add: si otro worker la creó al mismo tiempo queda la suya
+        cache.add(VERSION, nueva, timeout=None)
+        actual = cache.get(VERSION, nueva)
+    return actual
+
+
+def _incrementar():
+    _por_instalacion.clear()
+    try:
+        cache.incr(VERSION)
+    except ValueError:
+        cache.set(VERSION, time_ns(), timeout=None)
+
+
+def invalidar(**kwargs):
+    """
+    Descarta el caché: ya mismo para la transacción en curso y de nuevo al
+    hacer commit, para que ningún worker se quede con lo que leyó antes.
+    """
+    _incrementar()
+    transaction.on_commit(_incrementar)
+
+
+def _cargar(instalacion_id):
+    ahora = timezone.now()
+    prohibiciones = {}
+    filas = ProhibicionAcceso.objects.filter(
+        instalacion_id=instalacion_id
+    ).filter(
+        Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=ahora)
+    ).order_by("-fecha_inicio").values_list("visita_id", "fecha_inicio", "fecha_fin", "motivo")
+
+    for visita_id, inicio, fin, motivo in filas:
+        prohibiciones.setdefault(visita_id, []).append((inicio, fin, motivo))
+    return prohibiciones
+
+
+def _prohibiciones(instalacion_id):
+    actual = version()
+    entrada = _por_instalacion.get(instalacion_id)
+    hit = (
+        entrada is not None and entrada[0] == actual
+        and monotonic() - entrada[1] < settings.PROHIBICIONES_CACHE_SEGUNDOS
+    )
+    registrar_cache("prohibiciones", hit)
+    if hit:
+        return entrada[2]
+
+    prohibiciones = _cargar(instalacion_id)
+    _por_instalacion[instalacion_id] = (actual, monotonic(), prohibiciones)
+    return prohibiciones
+
+
+def motivo_vigente(visita_id, instalacion_id):
+    """
+    Motivo de la prohibición vigente más reciente de la visita en la
+    instalación, o None. Igual criterio que ``views._prohibiciones_activas``.
+    """
+    ahora = timezone.now()
+    for inicio, fin, motivo in _prohibiciones(instalacion_id).get(visita_id, ()):
+        if inicio <= ahora and (fin is None or fin >= ahora):
+            return motivo
+    return None
@@ -0,0 +1,161 @@
+"""
+Caché de representaciones serializadas de visitas.
+
+La misma visita se serializa una y otra vez: en cada acceso anidado de los
+listados, en las búsquedas y en los enrolados. ``RepresentacionCacheadaMixin``
+(en ``VisitaSerializer`` y ``EnrolamientoSerializer``) guarda el dict ya
+serializado con la clave ``(serializer, visita_id, actualizado_en, zona horaria)``:
+cualquier ``save()`` de la visita cambia ``actualizado_en``, así que una
+entrada vieja nunca se vuelve a leer; sólo envejece hasta salir.
+
+``motivo_prohibicion`` no se cachea (``campos_por_pedido``): depende de la
+hora y de las prohibiciones, no de la fila, y se calcula en cada pedido con el
+prefetch de ``prohibiciones_vigentes`` que ya hacen las vistas. Así una
+prohibición nueva, levantada, que empieza o que vence se ve en el pedido
+siguiente en cualquier worker, sin depender de una versión compartida.
+
+- Primer nivel: LRU en memoria del proceso, acotado a
+  ``REPRESENTACIONES_CACHE_MAX`` entradas.
+- Segundo nivel opcional: el alias de ``CACHES`` en
+  ``REPRESENTACIONES_CACHE_ALIAS`` (p. ej. Redis), compartido entre workers.
+  En los listados se lee con un solo ``get_many`` (ver ``precargar``).
+
+Las entradas duran ``REPRESENTACIONES_CACHE_SEGUNDOS``.
+"""
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from config.metricas import registrar_cache
+
+
+class LRU:
+    """Diccionario acotado con desalojo del menos usado y vencimiento por entrada."""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if entrada[1] < monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return entrada[0]
+
+    def set(self, clave, valor, segundos):
+        with self._lock:
+            self._datos[clave] = (valor, monotonic() + segundos)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+local = LRU(settings.REPRESENTACIONES_CACHE_MAX)
+
+
+def _compartido():
+    alias = settings.REPRESENTACIONES_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def clave(nombre, visita):
+    """
+    Clave de la visita, o None si no se puede cachear (serializer recortado
+    con ``?fields=``, sin guardar o con ``actualizado_en`` diferido).
+    """
+    if nombre is None or visita.pk is None or "actualizado_en" in visita.get_deferred_fields() or visita.actualizado_en is None:
+        return None
+    # las fechas se serializan en la zona horaria activa
+    return (
+        f"repr:{nombre}:{visita.pk}:{visita.actualizado_en.timestamp():.6f}:"
+        f"{timezone.get_current_timezone_name()}"
+    )
+
+
+def obtener(clave):
+    valor = local.get(clave)
+    if valor is None and (compartido := _compartido()) is not None:
+        valor = compartido.get(clave)
+        if valor is not None:
+            local.set(clave, valor, settings.REPRESENTACIONES_CACHE_SEGUNDOS)
+    registrar_cache("representaciones", valor is not None)
+    # copia: quien la recibe puede modificarla
+    return dict(valor) if valor is not None else None
+
+
+def guardar(clave, valor):
+    valor = dict(valor)
+    local.set(clave, valor, settings.REPRESENTACIONES_CACHE_SEGUNDOS)
+    if (compartido := _compartido()) is not None:
+        compartido.set(clave, valor, settings.REPRESENTACIONES_CACHE_SEGUNDOS)
+
+
+def precargar(claves):
+    """Trae al LRU local, con un solo ``get_many``, las claves que falten y estén en el caché compartido."""
+    compartido = _compartido()
+    if compartido is None:
+        return
+    faltan = [c for c in claves if c is not None and local.get(c) is None]
+    if not faltan:
+        return
+    for c, valor in compartido.get_many(faltan).items():
+        local.set(c, valor, settings.REPRESENTACIONES_CACHE_SEGUNDOS)
+
+
+class RepresentacionCacheadaMixin:
+    """
+    Para serializers de ``Visita`` cuya salida depende sólo de la fila, salvo
+    los ``campos_por_pedido``, que se guardan vacíos y se recalculan en cada
+    lectura. ``cache_nombre`` separa las claves de cada serializer.
+    """
+    cache_nombre = None
+    campos_por_pedido = ("motivo_prohibicion",)
+
+    def to_representation(self, instance):
+        c = clave(self.cache_nombre, instance)
+        if c is None:
+            return super().to_representation(instance)
+
+        por_pedido = [nombre for nombre in self.campos_por_pedido if nombre in self.fields]
+        data = obtener(c)
+        if data is None:
+            data = super().to_representation(instance)
+            # vacíos, para que la entrada conserve el orden de los campos
+            guardar(c, {**data, **dict.fromkeys(por_pedido)})
+            return data
+
+        for nombre in por_pedido:
+            campo = self.fields[nombre]
+            data[nombre] = campo.to_representation(campo.get_attribute(instance))
+        return data
+
+
+class ListaVisitasCacheada:
+    """Para ``ListSerializer``: precarga del caché compartido, de una vez, las visitas de la lista."""
+
+    def visitas(self, data):
+        """``(cache_nombre, visita)`` de cada elemento."""
+        return [(self.child.cache_nombre, visita) for visita in data]
+
+    def to_representation(self, data):
+        if _compartido() is not None:
+            data = list(data.all() if hasattr(data, "all") else data)
+            precargar([clave(nombre, visita) for nombre, visita in self.visitas(data) if visita is not None])
+        return super().to_representation(data)
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import Visita, Acceso
+from .models import Visita, Acceso, ProhibicionAcceso
+from .campos import CamposPedidosMixin
+from .derivadas import url_derivada
+from .representaciones import ListaVisitasCacheada, RepresentacionCacheadaMixin
 from core.models import Instalacion, Sector, Empresa
+from config.instrumentacion import ListaMedidaSerializer, MideSerializacionMixin
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from .models import Visita
@@ -11,7 +15,41 @@ from django.db import models
 
 User = get_user_model()
 
-class UsuarioSerializer(serializers.ModelSerializer):
+
+def prohibiciones_vigentes(relacion="prohibiciones"):
+    """
+    Prefetch de las prohibiciones vigentes (más reciente primero) para
+    ``motivo_prohibicion``: una consulta para toda la lista en vez de una
+    por visita. Para listas de accesos usar ``"visita__prohibiciones"``.
+    """
+    now = timezone.now()
+    return models.Prefetch(
+        relacion,
+        queryset=ProhibicionAcceso.objects.filter(
+            fecha_inicio__lte=now
+        ).filter(
+            models.Q(fecha_fin__isnull=True) | models.Q(fecha_fin__gte=now)
+        ).order_by("-fecha_inicio"),
+        to_attr="prohibiciones_vigentes",
+    )
+
+
+def motivo_prohibicion(visita):
+    vigentes = getattr(visita, "prohibiciones_vigentes", None)
+    if vigentes is not None:
+        return vigentes[0].motivo if vigentes else None
+
+    # sin prefetch (una sola visita)
+    now = timezone.now()
+    prohibicion = visita.prohibiciones.filter(
+        fecha_inicio__lte=now
+    ).filter(
+        models.Q(fecha_fin__isnull=True) | models.Q(fecha_fin__gte=now)
+    ).order_by("-fecha_inicio").first()
+
+    return prohibicion.motivo if prohibicion else None
+
+class UsuarioSerializer(MideSerializacionMixin, serializers.ModelSerializer):
     empresa = serializers.PrimaryKeyRelatedField(
         queryset=Empresa.objects.all(),
         required=False,
@@ -52,6 +90,7 @@ class UsuarioSerializer(serializers.ModelSerializer):
             "sector_nombre",
         ]
         read_only_fields = ["id"]
+        list_serializer_class = ListaMedidaSerializer
 
     def create(self, validated_data):
         password = validated_data.pop("password", None)
@@ -75,26 +114,33 @@ class UsuarioSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class VisitaSerializer(serializers.ModelSerializer):
+class ListaVisitasSerializer(MideSerializacionMixin, ListaVisitasCacheada, serializers.ListSerializer):
+    pass
+
+
+class ListaAccesosSerializer(MideSerializacionMixin, ListaVisitasCacheada, serializers.ListSerializer):
+    def visitas(self, data):
+        # con ?fields= la visita puede no estar, o salir como id
+        nombre = getattr(self.child.fields.get("visita"), "cache_nombre", None)
+        if nombre is None:
+            return []
+        return [(nombre, acceso.visita) for acceso in data]
+
+
+class VisitaSerializer(MideSerializacionMixin, CamposPedidosMixin, RepresentacionCacheadaMixin, serializers.ModelSerializer):
     motivo_prohibicion = serializers.SerializerMethodField()
+    cache_nombre = "visita"
 
     class Meta:
         model = Visita
-        fields = "__all__"
+        exclude = ["busqueda", "documento_normalizado", "patente_normalizada"]
         extra_fields = ["motivo_prohibicion"]
+        list_serializer_class = ListaVisitasSerializer
 
     def get_motivo_prohibicion(self, obj):
-        now = timezone.now()
+        return motivo_prohibicion(obj)
 
-        prohibicion = obj.prohibiciones.filter(
-            fecha_inicio__lte=now
-        ).filter(
-            models.Q(fecha_fin__isnull=True) | models.Q(fecha_fin__gte=now)
-        ).order_by("-fecha_inicio").first()
-
-        return prohibicion.motivo if prohibicion else None
-
-class AccesoSerializer(serializers.ModelSerializer):
+class AccesoSerializer(MideSerializacionMixin, CamposPedidosMixin, serializers.ModelSerializer):
     visita = VisitaSerializer(read_only=True)
     sector_nombre = serializers.CharField(source="sector.nombre", read_only=True)
     instalacion_nombre = serializers.CharField(source="instalacion.nombre", read_only=True)
@@ -103,6 +149,29 @@ class AccesoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Acceso
         fields = "__all__"
+        list_serializer_class = ListaAccesosSerializer
+
+
+def variante_fotos(request):
+    """Variante de foto para listados: miniatura salvo ``?fotos=original``."""
+    if request is not None and request.query_params.get("fotos") == "original":
+        return None
+    return "mini"
+
+
+class AccesoListaSerializer(AccesoSerializer):
+    """
+    AccesoSerializer para listados: ``foto_url`` apunta a las miniaturas de
+    las fotos guardadas acá (las externas quedan igual). Con
+    ``?fotos=original`` devuelve las fotos completas.
+    """
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        variante = variante_fotos(self.context.get("request"))
+        if variante and isinstance(data.get("foto_url"), list):
+            data["foto_url"] = [url_derivada(url, variante) for url in data["foto_url"]]
+        return data
 
 # ---- Ingreso ----
 class IngresoRequest(serializers.Serializer):
@@ -142,27 +211,62 @@ class SalidaRequest(serializers.Serializer):
         required=False,
         allow_null=True
     )
+    # ids de subidas completadas en /api/fotos/subidas/; sus URLs se agregan a foto_url
+    fotos = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False
+    )
 
     def validate(self, data):
         if not data.get("visita_id") and not (data.get("rut") or data.get("dni_extranjero")):
             raise serializers.ValidationError("Debe enviar visita_id o rut/dni_extranjero.")
         return data
 
+# ---- Ingreso / salida grupal ----
+GRUPO_MAX_PERSONAS = 100
+
+
+class PersonaGrupo(serializers.Serializer):
+    documento = serializers.CharField()
+    es_extranjero = serializers.BooleanField(default=False)
+
+
+class GrupoRequest(serializers.Serializer):
+    """Una cuadrilla o bus completo: los documentos y el sector, una sola vez."""
+    personas = serializers.ListField(
+        child=PersonaGrupo(), min_length=1, max_length=GRUPO_MAX_PERSONAS
+    )
+    sector_id = serializers.IntegerField()
+    comentario = serializers.CharField(required=False, allow_blank=True)
+
+# ---- Pases QR ----
+class PaseRequest(serializers.Serializer):
+    visita_id = serializers.IntegerField()
+    sector_id = serializers.IntegerField()
+    valido_desde = serializers.DateTimeField(required=False)
+    valido_hasta = serializers.DateTimeField(required=False)
+
+
+class EscanearPaseRequest(serializers.Serializer):
+    token = serializers.CharField(max_length=200)
+
 # ---- Visitas por instalacion ----
-class VisitaSimpleSerializer(serializers.ModelSerializer):
+class VisitaSimpleSerializer(MideSerializacionMixin, serializers.ModelSerializer):
     class Meta:
         model = Visita
         fields = ["id", "rut", "dni_extranjero", "es_extranjero", "nombre", "apellido",
                   "empresa", "patente", "estado", "instalacion_id", "creado_en"]
+        list_serializer_class = ListaMedidaSerializer
 
 # ---- Edicion accesos ----
-class AccesoFullSerializer(serializers.ModelSerializer):
+class AccesoFullSerializer(MideSerializacionMixin, serializers.ModelSerializer):
     class Meta:
         model = Acceso
         fields = "__all__"  # ✅ todos los campos editables
+        list_serializer_class = ListaMedidaSerializer
 
 # ---- Enrolamiento manual ----
-class EnrolamientoSerializer(serializers.ModelSerializer):
+class EnrolamientoSerializer(MideSerializacionMixin, RepresentacionCacheadaMixin, serializers.ModelSerializer):
     sector_id = serializers.PrimaryKeyRelatedField(
         queryset=Sector.objects.all(),
         source="sector",
@@ -171,9 +275,11 @@ class EnrolamientoSerializer(serializers.ModelSerializer):
     tipo_documento = serializers.CharField(write_only=True)
     dni = serializers.CharField(write_only=True, required=False, allow_blank=True)
     motivo_prohibicion = serializers.SerializerMethodField()
+    cache_nombre = "enrolado"
 
     class Meta:
         model = Visita
+        list_serializer_class = ListaVisitasSerializer
         fields = [
             "id",
             "tipo_documento",
@@ -198,15 +304,7 @@ class EnrolamientoSerializer(serializers.ModelSerializer):
         ]
 
     def get_motivo_prohibicion(self, obj):
-        now = timezone.now()
-
-        prohibicion = obj.prohibiciones.filter(
-            fecha_inicio__lte=now
-        ).filter(
-            models.Q(fecha_fin__isnull=True) | models.Q(fecha_fin__gte=now)
-        ).order_by("-fecha_inicio").first()
-
-        return prohibicion.motivo if prohibicion else None
+        return motivo_prohibicion(obj)
 
     def validate(self, attrs):
         tipo_documento = (attrs.get("tipo_documento") or "").strip().upper()
@@ -261,7 +359,7 @@ class CargaMasivaEnrolamientoSerializer(serializers.Serializer):
     archivo = serializers.FileField()
     sector_id = serializers.IntegerField(required=False)
 
-class VisitaInlineUpdateSerializer(serializers.ModelSerializer):
+class VisitaInlineUpdateSerializer(MideSerializacionMixin, serializers.ModelSerializer):
     class Meta:
         model = Visita
         fields = ["rut", "dni_extranjero", "nombre", "apellido", "patente"]
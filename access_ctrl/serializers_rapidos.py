@@ -0,0 +1,157 @@
+"""
+Serialización rápida de listados de accesos.
+
+``AccesoListaSerializer`` arma, por cada fila, la instancia de Acceso con su
+Visita, Sector, Instalación y Empresa y recorre campo por campo con
+``get_attribute`` + ``to_representation``; con miles de filas eso es casi
+todo el tiempo de la petición. Acá se lee ``.values()`` y cada fila se arma
+con un plan precalculado del propio serializer (mismo orden de campos, mismas
+fuentes, mismos formatos), así que la salida es idéntica byte a byte; lo
+verifica ``SerializacionRapidaTests`` y lo mide
+``python manage.py benchmark_serializacion``.
+
+Si se agrega un campo a ``AccesoSerializer``/``VisitaSerializer`` el plan lo
+toma solo; un campo de un tipo que no esté en ``_IDENTIDAD`` usa su propio
+``to_representation`` sobre el valor de ``.values()``. Con ``?fields=``
+(campos.py) el plan sale del serializer recortado: sólo se leen las columnas
+y relaciones pedidas, y las prohibiciones sólo si se pidió el motivo.
+"""
+from functools import lru_cache
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import fields, relations, serializers
+from rest_framework.settings import api_settings
+
+from config.instrumentacion import midiendo_serializacion
+
+from .derivadas import url_derivada
+from .models import ProhibicionAcceso
+from .serializers import AccesoListaSerializer, variante_fotos
+
+# campos cuyo to_representation devuelve el mismo valor que trae .values()
+_IDENTIDAD = (
+    fields.IntegerField, fields.CharField, fields.BooleanField, fields.ChoiceField,
+    fields.JSONField, relations.PrimaryKeyRelatedField,
+)
+_FECHA = "fecha"
+_MOTIVO = "motivo"
+
+
+def _conversor(campo):
+    if isinstance(campo, fields.DateTimeField):
+        formato = getattr(campo, "format", api_settings.DATETIME_FORMAT)
+        if formato and formato.lower() == fields.ISO_8601:
+            return _FECHA
+        return campo.to_representation
+    if isinstance(campo, _IDENTIDAD):
+        return None
+    return campo.to_representation
+
+
+def _armar_plan(serializer, prefijo=""):
+    plan, claves = [], []
+    for nombre, campo in serializer.fields.items():
+        if campo.write_only:
+            continue
+        if isinstance(campo, serializers.BaseSerializer):
+            subplan, subclaves = _armar_plan(campo, f"{prefijo}{campo.source}__")
+            plan.append((nombre, None, subplan))
+            claves.extend(subclaves)
+        elif nombre == "motivo_prohibicion":
+            plan.append((nombre, f"{prefijo}id", _MOTIVO))
+        elif isinstance(campo, fields.SerializerMethodField):
+            raise TypeError(f"serializers_rapidos no sabe armar el campo calculado {nombre!r}")
+        else:
+            clave = prefijo + campo.source.replace(".", "__")
+            plan.append((nombre, clave, _conversor(campo)))
+            claves.append(clave)
+    return plan, claves
+
+
+def _clave_motivo(plan):
+    for _, clave, conversor in plan:
+        if conversor is _MOTIVO:
+            return clave
+        if clave is None and (anidada := _clave_motivo(conversor)):
+            return anidada
+    return None
+
+
+@lru_cache(maxsize=128)
+def plan_accesos(campos=None):
+    """
+    ``(plan, claves de .values(), clave del id de visita para el motivo o
+    None)`` de ``AccesoListaSerializer``, uno por combinación de campos.
+    """
+    plan, claves = _armar_plan(AccesoListaSerializer(campos=campos))
+    clave_motivo = _clave_motivo(plan)
+    if clave_motivo:
+        claves.append(clave_motivo)
+    return plan, tuple(dict.fromkeys(claves)), clave_motivo
+
+
+def _fecha_hora(valor, tz):
+    # DateTimeField.to_representation con ISO 8601
+    if not valor:
+        return None
+    valor = valor.astimezone(tz).isoformat()
+    if valor.endswith("+00:00"):
+        valor = valor[:-6] + "Z"
+    return valor
+
+
+def _motivos(visita_ids):
+    """Motivo de la prohibición vigente más reciente por visita, como ``prohibiciones_vigentes``."""
+    if not visita_ids:
+        return {}
+    now = timezone.now()
+    filas = ProhibicionAcceso.objects.filter(
+        visita_id__in=visita_ids, fecha_inicio__lte=now
+    ).filter(
+        Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=now)
+    ).order_by("visita_id", "-fecha_inicio").values_list("visita_id", "motivo")
+
+    motivos = {}
+    for visita_id, motivo in filas:
+        motivos.setdefault(visita_id, motivo)
+    return motivos
+
+
+def _armar(plan, fila, tz, motivos):
+    salida = {}
+    for nombre, clave, conversor in plan:
+        if clave is None:
+            salida[nombre] = _armar(conversor, fila, tz, motivos)
+            continue
+        valor = fila[clave]
+        if conversor is None or valor is None:
+            salida[nombre] = valor
+        elif conversor is _FECHA:
+            salida[nombre] = _fecha_hora(valor, tz)
+        elif conversor is _MOTIVO:
+            salida[nombre] = motivos.get(valor)
+        else:
+            salida[nombre] = conversor(valor)
+    return salida
+
+
+def serializar_accesos(queryset, request=None, campos=None):
+    """
+    Lo mismo que ``AccesoListaSerializer(queryset, many=True, campos=campos).data``,
+    desde ``.values()``.
+    """
+    plan, claves, clave_motivo = plan_accesos(campos)
+    filas = list(queryset.prefetch_related(None).values(*claves))
+    motivos = _motivos({f[clave_motivo] for f in filas}) if clave_motivo else {}
+    with midiendo_serializacion():
+        tz = timezone.get_current_timezone()
+        variante = variante_fotos(request)
+
+        accesos = []
+        for fila in filas:
+            acceso = _armar(plan, fila, tz, motivos)
+            if variante and isinstance(acceso.get("foto_url"), list):
+                acceso["foto_url"] = [url_derivada(url, variante) for url in acceso["foto_url"]]
+            accesos.append(acceso)
+    return accesos
@@ -0,0 +1,210 @@
+"""
+Sesiones de visita: cada ingreso abre una ``SesionVisita`` y la salida
+correspondiente la cierra con su duración. Las estadísticas de permanencia
+se calculan sobre esta tabla con consultas por rango de ``fecha_ingreso``.
+"""
+from django.db import connections
+from django.db.models import Aggregate, Avg, Count, FloatField, Max
+from django.db.models.functions import TruncDate
+
+from .models import Acceso, SesionVisita
+
+PERCENTILES = (0.5, 0.9, 0.95)
+
+AGRUPACIONES = {
+    "sector": ("sector_id", "sector__nombre"),
+    "instalacion": ("instalacion_id", "instalacion__nombre"),
+    "dia": ("dia",),
+}
+
+
+def abrir_sesion(acceso):
+    return SesionVisita.objects.create(
+        visita_id=acceso.visita_id,
+        instalacion_id=acceso.instalacion_id,
+        sector_id=acceso.sector_id,
+        empresa_id=acceso.empresa_id,
+        ingreso=acceso,
+        fecha_ingreso=acceso.fecha_hora,
+    )
+
+
+def cerrar_sesion(acceso):
+    """
+    Cierra la sesión abierta de la visita en la instalación del acceso de salida.
+    Devuelve la sesión, o None si no había una abierta (p. ej. ingresos previos
+    a que existiera esta tabla y sin backfill).
+    """
+    sesion = (
+        SesionVisita.objects
+        .filter(visita_id=acceso.visita_id, instalacion_id=acceso.instalacion_id, fecha_salida__isnull=True)
+        .order_by("-fecha_ingreso")
+        .first()
+    )
+    if not sesion:
+        return None
+
+    sesion.salida = acceso
+    sesion.fecha_salida = acceso.fecha_hora
+    sesion.duracion_segundos = max(0, int((acceso.fecha_hora - sesion.fecha_ingreso).total_seconds()))
+    sesion.save(update_fields=["salida", "fecha_salida", "duracion_segundos"])
+    return sesion
+
+
+def abrir_sesiones(accesos):
+    """``abrir_sesion`` para un lote de ingresos (ingreso grupal), en un solo INSERT."""
+    return SesionVisita.objects.bulk_create([
+        SesionVisita(
+            visita_id=acceso.visita_id,
+            instalacion_id=acceso.instalacion_id,
+            sector_id=acceso.sector_id,
+            empresa_id=acceso.empresa_id,
+            ingreso=acceso,
+            fecha_ingreso=acceso.fecha_hora,
+        )
+        for acceso in accesos
+    ])
+
+
+def cerrar_sesiones(accesos):
+    """
+    ``cerrar_sesion`` para un lote de salidas de una misma instalación: una
+    consulta para las sesiones abiertas y un UPDATE en bloque.
+    """
+    if not accesos:
+        return []
+    por_visita = {acceso.visita_id: acceso for acceso in accesos}
+    abiertas = (
+        SesionVisita.objects
+        .filter(
+            visita_id__in=por_visita, instalacion_id=accesos[0].instalacion_id, fecha_salida__isnull=True
+        )
+        .order_by("visita_id", "-fecha_ingreso")
+    )
+
+    sesiones = []
+    for sesion in abiertas:
+        acceso = por_visita.pop(sesion.visita_id, None)
+        if acceso is None:
+            # sólo se cierra la más reciente de cada visita
+            continue
+        sesion.salida = acceso
+        sesion.fecha_salida = acceso.fecha_hora
+        sesion.duracion_segundos = max(0, int((acceso.fecha_hora - sesion.fecha_ingreso).total_seconds()))
+        sesiones.append(sesion)
+
+    SesionVisita.objects.bulk_update(sesiones, ["salida", "fecha_salida", "duracion_segundos"])
+    return sesiones
+
+
+def emparejar_accesos(accesos):
+    """
+    Recibe accesos ordenados por visita, instalación y fecha_hora y produce
+    las sesiones (sin guardar). Un ingreso repetido sin salida reemplaza al
+    anterior, igual que en el flujo en vivo nunca quedan dos abiertas.
+    """
+    abiertas = {}
+    for acceso in accesos:
+        clave = (acceso.visita_id, acceso.instalacion_id)
+
+        if acceso.tipo == "ingreso":
+            abiertas[clave] = SesionVisita(
+                visita_id=acceso.visita_id,
+                instalacion_id=acceso.instalacion_id,
+                sector_id=acceso.sector_id,
+                empresa_id=acceso.empresa_id,
+                ingreso_id=acceso.id,
+                fecha_ingreso=acceso.fecha_hora,
+            )
+            continue
+
+        sesion = abiertas.pop(clave, None)
+        if sesion is None:
+            continue
+
+        sesion.salida_id = acceso.id
+        sesion.fecha_salida = acceso.fecha_hora
+        sesion.duracion_segundos = max(0, int((acceso.fecha_hora - sesion.fecha_ingreso).total_seconds()))
+        yield sesion
+
+    # las que siguen abiertas quedan como visitas aún adentro
+    yield from abiertas.values()
+
+
+def reemparejar_sesiones(visita_ids, instalacion_ids=None):
+    """
+    Rehace desde el log las sesiones de esas visitas (sólo en esas
+    instalaciones si se indican), para cuando un acceso se edita o se carga
+    fuera del flujo de portería. Va dentro de la transacción del cambio.
+    """
+    sesiones = SesionVisita.objects.filter(visita_id__in=visita_ids)
+    accesos = Acceso.objects.filter(visita_id__in=visita_ids)
+    if instalacion_ids is not None:
+        sesiones = sesiones.filter(instalacion_id__in=instalacion_ids)
+        accesos = accesos.filter(instalacion_id__in=instalacion_ids)
+
+    sesiones.delete()
+    return SesionVisita.objects.bulk_create(emparejar_accesos(
+        accesos
+        .only("id", "visita_id", "instalacion_id", "sector_id", "empresa_id", "tipo", "fecha_hora")
+        .order_by("visita_id", "instalacion_id", "fecha_hora", "id")
+    ))
+
+
+class PercentilCont(Aggregate):
+    function = "PERCENTILE_CONT"
+    template = "%(function)s(%(percentil)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, percentil, **extra):
+        super().__init__(expression, percentil=float(percentil), **extra)
+
+
+def _clave_percentil(p):
+    return f"p{int(p * 100)}"
+
+
+def _percentil(valores, p):
+    # interpolación lineal, igual que percentile_cont de PostgreSQL
+    if not valores:
+        return None
+    pos = (len(valores) - 1) * p
+    bajo = int(pos)
+    alto = min(bajo + 1, len(valores) - 1)
+    return valores[bajo] + (valores[alto] - valores[bajo]) * (pos - bajo)
+
+
+def estadisticas_permanencia(qs, agrupar):
+    """
+    Promedio y percentiles de duración (segundos) de las sesiones cerradas de
+    ``qs`` agrupadas por sector, instalación o día.
+    """
+    campos = AGRUPACIONES[agrupar]
+    qs = qs.filter(duracion_segundos__isnull=False)
+    if agrupar == "dia":
+        qs = qs.annotate(dia=TruncDate("fecha_ingreso"))
+
+    agregados = {
+        "total": Count("id"),
+        "promedio_segundos": Avg("duracion_segundos"),
+        "maximo_segundos": Max("duracion_segundos"),
+    }
+
+    postgres = connections[qs.db].vendor == "postgresql"
+    if postgres:
+        for p in PERCENTILES:
+            agregados[_clave_percentil(p)] = PercentilCont("duracion_segundos", p)
+
+    filas = list(qs.values(*campos).annotate(**agregados).order_by(*campos))
+
+    if not postgres:
+        # SQLite no tiene percentile_cont: se calcula con las duraciones ordenadas
+        duraciones = {}
+        for *grupo, duracion in qs.order_by(*campos, "duracion_segundos").values_list(*campos, "duracion_segundos"):
+            duraciones.setdefault(tuple(grupo), []).append(duracion)
+        for fila in filas:
+            valores = duraciones.get(tuple(fila[c] for c in campos), [])
+            for p in PERCENTILES:
+                fila[_clave_percentil(p)] = _percentil(valores, p)
+
+    return filas
@@ -1,3 +1,1299 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import itertools
+import json
+import re
+import shutil
+import tempfile
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from config.instrumentacion import contar_consultas
+from core.models import Empresa, Instalacion, Sector
+
+from . import derivadas, feed, fotos, particiones, pases, prohibiciones, representaciones, sesiones, views_async
+from .busqueda import (
+    buscar_visitas, completar_normalizados, filtrar_prefijos, normalizar_busqueda, normalizar_documento,
+)
+from .campos import campos_pedidos
+from .feed import hub
+from .models import Acceso, ProhibicionAcceso, SesionVisita, SubidaFoto, Visita
+from .serializers import AccesoListaSerializer, EnrolamientoSerializer, VisitaSerializer, prohibiciones_vigentes
+from .serializers_rapidos import serializar_accesos
+from .views_accesos import AccesoListView
+
+FILAS_POCAS = 10
+FILAS_MUCHAS = 1000
+
+
+class InstalacionMixin:
+    """
+    Empresa "Cliente" con la instalación "Planta", su sector "Bodega" y un
+    guardia. ``sector_kwargs`` para un sector con otra configuración.
+    """
+    sector_kwargs = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.empresa = Empresa.objects.create(nombre="Cliente")
+        cls.instalacion = Instalacion.objects.create(empresa=cls.empresa, nombre="Planta")
+        cls.sector = Sector.objects.create(instalacion=cls.instalacion, nombre="Bodega", **cls.sector_kwargs)
+        cls.guardia = User.objects.create_user(
+            "guardia", password="x", role="guardia", empresa=cls.empresa, instalacion=cls.instalacion,
+        )
+
+
+class UsuariosPorRolMixin(InstalacionMixin):
+    """Además ``usuarios``: el guardia, un admin de la empresa y un superadmin de la administradora general."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin_general = Empresa.objects.create(nombre="Administradora", es_administradora_general=True)
+        cls.usuarios = {
+            "guardia": cls.guardia,
+            "admin": User.objects.create_user("admin", password="x", role="admin", empresa=cls.empresa),
+            "superadmin": User.objects.create_user(
+                "superadmin", password="x", role="superadmin", empresa=cls.admin_general,
+            ),
+        }
+
+
+class PresupuestoConsultasTests(UsuariosPorRolMixin, TestCase):
+    """
+    Presupuesto máximo de consultas SQL por endpoint. Cada endpoint se mide
+    con FILAS_POCAS y con FILAS_MUCHAS visitas/accesos: la cantidad de
+    consultas no puede crecer con las filas (un N+1 rompe el test aunque el
+    presupuesto alcance con pocos datos).
+
+    Si un cambio necesita una consulta más, se sube el presupuesto acá en el
+    mismo commit, a la vista de quien revisa.
+    """
+
+    # nombre: (usuario, url, presupuesto[, status esperado])
+    PRESUPUESTOS = {
+        "accesos_lista": ("guardia", "/api/accesos/", 5),
+        "accesos_lista_admin": ("admin", "/api/accesos/?tipo=ingreso", 5),
+        "accesos_ultimas_24h": ("admin", "/api/accesos/ultimas-24h/", 8),
+        "accesos_dia_curso": ("guardia", "/api/accesos/dia-curso/", 5),
+        "accesos_por_mes_detalle": ("admin", "/api/accesos/por-mes/?detail=1", 6),
+        "visitas_por_instalacion": ("guardia", "/api/instalaciones/{instalacion}/visitas/", 5),
+        "visitas_buscar": ("superadmin", "/api/visitas/buscar/?q=visita", 6),
+        "enrolados": ("guardia", "/api/enrolamiento/personas/", 4),
+        "buscar_rut": ("guardia", "/api/visitas/buscar-rut/{rut}/", 6),
+        # el último acceso de la visita es una salida: 409 con el acceso serializado
+        "buscar_ultimo": ("guardia", "/api/accesos/buscar-ultimo/{rut}/", 7, 409),
+        # visita con sus anotaciones + prefetch de prohibiciones
+        "decision_porteria": ("guardia", "/api/porteria/decision/{rut}/", 2),
+        "permanencias_resumen": ("admin", "/api/permanencias/resumen/?agrupar=sector", 4),
+        "permanencias_excedidas": ("admin", "/api/permanencias/excedidas/?horas=0", 4),
+    }
+
+    def _fecha_base(self):
+        # dentro del "día en curso" (desde las 06:00) aunque el test corra de madrugada
+        ahora = timezone.localtime()
+        seis = timezone.make_aware(datetime.combine(ahora.date(), time(6, 5)), timezone.get_current_timezone())
+        return max(ahora - timedelta(hours=1), seis)
+
+    def _poblar(self, hasta):
+        """Completa visitas hasta ``hasta``, cada una con ingreso, salida y sesión; una de cada 5 prohibida (no la primera, que usan los endpoints por RUT)."""
+        existentes = Visita.objects.count()
+        base = self._fecha_base()
+        guardia = self.usuarios["guardia"]
+
+        visitas = []
+        for n in range(existentes, hasta):
+            v = Visita(
+                rut=f"{10_000_000 + n}-{n % 10}", nombre="Visita", apellido=f"Prueba {n}",
+                instalacion=self.instalacion, sector=self.sector,
+            )
+            completar_normalizados(v)
+            visitas.append(v)
+        visitas = Visita.objects.bulk_create(visitas)
+
+        accesos = []
+        for i, v in enumerate(visitas):
+            ingreso = base - timedelta(minutes=30, seconds=i)
+            for tipo, fecha in (("ingreso", ingreso), ("salida", ingreso + timedelta(minutes=10))):
+                accesos.append(Acceso(
+                    visita=v, instalacion=self.instalacion, sector=self.sector, tipo=tipo,
+                    fecha_hora=fecha, guardia=guardia, empresa=self.empresa,
+                ))
+        accesos = Acceso.objects.bulk_create(accesos)
+
+        SesionVisita.objects.bulk_create([
+            SesionVisita(
+                visita_id=ingreso.visita_id, instalacion=self.instalacion, sector=self.sector,
+                empresa=self.empresa, ingreso=ingreso, fecha_ingreso=ingreso.fecha_hora,
+                # la mitad sigue adentro
+                salida=salida if n % 2 else None,
+                fecha_salida=salida.fecha_hora if n % 2 else None,
+                duracion_segundos=600 if n % 2 else None,
+            )
+            for n, (ingreso, salida) in enumerate(zip(accesos[::2], accesos[1::2]))
+        ])
+        ProhibicionAcceso.objects.bulk_create([
+            ProhibicionAcceso(
+                visita=v, instalacion=self.instalacion, motivo="Prueba",
+                fecha_inicio=base - timedelta(days=1),
+            )
+            for v in visitas[1::5]
+        ])
+
+    def _medir(self, usuario, url, status=200):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuarios[usuario])
+        url = url.format(instalacion=self.instalacion.id, rut=Visita.objects.order_by("id").first().rut)
+        # el presupuesto es para el camino sin caché de representaciones
+        representaciones.local.clear()
+        with contar_consultas() as consultas:
+            response = cliente.get(url)
+        self.assertEqual(response.status_code, status, f"{url}: {response.content[:300]}")
+        return consultas
+
+    def test_presupuesto_independiente_de_filas(self):
+        medidas = {}
+        for filas in (FILAS_POCAS, FILAS_MUCHAS):
+            self._poblar(filas)
+            for nombre, (usuario, url, _, *status) in self.PRESUPUESTOS.items():
+                medidas.setdefault(nombre, {})[filas] = self._medir(usuario, url, *status)
+
+        for nombre, (_, _, presupuesto, *_) in self.PRESUPUESTOS.items():
+            with self.subTest(endpoint=nombre):
+                pocas, muchas = medidas[nombre][FILAS_POCAS], medidas[nombre][FILAS_MUCHAS]
+                self.assertLessEqual(
+                    len(muchas), presupuesto,
+                    f"{nombre} usa {len(muchas)} consultas (presupuesto {presupuesto}):\n"
+                    + "\n".join(muchas.sql),
+                )
+                self.assertEqual(
+                    len(pocas), len(muchas),
+                    f"{nombre}: {len(pocas)} consultas con {FILAS_POCAS} filas y {len(muchas)} con "
+                    f"{FILAS_MUCHAS} (¿N+1?)",
+                )
+
+
+class ConsultasPorteriaAsyncTests(InstalacionMixin, TestCase):
+    """Las vistas de views_async responden lo mismo que las DRF de views.py."""
+
+    sector_kwargs = {"requiere_guia": True}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Sector.objects.create(instalacion=cls.instalacion, nombre="Casino")
+
+        adentro = Visita.objects.create(rut="12345678-5", nombre="Ana", apellido="Adentro")
+        afuera = Visita.objects.create(rut="11111111-1", nombre="Beto", apellido="Afuera")
+        Visita.objects.create(es_extranjero=True, dni_extranjero="ab-123", nombre="Carla")
+        prohibida = Visita.objects.create(rut="22222222-2", nombre="Dino")
+        ProhibicionAcceso.objects.create(
+            visita=prohibida, instalacion=cls.instalacion, motivo="Prueba",
+            fecha_inicio=timezone.now() - timedelta(days=1),
+        )
+
+        ahora = timezone.now()
+        for visita, tipos in ((adentro, ["ingreso"]), (afuera, ["ingreso", "salida"])):
+            for n, tipo in enumerate(tipos):
+                Acceso.objects.create(
+                    visita=visita, instalacion=cls.instalacion, sector=cls.sector, tipo=tipo,
+                    fecha_hora=ahora - timedelta(minutes=10 - n), guardia=cls.guardia, empresa=cls.empresa,
+                )
+
+    def setUp(self):
+        self.token = str(RefreshToken.for_user(self.guardia).access_token)
+
+    def _comparar(self, url, vista, token=True, **kwargs):
+        headers = {"authorization": f"Bearer {self.token}"} if token else {}
+        esperado = self.client.get(url, headers=headers)
+
+        request = AsyncRequestFactory().get(url, headers=headers)
+        obtenido = async_to_sync(vista)(request, **kwargs)
+
+        self.assertEqual(obtenido.status_code, esperado.status_code, obtenido.content)
+        self.assertEqual(json.loads(obtenido.content), json.loads(esperado.content))
+        return obtenido
+
+    def test_buscar_por_rut(self):
+        for rut, status in (("12.345.678-5", 200), ("22222222-2", 403), ("99999999-9", 404)):
+            with self.subTest(rut=rut):
+                r = self._comparar(f"/api/visitas/buscar-rut/{rut}/", views_async.buscar_por_rut, rut=rut)
+                self.assertEqual(r.status_code, status)
+
+    def test_buscar_por_dni(self):
+        r = self._comparar("/api/visitas/buscar-dni/AB123/", views_async.buscar_por_dni, dni="AB123")
+        self.assertEqual(r.status_code, 200)
+
+    def test_buscar_ultimo(self):
+        for rut, status in (("12345678-5", 200), ("11111111-1", 409), ("22222222-2", 404), ("1-9", 404)):
+            with self.subTest(rut=rut):
+                r = self._comparar(
+                    f"/api/accesos/buscar-ultimo/{rut}/", views_async.buscar_ultimo_acceso_por_rut, rut=rut,
+                )
+                self.assertEqual(r.status_code, status)
+
+    def test_decision_porteria(self):
+        casos = (
+            ("12.345.678-5", "", True, "salida", False),
+            ("11111111-1", "", False, "ingreso", False),
+            ("22222222-2", "", False, None, True),
+            ("AB123", "?extranjero=1", False, "ingreso", False),
+            ("99999999-9", "", False, "ingreso", False),
+        )
+        for documento, query, adentro, accion, prohibido in casos:
+            with self.subTest(documento=documento):
+                r = self._comparar(
+                    f"/api/porteria/decision/{documento}/{query}", views_async.decision_porteria, documento=documento,
+                )
+                data = json.loads(r.content)
+                self.assertEqual(r.status_code, 200)
+                self.assertEqual((data["adentro"], data["accion"], data["prohibido"]), (adentro, accion, prohibido))
+
+        data = json.loads(self._comparar(
+            "/api/porteria/decision/12345678-5/", views_async.decision_porteria, documento="12345678-5",
+        ).content)
+        self.assertEqual(data["sector"], {"id": self.sector.id, "nombre": "Bodega", "requiere_documentacion": True})
+        self.assertIsNotNone(data["adentro_desde"])
+        self.assertIsNone(json.loads(self.client.get(
+            "/api/porteria/decision/99999999-9/", headers={"authorization": f"Bearer {self.token}"},
+        ).content)["visita"])
+
+    def test_sectores_disponibles(self):
+        r = self._comparar("/api/enrolamiento/sectores/", views_async.sectores_disponibles)
+        self.assertEqual(len(json.loads(r.content)), 2)
+
+    def test_sin_token(self):
+        r = self._comparar("/api/enrolamiento/sectores/", views_async.sectores_disponibles, token=False)
+        self.assertEqual(r.status_code, 401)
+        self.assertIn("Bearer", r["WWW-Authenticate"])
+
+    @override_settings(ROOT_URLCONF="access_ctrl.tests")
+    def test_stack_asgi_con_middlewares(self):
+        async def pedir():
+            return await self.async_client.get(
+                "/async/sectores/", headers={"authorization": f"Bearer {self.token}"},
+            )
+
+        r = async_to_sync(pedir)()
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("db;dur=", r["Server-Timing"])
+
+
+def imagen_de_prueba(formato="JPEG", color=(200, 30, 30), tamano=(640, 480)):
+    buffer = io.BytesIO()
+    Image.new("RGB", tamano, color).save(buffer, formato)
+    return buffer.getvalue()
+
+
+class FotosMixin(InstalacionMixin):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.visita = Visita.objects.create(rut="12345678-5", nombre="Ana")
+        Acceso.objects.create(
+            visita=cls.visita, instalacion=cls.instalacion, sector=cls.sector, tipo="ingreso",
+            fecha_hora=timezone.now() - timedelta(minutes=5), guardia=cls.guardia, empresa=cls.empresa,
+        )
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.guardia)
+        self.foto = imagen_de_prueba()
+
+    def _crear(self, contenido, **extra):
+        r = self.cliente.post("/api/fotos/subidas/", {"tamano": len(contenido), **extra}, format="json")
+        self.assertEqual(r.status_code, 201, r.content)
+        return r.json()["subida"]
+
+    def _enviar(self, subida_id, bloque, offset):
+        return self.cliente.generic(
+            "PATCH", f"/api/fotos/subidas/{subida_id}/", bloque,
+            content_type="application/offset+octet-stream", headers={"Upload-Offset": str(offset)},
+        )
+
+    def _subir(self, contenido):
+        subida = self._crear(contenido)
+        r = self._enviar(subida["id"], contenido, 0)
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()["subida"]
+
+    def _archivos(self):
+        return sorted(p.name for p in (Path(self.media) / "fotos").rglob("*.jpg"))
+
+
+class SubidaFotosTests(FotosMixin, TestCase):
+    def test_subida_reanudable(self):
+        subida = self._crear(self.foto)
+        mitad = len(self.foto) // 2
+
+        r = self._enviar(subida["id"], self.foto[:mitad], 0)
+        self.assertEqual(r.json()["subida"]["offset"], mitad)
+        self.assertFalse(r.json()["subida"]["completada"])
+
+        # se cortó: el cliente pregunta dónde quedó y reintenta desde ahí
+        r = self.cliente.head(f"/api/fotos/subidas/{subida['id']}/")
+        self.assertEqual(r["Upload-Offset"], str(mitad))
+
+        r = self._enviar(subida["id"], self.foto[1:], 1)
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r["Upload-Offset"], str(mitad))
+
+        r = self._enviar(subida["id"], self.foto[mitad:], mitad)
+        final = r.json()["subida"]
+        sha = hashlib.sha256(self.foto).hexdigest()
+        self.assertTrue(final["completada"])
+        self.assertEqual(final["sha256"], sha)
+        self.assertTrue(final["url"].endswith(f"/media/fotos/{sha[:2]}/{sha}.jpg"))
+
+        self.client.force_login(self.guardia)
+        r = self.client.get(f"/media/fotos/{sha[:2]}/{sha}.jpg")
+        self.assertEqual(b"".join(r.streaming_content), self.foto)
+        self.assertEqual(r["Cache-Control"], "private, max-age=31536000, immutable")
+
+    def test_mismo_contenido_se_guarda_una_vez(self):
+        primera = self._subir(self.foto)
+        segunda = self._subir(self.foto)
+        self.assertEqual(primera["url"], segunda["url"])
+        self.assertEqual(len(self._archivos()), 1)
+
+        # con el hash declarado ni siquiera se transfiere
+        sha = hashlib.sha256(self.foto).hexdigest()
+        tercera = self._crear(self.foto, sha256=sha)
+        self.assertTrue(tercera["completada"])
+        self.assertEqual(tercera["url"], primera["url"])
+
+        # pero sólo si la subió alguien de su empresa: si no, tiene que mandar los bytes
+        ajeno = User.objects.create_user("ajeno", password="x", role="admin", empresa=Empresa.objects.create(nombre="Otra"))
+        self.cliente.force_authenticate(ajeno)
+        cuarta = self._crear(self.foto, sha256=sha)
+        self.assertFalse(cuarta["completada"])
+        self.assertIsNone(cuarta["url"])
+
+        r = self._enviar(cuarta["id"], self.foto, 0)
+        self.assertTrue(r.json()["subida"]["completada"])
+        self.assertEqual(len(self._archivos()), 1)
+
+    def test_fotos_solo_para_su_empresa(self):
+        sha = self._subir(self.foto)["sha256"]
+        url = f"/media/fotos/{sha[:2]}/{sha}.jpg"
+
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        ajeno = User.objects.create_user("ajeno", password="x", role="admin", empresa=Empresa.objects.create(nombre="Otra"))
+        token = RefreshToken.for_user(ajeno).access_token
+        r = self.client.get(url, headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(r.status_code, 404)
+
+        companero = User.objects.create_user("companero", password="x", role="admin", empresa=self.guardia.empresa)
+        token = RefreshToken.for_user(companero).access_token
+        r = self.client.get(url, headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(b"".join(r.streaming_content), self.foto)
+
+    def test_rechaza_lo_que_no_es_imagen(self):
+        subida = self._crear(b"no soy una foto")
+        r = self._enviar(subida["id"], b"no soy una foto", 0)
+        self.assertEqual(r.status_code, 415)
+        self.assertFalse(SubidaFoto.objects.filter(id=subida["id"]).exists())
+
+    def test_salida_adjunta_las_fotos(self):
+        subida = self._subir(self.foto)
+        r = self.cliente.post("/api/accesos/salida/", {
+            "visita_id": self.visita.id, "instalacion_id": self.instalacion.id,
+            "sector_id": self.sector.id, "fotos": [subida["id"]],
+        }, format="json")
+        self.assertEqual(r.status_code, 201, r.content)
+        self.assertEqual(Acceso.objects.get(tipo="salida").foto_url, [subida["url"]])
+
+
+class DerivadasFotosTests(FotosMixin, TestCase):
+    def _subir_y_generar(self, contenido):
+        with self.captureOnCommitCallbacks() as callbacks:
+            subida = self._subir(contenido)
+        # el callback encola en el pool; se espera a que termine
+        futuros = [callback() for callback in callbacks]
+        self.assertEqual(len(futuros), 1)
+        futuros[0].result()
+        return subida
+
+    def test_genera_variantes_acotadas(self):
+        subida = self._subir_y_generar(imagen_de_prueba(tamano=(4000, 3000)))
+        for variante, lado in derivadas.VARIANTES.items():
+            with Image.open(derivadas.ruta_derivada(subida["sha256"], variante)) as imagen:
+                self.assertEqual(imagen.format, "WEBP")
+                self.assertEqual(max(imagen.size), lado or 4000)
+
+    def test_sirve_inmutable_y_redirige_si_falta(self):
+        sha = self._subir(self.foto)["sha256"]
+        url = f"/media/fotos/derivadas/{sha[:2]}/{sha}_mini.webp"
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.client.force_login(self.guardia)
+
+        with mock.patch.object(derivadas, "encolar") as encolar:
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(r["Cache-Control"], "no-store")
+        encolar.assert_called_once_with(sha, "jpg")
+
+        derivadas.generar(sha, "jpg")
+        r = self.client.get(url)
+        self.assertEqual(r["Content-Type"], "image/webp")
+        self.assertEqual(r["Cache-Control"], "private, max-age=31536000, immutable")
+
+    def test_listados_devuelven_miniaturas(self):
+        subida = self._subir(self.foto)
+        externa = "https://fotos.example.com/salida.jpg"
+        Acceso.objects.filter(tipo="ingreso").update(foto_url=[subida["url"], externa])
+
+        fotos = self.cliente.get("/api/accesos/").json()[0]["foto_url"]
+        sha = subida["sha256"]
+        self.assertEqual(fotos, [f"http://testserver/media/fotos/derivadas/{sha[:2]}/{sha}_mini.webp", externa])
+
+        fotos = self.cliente.get("/api/accesos/?fotos=original").json()[0]["foto_url"]
+        self.assertEqual(fotos, [subida["url"], externa])
+
+
+urlpatterns = [
+    path("async/sectores/", views_async.sectores_disponibles),
+]
+
+
+class AdminTablasGrandesTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = User.objects.create_superuser("staff", password="x", role="superadmin", empresa=cls.empresa)
+        cls.ana = Visita.objects.create(rut="11111111-1", nombre="Ana", apellido="Muñoz", instalacion=cls.instalacion)
+        cls.luis = Visita.objects.create(rut="22222222-2", nombre="Luis", instalacion=cls.instalacion)
+        cls.sin_instalacion = Visita.objects.create(rut="33333333-3", nombre="Eva")
+        inicio = timezone.make_aware(datetime(2024, 11, 20, 10))
+        for n, visita in enumerate((cls.ana, cls.luis)):
+            Acceso.objects.create(
+                visita=visita, instalacion=cls.instalacion, sector=cls.sector, tipo="ingreso",
+                fecha_hora=inicio + timedelta(days=60 * n), guardia=cls.guardia, empresa=cls.empresa,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def _accion(self, accion, visitas):
+        return self.client.post("/admin/access_ctrl/visita/", {
+            "action": accion, "_selected_action": [v.pk for v in visitas],
+        }, follow=True)
+
+    def test_prohibir_y_habilitar_en_lote(self):
+        self._accion("prohibir_acceso", [self.ana, self.luis, self.sin_instalacion])
+        # repetir no duplica las prohibiciones activas
+        self._accion("prohibir_acceso", [self.ana])
+
+        activas = ProhibicionAcceso.objects.filter(fecha_fin__isnull=True)
+        self.assertEqual(sorted(activas.values_list("visita_id", flat=True)), [self.ana.pk, self.luis.pk])
+        self.assertEqual(Visita.objects.get(pk=self.ana.pk).estado, "prohibido")
+        self.assertEqual(Visita.objects.get(pk=self.sin_instalacion.pk).estado, "activo")
+
+        self._accion("habilitar_acceso", [self.ana])
+        self.assertEqual(list(activas.values_list("visita_id", flat=True)), [self.luis.pk])
+        self.assertEqual(Visita.objects.get(pk=self.ana.pk).estado, "activo")
+
+    def test_changelist_de_accesos_con_jerarquia_y_busqueda(self):
+        r = self.client.get("/admin/access_ctrl/acceso/")
+        self.assertEqual(r.status_code, 200)
+        # los años salen del mínimo y el máximo de fecha_hora, sin DISTINCT
+        self.assertContains(r, "?fecha_hora__year=2024")
+        self.assertContains(r, "?fecha_hora__year=2025")
+
+        r = self.client.get("/admin/access_ctrl/acceso/", {"q": "munoz"})
+        self.assertEqual([a.visita_id for a in r.context["cl"].result_list], [self.ana.pk])
+
+        r = self.client.get("/admin/access_ctrl/acceso/", {"fecha_hora__year": "2025", "fecha_hora__month": "1"})
+        self.assertEqual([a.visita_id for a in r.context["cl"].result_list], [self.luis.pk])
+
+    def test_autocomplete_de_visitas_usa_la_busqueda_normalizada(self):
+        r = self.client.get("/admin/autocomplete/", {
+            "app_label": "access_ctrl", "model_name": "acceso", "field_name": "visita", "term": "munoz",
+        })
+        self.assertEqual([int(x["id"]) for x in r.json()["results"]], [self.ana.pk])
+
+
+class FiltrosAccesosTests(UsuariosPorRolMixin, TestCase):
+    FILTROS = {
+        "rango": {"desde": "2024-11-01", "hasta": "2024-11-30"},
+        "sector": {"sector_id": "{sector}"},
+        "guardia": {"guardia_id": "{guardia}"},
+        "visita": {"visita_id": "{visita}"},
+        "tipo": {"tipo": "salida"},
+        "documento": {"documento": "11.111.111-1"},
+        "patente": {"patente": "ab-cd 12"},
+        "comentario": {"con_comentario": "1"},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        otro_sector = Sector.objects.create(instalacion=cls.instalacion, nombre="Patio")
+        cls.ana = Visita.objects.create(rut="11111111-1", nombre="Ana", patente="ABCD12")
+        luis = Visita.objects.create(rut="22222222-2", nombre="Luis", patente="WXYZ99")
+
+        base = timezone.make_aware(datetime(2024, 11, 15, 9))
+        for visita, sector, comentario, dias in (
+            (cls.ana, cls.sector, "retira mercadería", 0),
+            (cls.ana, otro_sector, "", 1),
+            (luis, cls.sector, None, 30),
+        ):
+            for tipo, minutos in (("ingreso", 0), ("salida", 45)):
+                Acceso.objects.create(
+                    visita=visita, instalacion=cls.instalacion, sector=sector, tipo=tipo,
+                    fecha_hora=base + timedelta(days=dias, minutes=minutos), comentario=comentario,
+                    guardia=cls.usuarios["guardia"], empresa=cls.empresa,
+                )
+
+    def _params(self, nombres):
+        valores = {"sector": self.sector.pk, "guardia": self.usuarios["guardia"].pk, "visita": self.ana.pk}
+        params = {}
+        for nombre in nombres:
+            params.update({k: v.format(**valores) for k, v in self.FILTROS[nombre].items()})
+        return params
+
+    def _listar(self, usuario, params):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuarios[usuario])
+        r = cliente.get("/api/accesos/", params)
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()
+
+    def test_filtros_combinados(self):
+        data = self._listar("admin", {"documento": "111111111", "con_comentario": "1"})
+        self.assertEqual({a["comentario"] for a in data}, {"retira mercadería"})
+        self.assertEqual(len(data), 2)
+
+        data = self._listar("guardia", {"patente": "wxyz-99", "tipo": "ingreso"})
+        self.assertEqual([a["visita"]["id"] for a in data], [Visita.objects.get(rut="22222222-2").pk])
+
+        # "hasta" con fecha sola incluye ese día completo
+        data = self._listar("superadmin", {"desde": "2024-11-16", "hasta": "2024-11-16"})
+        self.assertEqual(len(data), 2)
+
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuarios["admin"])
+        self.assertEqual(cliente.get("/api/accesos/", {"desde": "ayer"}).status_code, 400)
+
+    def _plan(self, usuario, params):
+        request = Request(APIRequestFactory().get("/api/accesos/", params))
+        request.user = self.usuarios[usuario]
+        vista = AccesoListView(request=request, format_kwarg=None)
+        queryset = vista.get_queryset()
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                # con tablas chicas el planificador prefiere Seq Scan aunque haya índice
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def test_ninguna_combinacion_recorre_la_tabla(self):
+        if connection.vendor == "postgresql":
+            recorre = re.compile(r"Seq Scan on access_ctrl_acceso")
+        else:
+            # SQLite informa como SCAN el recorrido de un índice parcial, que sólo tiene
+            # las filas de su condición: se aceptan los parciales que define el esquema
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'access_ctrl_acceso' "
+                    "AND sql LIKE '% WHERE %'"
+                )
+                parciales = "|".join(re.escape(nombre) for (nombre,) in cursor.fetchall())
+            self.assertTrue(parciales)
+            recorre = re.compile(rf"\bSCAN access_ctrl_acceso\b(?! USING (?:COVERING )?INDEX (?:{parciales})\b)")
+
+        for cantidad in range(1, len(self.FILTROS) + 1):
+            for nombres in itertools.combinations(self.FILTROS, cantidad):
+                params = self._params(nombres)
+                for usuario in self.usuarios:
+                    with self.subTest(usuario=usuario, filtros=nombres):
+                        plan = self._plan(usuario, params)
+                        self.assertIsNone(recorre.search(plan), plan)
+
+
+class AccesosGrupoTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.ruts = [f"{20_000_000 + n}-{n % 10}" for n in range(FILAS_POCAS * 4)]
+        for rut in cls.ruts:
+            Visita.objects.create(rut=rut, nombre="Cuadrilla")
+        Visita.objects.create(es_extranjero=True, dni_extranjero="AB-123", nombre="Carla")
+
+        cls.prohibida = Visita.objects.create(rut="22222222-2", nombre="Dino")
+        ProhibicionAcceso.objects.create(
+            visita=cls.prohibida, instalacion=cls.instalacion, motivo="Prueba",
+            fecha_inicio=timezone.now() - timedelta(days=1),
+        )
+        cls.adentro = Visita.objects.create(rut="12345678-5", nombre="Ana")
+        Acceso.objects.create(
+            visita=cls.adentro, instalacion=cls.instalacion, sector=cls.sector, tipo="ingreso",
+            fecha_hora=timezone.now() - timedelta(hours=1), guardia=cls.guardia, empresa=cls.empresa,
+        )
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.guardia)
+
+    def _enviar(self, tipo, personas):
+        with contar_consultas() as consultas:
+            r = self.cliente.post(
+                f"/api/accesos/{tipo}-grupo/", {"personas": personas, "sector_id": self.sector.id}, format="json",
+            )
+        return r, consultas
+
+    def test_resultado_por_persona(self):
+        personas = [
+            {"documento": "20.000.000-0"},
+            {"documento": "ab123", "es_extranjero": True},
+            {"documento": "22222222-2"},
+            {"documento": "12345678-5"},
+            {"documento": "99999999-9"},
+            {"documento": "200000000"},
+        ]
+        r, _ = self._enviar("ingreso", personas)
+        self.assertEqual(r.status_code, 201, r.content)
+        self.assertEqual(
+            [x["resultado"] for x in r.json()["resultados"]],
+            ["ingreso_ok", "ingreso_ok", "prohibido", "visita_ya_adentro", "visita_no_encontrada", "duplicado"],
+        )
+        self.assertEqual(r.json()["registrados"], 2)
+        ids = [x["acceso_id"] for x in r.json()["resultados"][:2]]
+        self.assertEqual(SesionVisita.objects.filter(ingreso_id__in=ids, fecha_salida__isnull=True).count(), 2)
+
+        r, _ = self._enviar("salida", personas[:2] + [{"documento": "22222222-2"}])
+        self.assertEqual(
+            [x["resultado"] for x in r.json()["resultados"]], ["salida_ok", "salida_ok", "no_hay_ingreso_abierto"],
+        )
+        self.assertEqual(SesionVisita.objects.filter(ingreso_id__in=ids, fecha_salida__isnull=False).count(), 2)
+
+        r, _ = self._enviar("salida", personas[:1])
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(r.json()["ok"])
+
+    def test_consultas_no_crecen_con_el_grupo(self):
+        medidas = {}
+        for tipo in ("ingreso", "salida"):
+            for ruts in (self.ruts[:FILAS_POCAS], self.ruts[FILAS_POCAS:]):
+                r, consultas = self._enviar(tipo, [{"documento": rut} for rut in ruts])
+                self.assertEqual(r.json()["registrados"], len(ruts), r.content)
+                medidas.setdefault(tipo, []).append(consultas)
+
+        for tipo, (pocas, muchas) in medidas.items():
+            with self.subTest(tipo=tipo):
+                self.assertEqual(len(pocas), len(muchas), "\n".join(muchas.sql))
+                # en PostgreSQL se suma el pg_notify del feed de accesos
+                self.assertLessEqual(len(muchas), 8 + (connection.vendor == "postgresql"), "\n".join(muchas.sql))
+
+
+class PasesQRTests(UsuariosPorRolMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        otra = Instalacion.objects.create(empresa=cls.empresa, nombre="Otra planta")
+        cls.otro_sector = Sector.objects.create(instalacion=otra, nombre="Patio")
+        cls.visita = Visita.objects.create(rut="12345678-5", nombre="Ana", instalacion=cls.instalacion)
+
+    def setUp(self):
+        prohibiciones._por_instalacion.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.guardia)
+
+    def _pedir_pase(self, usuario=None, sector=None, **extra):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario or self.usuarios["admin"])
+        return cliente.post("/api/pases/", {
+            "visita_id": self.visita.id, "sector_id": (sector or self.sector).id, **extra,
+        })
+
+    def _emitir(self, **extra):
+        r = self._pedir_pase(**extra)
+        self.assertEqual(r.status_code, 201, r.content)
+        return r.json()["token"]
+
+    def _escanear(self, token):
+        return self.cliente.post("/api/porteria/pase/", {"token": token})
+
+    def test_verificar_no_consulta_la_base(self):
+        token = self._emitir()
+        self.assertLess(len(token), 80)
+        with self.assertNumQueries(0):
+            pase = pases.verificar(token)
+        self.assertEqual(
+            (pase.visita_id, pase.instalacion_id, pase.sector_id),
+            (self.visita.id, self.instalacion.id, self.sector.id),
+        )
+
+    def test_escanear(self):
+        token = self._emitir()
+        self._escanear(token)
+        # con el caché de prohibiciones cargado: sólo el último acceso
+        with contar_consultas() as consultas:
+            r = self._escanear(token)
+        self.assertEqual(len(consultas), 1, consultas.sql)
+        self.assertEqual((r.json()["accion"], r.json()["prohibido"]), ("ingreso", False))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProhibicionAcceso.objects.create(
+                visita=self.visita, instalacion=self.instalacion, motivo="Robo",
+                fecha_inicio=timezone.now() - timedelta(minutes=1),
+            )
+        r = self._escanear(token)
+        self.assertEqual((r.json()["ok"], r.json()["motivo_prohibicion"]), (False, "Robo"))
+
+    def test_version_perdida_no_reusa_el_cache(self):
+        cache.clear()
+        self.assertIsNone(prohibiciones.motivo_vigente(self.visita.id, self.instalacion.id))
+
+        # otro worker prohíbe y el caché compartido pierde la clave (reinicio o desalojo)
+        ProhibicionAcceso.objects.bulk_create([ProhibicionAcceso(
+            visita=self.visita, instalacion=self.instalacion, motivo="Robo",
+            fecha_inicio=timezone.now() - timedelta(minutes=1),
+        )])
+        cache.delete(prohibiciones.VERSION)
+        self.assertEqual(prohibiciones.motivo_vigente(self.visita.id, self.instalacion.id), "Robo")
+
+    def test_pases_rechazados(self):
+        token = self._emitir()
+        self.assertEqual(self._escanear(token[:-1] + ("A" if token[-1] != "A" else "B")).json()["error"], "pase_invalido")
+        self.assertEqual(self._escanear("basura").status_code, 400)
+
+        vencido = self._emitir(
+            valido_desde=(timezone.now() - timedelta(days=2)).isoformat(),
+            valido_hasta=(timezone.now() - timedelta(days=1)).isoformat(),
+        )
+        r = self._escanear(vencido)
+        self.assertEqual((r.status_code, r.json()["error"]), (403, "pase_vencido"))
+
+        ajeno = pases.emitir(
+            self.visita.id, self.otro_sector.instalacion_id, self.otro_sector.id,
+            timezone.now(), timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(self._escanear(ajeno).json()["error"], "pase_de_otra_instalacion")
+
+    def test_quien_emite(self):
+        r = self._pedir_pase(self.guardia)
+        self.assertEqual((r.status_code, r.json()["error"]), (403, "rol_sin_permiso"))
+
+        # la visita está preinscrita en otra instalación de la empresa
+        r = self._pedir_pase(sector=self.otro_sector)
+        self.assertEqual((r.status_code, r.json()["error"]), (403, "visita_de_otra_instalacion"))
+        self.assertEqual(self._pedir_pase(self.usuarios["superadmin"], sector=self.otro_sector).status_code, 201)
+
+        ajeno = User.objects.create_user("ajeno", password="x", role="admin", empresa=Empresa.objects.create(nombre="Otra"))
+        r = self._pedir_pase(ajeno)
+        self.assertEqual((r.status_code, r.json()["error"]), (403, "sector_de_otra_empresa"))
+
+
+class RepresentacionesCacheTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.visitas = [Visita.objects.create(rut=f"1{n}111111-1", nombre=f"Visita {n}") for n in range(3)]
+
+    def setUp(self):
+        representaciones.local.clear()
+
+    def _serializar(self, visita):
+        # como en las vistas: motivo_prohibicion sale del prefetch, también con caché
+        return VisitaSerializer(Visita.objects.prefetch_related(prohibiciones_vigentes()).get(pk=visita.pk)).data
+
+    def test_hit_y_cambios_que_invalidan(self):
+        visita = self.visitas[0]
+        data = self._serializar(visita)
+        entrada = representaciones.local.get(representaciones.clave("visita", Visita.objects.get(pk=visita.pk)))
+        self.assertEqual(entrada, {**data, "motivo_prohibicion": None})
+        with mock.patch.object(representaciones, "guardar") as guardar:
+            self.assertEqual(self._serializar(visita), data)
+        guardar.assert_not_called()
+        self.assertNotEqual(VisitaSerializer(visita).data, EnrolamientoSerializer(visita).data)
+
+        visita.nombre = "Renombrada"
+        visita.save()
+        self.assertEqual(self._serializar(visita)["nombre"], "Renombrada")
+
+        # el motivo se calcula en cada pedido: ni la prohibición ni su vencimiento cambian la clave
+        prohibicion = ProhibicionAcceso.objects.create(
+            visita=visita, instalacion=self.instalacion, motivo="Robo",
+            fecha_inicio=timezone.now() - timedelta(minutes=1),
+        )
+        with mock.patch.object(representaciones, "guardar") as guardar:
+            self.assertEqual(self._serializar(visita)["motivo_prohibicion"], "Robo")
+            ProhibicionAcceso.objects.filter(pk=prohibicion.pk).update(fecha_fin=timezone.now() - timedelta(seconds=1))
+            self.assertIsNone(self._serializar(visita)["motivo_prohibicion"])
+        guardar.assert_not_called()
+
+    def test_lru_acotado(self):
+        lru = representaciones.LRU(2)
+        lru.set("a", {"n": 1}, 60)
+        lru.set("b", {"n": 2}, 60)
+        lru.get("a")
+        lru.set("c", {"n": 3}, 60)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual((lru.get("a"), len(lru)), ({"n": 1}, 2))
+        lru.set("d", {"n": 4}, -1)
+        self.assertIsNone(lru.get("d"))
+
+    @override_settings(
+        REPRESENTACIONES_CACHE_ALIAS="representaciones",
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "representaciones": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "repr"},
+        },
+    )
+    def test_cache_compartido_en_listas(self):
+        ProhibicionAcceso.objects.create(
+            visita=self.visitas[1], instalacion=self.instalacion, motivo="Robo",
+            fecha_inicio=timezone.now() - timedelta(minutes=1),
+        )
+        visitas = Visita.objects.prefetch_related(prohibiciones_vigentes()).order_by("id")
+        esperado = VisitaSerializer(visitas.all(), many=True).data
+        # otro worker: LRU vacío, lee del caché compartido con un get_many
+        representaciones.local.clear()
+        with mock.patch("django.core.cache.backends.locmem.LocMemCache.get_many", autospec=True,
+                        side_effect=lambda self, claves, **kw: {c: self.get(c) for c in claves}) as get_many:
+            with contar_consultas() as consultas:
+                obtenido = VisitaSerializer(visitas.all(), many=True).data
+        self.assertEqual(obtenido, esperado)
+        self.assertEqual(obtenido[1]["motivo_prohibicion"], "Robo")
+        # las visitas y el prefetch de prohibiciones
+        self.assertEqual(len(consultas), 2, consultas.sql)
+        self.assertEqual(get_many.call_count, 1)
+
+
+class SerializacionRapidaTests(InstalacionMixin, TestCase):
+    sector_kwargs = {"requiere_guia": True}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        visitas = [
+            Visita.objects.create(rut="11111111-1", nombre="Ana", apellido="Muñoz", instalacion=cls.instalacion, sector=cls.sector),
+            Visita.objects.create(es_extranjero=True, dni_extranjero="AB123", nombre="Carla", apellido=None),
+            Visita.objects.create(rut="22222222-2", nombre="Dino", patente="ABCD12", comentario="Proveedor"),
+        ]
+        ahora = timezone.now()
+        for motivo, inicio, fin in (
+            ("Vieja", ahora - timedelta(days=9), None),
+            ("Reciente", ahora - timedelta(days=1), ahora + timedelta(days=1)),
+            ("Vencida", ahora - timedelta(hours=1), ahora - timedelta(minutes=1)),
+        ):
+            ProhibicionAcceso.objects.create(
+                visita=visitas[2], instalacion=cls.instalacion, motivo=motivo, fecha_inicio=inicio, fecha_fin=fin,
+            )
+
+        foto_propia = "http://testserver" + fotos.url_foto("a" * 64, "jpg")
+        for n, (visita, foto_url, comentario) in enumerate((
+            (visitas[0], None, None),
+            (visitas[1], [], ""),
+            (visitas[2], [foto_propia, "https://externa.example/x.jpg"], "con guía"),
+            (visitas[0], ["https://externa.example/y.jpg"], "ñandú"),
+        )):
+            Acceso.objects.create(
+                visita=visita, instalacion=cls.instalacion, sector=cls.sector, tipo=("ingreso", "salida")[n % 2],
+                fecha_hora=ahora - timedelta(hours=n, microseconds=n * 137), comentario=comentario,
+                foto_url=foto_url, guardia=cls.guardia, empresa=cls.empresa,
+            )
+
+    def test_salida_identica_byte_a_byte(self):
+        renderer = JSONRenderer()
+        queryset = Acceso.objects.select_related("visita", "sector", "instalacion", "empresa").prefetch_related(
+            prohibiciones_vigentes("visita__prohibiciones")
+        ).order_by("-fecha_hora")
+
+        for query in ({}, {"fotos": "original"}):
+            with self.subTest(query=query):
+                request = Request(APIRequestFactory().get("/api/accesos/", query))
+                representaciones.local.clear()
+                esperado = AccesoListaSerializer(queryset.all(), many=True, context={"request": request}).data
+                with self.assertNumQueries(2):
+                    obtenido = serializar_accesos(queryset.all(), request)
+                self.assertEqual(renderer.render(obtenido), renderer.render(esperado))
+
+        with timezone.override("UTC"):
+            self.assertEqual(
+                renderer.render(serializar_accesos(queryset.all())),
+                renderer.render(AccesoListaSerializer(queryset.all(), many=True).data),
+            )
+
+
+class CamposPedidosTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ana = Visita.objects.create(rut="11111111-1", nombre="Ana", apellido="Muñoz", instalacion=cls.instalacion)
+        dino = Visita.objects.create(rut="22222222-2", nombre="Dino", instalacion=cls.instalacion)
+        ProhibicionAcceso.objects.create(
+            visita=dino, instalacion=cls.instalacion, motivo="Prueba", fecha_inicio=timezone.now() - timedelta(days=1),
+        )
+        for n, visita in enumerate((ana, dino, ana)):
+            Acceso.objects.create(
+                visita=visita, instalacion=cls.instalacion, sector=cls.sector, tipo=("ingreso", "salida")[n % 2],
+                fecha_hora=timezone.now() - timedelta(hours=n), foto_url=["https://externa.example/x.jpg"],
+                guardia=cls.guardia, empresa=cls.empresa,
+            )
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.guardia)
+
+    def _get(self, url):
+        with contar_consultas() as consultas:
+            r = self.cliente.get(url)
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json(), consultas
+
+    def test_igual_al_serializer_recortado(self):
+        queryset = Acceso.objects.select_related("visita", "sector", "instalacion", "empresa").prefetch_related(
+            prohibiciones_vigentes("visita__prohibiciones")
+        ).order_by("-fecha_hora")
+        request = Request(APIRequestFactory().get("/api/accesos/"))
+        for query in (
+            {"fields": "id,tipo,fecha_hora,sector_nombre"},
+            {"fields": "id,visita,foto_url"},
+            {"fields": "id", "expand": "visita"},
+            {"fields": "visita.nombre,visita.motivo_prohibicion,empresa_nombre"},
+        ):
+            with self.subTest(query=query):
+                campos = campos_pedidos(query, AccesoListaSerializer)
+                self.assertEqual(
+                    JSONRenderer().render(serializar_accesos(queryset.all(), request, campos)),
+                    JSONRenderer().render(AccesoListaSerializer(
+                        queryset.all(), many=True, context={"request": request}, campos=campos,
+                    ).data),
+                )
+
+    def test_listado_recorta_salida_y_sql(self):
+        accesos, consultas = self._get("/api/accesos/?fields=id,tipo,fecha_hora,sector_nombre")
+        self.assertEqual(list(accesos[0]), ["id", "sector_nombre", "tipo", "fecha_hora"])
+        self.assertEqual(len(consultas), 1)
+        self.assertNotIn("access_ctrl_visita", consultas.sql[0])
+
+        accesos, _ = self._get("/api/accesos/?fields=id,visita")
+        self.assertIsInstance(accesos[0]["visita"], int)
+
+        accesos, consultas = self._get("/api/accesos/?fields=id&expand=visita")
+        self.assertEqual(accesos[0]["visita"]["nombre"], "Ana")
+        self.assertEqual(len(consultas), 2)
+
+        accesos, consultas = self._get("/api/accesos/dia-curso/?fields=visita.nombre,visita.rut")
+        self.assertEqual(accesos[-1], {"visita": {"rut": "11111111-1", "nombre": "Ana"}})
+        self.assertEqual(len(consultas), 1)
+
+        data, _ = self._get("/api/accesos/ultimas-24h/?fields=id,visita.motivo_prohibicion")
+        self.assertEqual([a["visita"]["motivo_prohibicion"] for a in data["results"]], [None, "Prueba", None])
+
+    def test_campos_invalidos(self):
+        for url, parametro in (
+            ("/api/accesos/?fields=id,nope", "fields"),
+            ("/api/accesos/?fields=visita.nope", "fields"),
+            ("/api/accesos/?expand=sector", "expand"),
+            ("/api/visitas/buscar/?q=ana&expand=visita", "expand"),
+        ):
+            with self.subTest(url=url):
+                r = self.cliente.get(url)
+                self.assertEqual(r.status_code, 400)
+                self.assertIn(parametro, r.json())
+
+    def test_visitas_only(self):
+        data, consultas = self._get("/api/visitas/buscar/?q=ana&fields=id,nombre")
+        self.assertEqual(data["results"], [{"id": data["results"][0]["id"], "nombre": "Ana"}])
+        self.assertNotIn("prohibicion", " ".join(consultas.sql))
+        self.assertNotIn('"comentario"', " ".join(consultas.sql))
+
+        data, _ = self._get(f"/api/instalaciones/{self.instalacion.id}/visitas/?fields=rut,motivo_prohibicion")
+        self.assertEqual(data, [
+            {"rut": "22222222-2", "motivo_prohibicion": "Prueba"},
+            {"rut": "11111111-1", "motivo_prohibicion": None},
+        ])
+
+
+class BusquedaVisitasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Visita.objects.create(nombre="Ana", apellido="Muñoz", rut="12.345.678-5", patente="AB-CD·12")
+        cls.ramuz = Visita.objects.create(nombre="Pedro", apellido="Ramuz", rut="9.876.543-2")
+        cls.mariana = Visita.objects.create(nombre="Mariana", apellido="Soto")
+        cls.anaya = Visita.objects.create(nombre="Juan", apellido="Anaya", es_extranjero=True, dni_extranjero="X-99")
+
+    def test_normalizacion(self):
+        self.assertEqual(normalizar_busqueda("  Muñoz-Pérez, JOSÉ "), "munozperez jose")
+        self.assertEqual(normalizar_busqueda("12.345.678-k"), "12345678k")
+        self.assertEqual(Visita.objects.get(pk=self.ana.pk).busqueda, "ana munoz 123456785 abcd 12")
+        self.assertEqual(normalizar_documento(" 12.345.678-k"), "12345678K")
+        self.assertEqual(self.ana.patente_normalizada, "ABCD12")
+
+    def _buscar(self, q):
+        return list(
+            buscar_visitas(Visita.objects.all(), q).order_by("rank_busqueda", "id").values_list("nombre", "rank_busqueda")
+        )
+
+    def test_prefijos_de_palabra(self):
+        self.assertEqual(self._buscar("mu"), [("Ana", 0)])
+        self.assertEqual(self._buscar("MUÑOZ ana"), [("Ana", 1)])
+        self.assertEqual(self._buscar("ana"), [("Ana", 0), ("Juan", 0)])
+        self.assertEqual(self._buscar("12.345"), [("Ana", 0)])
+        self.assertEqual(self._buscar("x99"), [("Juan", 0)])
+        self.assertEqual(self._buscar("uz"), [])
+        self.assertFalse(buscar_visitas(Visita.objects.all(), " -- ").exists())
+
+    def test_mismo_resultado_en_los_dos_motores(self):
+        # filtrar_prefijos es el filtro de PostgreSQL; en SQLite se puede correr igual con LIKE
+        for q in ("mu", "ana", "ana munoz", "98765", "pe ra", "so", "riana", "ab cd"):
+            tokens = normalizar_busqueda(q).split()
+            with self.subTest(q=q):
+                self.assertEqual(
+                    set(buscar_visitas(Visita.objects.all(), q).values_list("id", flat=True)),
+                    set(filtrar_prefijos(Visita.objects.all(), tokens).values_list("id", flat=True)),
+                )
+
+
+@skipUnless(connection.vendor == "postgresql", "el particionado de accesos es sólo de PostgreSQL")
+class ParticionesTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        visita = Visita.objects.create(rut="12345678-5", nombre="Ana")
+        # meses sin partición: quedan en la partición por defecto
+        for fecha in (datetime(2019, 5, 1), datetime(2019, 5, 31, 23, 59), datetime(2019, 6, 1)):
+            Acceso.objects.create(
+                visita=visita, instalacion=cls.instalacion, sector=cls.sector, tipo="ingreso",
+                fecha_hora=timezone.make_aware(fecha), guardia=cls.guardia, empresa=cls.empresa,
+            )
+
+    def _filas(self, tabla):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {tabla}")
+            return cursor.fetchone()[0]
+
+    def test_crear_particion_mueve_las_filas_de_la_por_defecto(self):
+        self.assertEqual(self._filas(particiones.PARTICION_DEFAULT), 3)
+
+        self.assertTrue(particiones.crear_particion(2019, 5))
+
+        self.assertIn((2019, 5), particiones.particiones_existentes())
+        self.assertEqual(self._filas(particiones.nombre_particion(2019, 5)), 2)
+        self.assertEqual(self._filas(particiones.PARTICION_DEFAULT), 1)
+        self.assertEqual(Acceso.objects.filter(instalacion=self.instalacion).count(), 3)
+        # la por defecto volvió a quedar adjunta
+        self.assertTrue(particiones.crear_particion(2019, 6))
+        self.assertEqual(self._filas(particiones.PARTICION_DEFAULT), 0)
+        self.assertFalse(particiones.crear_particion(2019, 6))
+
+
+class SesionesTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_user("admin", password="x", role="admin", empresa=cls.empresa)
+        cls.ana = Visita.objects.create(rut="11111111-1", nombre="Ana")
+        cls.dino = Visita.objects.create(rut="22222222-2", nombre="Dino")
+        cls.inicio = timezone.make_aware(datetime(2025, 3, 3, 8, 0))
+
+    def _acceso(self, visita, tipo, minutos):
+        return Acceso.objects.create(
+            visita=visita, instalacion=self.instalacion, sector=self.sector, tipo=tipo,
+            fecha_hora=self.inicio + timedelta(minutes=minutos), guardia=self.guardia, empresa=self.empresa,
+        )
+
+    def _sesiones(self):
+        return list(
+            SesionVisita.objects.order_by("visita_id", "fecha_ingreso")
+            .values_list("visita__nombre", "ingreso_id", "salida_id", "duracion_segundos")
+        )
+
+    def test_abrir_y_cerrar(self):
+        ingreso = self._acceso(self.ana, "ingreso", 0)
+        sesiones.abrir_sesion(ingreso)
+        salida = self._acceso(self.ana, "salida", 90)
+        self.assertEqual(sesiones.cerrar_sesion(salida).duracion_segundos, 90 * 60)
+        # sin sesión abierta no hay nada que cerrar
+        self.assertIsNone(sesiones.cerrar_sesion(self._acceso(self.ana, "salida", 120)))
+        self.assertEqual(self._sesiones(), [("Ana", ingreso.id, salida.id, 90 * 60)])
+
+    def test_emparejar_accesos(self):
+        accesos = [
+            self._acceso(self.ana, "ingreso", 0),
+            self._acceso(self.ana, "ingreso", 10),  # reemplaza al anterior, que nunca salió
+            self._acceso(self.ana, "salida", 70),
+            self._acceso(self.ana, "salida", 80),  # salida sin ingreso abierto
+            self._acceso(self.dino, "ingreso", 5),  # sigue adentro
+        ]
+        ordenados = sorted(accesos, key=lambda a: (a.visita_id, a.instalacion_id, a.fecha_hora, a.id))
+        emparejadas = sorted(
+            ((s.ingreso_id, s.salida_id, s.duracion_segundos) for s in sesiones.emparejar_accesos(ordenados)),
+            key=lambda s: s[0],
+        )
+        self.assertEqual(emparejadas, [(accesos[1].id, accesos[2].id, 3600), (accesos[4].id, None, None)])
+
+    def test_percentiles_iguales_en_los_dos_motores(self):
+        # PostgreSQL usa percentile_cont y SQLite el cálculo en Python: mismos valores
+        for n, minutos in enumerate((1, 2, 3, 4)):
+            ingreso = self._acceso(self.ana, "ingreso", n * 100)
+            sesiones.abrir_sesion(ingreso)
+            sesiones.cerrar_sesion(self._acceso(self.ana, "salida", n * 100 + minutos))
+
+        (fila,) = sesiones.estadisticas_permanencia(SesionVisita.objects.all(), "sector")
+        self.assertEqual(fila["total"], 4)
+        self.assertEqual(fila["promedio_segundos"], 150)
+        self.assertAlmostEqual(fila["p50"], 150)
+        self.assertAlmostEqual(fila["p90"], 222)
+        self.assertAlmostEqual(fila["p95"], 231)
+        self.assertIsNone(sesiones._percentil([], 0.5))
+
+    def test_backfill(self):
+        self._acceso(self.ana, "ingreso", 0)
+        self._acceso(self.ana, "salida", 30)
+        self._acceso(self.dino, "ingreso", 0)
+        call_command("backfill_sesiones", stdout=io.StringIO())
+        self.assertEqual(len(self._sesiones()), 2)
+
+        salida = io.StringIO()
+        call_command("backfill_sesiones", stdout=salida)
+        self.assertIn("--reset", salida.getvalue())
+        call_command("backfill_sesiones", "--reset", "--lote", "1", stdout=io.StringIO())
+        self.assertEqual([s[3] for s in self._sesiones()], [1800, None])
+
+    def test_editar_acceso_reempareja(self):
+        ingreso = self._acceso(self.ana, "ingreso", 0)
+        sesiones.abrir_sesion(ingreso)
+        salida = self._acceso(self.ana, "salida", 30)
+        sesiones.cerrar_sesion(salida)
+
+        cliente = APIClient()
+        cliente.force_authenticate(self.admin)
+        r = cliente.patch(
+            f"/api/accesos/{salida.id}/", {"fecha_hora": (self.inicio + timedelta(hours=2)).isoformat()}, format="json",
+        )
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(self._sesiones(), [("Ana", ingreso.id, salida.id, 7200)])
+
+        # la salida pasa a ser de otra visita: Ana queda adentro y Dino tiene una salida sin ingreso
+        r = cliente.patch(f"/api/accesos/{salida.id}/", {"visita": self.dino.id}, format="json")
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(self._sesiones(), [("Ana", ingreso.id, None, None)])
+
+        # cambiar sólo el comentario no toca las sesiones
+        with contar_consultas() as consultas:
+            cliente.patch(f"/api/accesos/{ingreso.id}/", {"comentario": "ok"}, format="json")
+        self.assertFalse([sql for sql in consultas.sql if "sesionvisita" in sql.lower()])
+
+
+class FeedAccesosTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otra = Instalacion.objects.create(empresa=cls.empresa, nombre="Otra planta")
+        cls.visita = Visita.objects.create(rut="12345678-5", nombre="Ana")
+        cls.accesos = [
+            Acceso.objects.create(
+                visita=cls.visita, instalacion=cls.instalacion, sector=cls.sector, tipo=tipo,
+                fecha_hora=timezone.now() - timedelta(minutes=5 - n), guardia=cls.guardia, empresa=cls.empresa,
+            )
+            for n, tipo in enumerate(("ingreso", "salida", "ingreso"))
+        ]
+
+    def setUp(self):
+        self.addCleanup(self._detener_hub)
+
+    def _detener_hub(self):
+        # en PostgreSQL el primer suscriptor arranca el hilo con LISTEN: que suelte su conexión
+        escucha = hub._escucha
+        hub.detener()
+        if escucha is not None:
+            escucha.join()
+
+    def _ticket(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.guardia)
+        r = cliente.post("/api/accesos/stream/ticket/")
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()["ticket"]
+
+    def _abrir(self, query="", cuantos=0, **headers):
+        """Abre el feed por ASGI y devuelve ``(status, [los primeros ``cuantos`` mensajes])``."""
+        async def abrir():
+            r = await self.async_client.get(f"/api/accesos/stream/{query}", headers=headers)
+            mensajes = []
+            if r.streaming:
+                contenido = aiter(r.streaming_content)
+                try:
+                    for _ in range(cuantos):
+                        mensajes.append(await anext(contenido))
+                finally:
+                    await contenido.aclose()
+            return r.status_code, mensajes
+
+        return async_to_sync(abrir)()
+
+    def test_wsgi_no_sirve_el_feed(self):
+        r = self.client.get("/api/accesos/stream/")
+        self.assertEqual(r.status_code, 501)
+
+    def test_autenticacion(self):
+        self.assertEqual(self._abrir()[0], 401)
+        # un JWT en la URL ya no sirve, el ticket sí
+        jwt = str(RefreshToken.for_user(self.guardia).access_token)
+        self.assertEqual(self._abrir(f"?token={jwt}")[0], 401)
+        self.assertEqual(self._abrir(f"?ticket={jwt}")[0], 401)
+        self.assertEqual(self._abrir(f"?ticket={self._ticket()}", cuantos=1), (200, [b"retry: 3000\n\n"]))
+        self.assertEqual(self._abrir(cuantos=1, authorization=f"Bearer {jwt}")[0], 200)
+
+        ticket = self._ticket()
+        with override_settings(FEED_ACCESOS_TICKET_SEGUNDOS=-1):
+            self.assertEqual(self._abrir(f"?ticket={ticket}")[0], 401)
+        self.assertFalse(hub.hay_suscriptores())
+
+    def test_reconexion_reenvia_desde_last_event_id(self):
+        status, mensajes = self._abrir(
+            f"?ticket={self._ticket()}", cuantos=3, **{"Last-Event-ID": str(self.accesos[0].id)},
+        )
+        self.assertEqual(status, 200)
+        ids = [re.match(rb"id: (\d+)\n", m).group(1) for m in mensajes[1:]]
+        self.assertEqual(ids, [str(a.id).encode() for a in self.accesos[1:]])
+        self.assertIn(b"event: acceso\n", mensajes[1])
+
+    def test_hub_reparte_segun_filtro(self):
+        async def repartir():
+            propia = hub.suscribir({"empresa_id": self.empresa.id, "instalacion_id": self.instalacion.id})
+            ajena = hub.suscribir({"empresa_id": self.empresa.id, "instalacion_id": self.otra.id})
+            chica = hub.suscribir({})
+            chica.cola = asyncio.Queue(maxsize=1)
+            try:
+                for n in (1, 2):
+                    hub.repartir(feed.Evento(n, self.empresa.id, self.instalacion.id, b"x"))
+                await asyncio.sleep(0)
+                return propia.cola.qsize(), ajena.cola.qsize(), chica.atrasada
+            finally:
+                for sub in (propia, ajena, chica):
+                    sub.cerrar()
+
+        self.assertEqual(async_to_sync(repartir)(), (2, 0, True))
+        self.assertFalse(hub.hay_suscriptores())
 
-# Create your tests here.
@@ -1,14 +1,35 @@
+from django.conf import settings
 from django.urls import path, include
-from .views import IngresoView, SalidaView, AccesoListView, BuscarPorRUTView, BuscarPorDNIView, RegistrarVisitaView, \
-    buscar_ultimo_acceso_por_rut, VisitasPorInstalacionView, VisitaUpdateView, AccesosUltimas24View, \
-    AccesosDiaEnCursoView, AccesosPorMesView, SectoresPorInstalacionView, AccesoUpdateAdminView, CargaMasivaAccesosView, \
-    SectoresDisponiblesView, EnroladosListCreateView, CargaMasivaEnrolamientoView, EnroladoDeleteView, \
-    EnroladoDeleteView, \
-    ProhibirAccesoEnroladoView, DescargarPlantillaEnrolamientoView, HabilitarAccesoEnroladoView
+from .views import IngresoView, SalidaView, BuscarPorRUTView, BuscarPorDNIView, RegistrarVisitaView, \
+    DecisionPorteriaView, IngresoGrupoView, SalidaGrupoView, buscar_ultimo_acceso_por_rut
+from .views_accesos import AccesoListView, AccesosUltimas24View, AccesosDiaEnCursoView, AccesosPorMesView, \
+    AccesoUpdateAdminView, PermanenciaResumenView, PermanenciasExcedidasView
+from .views_visitas import VisitasPorInstalacionView, VisitaUpdateView, SectoresPorInstalacionView, BuscarVisitasView
+from .views_enrolamiento import SectoresDisponiblesView, EnroladosListCreateView, EnroladoDeleteView, \
+    ProhibirAccesoEnroladoView, HabilitarAccesoEnroladoView
+from .views_carga import CargaMasivaAccesosView, CargaMasivaEnrolamientoView, DescargarPlantillaEnrolamientoView
 from rest_framework.routers import DefaultRouter
 
 from .views_token import CustomTokenObtainPairView
 from .views_user import UsuarioViewSet
+from .views_feed import TicketFeedView, stream_accesos
+from .views_fotos import SubidaFotoCreateView, SubidaFotoView
+from .views_pases import EmitirPaseView, EscanearPaseView
+from . import views_async
+
+# ⚡ consultas de portería: versión async para ASGI o la DRF de siempre (ver settings)
+if settings.GATE_VISTAS_ASYNC:
+    buscar_por_rut = views_async.buscar_por_rut
+    buscar_por_dni = views_async.buscar_por_dni
+    buscar_ultimo = views_async.buscar_ultimo_acceso_por_rut
+    decision_porteria = views_async.decision_porteria
+    sectores_disponibles = views_async.sectores_disponibles
+else:
+    buscar_por_rut = BuscarPorRUTView.as_view()
+    buscar_por_dni = BuscarPorDNIView.as_view()
+    buscar_ultimo = buscar_ultimo_acceso_por_rut
+    decision_porteria = DecisionPorteriaView.as_view()
+    sectores_disponibles = SectoresDisponiblesView.as_view()
 
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet, basename='usuarios')
@@ -16,13 +37,23 @@ router.register(r'usuarios', UsuarioViewSet, basename='usuarios')
 urlpatterns = [
     path("accesos/ingreso/", IngresoView.as_view(), name="accesos_ingreso"),
     path("accesos/salida/", SalidaView.as_view(), name="accesos_salida"),
+    path("accesos/ingreso-grupo/", IngresoGrupoView.as_view(), name="accesos_ingreso_grupo"),
+    path("accesos/salida-grupo/", SalidaGrupoView.as_view(), name="accesos_salida_grupo"),
     path('', include(router.urls)),
     path("accesos/", AccesoListView.as_view(), name="listar-accesos"),
-    path('visitas/buscar-rut/<str:rut>/', BuscarPorRUTView.as_view(), name='buscar_por_rut'),
-    path('visitas/buscar-dni/<str:dni>/', BuscarPorDNIView.as_view(), name='buscar_por_dni'),
+    path("accesos/stream/", stream_accesos, name="accesos_stream"),
+    path("accesos/stream/ticket/", TicketFeedView.as_view(), name="accesos_stream_ticket"),
+    path("fotos/subidas/", SubidaFotoCreateView.as_view(), name="fotos_subidas"),
+    path("fotos/subidas/<uuid:pk>/", SubidaFotoView.as_view(), name="fotos_subida"),
+    path('visitas/buscar-rut/<str:rut>/', buscar_por_rut, name='buscar_por_rut'),
+    path('visitas/buscar-dni/<str:dni>/', buscar_por_dni, name='buscar_por_dni'),
     path('visitas/crear/', RegistrarVisitaView.as_view(), name='crear_visita'),
+    path('visitas/buscar/', BuscarVisitasView.as_view(), name='buscar_visitas'),
     path("auth/token/id/", CustomTokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("accesos/buscar-ultimo/<str:rut>/", buscar_ultimo_acceso_por_rut, name="buscar_ultimo_acceso_por_rut"),
+    path("accesos/buscar-ultimo/<str:rut>/", buscar_ultimo, name="buscar_ultimo_acceso_por_rut"),
+    path("porteria/decision/<str:documento>/", decision_porteria, name="decision_porteria"),
+    path("porteria/pase/", EscanearPaseView.as_view(), name="escanear_pase"),
+    path("pases/", EmitirPaseView.as_view(), name="emitir_pase"),
     path('instalaciones/<int:instalacion_id>/visitas/', VisitasPorInstalacionView.as_view(),
          name='visitas_por_instalacion'),
     path('visitas/<int:pk>/', VisitaUpdateView.as_view(), name='actualizar_visita'),
@@ -30,12 +61,14 @@ urlpatterns = [
     path("accesos/ultimas-24h/", AccesosUltimas24View.as_view(), name="accesos_ultimas_24h"),
     path("accesos/dia-curso/", AccesosDiaEnCursoView.as_view(), name="accesos_dia_curso"),
     path("accesos/por-mes/", AccesosPorMesView.as_view(), name="accesos_por_mes"),
+    path("permanencias/resumen/", PermanenciaResumenView.as_view(), name="permanencias_resumen"),
+    path("permanencias/excedidas/", PermanenciasExcedidasView.as_view(), name="permanencias_excedidas"),
     path('instalaciones/<int:instalacion_id>/sectores/', SectoresPorInstalacionView.as_view(),
          name='sectores_por_inst'),
     path('accesos/<int:pk>/', AccesoUpdateAdminView.as_view(), name='editar_acceso'),
     path("accesos/carga-masiva/", CargaMasivaAccesosView.as_view(), name="carga_masiva_accesos"),
 
-    path("enrolamiento/sectores/", SectoresDisponiblesView.as_view()),
+    path("enrolamiento/sectores/", sectores_disponibles),
     path("enrolamiento/personas/", EnroladosListCreateView.as_view()),
     path("enrolamiento/carga-masiva/", CargaMasivaEnrolamientoView.as_view()),
     path("enrolamiento/personas/<int:pk>/", EnroladoDeleteView.as_view()),
@@ -1,102 +1,51 @@
-from django.db import IntegrityError
-from django.db.models import Q, Max, Count
-from django.db.models.functions import TruncDay
+import operator
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
 from django.utils import timezone
-from django.http import HttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from rest_framework.generics import ListAPIView, UpdateAPIView
 from rest_framework.permissions import IsAuthenticated
-from datetime import timedelta, datetime, time
-from .models import Visita, Acceso, ProhibicionAcceso, Acceso
-from core.models import Instalacion, Sector, Empresa
-from core.serializers import SectorSer
-from .serializers import AccesoSerializer, VisitaInlineUpdateSerializer
-from .serializers import IngresoRequest, SalidaRequest, AccesoSerializer, VisitaSerializer, VisitaSimpleSerializer, \
-    AccesoFullSerializer, EnrolamientoSerializer, CargaMasivaEnrolamientoSerializer
+from .models import Visita, Acceso, ProhibicionAcceso, SubidaFoto
+from .fotos import url_foto
+from .busqueda import normalizar_documento
+from .feed import publicar_acceso, publicar_accesos
+from config.metricas import registrar_resultado_gate
+from .sesiones import abrir_sesion, abrir_sesiones, cerrar_sesion, cerrar_sesiones
+from core.models import Sector
+from .serializers import IngresoRequest, SalidaRequest, GrupoRequest, AccesoSerializer, VisitaSerializer, \
+    prohibiciones_vigentes
 from drf_spectacular.utils import extend_schema
-from openpyxl import load_workbook
-from openpyxl import Workbook
-from openpyxl.worksheet.datavalidation import DataValidation
-from openpyxl.styles import Font, PatternFill, Alignment
 
-def _normalizar_documento(doc: str) -> str:
-    return (doc or "").replace(".", "").replace("-", "").strip().upper()
+# 📦 vistas de portería y helpers compartidos; el resto está repartido en
+# views_accesos, views_visitas, views_enrolamiento y views_carga (Excel)
+
+def _visitas_por_documento(documento, extranjero):
+    """
+    Visitas cuyo RUT (o DNI si ``extranjero``) normalizado coincide con
+    ``documento``, por el índice de ``Visita.documento_normalizado``.
+    """
+    return Visita.objects.filter(
+        es_extranjero=extranjero, documento_normalizado=normalizar_documento(documento)
+    ).order_by("id")
 
 def es_admin_general(user):
     return bool(user.empresa and user.empresa.es_administradora_general)
 
 
-class AccesoListView(ListAPIView):
-    serializer_class = AccesoSerializer
-    permission_classes = [IsAuthenticated]
-
-    def get_queryset(self):
-        user = self.request.user
-        queryset = Acceso.objects.select_related(
-            "visita",
-            "instalacion",
-            "sector",
-            "empresa",
-            "guardia",
-        ).all()
-
-        visita_id = self.request.query_params.get("visita_id")
-        instalacion_id = self.request.query_params.get("instalacion_id")
-        empresa_id = self.request.query_params.get("empresa_id")
-        tipo = self.request.query_params.get("tipo")
-
-        if es_admin_general(user):
-            if empresa_id:
-                queryset = queryset.filter(empresa_id=empresa_id)
-            if instalacion_id:
-                queryset = queryset.filter(instalacion_id=instalacion_id)
-
-        elif user.role == "admin":
-            queryset = queryset.filter(empresa_id=user.empresa_id)
-            if instalacion_id:
-                queryset = queryset.filter(instalacion_id=instalacion_id)
-
-        elif user.role == "guardia":
-            queryset = queryset.filter(
-                empresa_id=user.empresa_id,
-                instalacion_id=user.instalacion_id
-            )
-
-        else:
-            return Acceso.objects.none()
-
-        if visita_id:
-            queryset = queryset.filter(visita_id=visita_id)
-
-        if tipo in ["ingreso", "salida"]:
-            queryset = queryset.filter(tipo=tipo)
-
-        return queryset.order_by("-fecha_hora")
-
-
 def _get_visita(payload):
     # 1) por id
     if payload.get("visita_id"):
         return Visita.objects.filter(id=payload["visita_id"]).first()
 
     # 2) por documento
-    if payload.get("es_extranjero"):
-        dni = _normalizar_documento(payload.get("dni_extranjero") or "")
-        if dni:
-            visitas = Visita.objects.filter(es_extranjero=True)
-            for visita in visitas:
-                if _normalizar_documento(visita.dni_extranjero or "") == dni:
-                    return visita
-    else:
-        rut = _normalizar_documento(payload.get("rut") or "")
-        if rut:
-            visitas = Visita.objects.filter(es_extranjero=False)
-            for visita in visitas:
-                if _normalizar_documento(visita.rut or "") == rut:
-                    return visita
+    extranjero = bool(payload.get("es_extranjero"))
+    documento = payload.get("dni_extranjero" if extranjero else "rut")
+    if normalizar_documento(documento):
+        return _visitas_por_documento(documento, extranjero).first()
 
     return None
 
@@ -127,17 +76,108 @@ def _crear_o_actualizar_visita(payload):
     return v, True
 
 
-def _hay_prohibicion(v, instalacion):
+def _prohibiciones_en(instalacion):
     now = timezone.now()
     return ProhibicionAcceso.objects.filter(
-        visita=v, instalacion=instalacion
-    ).filter(Q(fecha_fin__isnull=True, fecha_inicio__lte=now) | Q(fecha_inicio__lte=now, fecha_fin__gte=now)).exists()
+        instalacion=instalacion
+    ).filter(Q(fecha_fin__isnull=True, fecha_inicio__lte=now) | Q(fecha_inicio__lte=now, fecha_fin__gte=now))
+
+
+def _prohibiciones_activas(v, instalacion):
+    return _prohibiciones_en(instalacion).filter(visita=v)
+
+
+def _hay_prohibicion(v, instalacion):
+    return _prohibiciones_activas(v, instalacion).exists()
 
 
 def _ultimo_evento(v, instalacion):
     return Acceso.objects.filter(visita=v, instalacion=instalacion).order_by("-fecha_hora").first()
 
 
+def _visitas_del_grupo(personas, instalacion):
+    """
+    Las visitas de todas las personas de un grupo en una sola consulta, por
+    ``(es_extranjero, documento_normalizado)``, con el tipo de su último
+    acceso en la instalación. Con documentos repetidos en la base gana la de
+    menor id, igual que ``_visitas_por_documento(...).first()``.
+    """
+    filtros = [
+        Q(es_extranjero=extranjero, documento_normalizado__in=documentos)
+        for extranjero in (False, True)
+        if (documentos := {
+            normalizar_documento(p["documento"]) for p in personas if p["es_extranjero"] == extranjero
+        } - {""})
+    ]
+    if not filtros:
+        return {}
+
+    ultimo = Acceso.objects.filter(
+        visita=OuterRef("pk"), instalacion=instalacion
+    ).order_by("-fecha_hora")[:1]
+    visitas = Visita.objects.filter(
+        reduce(operator.or_, filtros)
+    ).annotate(ultimo_tipo=Subquery(ultimo.values("tipo"))).order_by("-id")
+
+    return {(v.es_extranjero, v.documento_normalizado): v for v in visitas}
+
+
+def _consulta_decision(documento, extranjero, instalacion_id):
+    """
+    La visita del documento con su último acceso en la instalación anotado
+    (por el índice (visita, fecha_hora)) y las prohibiciones vigentes en un
+    prefetch: dos consultas en total, evaluando con ``first()``/``afirst()``.
+    """
+    ultimo = Acceso.objects.filter(
+        visita=OuterRef("pk"), instalacion_id=instalacion_id
+    ).order_by("-fecha_hora")[:1]
+
+    return _visitas_por_documento(documento, extranjero).annotate(
+        ultimo_tipo=Subquery(ultimo.values("tipo")),
+        ultimo_fecha_hora=Subquery(ultimo.values("fecha_hora")),
+        ultimo_sector_id=Subquery(ultimo.values("sector_id")),
+        ultimo_sector_nombre=Subquery(ultimo.values("sector__nombre")),
+        ultimo_sector_requiere_guia=Subquery(ultimo.values("sector__requiere_guia")),
+    ).prefetch_related(prohibiciones_vigentes())
+
+
+def _decision(visita, instalacion_id):
+    """
+    Lo que necesita la app de portería para decidir: prohibición en la
+    instalación, si está adentro y desde cuándo, la acción permitida y si el
+    sector exige guía (comentario y foto) para la salida.
+    """
+    if visita is None:
+        # visitante nuevo: IngresoView lo crea al registrar el ingreso
+        return {
+            "ok": True, "visita": None, "prohibido": False, "motivo_prohibicion": None,
+            "adentro": False, "adentro_desde": None, "accion": "ingreso", "sector": None,
+        }
+
+    prohibiciones = [p for p in visita.prohibiciones_vigentes if p.instalacion_id == instalacion_id]
+    adentro = visita.ultimo_tipo == "ingreso"
+    if adentro:
+        accion = "salida"
+    else:
+        accion = None if prohibiciones else "ingreso"
+
+    return {
+        "ok": accion is not None,
+        "visita": VisitaSerializer(visita).data,
+        "prohibido": bool(prohibiciones),
+        "motivo_prohibicion": prohibiciones[0].motivo if prohibiciones else None,
+        "adentro": adentro,
+        "adentro_desde": timezone.localtime(visita.ultimo_fecha_hora).isoformat() if adentro else None,
+        "accion": accion,
+        # sector donde se registrará la salida
+        "sector": {
+            "id": visita.ultimo_sector_id,
+            "nombre": visita.ultimo_sector_nombre,
+            "requiere_documentacion": visita.ultimo_sector_requiere_guia,
+        } if adentro else None,
+    }
+
+
 class IngresoView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -183,6 +223,7 @@ class IngresoView(APIView):
 
         # ✅ 4️⃣ Verificar prohibición
         if _hay_prohibicion(visita, instalacion):
+            registrar_resultado_gate("prohibido")
             return Response(
                 {"ok": False, "error": "prohibido"},
                 status=status.HTTP_403_FORBIDDEN
@@ -191,23 +232,28 @@ class IngresoView(APIView):
         # ✅ 5️⃣ Evitar doble ingreso
         last = _ultimo_evento(visita, instalacion)
         if last and last.tipo == "ingreso":
+            registrar_resultado_gate("visita_ya_adentro")
             return Response(
                 {"ok": False, "error": "visita_ya_adentro"},
                 status=status.HTTP_409_CONFLICT
             )
 
-        # ✅ 6️⃣ Registrar acceso
-        acceso = Acceso.objects.create(
-            visita=visita,
-            instalacion=instalacion,
-            sector=sector,
-            tipo="ingreso",
-            fecha_hora=timezone.now(),
-            comentario=data.get("comentario") or "",
-            guardia=user,
-            empresa=instalacion.empresa,
-        )
+        # ✅ 6️⃣ Registrar acceso y abrir la sesión de la visita
+        with transaction.atomic():
+            acceso = Acceso.objects.create(
+                visita=visita,
+                instalacion=instalacion,
+                sector=sector,
+                tipo="ingreso",
+                fecha_hora=timezone.now(),
+                comentario=data.get("comentario") or "",
+                guardia=user,
+                empresa=instalacion.empresa,
+            )
+            abrir_sesion(acceso)
+            publicar_acceso(acceso)
 
+        registrar_resultado_gate("ingreso_ok")
         return Response(
             {"ok": True, "mensaje": "Ingreso registrado", "acceso": AccesoSerializer(acceso).data},
             status=201
@@ -250,30 +296,202 @@ class SalidaView(APIView):
         # Aquí continúas con el flujo normal:
         visita = _get_visita(data)
         if not visita:
+            registrar_resultado_gate("visita_no_encontrada")
             return Response({"ok": False, "error": "visita_no_encontrada"}, status=404)
 
         last = _ultimo_evento(visita, instalacion)
         if not last or last.tipo != "ingreso":
+            registrar_resultado_gate("no_hay_ingreso_abierto")
             return Response({"ok": False, "error": "no_hay_ingreso_abierto"}, status=409)
 
-        acceso = Acceso.objects.create(
-            visita=visita,
-            instalacion=instalacion,
-            sector=sector,
-            tipo="salida",
-            fecha_hora=timezone.now(),
-            comentario=data.get("comentario") or "",
-            foto_url=data.get("foto_url") or "",
-            guardia=user,
-            empresa=instalacion.empresa,
-        )
+        foto_url = data.get("foto_url") or ""
+        if data.get("fotos"):
+            subidas = list(SubidaFoto.objects.filter(
+                id__in=data["fotos"], usuario=user, completada_en__isnull=False
+            ))
+            if len(subidas) != len(set(data["fotos"])):
+                return Response({"ok": False, "error": "fotos_no_validas"}, status=400)
+            foto_url = list(foto_url) + [
+                request.build_absolute_uri(url_foto(s.sha256, s.extension)) for s in subidas
+            ]
+
+        with transaction.atomic():
+            acceso = Acceso.objects.create(
+                visita=visita,
+                instalacion=instalacion,
+                sector=sector,
+                tipo="salida",
+                fecha_hora=timezone.now(),
+                comentario=data.get("comentario") or "",
+                foto_url=foto_url,
+                guardia=user,
+                empresa=instalacion.empresa,
+            )
+            cerrar_sesion(acceso)
+            publicar_acceso(acceso)
 
+        registrar_resultado_gate("salida_ok")
         return Response(
             {"ok": True, "mensaje": "Salida registrada", "acceso": AccesoSerializer(acceso).data},
             status=201
         )
 
 
+def _validar_grupo(request):
+    """Datos validados, instalación y sector del pedido grupal, o la respuesta de error."""
+    ser = GrupoRequest(data=request.data)
+    ser.is_valid(raise_exception=True)
+    data = ser.validated_data
+
+    instalacion = request.user.instalacion
+    if not instalacion:
+        return data, None, None, Response(
+            {"ok": False, "error": "usuario_sin_instalacion_asociada"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        sector = Sector.objects.get(id=data["sector_id"], instalacion=instalacion)
+    except Sector.DoesNotExist:
+        return data, instalacion, None, Response(
+            {"ok": False, "error": "sector_no_valido"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return data, instalacion, sector, None
+
+
+def _clasificar_grupo(personas, visitas, rechazo):
+    """
+    Resultado de cada persona en el orden recibido. ``rechazo(visita)``
+    devuelve el motivo por el que no se registra, o None.
+    """
+    resultados, vistas = [], set()
+    for persona in personas:
+        clave = (persona["es_extranjero"], normalizar_documento(persona["documento"]))
+        visita = visitas.get(clave)
+        if visita is None:
+            resultado = "visita_no_encontrada"
+        elif clave in vistas:
+            resultado = "duplicado"
+        else:
+            resultado = rechazo(visita)
+        vistas.add(clave)
+        resultados.append({
+            "documento": persona["documento"],
+            "resultado": resultado,
+            "visita_id": visita.id if visita else None,
+            "acceso_id": None,
+            "visita": visita if resultado is None else None,
+        })
+    return resultados
+
+
+def _respuesta_grupo(resultados, tipo, accesos):
+    por_visita = {acceso.visita_id: acceso.id for acceso in accesos}
+    for r in resultados:
+        if r.pop("visita") is not None:
+            r["resultado"] = f"{tipo}_ok"
+            r["acceso_id"] = por_visita[r["visita_id"]]
+        registrar_resultado_gate(r["resultado"])
+
+    return Response(
+        {"ok": bool(accesos), "registrados": len(accesos), "resultados": resultados},
+        status=status.HTTP_201_CREATED if accesos else status.HTTP_200_OK
+    )
+
+
+class IngresoGrupoView(APIView):
+    """
+    Ingreso de un grupo (bus, cuadrilla) al mismo sector en un solo pedido:
+    las visitas, su presencia y sus prohibiciones se resuelven para todo el
+    grupo a la vez y los accesos y sesiones se insertan en bloque. Las
+    visitas deben estar registradas; las que no, se informan en el resultado.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(request=GrupoRequest)
+    def post(self, request):
+        data, instalacion, sector, error = _validar_grupo(request)
+        if error:
+            return error
+
+        visitas = _visitas_del_grupo(data["personas"], instalacion)
+        prohibidas = set(_prohibiciones_en(instalacion).filter(
+            visita_id__in=[v.id for v in visitas.values()]
+        ).values_list("visita_id", flat=True))
+
+        def rechazo(visita):
+            if visita.id in prohibidas:
+                return "prohibido"
+            if visita.ultimo_tipo == "ingreso":
+                return "visita_ya_adentro"
+            return None
+
+        resultados = _clasificar_grupo(data["personas"], visitas, rechazo)
+        admitidas = [r["visita"] for r in resultados if r["visita"] is not None]
+
+        ahora = timezone.now()
+        with transaction.atomic():
+            Visita.objects.filter(id__in=[v.id for v in admitidas]).update(
+                instalacion=instalacion, sector=sector, actualizado_en=ahora
+            )
+            accesos = Acceso.objects.bulk_create([
+                Acceso(
+                    visita=visita,
+                    instalacion=instalacion,
+                    sector=sector,
+                    tipo="ingreso",
+                    fecha_hora=ahora,
+                    comentario=data.get("comentario") or "",
+                    guardia=request.user,
+                    empresa=instalacion.empresa,
+                )
+                for visita in admitidas
+            ])
+            abrir_sesiones(accesos)
+            publicar_accesos(accesos)
+
+        return _respuesta_grupo(resultados, "ingreso", accesos)
+
+
+class SalidaGrupoView(APIView):
+    """Salida de un grupo: como ``IngresoGrupoView``, cerrando las sesiones en bloque."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(request=GrupoRequest)
+    def post(self, request):
+        data, instalacion, sector, error = _validar_grupo(request)
+        if error:
+            return error
+
+        visitas = _visitas_del_grupo(data["personas"], instalacion)
+        resultados = _clasificar_grupo(
+            data["personas"], visitas,
+            lambda visita: None if visita.ultimo_tipo == "ingreso" else "no_hay_ingreso_abierto",
+        )
+        salientes = [r["visita"] for r in resultados if r["visita"] is not None]
+
+        ahora = timezone.now()
+        with transaction.atomic():
+            accesos = Acceso.objects.bulk_create([
+                Acceso(
+                    visita=visita,
+                    instalacion=instalacion,
+                    sector=sector,
+                    tipo="salida",
+                    fecha_hora=ahora,
+                    comentario=data.get("comentario") or "",
+                    guardia=request.user,
+                    empresa=instalacion.empresa,
+                )
+                for visita in salientes
+            ])
+            cerrar_sesiones(accesos)
+            publicar_accesos(accesos)
+
+        return _respuesta_grupo(resultados, "salida", accesos)
+
+
 class BuscarPorRUTView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -287,13 +505,7 @@ class BuscarPorRUTView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rut_normalizado = _normalizar_documento(rut)
-        visita = None
-
-        for v in Visita.objects.filter(es_extranjero=False):
-            if _normalizar_documento(v.rut or "") == rut_normalizado:
-                visita = v
-                break
+        visita = _visitas_por_documento(rut, extranjero=False).first()
 
         if not visita:
             return Response(
@@ -334,13 +546,7 @@ class BuscarPorDNIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        dni_normalizado = _normalizar_documento(dni)
-        visita = None
-
-        for v in Visita.objects.filter(es_extranjero=True):
-            if _normalizar_documento(v.dni_extranjero or "") == dni_normalizado:
-                visita = v
-                break
+        visita = _visitas_por_documento(dni, extranjero=True).first()
 
         if not visita:
             return Response(
@@ -368,6 +574,27 @@ class BuscarPorDNIView(APIView):
         )
 
 
+class DecisionPorteriaView(APIView):
+    """
+    Todo lo que la portería necesita para un documento en una sola llamada
+    (en vez de buscar-rut, buscar-ultimo y sectores): visita, prohibición,
+    si está adentro y la acción siguiente. ``?extranjero=1`` busca por DNI.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, documento):
+        instalacion_id = request.user.instalacion_id
+        if not instalacion_id:
+            return Response(
+                {"ok": False, "mensaje": "Usuario sin instalación asociada"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        extranjero = request.query_params.get("extranjero") not in (None, "", "0")
+        visita = _consulta_decision(documento, extranjero, instalacion_id).first()
+        return Response(_decision(visita, instalacion_id), status=status.HTTP_200_OK)
+
+
 class RegistrarVisitaView(APIView):
     """
     Crea una nueva visita o actualiza datos mínimos si ya existe.
@@ -402,16 +629,18 @@ def buscar_ultimo_acceso_por_rut(request, rut):
     Si no hay ingreso previo abierto, informa que no se puede registrar salida.
     Incluye información del sector visitado y si requiere documentación de salida.
     """
-    try:
-        visita = Visita.objects.get(rut=rut)
-    except Visita.DoesNotExist:
+    visita = _visitas_por_documento(rut, extranjero=False).first()
+    if not visita:
         return Response(
             {"ok": False, "mensaje": "No existe una visita registrada con ese RUT."},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    # Buscar último acceso registrado
-    ultimo = Acceso.objects.filter(visita=visita).order_by("-fecha_hora").first()
+    # Buscar último acceso registrado (en la instalación del guardia, como SalidaView)
+    ultimo = Acceso.objects.filter(visita=visita)
+    if request.user.instalacion_id:
+        ultimo = ultimo.filter(instalacion_id=request.user.instalacion_id)
+    ultimo = ultimo.order_by("-fecha_hora").first()
 
     if not ultimo:
         return Response(
@@ -449,854 +678,3 @@ def buscar_ultimo_acceso_por_rut(request, rut):
         },
         status=status.HTTP_200_OK
     )
-
-
-class AccesosUltimas24View(ListAPIView):
-    permission_classes = [IsAuthenticated]
-    serializer_class = AccesoSerializer
-
-    def get_queryset(self):
-        user = self.request.user
-        now = timezone.localtime()
-        start = now - timedelta(hours=24)
-
-        qs = Acceso.objects.select_related(
-            "visita",
-            "instalacion",
-            "sector",
-            "empresa",
-            "guardia"
-        ).filter(
-            fecha_hora__gte=start
-        )
-
-        empresa_id = self.request.query_params.get("empresa_id")
-        instalacion_id = self.request.query_params.get("instalacion_id")
-
-        if es_admin_general(user):
-            if empresa_id:
-                qs = qs.filter(empresa_id=empresa_id)
-            if instalacion_id:
-                qs = qs.filter(instalacion_id=instalacion_id)
-
-        elif user.role == "admin":
-            qs = qs.filter(empresa_id=user.empresa_id)
-            if instalacion_id:
-                qs = qs.filter(instalacion_id=instalacion_id)
-
-        elif user.role == "guardia":
-            qs = qs.filter(
-                empresa_id=user.empresa_id,
-                instalacion_id=user.instalacion_id
-            )
-
-        else:
-            qs = qs.none()
-
-        return qs.order_by("-fecha_hora")
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-
-        total = queryset.count()
-        total_ingresos = queryset.filter(tipo="ingreso").count()
-        total_salidas = queryset.filter(tipo="salida").count()
-
-        return Response({
-            "ok": True,
-            "total": total,
-            "total_ingresos": total_ingresos,
-            "total_salidas": total_salidas,
-            "results": serializer.data
-        })
-
-
-class AccesosDiaEnCursoView(ListAPIView):
-    permission_classes = [IsAuthenticated]
-    serializer_class = AccesoSerializer
-
-    def get_queryset(self):
-        user = self.request.user
-        now = timezone.localtime()
-
-        start = timezone.make_aware(
-            datetime.combine(now.date(), time(6, 0)),
-            timezone.get_current_timezone()
-        )
-        next_midnight = timezone.make_aware(
-            datetime.combine(now.date() + timedelta(days=1), time(0, 0)),
-            timezone.get_current_timezone()
-        )
-
-        qs = Acceso.objects.select_related(
-            "visita", "instalacion", "sector", "empresa", "guardia"
-        ).filter(
-            fecha_hora__gte=start,
-            fecha_hora__lt=next_midnight
-        )
-
-        empresa_id = self.request.query_params.get("empresa_id")
-        instalacion_id = self.request.query_params.get("instalacion_id")
-
-        if es_admin_general(user):
-            if empresa_id:
-                qs = qs.filter(empresa_id=empresa_id)
-            if instalacion_id:
-                qs = qs.filter(instalacion_id=instalacion_id)
-
-        elif user.role == "admin":
-            qs = qs.filter(empresa_id=user.empresa_id)
-            if instalacion_id:
-                qs = qs.filter(instalacion_id=instalacion_id)
-
-        elif user.role == "guardia":
-            qs = qs.filter(
-                empresa_id=user.empresa_id,
-                instalacion_id=user.instalacion_id
-            )
-
-        else:
-            qs = qs.none()
-
-        return qs.order_by("-fecha_hora")
-
-class SectoresPorInstalacionView(ListAPIView):
-    permission_classes = [IsAuthenticated]
-    serializer_class = SectorSer
-
-    def get_queryset(self):
-        user = self.request.user
-        inst_id = self.kwargs.get("instalacion_id")
-
-        qs = Sector.objects.filter(instalacion_id=inst_id)
-
-        if es_admin_general(user):
-            return qs.order_by("nombre")
-
-        return qs.filter(instalacion__empresa_id=user.empresa_id).order_by("nombre")
-
-
-class VisitasPorInstalacionView(ListAPIView):
-    permission_classes = [IsAuthenticated]
-    serializer_class = VisitaSerializer
-
-    def get_queryset(self):
-        user = self.request.user
-        instalacion_id = self.kwargs.get("instalacion_id")
-
-        qs = Visita.objects.filter(instalacion_id=instalacion_id)
-
-        if not es_admin_general(user):
-            qs = qs.filter(instalacion__empresa_id=user.empresa_id)
-
-        q = self.request.query_params.get("q")
-        if q:
-            qs = qs.filter(
-                Q(nombre__icontains=q) |
-                Q(apellido__icontains=q) |
-                Q(rut__icontains=q) |
-                Q(dni_extranjero__icontains=q)
-            )
-
-        return qs.order_by("-creado_en")
-
-
-class AccesosPorMesView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        user = request.user
-        year = int(request.query_params.get("year", timezone.localtime().year))
-        month = int(request.query_params.get("month", timezone.localtime().month))
-
-        empresa_id = request.query_params.get("empresa_id")
-        instalacion_id = request.query_params.get("instalacion_id")
-
-        base = Acceso.objects.filter(
-            fecha_hora__year=year,
-            fecha_hora__month=month,
-        )
-
-        if es_admin_general(user):
-            if empresa_id:
-                base = base.filter(empresa_id=empresa_id)
-            if instalacion_id:
-                base = base.filter(instalacion_id=instalacion_id)
-        else:
-            base = base.filter(empresa_id=user.empresa_id)
-            if instalacion_id:
-                base = base.filter(instalacion_id=instalacion_id)
-
-        diario = (
-            base.annotate(dia=TruncDay("fecha_hora"))
-            .values("dia", "tipo")
-            .annotate(total=Count("id"))
-            .order_by("dia", "tipo")
-        )
-
-        include_detail = request.query_params.get("detail") == "1"
-        data = {
-            "year": year,
-            "month": month,
-            "empresa_id": empresa_id if es_admin_general(user) else user.empresa_id,
-            "instalacion_id": instalacion_id,
-            "resumen_diario": list(diario),
-        }
-
-        if include_detail:
-            data["accesos"] = AccesoSerializer(
-                base.select_related("visita", "sector", "instalacion", "empresa").order_by("-fecha_hora"),
-                many=True
-            ).data
-
-        return Response({"ok": True, "data": data}, status=200)
-
-
-class VisitaUpdateView(UpdateAPIView):
-    permission_classes = [IsAuthenticated]
-    serializer_class = VisitaInlineUpdateSerializer
-    queryset = Visita.objects.all()
-
-    def get_queryset(self):
-        qs = super().get_queryset()
-        user = self.request.user
-
-        if es_admin_general(user):
-            return qs
-
-        return qs.filter(instalacion__empresa_id=user.empresa_id)
-
-
-class AccesoUpdateAdminView(UpdateAPIView):
-    permission_classes = [IsAuthenticated]
-    serializer_class = AccesoFullSerializer
-    queryset = Acceso.objects.all()
-
-    def get_queryset(self):
-        qs = super().get_queryset()
-        user = self.request.user
-
-        if es_admin_general(user):
-            return qs
-
-        if user.is_admin():
-            return qs.filter(empresa_id=user.empresa_id)
-
-        return qs.none()
-
-    def patch(self, request, *args, **kwargs):
-        user = request.user
-
-        if not user.is_admin() and not es_admin_general(user):
-            return Response(
-                {"ok": False, "error": "No tiene permisos para editar accesos"},
-                status=status.HTTP_403_FORBIDDEN
-            )
-
-        return self.partial_update(request, *args, **kwargs)
-
-    def put(self, request, *args, **kwargs):
-        user = request.user
-
-        if not user.is_admin() and not es_admin_general(user):
-            return Response(
-                {"ok": False, "error": "No tiene permisos para editar accesos"},
-                status=status.HTTP_403_FORBIDDEN
-            )
-
-        return self.update(request, *args, **kwargs)
-
-
-class CargaMasivaAccesosView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request):
-        data = request.data
-        if not isinstance(data, list):
-            return Response({"error": "Debe enviar una lista de accesos"}, status=400)
-
-        creados = 0
-        errores = []
-        user = request.user
-
-        for acceso_data in data:
-            try:
-                rut = acceso_data.get("rut")
-                nombre = acceso_data.get("nombre") or "Sin nombre"
-
-                visita, creada = Visita.objects.get_or_create(
-                    rut=rut,
-                    defaults={
-                        "dni_extranjero": acceso_data.get("dni_extranjero", ""),
-                        "es_extranjero": acceso_data.get("es_extranjero", False),
-                        "nombre": nombre,
-                        "apellido": acceso_data.get("apellido", ""),
-                        "empresa": acceso_data.get("empresa", ""),
-                        "patente": acceso_data.get("patente", ""),
-                    },
-                )
-
-                if not visita.nombre:
-                    visita.nombre = nombre
-                    visita.save()
-
-                serializer = AccesoSerializer(data={
-                    "visita": visita.id,
-                    "instalacion": acceso_data.get("instalacion_id"),
-                    "sector": acceso_data.get("sector_id"),
-                    "tipo": "ingreso",
-                    "fecha_hora": timezone.now(),
-                    "comentario": acceso_data.get("comentario", ""),
-                    "empresa": user.empresa_id,
-                    "guardia": user.id
-                })
-
-                if serializer.is_valid():
-                    serializer.save()
-                    creados += 1
-                else:
-                    errores.append(serializer.errors)
-
-            except Exception as e:
-                errores.append(str(e))
-
-        return Response(
-            {"ok": True, "total_creados": creados, "errores": errores[:10]},
-            status=status.HTTP_201_CREATED
-        )
-
-
-class SectoresDisponiblesView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        user = request.user
-
-        # 🔥 usuario sectorial → solo su sector
-        if user.solo_enrolamiento:
-            sectores = Sector.objects.filter(id=user.sector_id)
-
-        # 🔥 admin → sectores de su instalación
-        elif user.instalacion_id:
-            sectores = Sector.objects.filter(instalacion_id=user.instalacion_id)
-
-        else:
-            # superadmin
-            sectores = Sector.objects.all()
-
-        data = [
-            {
-                "id": s.id,
-                "nombre": s.nombre
-            }
-            for s in sectores
-        ]
-
-        return Response(data)
-
-
-class EnroladosListCreateView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        user = request.user
-
-        # 🔥 cliente_sector → solo su sector
-        if user.solo_enrolamiento:
-            visitas = Visita.objects.filter(sector=user.sector)
-
-        # 🔥 admin → por instalación
-        elif user.instalacion_id:
-            visitas = Visita.objects.filter(instalacion_id=user.instalacion_id)
-
-        else:
-            visitas = Visita.objects.all()
-
-        serializer = EnrolamientoSerializer(visitas, many=True)
-        return Response(serializer.data)
-
-    def post(self, request):
-        serializer = EnrolamientoSerializer(
-            data=request.data,
-            context={"request": request}
-        )
-
-        serializer.is_valid(raise_exception=True)
-        visita = serializer.save()
-
-        return Response(
-            EnrolamientoSerializer(visita).data,
-            status=201
-        )
-
-
-class CargaMasivaEnrolamientoView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request):
-        serializer = CargaMasivaEnrolamientoSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-
-        user = request.user
-        archivo = serializer.validated_data["archivo"]
-
-        if not archivo.name.endswith(".xlsx"):
-            return Response(
-                {"detail": "Solo se permiten archivos .xlsx"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if user.solo_enrolamiento:
-            sector = user.sector
-            instalacion = user.instalacion
-        else:
-            sector_id = serializer.validated_data.get("sector_id")
-            if not sector_id:
-                return Response(
-                    {"detail": "Debe enviar sector_id"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            try:
-                sector = Sector.objects.get(id=sector_id)
-            except Sector.DoesNotExist:
-                return Response(
-                    {"detail": "El sector enviado no existe"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-
-            instalacion = sector.instalacion
-
-        try:
-            wb = load_workbook(filename=archivo)
-            ws = wb.active
-        except Exception:
-            return Response(
-                {"detail": "No se pudo leer el archivo Excel"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Buscar encabezados dinámicamente
-        header_row_idx = None
-        header_map = {}
-
-        expected_headers = {
-            "tipo documento",
-            "rut",
-            "dni",
-            "nombre",
-            "apellido",
-            "patente",
-            "comentario",
-        }
-
-        for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
-            normalized = []
-            for cell in row:
-                if cell is None:
-                    normalized.append("")
-                else:
-                    normalized.append(str(cell).strip().lower().replace("_", " "))
-
-            row_headers = set(x for x in normalized if x)
-
-            if expected_headers.issubset(row_headers):
-                header_row_idx = row_idx
-                for col_idx, value in enumerate(normalized):
-                    if value in expected_headers:
-                        header_map[value] = col_idx
-                break
-
-        if not header_row_idx:
-            return Response(
-                {
-                    "detail": "No se encontraron los encabezados requeridos.",
-                    "encabezados_requeridos": [
-                        "TIPO DOCUMENTO",
-                        "RUT",
-                        "DNI",
-                        "NOMBRE",
-                        "APELLIDO",
-                        "PATENTE",
-                        "COMENTARIO",
-                    ]
-                },
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        total = 0
-        creados = 0
-        errores = []
-
-        for idx, row in enumerate(
-                ws.iter_rows(min_row=header_row_idx + 1, values_only=True),
-                start=header_row_idx + 1
-        ):
-            tipo_documento = str(row[header_map["tipo documento"]]).strip().upper() if row[header_map[
-                "tipo documento"]] is not None else ""
-            rut = str(row[header_map["rut"]]).strip() if row[header_map["rut"]] is not None else ""
-            dni_extranjero = str(row[header_map["dni"]]).strip() if row[header_map["dni"]] is not None else ""
-            nombre = str(row[header_map["nombre"]]).strip() if row[header_map["nombre"]] is not None else ""
-            apellido = str(row[header_map["apellido"]]).strip() if row[header_map["apellido"]] is not None else ""
-            patente = str(row[header_map["patente"]]).strip() if row[header_map["patente"]] is not None else ""
-            comentario = str(row[header_map["comentario"]]).strip() if row[header_map["comentario"]] is not None else ""
-
-            empresa = sector.nombre if sector else None
-
-            # Saltar filas completamente vacías
-            if not any([tipo_documento, rut, dni_extranjero, nombre, apellido, patente, comentario]):
-                continue
-
-            total += 1
-
-            tipo_documento_normalizado = tipo_documento.replace(" ", "").upper()
-
-            if tipo_documento_normalizado not in ["RUT", "DNI"]:
-                errores.append({
-                    "fila": idx,
-                    "error": "TIPO DOCUMENTO inválido. Use RUT o DNI"
-                })
-                continue
-
-            if not nombre:
-                errores.append({"fila": idx, "error": "NOMBRE vacío"})
-                continue
-
-            if not apellido:
-                errores.append({"fila": idx, "error": "APELLIDO vacío"})
-                continue
-
-            es_extranjero = tipo_documento_normalizado == "DNI"
-
-            if es_extranjero:
-                if not dni_extranjero:
-                    errores.append({
-                        "fila": idx,
-                        "error": "DNI vacío para registro tipo DNI"
-                    })
-                    continue
-
-                if Visita.objects.filter(
-                        dni_extranjero=dni_extranjero,
-                        es_extranjero=True
-                ).exists():
-                    errores.append({
-                        "fila": idx,
-                        "error": f"DNI duplicado: {dni_extranjero}"
-                    })
-                    continue
-
-                rut = None
-
-            else:
-                if not rut:
-                    errores.append({
-                        "fila": idx,
-                        "error": "RUT vacío para registro tipo RUT"
-                    })
-                    continue
-
-                if Visita.objects.filter(
-                        rut=rut,
-                        es_extranjero=False
-                ).exists():
-                    errores.append({
-                        "fila": idx,
-                        "error": f"RUT duplicado: {rut}"
-                    })
-                    continue
-
-                dni_extranjero = None
-
-            try:
-                Visita.objects.create(
-                    rut=rut,
-                    dni_extranjero=dni_extranjero,
-                    es_extranjero=es_extranjero,
-                    nombre=nombre,
-                    apellido=apellido,
-                    empresa=empresa,
-                    patente=patente or None,
-                    comentario=comentario or None,
-                    sector=sector,
-                    instalacion=instalacion,
-                )
-                creados += 1
-
-            except IntegrityError:
-                errores.append({
-                    "fila": idx,
-                    "error": "Error de integridad al guardar el registro"
-                })
-            except Exception as e:
-                errores.append({
-                    "fila": idx,
-                    "error": str(e)
-                })
-
-        return Response({
-            "total_filas_procesadas": total,
-            "creados": creados,
-            "errores": len(errores),
-            "detalle_errores": errores,
-            "sector_id": sector.id if sector else None,
-        }, status=status.HTTP_200_OK)
-
-
-class EnroladoDeleteView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def delete(self, request, pk):
-        user = request.user
-
-        try:
-            visita = Visita.objects.get(id=pk)
-        except Visita.DoesNotExist:
-            return Response(
-                {"detail": "Persona enrolada no encontrada"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        # cliente sectorial: solo su sector
-        if user.solo_enrolamiento:
-            if visita.sector_id != user.sector_id:
-                return Response(
-                    {"detail": "No tiene permisos para eliminar este registro"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-
-        # admin normal: solo su instalación
-        elif not es_admin_general(user):
-            if visita.instalacion_id != user.instalacion_id:
-                return Response(
-                    {"detail": "No tiene permisos para eliminar este registro"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-
-        visita.delete()
-
-        return Response(
-            {"detail": "Registro eliminado correctamente"},
-            status=status.HTTP_200_OK
-        )
-
-
-class EnroladoDeleteView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def delete(self, request, pk):
-        user = request.user
-
-        try:
-            visita = Visita.objects.get(id=pk)
-        except Visita.DoesNotExist:
-            return Response(
-                {"detail": "Persona enrolada no encontrada"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        if user.solo_enrolamiento:
-            if visita.sector_id != user.sector_id:
-                return Response(
-                    {"detail": "No tiene permisos para eliminar este registro"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-
-        elif not es_admin_general(user):
-            if visita.instalacion_id != user.instalacion_id:
-                return Response(
-                    {"detail": "No tiene permisos para eliminar este registro"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-
-        visita.delete()
-
-        return Response(
-            {"detail": "Registro eliminado correctamente"},
-            status=status.HTTP_200_OK
-        )
-
-
-class ProhibirAccesoEnroladoView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request, pk):
-        user = request.user
-
-        try:
-            visita = Visita.objects.get(id=pk)
-        except Visita.DoesNotExist:
-            return Response(
-                {"detail": "Persona enrolada no encontrada"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        if user.solo_enrolamiento:
-            if visita.sector_id != user.sector_id:
-                return Response(
-                    {"detail": "No tiene permisos para prohibir el acceso de este registro"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            instalacion = user.instalacion
-
-        elif not es_admin_general(user):
-            if visita.instalacion_id != user.instalacion_id:
-                return Response(
-                    {"detail": "No tiene permisos para prohibir el acceso de este registro"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            instalacion = user.instalacion
-
-        else:
-            instalacion = visita.instalacion
-
-        if not instalacion:
-            return Response(
-                {"detail": "No se pudo determinar la instalación para registrar la prohibición"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        prohibicion_activa = ProhibicionAcceso.objects.filter(
-            visita=visita,
-            instalacion=instalacion,
-            fecha_fin__isnull=True
-        ).exists()
-
-        if prohibicion_activa:
-            return Response(
-                {"detail": "La persona ya tiene una prohibición activa en esta instalación"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        motivo = request.data.get("motivo", "").strip() or "Prohibición registrada desde módulo de enrolamiento"
-
-        ProhibicionAcceso.objects.create(
-            visita=visita,
-            instalacion=instalacion,
-            motivo=motivo,
-            fecha_inicio=timezone.now(),
-        )
-
-        visita.estado = "prohibido"
-        visita.save(update_fields=["estado", "actualizado_en"])
-
-        return Response(
-            {"detail": "Prohibición de acceso registrada correctamente"},
-            status=status.HTTP_201_CREATED
-        )
-
-
-class DescargarPlantillaEnrolamientoView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Plantilla Enrolamiento"
-
-        headers = [
-            "TIPO DOCUMENTO",
-            "RUT",
-            "DNI",
-            "NOMBRE",
-            "APELLIDO",
-            "PATENTE",
-            "COMENTARIO",
-        ]
-
-        # Encabezados
-        for col_num, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill("solid", fgColor="0F2A24")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        # Anchos
-        widths = [20, 18, 18, 24, 24, 16, 30]
-        for i, width in enumerate(widths, start=1):
-            ws.column_dimensions[chr(64 + i)].width = width
-
-        # Dropdown TIPO DOCUMENTO
-        dv = DataValidation(type="list", formula1='"RUT,DNI"', allow_blank=False)
-        dv.prompt = "Seleccione RUT para chilenos o DNI para extranjeros"
-        dv.promptTitle = "Tipo de documento"
-        dv.error = "Solo puede seleccionar RUT o DNI"
-        dv.errorTitle = "Valor inválido"
-        ws.add_data_validation(dv)
-
-        # Aplicar dropdown y valor por defecto
-        for row in range(2, 301):
-            cell_ref = f"A{row}"
-            dv.add(cell_ref)
-            ws[cell_ref] = "RUT"
-
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        response["Content-Disposition"] = 'attachment; filename="plantilla_enrolamiento.xlsx"'
-
-        wb.save(response)
-        return response
-
-
-class HabilitarAccesoEnroladoView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request, pk):
-        user = request.user
-
-        try:
-            visita = Visita.objects.get(id=pk)
-        except Visita.DoesNotExist:
-            return Response(
-                {"detail": "Persona enrolada no encontrada"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        if user.solo_enrolamiento:
-            if visita.sector_id != user.sector_id:
-                return Response(
-                    {"detail": "No tiene permisos para habilitar este registro"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            instalacion = user.instalacion
-
-        elif not es_admin_general(user):
-            if visita.instalacion_id != user.instalacion_id:
-                return Response(
-                    {"detail": "No tiene permisos para habilitar este registro"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            instalacion = user.instalacion
-
-        else:
-            instalacion = visita.instalacion
-
-        if not instalacion:
-            return Response(
-                {"detail": "No se pudo determinar la instalación"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        prohibiciones_activas = ProhibicionAcceso.objects.filter(
-            visita=visita,
-            instalacion=instalacion,
-            fecha_fin__isnull=True
-        )
-
-        if not prohibiciones_activas.exists():
-            return Response(
-                {"detail": "La persona no tiene una prohibición activa en esta instalación"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        prohibiciones_activas.update(fecha_fin=timezone.now())
-
-        visita.estado = "activo"
-        visita.save(update_fields=["estado", "actualizado_en"])
-
-        return Response(
-            {"detail": "Restricción levantada correctamente"},
-            status=status.HTTP_200_OK
-        )
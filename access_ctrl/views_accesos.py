@@ -0,0 +1,542 @@
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import ListAPIView, UpdateAPIView
+from rest_framework.permissions import IsAuthenticated
+from datetime import timedelta, datetime, time, date
+from collections import Counter
+from .models import CON_COMENTARIO, Visita, Acceso, SesionVisita
+from .busqueda import normalizar_documento, normalizar_patente
+from .campos import CamposPedidosViewMixin, campos_pedidos, pide
+from .particiones import leer_archivo, mes_archivado, rango_mes
+from .sesiones import estadisticas_permanencia, reemparejar_sesiones, AGRUPACIONES
+from core.models import Instalacion, Sector, Empresa
+from core.mixins import LecturaReplicaMixin
+from .serializers import VisitaSimpleSerializer, AccesoListaSerializer, AccesoFullSerializer, prohibiciones_vigentes
+from .serializers_rapidos import serializar_accesos
+from .views import es_admin_general
+
+
+def _fecha_param(params, nombre, fin_de_dia=False):
+    """
+    ``YYYY-MM-DD`` o fecha-hora ISO, con la zona local si no trae. Con
+    ``fin_de_dia`` una fecha sola se toma como el inicio del día siguiente
+    (para filtrar con ``<``) y se devuelve ``(fecha_hora, True)``.
+    """
+    valor = params.get(nombre)
+    if not valor:
+        return None, False
+
+    try:
+        # parse_datetime también acepta una fecha sola (como medianoche)
+        fecha = parse_date(valor)
+        fecha_hora = parse_datetime(valor) if fecha is None else None
+    except ValueError:
+        fecha = fecha_hora = None
+    if fecha is None and fecha_hora is None:
+        raise ValidationError({nombre: "Fecha no válida (YYYY-MM-DD o fecha-hora ISO)"})
+
+    solo_fecha = fecha is not None
+    if solo_fecha:
+        fecha_hora = datetime.combine(fecha + timedelta(days=1) if fin_de_dia else fecha, time.min)
+
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora, solo_fecha
+
+
+def filtrar_accesos(queryset, params):
+    """
+    Filtros combinables de ``AccesoListView``. Cada uno tiene su índice
+    compuesto con ``fecha_hora`` (el orden del listado), así que ninguna
+    combinación recorre la tabla entera:
+
+    - ``desde`` / ``hasta``: rango de ``fecha_hora``
+    - ``sector_id``, ``guardia_id``, ``visita_id``, ``tipo``
+    - ``documento`` (RUT o DNI en cualquier formato) y ``patente``: por las
+      columnas normalizadas e indexadas de la visita
+    - ``con_comentario=1``: sólo accesos con comentario (índice parcial)
+    """
+    desde, _ = _fecha_param(params, "desde")
+    if desde:
+        queryset = queryset.filter(fecha_hora__gte=desde)
+
+    hasta, dia_completo = _fecha_param(params, "hasta", fin_de_dia=True)
+    if hasta:
+        queryset = queryset.filter(**{"fecha_hora__lt" if dia_completo else "fecha_hora__lte": hasta})
+
+    for campo in ("sector_id", "guardia_id", "visita_id"):
+        valor = params.get(campo)
+        if valor:
+            if not valor.isdigit():
+                raise ValidationError({campo: "Debe ser un id numérico"})
+            queryset = queryset.filter(**{campo: valor})
+
+    tipo = params.get("tipo")
+    if tipo in ["ingreso", "salida"]:
+        queryset = queryset.filter(tipo=tipo)
+
+    documento = normalizar_documento(params.get("documento"))
+    if documento:
+        queryset = queryset.filter(
+            visita_id__in=Visita.objects.filter(documento_normalizado=documento).values("id")
+        )
+
+    patente = normalizar_patente(params.get("patente"))
+    if patente:
+        queryset = queryset.filter(
+            visita_id__in=Visita.objects.filter(patente_normalizada=patente).values("id")
+        )
+
+    if params.get("con_comentario") in ("1", "true"):
+        queryset = queryset.filter(CON_COMENTARIO)
+
+    return queryset
+
+
+class ListadoAccesosRapidoMixin(CamposPedidosViewMixin):
+    """
+    ``list()`` con ``serializar_accesos`` (``.values()`` + plan precalculado)
+    en vez de ``AccesoListaSerializer``: misma salida, sin armar instancias.
+    ``serializer_class`` queda para el esquema OpenAPI. Acepta ``?fields=`` y
+    ``?expand=visita`` (campos.py).
+    """
+
+    def list(self, request, *args, **kwargs):
+        return Response(serializar_accesos(self.filter_queryset(self.get_queryset()), request, self.campos))
+
+
+class AccesoListView(ListadoAccesosRapidoMixin, LecturaReplicaMixin, ListAPIView):
+    serializer_class = AccesoListaSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Acceso.objects.select_related(
+            "visita",
+            "instalacion",
+            "sector",
+            "empresa",
+            "guardia",
+        ).prefetch_related(prohibiciones_vigentes("visita__prohibiciones"))
+
+        instalacion_id = self.request.query_params.get("instalacion_id")
+        empresa_id = self.request.query_params.get("empresa_id")
+
+        if es_admin_general(user):
+            if empresa_id:
+                queryset = queryset.filter(empresa_id=empresa_id)
+            if instalacion_id:
+                queryset = queryset.filter(instalacion_id=instalacion_id)
+
+        elif user.role == "admin":
+            queryset = queryset.filter(empresa_id=user.empresa_id)
+            if instalacion_id:
+                queryset = queryset.filter(instalacion_id=instalacion_id)
+
+        elif user.role == "guardia":
+            queryset = queryset.filter(
+                empresa_id=user.empresa_id,
+                instalacion_id=user.instalacion_id
+            )
+
+        else:
+            return Acceso.objects.none()
+
+        queryset = filtrar_accesos(queryset, self.request.query_params)
+
+        return queryset.order_by("-fecha_hora")
+
+
+class AccesosUltimas24View(CamposPedidosViewMixin, LecturaReplicaMixin, ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = AccesoListaSerializer
+
+    def get_queryset(self):
+        user = self.request.user
+        now = timezone.localtime()
+        start = now - timedelta(hours=24)
+
+        qs = Acceso.objects.select_related(
+            "visita",
+            "instalacion",
+            "sector",
+            "empresa",
+            "guardia"
+        ).prefetch_related(
+            prohibiciones_vigentes("visita__prohibiciones")
+        ).filter(
+            fecha_hora__gte=start
+        )
+
+        empresa_id = self.request.query_params.get("empresa_id")
+        instalacion_id = self.request.query_params.get("instalacion_id")
+
+        if es_admin_general(user):
+            if empresa_id:
+                qs = qs.filter(empresa_id=empresa_id)
+            if instalacion_id:
+                qs = qs.filter(instalacion_id=instalacion_id)
+
+        elif user.role == "admin":
+            qs = qs.filter(empresa_id=user.empresa_id)
+            if instalacion_id:
+                qs = qs.filter(instalacion_id=instalacion_id)
+
+        elif user.role == "guardia":
+            qs = qs.filter(
+                empresa_id=user.empresa_id,
+                instalacion_id=user.instalacion_id
+            )
+
+        else:
+            qs = qs.none()
+
+        return qs.order_by("-fecha_hora")
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        results = serializar_accesos(queryset, request, self.campos)
+
+        total = queryset.count()
+        total_ingresos = queryset.filter(tipo="ingreso").count()
+        total_salidas = queryset.filter(tipo="salida").count()
+
+        return Response({
+            "ok": True,
+            "total": total,
+            "total_ingresos": total_ingresos,
+            "total_salidas": total_salidas,
+            "results": results
+        })
+
+
+class AccesosDiaEnCursoView(ListadoAccesosRapidoMixin, LecturaReplicaMixin, ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = AccesoListaSerializer
+
+    def get_queryset(self):
+        user = self.request.user
+        now = timezone.localtime()
+
+        start = timezone.make_aware(
+            datetime.combine(now.date(), time(6, 0)),
+            timezone.get_current_timezone()
+        )
+        next_midnight = timezone.make_aware(
+            datetime.combine(now.date() + timedelta(days=1), time(0, 0)),
+            timezone.get_current_timezone()
+        )
+
+        qs = Acceso.objects.select_related(
+            "visita", "instalacion", "sector", "empresa", "guardia"
+        ).prefetch_related(
+            prohibiciones_vigentes("visita__prohibiciones")
+        ).filter(
+            fecha_hora__gte=start,
+            fecha_hora__lt=next_midnight
+        )
+
+        empresa_id = self.request.query_params.get("empresa_id")
+        instalacion_id = self.request.query_params.get("instalacion_id")
+
+        if es_admin_general(user):
+            if empresa_id:
+                qs = qs.filter(empresa_id=empresa_id)
+            if instalacion_id:
+                qs = qs.filter(instalacion_id=instalacion_id)
+
+        elif user.role == "admin":
+            qs = qs.filter(empresa_id=user.empresa_id)
+            if instalacion_id:
+                qs = qs.filter(instalacion_id=instalacion_id)
+
+        elif user.role == "guardia":
+            qs = qs.filter(
+                empresa_id=user.empresa_id,
+                instalacion_id=user.instalacion_id
+            )
+
+        else:
+            qs = qs.none()
+
+        return qs.order_by("-fecha_hora")
+
+class AccesosPorMesView(LecturaReplicaMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        year = int(request.query_params.get("year", timezone.localtime().year))
+        month = int(request.query_params.get("month", timezone.localtime().month))
+
+        empresa_id = request.query_params.get("empresa_id")
+        instalacion_id = request.query_params.get("instalacion_id")
+
+        admin_general = es_admin_general(user)
+        if not admin_general:
+            empresa_id = user.empresa_id
+
+        include_detail = request.query_params.get("detail") == "1"
+        campos = campos_pedidos(request.query_params, AccesoListaSerializer) if include_detail else None
+        data = {
+            "year": year,
+            "month": month,
+            "empresa_id": empresa_id,
+            "instalacion_id": instalacion_id,
+        }
+
+        # 🧊 meses fuera de la retención se leen desde el archivo en disco
+        if mes_archivado(year, month):
+            data.update(self._desde_archivo(
+                year, month, admin_general, empresa_id, instalacion_id, include_detail, campos
+            ))
+            return Response({"ok": True, "data": data}, status=200)
+
+        # rango explícito: permite descartar particiones y usar los índices por fecha
+        desde, hasta = rango_mes(year, month)
+        base = Acceso.objects.filter(fecha_hora__gte=desde, fecha_hora__lt=hasta)
+
+        if empresa_id or not admin_general:
+            base = base.filter(empresa_id=empresa_id)
+        if instalacion_id:
+            base = base.filter(instalacion_id=instalacion_id)
+
+        diario = (
+            base.annotate(dia=TruncDay("fecha_hora"))
+            .values("dia", "tipo")
+            .annotate(total=Count("id"))
+            .order_by("dia", "tipo")
+        )
+        data["resumen_diario"] = list(diario)
+
+        if include_detail:
+            data["accesos"] = serializar_accesos(base.order_by("-fecha_hora"), request, campos)
+
+        return Response({"ok": True, "data": data}, status=200)
+
+    def _desde_archivo(self, year, month, admin_general, empresa_id, instalacion_id, include_detail, campos=None):
+        filas = [
+            f for f in leer_archivo(year, month)
+            if ((admin_general and not empresa_id) or str(f["empresa_id"]) == str(empresa_id))
+            and (not instalacion_id or str(f["instalacion_id"]) == str(instalacion_id))
+        ]
+
+        conteo = Counter(
+            (timezone.localtime(f["fecha_hora"]).replace(hour=0, minute=0, second=0, microsecond=0), f["tipo"])
+            for f in filas
+        )
+        data = {
+            "archivado": True,
+            "resumen_diario": [
+                {"dia": dia, "tipo": tipo, "total": total}
+                for (dia, tipo), total in sorted(conteo.items())
+            ],
+        }
+
+        if include_detail:
+            filas.sort(key=lambda f: f["fecha_hora"], reverse=True)
+            data["accesos"] = AccesoListaSerializer(
+                _accesos_desde_filas(filas, con_motivo=pide(campos, "visita.motivo_prohibicion")),
+                many=True, context={"request": self.request}, campos=campos,
+            ).data
+
+        return data
+
+
+def _accesos_desde_filas(filas, con_motivo=True):
+    """
+    Arma instancias de Acceso (sin guardar) desde filas archivadas, con sus
+    relaciones cargadas en bloque para poder usar AccesoSerializer.
+    """
+    campos = {f.attname for f in Acceso._meta.concrete_fields}
+    accesos = [Acceso(**{k: v for k, v in f.items() if k in campos}) for f in filas]
+
+    visitas = Visita.objects.all()
+    if con_motivo:
+        visitas = visitas.prefetch_related(prohibiciones_vigentes())
+    visitas = visitas.in_bulk({a.visita_id for a in accesos})
+    sectores = Sector.objects.in_bulk({a.sector_id for a in accesos})
+    instalaciones = Instalacion.objects.in_bulk({a.instalacion_id for a in accesos})
+    empresas = Empresa.objects.in_bulk({a.empresa_id for a in accesos})
+
+    for a in accesos:
+        a.visita = visitas.get(a.visita_id)
+        a.sector = sectores.get(a.sector_id)
+        a.instalacion = instalaciones.get(a.instalacion_id)
+        a.empresa = empresas.get(a.empresa_id)
+
+    return accesos
+
+
+def _sesiones_visibles(request):
+    user = request.user
+    qs = SesionVisita.objects.all()
+
+    empresa_id = request.query_params.get("empresa_id")
+    instalacion_id = request.query_params.get("instalacion_id")
+    sector_id = request.query_params.get("sector_id")
+
+    if es_admin_general(user):
+        if empresa_id:
+            qs = qs.filter(empresa_id=empresa_id)
+        if instalacion_id:
+            qs = qs.filter(instalacion_id=instalacion_id)
+
+    elif user.role == "admin":
+        qs = qs.filter(empresa_id=user.empresa_id)
+        if instalacion_id:
+            qs = qs.filter(instalacion_id=instalacion_id)
+
+    elif user.role == "guardia":
+        qs = qs.filter(empresa_id=user.empresa_id, instalacion_id=user.instalacion_id)
+
+    else:
+        return SesionVisita.objects.none()
+
+    if sector_id:
+        qs = qs.filter(sector_id=sector_id)
+
+    return qs
+
+
+class PermanenciaResumenView(LecturaReplicaMixin, APIView):
+    """
+    Promedio y percentiles (p50, p90, p95) de permanencia en segundos,
+    agrupados por sector, instalación o día, para un rango de fechas de ingreso.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        agrupar = request.query_params.get("agrupar", "sector")
+        if agrupar not in AGRUPACIONES:
+            return Response(
+                {"ok": False, "error": "agrupar_invalido", "opciones": list(AGRUPACIONES)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        hoy = timezone.localdate()
+        try:
+            desde = date.fromisoformat(request.query_params.get("desde") or str(hoy - timedelta(days=30)))
+            hasta = date.fromisoformat(request.query_params.get("hasta") or str(hoy))
+        except ValueError:
+            return Response(
+                {"ok": False, "error": "fecha_invalida"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        tz = timezone.get_current_timezone()
+        qs = _sesiones_visibles(request).filter(
+            fecha_ingreso__gte=timezone.make_aware(datetime.combine(desde, time(0, 0)), tz),
+            fecha_ingreso__lt=timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time(0, 0)), tz),
+        )
+
+        return Response({
+            "ok": True,
+            "desde": desde,
+            "hasta": hasta,
+            "agrupar": agrupar,
+            "results": estadisticas_permanencia(qs, agrupar),
+        })
+
+
+class PermanenciasExcedidasView(LecturaReplicaMixin, APIView):
+    """
+    Visitas que siguen adentro hace más de ``horas`` (por defecto 8).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            horas = float(request.query_params.get("horas", 8))
+        except ValueError:
+            return Response(
+                {"ok": False, "error": "horas_invalidas"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        now = timezone.now()
+        sesiones = (
+            _sesiones_visibles(request)
+            .filter(fecha_salida__isnull=True, fecha_ingreso__lt=now - timedelta(hours=horas))
+            .select_related("visita", "sector", "instalacion")
+            .order_by("fecha_ingreso")
+        )
+
+        return Response({
+            "ok": True,
+            "horas": horas,
+            "total": len(sesiones),
+            "results": [
+                {
+                    "sesion_id": s.id,
+                    "visita": VisitaSimpleSerializer(s.visita).data,
+                    "instalacion_id": s.instalacion_id,
+                    "instalacion_nombre": s.instalacion.nombre,
+                    "sector_id": s.sector_id,
+                    "sector_nombre": s.sector.nombre,
+                    "fecha_ingreso": timezone.localtime(s.fecha_ingreso),
+                    "segundos_adentro": int((now - s.fecha_ingreso).total_seconds()),
+                }
+                for s in sesiones
+            ],
+        })
+
+
+class AccesoUpdateAdminView(UpdateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = AccesoFullSerializer
+    queryset = Acceso.objects.all()
+
+    # campos que copian o de los que dependen las sesiones de visita
+    CAMPOS_SESION = ("visita_id", "instalacion_id", "sector_id", "empresa_id", "tipo", "fecha_hora")
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        user = self.request.user
+
+        if es_admin_general(user):
+            return qs
+
+        if user.is_admin():
+            return qs.filter(empresa_id=user.empresa_id)
+
+        return qs.none()
+
+    def patch(self, request, *args, **kwargs):
+        user = request.user
+
+        if not user.is_admin() and not es_admin_general(user):
+            return Response(
+                {"ok": False, "error": "No tiene permisos para editar accesos"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        return self.partial_update(request, *args, **kwargs)
+
+    def put(self, request, *args, **kwargs):
+        user = request.user
+
+        if not user.is_admin() and not es_admin_general(user):
+            return Response(
+                {"ok": False, "error": "No tiene permisos para editar accesos"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        return self.update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        antes = {campo: getattr(serializer.instance, campo) for campo in self.CAMPOS_SESION}
+        with transaction.atomic():
+            acceso = serializer.save()
+            if any(getattr(acceso, campo) != valor for campo, valor in antes.items()):
+                # el acceso editado puede abrir, cerrar o mover sesiones de la visita anterior y de la nueva
+                reemparejar_sesiones(
+                    {antes["visita_id"], acceso.visita_id}, {antes["instalacion_id"], acceso.instalacion_id},
+                )
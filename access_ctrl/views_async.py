@@ -0,0 +1,175 @@
+"""
+Consultas de portería en versión async (ORM async de Django), para el
+despliegue ASGI (ver config/asgi.py): buscar visita por RUT/DNI, último
+acceso por RUT, decisión de portería y sectores disponibles.
+
+Responden lo mismo que las vistas DRF de ``views.py``, que siguen
+disponibles; ``GATE_VISTAS_ASYNC`` decide cuáles se enrutan. Mientras una
+petición espera la base, el worker ASGI sigue atendiendo otras en vez de
+quedar bloqueado como un worker sync de gunicorn.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from config.renderers import renderer_para
+from core.models import Sector
+from .models import Acceso
+from .serializers import AccesoSerializer, VisitaSerializer, prohibiciones_vigentes
+from .views import _consulta_decision, _decision, _prohibiciones_activas, _visitas_por_documento
+
+
+def _respuesta(request, data, status_code=status.HTTP_200_OK):
+    # mismo render y misma negociación por Accept que las vistas DRF
+    renderer = renderer_para(request)
+    return HttpResponse(renderer.render(data), status=status_code, content_type=renderer.media_type)
+
+
+def _autenticar(request):
+    """Usuario del JWT del header, o la respuesta 401 que daría DRF."""
+    auth = JWTAuthentication()
+    try:
+        resultado = auth.authenticate(request)
+        if resultado is None:
+            raise NotAuthenticated()
+    except AuthenticationFailed as exc:
+        data = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+    except NotAuthenticated as exc:
+        data = {"detail": exc.detail}
+    else:
+        # para el log de InstrumentacionMiddleware, igual que con DRF
+        request.user = resultado[0]
+        return resultado[0], None
+
+    response = _respuesta(request, data, status.HTTP_401_UNAUTHORIZED)
+    response["WWW-Authenticate"] = auth.authenticate_header(request)
+    return None, response
+
+
+async def _buscar_por_documento(request, documento, extranjero):
+    user, error = await sync_to_async(_autenticar)(request)
+    if error:
+        return error
+
+    if not user.instalacion_id:
+        return _respuesta(
+            request, {"ok": False, "mensaje": "Usuario sin instalación asociada"},
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    visita = await _visitas_por_documento(documento, extranjero).prefetch_related(
+        prohibiciones_vigentes()
+    ).afirst()
+
+    if not visita:
+        return _respuesta(
+            request, {"ok": False, "mensaje": f"No se encontró un visitante con ese {'DNI' if extranjero else 'RUT'}"},
+            status.HTTP_404_NOT_FOUND
+        )
+
+    if await _prohibiciones_activas(visita, user.instalacion_id).aexists():
+        return _respuesta(
+            request, {"ok": False, "mensaje": "Acceso prohibido", "visita": VisitaSerializer(visita).data},
+            status.HTTP_403_FORBIDDEN
+        )
+
+    return _respuesta(request, {"ok": True, "mensaje": "Visita encontrada", "visita": VisitaSerializer(visita).data})
+
+
+async def buscar_por_rut(request, rut):
+    return await _buscar_por_documento(request, rut, extranjero=False)
+
+
+async def buscar_por_dni(request, dni):
+    return await _buscar_por_documento(request, dni, extranjero=True)
+
+
+async def buscar_ultimo_acceso_por_rut(request, rut):
+    """Ver ``views.buscar_ultimo_acceso_por_rut``."""
+    user, error = await sync_to_async(_autenticar)(request)
+    if error:
+        return error
+
+    visita = await _visitas_por_documento(rut, extranjero=False).afirst()
+    if not visita:
+        return _respuesta(
+            request, {"ok": False, "mensaje": "No existe una visita registrada con ese RUT."},
+            status.HTTP_404_NOT_FOUND
+        )
+
+    accesos = Acceso.objects.filter(visita=visita)
+    if user.instalacion_id:
+        accesos = accesos.filter(instalacion_id=user.instalacion_id)
+
+    # todo lo que serializa AccesoSerializer en una sola ida a la base (más el prefetch)
+    ultimo = await accesos.select_related(
+        "visita", "sector", "instalacion", "empresa"
+    ).prefetch_related(
+        prohibiciones_vigentes("visita__prohibiciones")
+    ).order_by("-fecha_hora").afirst()
+
+    if not ultimo:
+        return _respuesta(
+            request, {"ok": False, "mensaje": "No hay registros de accesos para esta visita."},
+            status.HTTP_404_NOT_FOUND
+        )
+
+    requiere_doc = ultimo.sector.requiere_guia if hasattr(ultimo.sector, "requiere_guia") else False
+    sector_info = {
+        "id": ultimo.sector.id,
+        "nombre": ultimo.sector.nombre,
+        "requiere_documentacion": requiere_doc
+    }
+
+    if ultimo.tipo == "salida":
+        return _respuesta(
+            request, {
+                "ok": False,
+                "mensaje": "La visita no tiene un ingreso abierto.",
+                "ultimo_acceso": AccesoSerializer(ultimo).data,
+                "sector": sector_info
+            },
+            status.HTTP_409_CONFLICT
+        )
+
+    return _respuesta(request, {
+        "ok": True,
+        "mensaje": "Ingreso encontrado. Puede registrar salida.",
+        "ultimo_acceso": AccesoSerializer(ultimo).data,
+        "sector": sector_info
+    })
+
+
+async def decision_porteria(request, documento):
+    """Ver ``views.DecisionPorteriaView``."""
+    user, error = await sync_to_async(_autenticar)(request)
+    if error:
+        return error
+
+    if not user.instalacion_id:
+        return _respuesta(
+            request, {"ok": False, "mensaje": "Usuario sin instalación asociada"},
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    extranjero = request.GET.get("extranjero") not in (None, "", "0")
+    visita = await _consulta_decision(documento, extranjero, user.instalacion_id).afirst()
+    return _respuesta(request, _decision(visita, user.instalacion_id))
+
+
+async def sectores_disponibles(request):
+    """Ver ``views.SectoresDisponiblesView``."""
+    user, error = await sync_to_async(_autenticar)(request)
+    if error:
+        return error
+
+    if user.solo_enrolamiento:
+        sectores = Sector.objects.filter(id=user.sector_id)
+    elif user.instalacion_id:
+        sectores = Sector.objects.filter(instalacion_id=user.instalacion_id)
+    else:
+        sectores = Sector.objects.all()
+
+    return _respuesta(request, [s async for s in sectores.values("id", "nombre")])
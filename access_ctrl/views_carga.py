@@ -0,0 +1,350 @@
+"""
+Cargas masivas y plantilla Excel. openpyxl se importa dentro de cada vista:
+cuesta ~70 ms y varios MB por worker y sólo lo usan estos endpoints.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.http import HttpResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from .models import Visita
+from .feed import publicar_acceso
+from .sesiones import abrir_sesion
+from core.models import Sector
+from .serializers import AccesoSerializer, CargaMasivaEnrolamientoSerializer
+
+
+class CargaMasivaAccesosView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        data = request.data
+        if not isinstance(data, list):
+            return Response({"error": "Debe enviar una lista de accesos"}, status=400)
+
+        creados = 0
+        errores = []
+        user = request.user
+
+        for acceso_data in data:
+            try:
+                rut = acceso_data.get("rut")
+                nombre = acceso_data.get("nombre") or "Sin nombre"
+
+                visita, creada = Visita.objects.get_or_create(
+                    rut=rut,
+                    defaults={
+                        "dni_extranjero": acceso_data.get("dni_extranjero", ""),
+                        "es_extranjero": acceso_data.get("es_extranjero", False),
+                        "nombre": nombre,
+                        "apellido": acceso_data.get("apellido", ""),
+                        "empresa": acceso_data.get("empresa", ""),
+                        "patente": acceso_data.get("patente", ""),
+                    },
+                )
+
+                if not visita.nombre:
+                    visita.nombre = nombre
+                    visita.save()
+
+                serializer = AccesoSerializer(data={
+                    "visita": visita.id,
+                    "instalacion": acceso_data.get("instalacion_id"),
+                    "sector": acceso_data.get("sector_id"),
+                    "tipo": "ingreso",
+                    "fecha_hora": timezone.now(),
+                    "comentario": acceso_data.get("comentario", ""),
+                    "empresa": user.empresa_id,
+                    "guardia": user.id
+                })
+
+                if serializer.is_valid():
+                    with transaction.atomic():
+                        acceso = serializer.save()
+                        abrir_sesion(acceso)
+                        publicar_acceso(acceso)
+                    creados += 1
+                else:
+                    errores.append(serializer.errors)
+
+            except Exception as e:
+                errores.append(str(e))
+
+        return Response(
+            {"ok": True, "total_creados": creados, "errores": errores[:10]},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class CargaMasivaEnrolamientoView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        from openpyxl import load_workbook
+
+        serializer = CargaMasivaEnrolamientoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user = request.user
+        archivo = serializer.validated_data["archivo"]
+
+        if not archivo.name.endswith(".xlsx"):
+            return Response(
+                {"detail": "Solo se permiten archivos .xlsx"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if user.solo_enrolamiento:
+            sector = user.sector
+            instalacion = user.instalacion
+        else:
+            sector_id = serializer.validated_data.get("sector_id")
+            if not sector_id:
+                return Response(
+                    {"detail": "Debe enviar sector_id"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                sector = Sector.objects.get(id=sector_id)
+            except Sector.DoesNotExist:
+                return Response(
+                    {"detail": "El sector enviado no existe"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            instalacion = sector.instalacion
+
+        try:
+            wb = load_workbook(filename=archivo)
+            ws = wb.active
+        except Exception:
+            return Response(
+                {"detail": "No se pudo leer el archivo Excel"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Buscar encabezados dinámicamente
+        header_row_idx = None
+        header_map = {}
+
+        expected_headers = {
+            "tipo documento",
+            "rut",
+            "dni",
+            "nombre",
+            "apellido",
+            "patente",
+            "comentario",
+        }
+
+        for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
+            normalized = []
+            for cell in row:
+                if cell is None:
+                    normalized.append("")
+                else:
+                    normalized.append(str(cell).strip().lower().replace("_", " "))
+
+            row_headers = set(x for x in normalized if x)
+
+            if expected_headers.issubset(row_headers):
+                header_row_idx = row_idx
+                for col_idx, value in enumerate(normalized):
+                    if value in expected_headers:
+                        header_map[value] = col_idx
+                break
+
+        if not header_row_idx:
+            return Response(
+                {
+                    "detail": "No se encontraron los encabezados requeridos.",
+                    "encabezados_requeridos": [
+                        "TIPO DOCUMENTO",
+                        "RUT",
+                        "DNI",
+                        "NOMBRE",
+                        "APELLIDO",
+                        "PATENTE",
+                        "COMENTARIO",
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        total = 0
+        creados = 0
+        errores = []
+
+        for idx, row in enumerate(
+                ws.iter_rows(min_row=header_row_idx + 1, values_only=True),
+                start=header_row_idx + 1
+        ):
+            tipo_documento = str(row[header_map["tipo documento"]]).strip().upper() if row[header_map[
+                "tipo documento"]] is not None else ""
+            rut = str(row[header_map["rut"]]).strip() if row[header_map["rut"]] is not None else ""
+            dni_extranjero = str(row[header_map["dni"]]).strip() if row[header_map["dni"]] is not None else ""
+            nombre = str(row[header_map["nombre"]]).strip() if row[header_map["nombre"]] is not None else ""
+            apellido = str(row[header_map["apellido"]]).strip() if row[header_map["apellido"]] is not None else ""
+            patente = str(row[header_map["patente"]]).strip() if row[header_map["patente"]] is not None else ""
+            comentario = str(row[header_map["comentario"]]).strip() if row[header_map["comentario"]] is not None else ""
+
+            empresa = sector.nombre if sector else None
+
+            # Saltar filas completamente vacías
+            if not any([tipo_documento, rut, dni_extranjero, nombre, apellido, patente, comentario]):
+                continue
+
+            total += 1
+
+            tipo_documento_normalizado = tipo_documento.replace(" ", "").upper()
+
+            if tipo_documento_normalizado not in ["RUT", "DNI"]:
+                errores.append({
+                    "fila": idx,
+                    "error": "TIPO DOCUMENTO inválido. Use RUT o DNI"
+                })
+                continue
+
+            if not nombre:
+                errores.append({"fila": idx, "error": "NOMBRE vacío"})
+                continue
+
+            if not apellido:
+                errores.append({"fila": idx, "error": "APELLIDO vacío"})
+                continue
+
+            es_extranjero = tipo_documento_normalizado == "DNI"
+
+            if es_extranjero:
+                if not dni_extranjero:
+                    errores.append({
+                        "fila": idx,
+                        "error": "DNI vacío para registro tipo DNI"
+                    })
+                    continue
+
+                if Visita.objects.filter(
+                        dni_extranjero=dni_extranjero,
+                        es_extranjero=True
+                ).exists():
+                    errores.append({
+                        "fila": idx,
+                        "error": f"DNI duplicado: {dni_extranjero}"
+                    })
+                    continue
+
+                rut = None
+
+            else:
+                if not rut:
+                    errores.append({
+                        "fila": idx,
+                        "error": "RUT vacío para registro tipo RUT"
+                    })
+                    continue
+
+                if Visita.objects.filter(
+                        rut=rut,
+                        es_extranjero=False
+                ).exists():
+                    errores.append({
+                        "fila": idx,
+                        "error": f"RUT duplicado: {rut}"
+                    })
+                    continue
+
+                dni_extranjero = None
+
+            try:
+                Visita.objects.create(
+                    rut=rut,
+                    dni_extranjero=dni_extranjero,
+                    es_extranjero=es_extranjero,
+                    nombre=nombre,
+                    apellido=apellido,
+                    empresa=empresa,
+                    patente=patente or None,
+                    comentario=comentario or None,
+                    sector=sector,
+                    instalacion=instalacion,
+                )
+                creados += 1
+
+            except IntegrityError:
+                errores.append({
+                    "fila": idx,
+                    "error": "Error de integridad al guardar el registro"
+                })
+            except Exception as e:
+                errores.append({
+                    "fila": idx,
+                    "error": str(e)
+                })
+
+        return Response({
+            "total_filas_procesadas": total,
+            "creados": creados,
+            "errores": len(errores),
+            "detalle_errores": errores,
+            "sector_id": sector.id if sector else None,
+        }, status=status.HTTP_200_OK)
+
+
+class DescargarPlantillaEnrolamientoView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Font, PatternFill
+        from openpyxl.worksheet.datavalidation import DataValidation
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Plantilla Enrolamiento"
+
+        headers = [
+            "TIPO DOCUMENTO",
+            "RUT",
+            "DNI",
+            "NOMBRE",
+            "APELLIDO",
+            "PATENTE",
+            "COMENTARIO",
+        ]
+
+        # Encabezados
+        for col_num, header in enumerate(headers, start=1):
+            cell = ws.cell(row=1, column=col_num, value=header)
+            cell.font = Font(bold=True, color="FFFFFF")
+            cell.fill = PatternFill("solid", fgColor="0F2A24")
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+
+        # Anchos
+        widths = [20, 18, 18, 24, 24, 16, 30]
+        for i, width in enumerate(widths, start=1):
+            ws.column_dimensions[chr(64 + i)].width = width
+
+        # Dropdown TIPO DOCUMENTO
+        dv = DataValidation(type="list", formula1='"RUT,DNI"', allow_blank=False)
+        dv.prompt = "Seleccione RUT para chilenos o DNI para extranjeros"
+        dv.promptTitle = "Tipo de documento"
+        dv.error = "Solo puede seleccionar RUT o DNI"
+        dv.errorTitle = "Valor inválido"
+        ws.add_data_validation(dv)
+
+        # Aplicar dropdown y valor por defecto
+        for row in range(2, 301):
+            cell_ref = f"A{row}"
+            dv.add(cell_ref)
+            ws[cell_ref] = "RUT"
+
+        response = HttpResponse(
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+        response["Content-Disposition"] = 'attachment; filename="plantilla_enrolamiento.xlsx"'
+
+        wb.save(response)
+        return response
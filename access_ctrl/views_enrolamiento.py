@@ -0,0 +1,282 @@
+from django.utils import timezone
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from .models import Visita, ProhibicionAcceso
+from core.mixins import LecturaReplicaMixin
+from core.models import Sector
+from .serializers import EnrolamientoSerializer, prohibiciones_vigentes
+from .prohibiciones import invalidar as invalidar_prohibiciones
+from .views import es_admin_general
+
+
+class SectoresDisponiblesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+
+        # 🔥 usuario sectorial → solo su sector
+        if user.solo_enrolamiento:
+            sectores = Sector.objects.filter(id=user.sector_id)
+
+        # 🔥 admin → sectores de su instalación
+        elif user.instalacion_id:
+            sectores = Sector.objects.filter(instalacion_id=user.instalacion_id)
+
+        else:
+            # superadmin
+            sectores = Sector.objects.all()
+
+        data = [
+            {
+                "id": s.id,
+                "nombre": s.nombre
+            }
+            for s in sectores
+        ]
+
+        return Response(data)
+
+
+class EnroladosListCreateView(LecturaReplicaMixin, APIView):
+    """El GET es el listado completo que el front exporta: se lee de la réplica."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+
+        # 🔥 cliente_sector → solo su sector
+        if user.solo_enrolamiento:
+            visitas = Visita.objects.filter(sector=user.sector)
+
+        # 🔥 admin → por instalación
+        elif user.instalacion_id:
+            visitas = Visita.objects.filter(instalacion_id=user.instalacion_id)
+
+        else:
+            visitas = Visita.objects.all()
+
+        serializer = EnrolamientoSerializer(visitas.prefetch_related(prohibiciones_vigentes()), many=True)
+        return Response(serializer.data)
+
+    def post(self, request):
+        serializer = EnrolamientoSerializer(
+            data=request.data,
+            context={"request": request}
+        )
+
+        serializer.is_valid(raise_exception=True)
+        visita = serializer.save()
+
+        return Response(
+            EnrolamientoSerializer(visita).data,
+            status=201
+        )
+
+
+class EnroladoDeleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, pk):
+        user = request.user
+
+        try:
+            visita = Visita.objects.get(id=pk)
+        except Visita.DoesNotExist:
+            return Response(
+                {"detail": "Persona enrolada no encontrada"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # cliente sectorial: solo su sector
+        if user.solo_enrolamiento:
+            if visita.sector_id != user.sector_id:
+                return Response(
+                    {"detail": "No tiene permisos para eliminar este registro"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+        # admin normal: solo su instalación
+        elif not es_admin_general(user):
+            if visita.instalacion_id != user.instalacion_id:
+                return Response(
+                    {"detail": "No tiene permisos para eliminar este registro"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+        visita.delete()
+
+        return Response(
+            {"detail": "Registro eliminado correctamente"},
+            status=status.HTTP_200_OK
+        )
+
+
+class EnroladoDeleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, pk):
+        user = request.user
+
+        try:
+            visita = Visita.objects.get(id=pk)
+        except Visita.DoesNotExist:
+            return Response(
+                {"detail": "Persona enrolada no encontrada"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if user.solo_enrolamiento:
+            if visita.sector_id != user.sector_id:
+                return Response(
+                    {"detail": "No tiene permisos para eliminar este registro"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+        elif not es_admin_general(user):
+            if visita.instalacion_id != user.instalacion_id:
+                return Response(
+                    {"detail": "No tiene permisos para eliminar este registro"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+        visita.delete()
+
+        return Response(
+            {"detail": "Registro eliminado correctamente"},
+            status=status.HTTP_200_OK
+        )
+
+
+class ProhibirAccesoEnroladoView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        user = request.user
+
+        try:
+            visita = Visita.objects.get(id=pk)
+        except Visita.DoesNotExist:
+            return Response(
+                {"detail": "Persona enrolada no encontrada"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if user.solo_enrolamiento:
+            if visita.sector_id != user.sector_id:
+                return Response(
+                    {"detail": "No tiene permisos para prohibir el acceso de este registro"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            instalacion = user.instalacion
+
+        elif not es_admin_general(user):
+            if visita.instalacion_id != user.instalacion_id:
+                return Response(
+                    {"detail": "No tiene permisos para prohibir el acceso de este registro"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            instalacion = user.instalacion
+
+        else:
+            instalacion = visita.instalacion
+
+        if not instalacion:
+            return Response(
+                {"detail": "No se pudo determinar la instalación para registrar la prohibición"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        prohibicion_activa = ProhibicionAcceso.objects.filter(
+            visita=visita,
+            instalacion=instalacion,
+            fecha_fin__isnull=True
+        ).exists()
+
+        if prohibicion_activa:
+            return Response(
+                {"detail": "La persona ya tiene una prohibición activa en esta instalación"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        motivo = request.data.get("motivo", "").strip() or "Prohibición registrada desde módulo de enrolamiento"
+
+        ProhibicionAcceso.objects.create(
+            visita=visita,
+            instalacion=instalacion,
+            motivo=motivo,
+            fecha_inicio=timezone.now(),
+        )
+
+        visita.estado = "prohibido"
+        visita.save(update_fields=["estado", "actualizado_en"])
+
+        return Response(
+            {"detail": "Prohibición de acceso registrada correctamente"},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class HabilitarAccesoEnroladoView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        user = request.user
+
+        try:
+            visita = Visita.objects.get(id=pk)
+        except Visita.DoesNotExist:
+            return Response(
+                {"detail": "Persona enrolada no encontrada"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if user.solo_enrolamiento:
+            if visita.sector_id != user.sector_id:
+                return Response(
+                    {"detail": "No tiene permisos para habilitar este registro"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            instalacion = user.instalacion
+
+        elif not es_admin_general(user):
+            if visita.instalacion_id != user.instalacion_id:
+                return Response(
+                    {"detail": "No tiene permisos para habilitar este registro"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            instalacion = user.instalacion
+
+        else:
+            instalacion = visita.instalacion
+
+        if not instalacion:
+            return Response(
+                {"detail": "No se pudo determinar la instalación"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        prohibiciones_activas = ProhibicionAcceso.objects.filter(
+            visita=visita,
+            instalacion=instalacion,
+            fecha_fin__isnull=True
+        )
+
+        if not prohibiciones_activas.exists():
+            return Response(
+                {"detail": "La persona no tiene una prohibición activa en esta instalación"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        prohibiciones_activas.update(fecha_fin=timezone.now())
+        invalidar_prohibiciones()
+
+        visita.estado = "activo"
+        visita.save(update_fields=["estado", "actualizado_en"])
+
+        return Response(
+            {"detail": "Restricción levantada correctamente"},
+            status=status.HTTP_200_OK
+        )
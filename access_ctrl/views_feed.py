@@ -0,0 +1,167 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from accounts.models import User
+
+from .feed import evento_desde_acceso, hub
+from .models import Acceso
+from .views import es_admin_general
+
+# sólo sirve para abrir el feed: no es un JWT ni vale en otra vista
+_tickets = signing.TimestampSigner(salt="access_ctrl.feed.ticket")
+
+
+def emitir_ticket(user):
+    return _tickets.sign(signing.b62_encode(user.pk))
+
+
+def _usuario_de_ticket(ticket):
+    try:
+        user_id = signing.b62_decode(_tickets.unsign(ticket, max_age=settings.FEED_ACCESOS_TICKET_SEGUNDOS))
+    except (signing.BadSignature, ValueError):
+        return None
+    return User.objects.select_related("empresa").filter(pk=user_id, is_active=True).first()
+
+
+def _autenticar(request):
+    """
+    JWT por header Authorization o, para EventSource (que no permite headers),
+    un ticket de ``TicketFeedView`` en ``?ticket=``: vence en segundos, así
+    que lo que quede en los logs de proxies no sirve para nada.
+    """
+    try:
+        resultado = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    if resultado:
+        return resultado[0]
+
+    ticket = request.GET.get("ticket")
+    return _usuario_de_ticket(ticket) if ticket else None
+
+
+class TicketFeedView(APIView):
+    """
+    Ticket de corta duración para abrir el feed con EventSource. Si la
+    conexión se corta después de que venció, el cliente pide otro.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            "ticket": emitir_ticket(request.user),
+            "expira_en_segundos": settings.FEED_ACCESOS_TICKET_SEGUNDOS,
+        })
+
+
+def filtro_tenant(user, params):
+    """
+    Mismas reglas que AccesoListView. Devuelve None si el rol no ve accesos.
+    """
+    empresa_id = params.get("empresa_id")
+    instalacion_id = params.get("instalacion_id")
+
+    if es_admin_general(user):
+        filtro = {}
+        if empresa_id:
+            filtro["empresa_id"] = int(empresa_id)
+        if instalacion_id:
+            filtro["instalacion_id"] = int(instalacion_id)
+        return filtro
+
+    if user.role == "admin":
+        filtro = {"empresa_id": user.empresa_id}
+        if instalacion_id:
+            filtro["instalacion_id"] = int(instalacion_id)
+        return filtro
+
+    if user.role == "guardia":
+        return {"empresa_id": user.empresa_id, "instalacion_id": user.instalacion_id}
+
+    return None
+
+
+def _pendientes(filtro, ultimo_id):
+    desde = timezone.now() - timedelta(hours=settings.FEED_ACCESOS_REPLAY_HORAS)
+    accesos = Acceso.objects.select_related(
+        "visita", "instalacion", "sector", "empresa"
+    ).filter(
+        id__gt=ultimo_id, fecha_hora__gte=desde, **filtro
+    ).order_by("id")[:settings.FEED_ACCESOS_REPLAY_MAX]
+
+    return [evento_desde_acceso(a) for a in accesos]
+
+
+async def _eventos(filtro, ultimo_id):
+    # se suscribe al empezar a transmitir: una respuesta que nunca se itera no deja suscripción
+    sub = hub.suscribir(filtro)
+    try:
+        yield b"retry: 3000\n\n"
+
+        # suscritos antes de consultar: lo que llegue mientras tanto queda en cola
+        reenviados = set()
+        if ultimo_id is not None:
+            for evento in await sync_to_async(_pendientes)(sub.filtro, ultimo_id):
+                reenviados.add(evento.id)
+                yield evento.mensaje
+
+        while not sub.atrasada:
+            try:
+                evento = await asyncio.wait_for(sub.cola.get(), timeout=settings.FEED_ACCESOS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+
+            if evento.id in reenviados:
+                continue
+            yield evento.mensaje
+    finally:
+        sub.cerrar()
+
+
+async def stream_accesos(request):
+    """
+    Feed SSE de accesos nuevos, con las mismas reglas de visibilidad que el
+    listado. Requiere servidor ASGI (ver config/asgi.py): en WSGI cada
+    suscriptor ocuparía un worker sync para siempre.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "El feed de accesos sólo se sirve con ASGI (gunicorn config.asgi:application, ver Procfile)"}, status=501,
+        )
+
+    user = await sync_to_async(_autenticar)(request)
+    if user is None:
+        return JsonResponse({"detail": "Credenciales inválidas o ausentes"}, status=401)
+
+    try:
+        filtro = await sync_to_async(filtro_tenant)(user, request.GET)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "filtro_invalido"}, status=400)
+
+    if filtro is None:
+        return JsonResponse({"detail": "No tiene permisos para ver accesos"}, status=403)
+
+    ultimo_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        ultimo_id = None
+
+    response = StreamingHttpResponse(_eventos(filtro, ultimo_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,189 @@
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from . import derivadas, fotos
+from .models import SubidaFoto
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _estado(request, subida):
+    data = {
+        "id": str(subida.id),
+        "tamano": subida.tamano,
+        "offset": fotos.recibidos(subida),
+        "completada": subida.completada_en is not None,
+        "sha256": subida.sha256 if subida.completada_en else None,
+        "url": None,
+    }
+    if subida.completada_en:
+        data["url"] = request.build_absolute_uri(fotos.url_foto(subida.sha256, subida.extension))
+    return data
+
+
+def _respuesta(request, subida, status_code=status.HTTP_200_OK):
+    data = _estado(request, subida)
+    response = Response({"ok": True, "subida": data}, status=status_code)
+    response["Upload-Offset"] = str(data["offset"])
+    return response
+
+
+class SubidaFotoCreateView(APIView):
+    """
+    Inicia la subida de una foto: ``{"tamano": bytes, "sha256": opcional}``.
+    Si se envía el hash y esa foto ya la subió alguien de la misma empresa,
+    la subida queda completa sin transferir nada. Si no, el hash declarado se
+    verifica contra los bytes recibidos.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            tamano = int(request.data.get("tamano"))
+        except (TypeError, ValueError):
+            return Response({"ok": False, "error": "tamano_requerido"}, status=400)
+
+        if tamano <= 0 or tamano > settings.FOTOS_MAX_BYTES:
+            return Response(
+                {"ok": False, "error": "tamano_no_valido", "maximo": settings.FOTOS_MAX_BYTES},
+                status=413 if tamano > 0 else 400
+            )
+
+        sha256 = (request.data.get("sha256") or "").lower() or None
+        if sha256 and not _SHA256.match(sha256):
+            return Response({"ok": False, "error": "sha256_no_valido"}, status=400)
+
+        subida = SubidaFoto(usuario=request.user, tamano=tamano, sha256=sha256)
+
+        # ♻️ misma foto ya guardada por su empresa: nada que transferir
+        extension = fotos.foto_existente(sha256, request.user) if sha256 else None
+        if extension:
+            subida.extension = extension
+            subida.completada_en = timezone.now()
+
+        subida.save()
+        return _respuesta(request, subida, status.HTTP_201_CREATED)
+
+
+class SubidaFotoView(APIView):
+    """
+    ``HEAD``/``GET``: cuántos bytes se recibieron (header ``Upload-Offset``).
+    ``PATCH``: bytes crudos desde ``Upload-Offset``; se escriben a disco en
+    bloques a medida que llegan.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def _subida(self, request, pk):
+        return get_object_or_404(SubidaFoto, pk=pk, usuario=request.user)
+
+    def get(self, request, pk):
+        return _respuesta(request, self._subida(request, pk))
+
+    def head(self, request, pk):
+        return self.get(request, pk)
+
+    def patch(self, request, pk):
+        subida = self._subida(request, pk)
+        if subida.completada_en:
+            return _respuesta(request, subida)
+
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+        except ValueError:
+            return Response({"ok": False, "error": "upload_offset_requerido"}, status=400)
+
+        try:
+            # request.read() lee del socket sin pasar por los parsers de DRF
+            fotos.agregar_bloques(subida, request, offset)
+        except fotos.ErrorSubida as exc:
+            response = Response({"ok": False, "error": exc.error, **exc.extra}, status=exc.status)
+            if "offset" in exc.extra:
+                response["Upload-Offset"] = str(exc.extra["offset"])
+            return response
+
+        return _respuesta(request, subida)
+
+
+def _usuario(request):
+    """Usuario de la sesión (admin) o del JWT, o None."""
+    if request.user.is_authenticated:
+        return request.user
+    try:
+        resultado = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    return resultado[0] if resultado else None
+
+
+def _autorizar(request, prefijo, sha256):
+    """Respuesta de error si no corresponde servir la foto, o None."""
+    if not sha256.startswith(prefijo):
+        raise Http404
+    usuario = _usuario(request)
+    if usuario is None:
+        return HttpResponse("No autorizado\n", status=401, content_type="text/plain")
+    # sin distinguir "no existe" de "es de otra empresa"
+    if not fotos.puede_ver(usuario, sha256):
+        raise Http404
+    return None
+
+
+def servir_foto(request, prefijo, sha256, extension):
+    """
+    Fotos guardadas por hash, sólo para usuarios de la empresa que la subió.
+    El contenido de una URL nunca cambia, así que se cachean un año
+    ``immutable``, pero ``private``: ningún proxy compartido las guarda.
+    """
+    error = _autorizar(request, prefijo, sha256)
+    if error:
+        return error
+
+    return _servir_inmutable(fotos.ruta_foto(sha256, extension), fotos.TIPOS[extension])
+
+
+def servir_derivada(request, prefijo, sha256, variante):
+    """
+    Miniatura / tamaño medio / WebP, con los mismos permisos que la original.
+    Si todavía no se generó se encola y se redirige a la original sin caché,
+    para que el próximo pedido ya la use.
+    """
+    error = _autorizar(request, prefijo, sha256)
+    if error:
+        return error
+
+    response = _servir_inmutable(derivadas.ruta_derivada(sha256, variante), "image/webp", faltante=None)
+    if response:
+        return response
+
+    extension = fotos.foto_existente(sha256)
+    if not extension:
+        raise Http404
+
+    derivadas.encolar(sha256, extension)
+    response = HttpResponseRedirect(fotos.url_foto(sha256, extension))
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def _servir_inmutable(ruta, content_type, faltante=Http404):
+    try:
+        archivo = open(ruta, "rb")
+    except FileNotFoundError:
+        if faltante is None:
+            return None
+        raise faltante
+
+    response = FileResponse(archivo, content_type=content_type)
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.models import Sector
+from . import pases, prohibiciones
+from .models import Acceso, Visita
+from .serializers import EscanearPaseRequest, PaseRequest
+from .views import es_admin_general
+
+
+def _fecha(epoch):
+    return timezone.localtime(datetime.fromtimestamp(epoch, tz=dt_timezone.utc)).isoformat()
+
+
+class EmitirPaseView(APIView):
+    """
+    Emite el pase QR de una visita preinscrita para un sector. Sin fechas,
+    vale desde ahora y por ``PASES_VIGENCIA_HORAS``.
+
+    Sólo admin y superadmin. Salvo la administradora general, el sector tiene
+    que ser de su empresa y la visita de la instalación del sector.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(request=PaseRequest)
+    def post(self, request):
+        ser = PaseRequest(data=request.data)
+        ser.is_valid(raise_exception=True)
+        data = ser.validated_data
+        user = request.user
+
+        if user.role not in ("admin", "superadmin"):
+            return Response({"ok": False, "error": "rol_sin_permiso"}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            sector = Sector.objects.select_related("instalacion").get(id=data["sector_id"])
+        except Sector.DoesNotExist:
+            return Response({"ok": False, "error": "sector_no_valido"}, status=status.HTTP_404_NOT_FOUND)
+
+        general = es_admin_general(user)
+        if not general and sector.instalacion.empresa_id != user.empresa_id:
+            return Response({"ok": False, "error": "sector_de_otra_empresa"}, status=status.HTTP_403_FORBIDDEN)
+
+        visita = Visita.objects.filter(id=data["visita_id"]).only("instalacion_id").first()
+        if visita is None:
+            return Response({"ok": False, "error": "visita_no_encontrada"}, status=status.HTTP_404_NOT_FOUND)
+
+        if not general and visita.instalacion_id != sector.instalacion_id:
+            return Response({"ok": False, "error": "visita_de_otra_instalacion"}, status=status.HTTP_403_FORBIDDEN)
+
+        desde = data.get("valido_desde") or timezone.now()
+        hasta = data.get("valido_hasta") or desde + timedelta(hours=settings.PASES_VIGENCIA_HORAS)
+        if hasta <= desde:
+            return Response({"ok": False, "error": "vigencia_no_valida"}, status=status.HTTP_400_BAD_REQUEST)
+
+        token = pases.emitir(data["visita_id"], sector.instalacion_id, sector.id, desde, hasta)
+        return Response(
+            {
+                "ok": True,
+                "token": token,
+                "visita_id": data["visita_id"],
+                "instalacion_id": sector.instalacion_id,
+                "sector_id": sector.id,
+                "valido_desde": timezone.localtime(desde).isoformat(),
+                "valido_hasta": timezone.localtime(hasta).isoformat(),
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+
+class EscanearPaseView(APIView):
+    """
+    Portería escanea un pase: firma y vigencia se verifican en memoria, la
+    prohibición sale del caché de prohibiciones y la única consulta es el
+    último acceso de la visita en la instalación (índice (visita, fecha_hora)).
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(request=EscanearPaseRequest)
+    def post(self, request):
+        ser = EscanearPaseRequest(data=request.data)
+        ser.is_valid(raise_exception=True)
+
+        try:
+            pase = pases.verificar(ser.validated_data["token"])
+        except pases.PaseInvalido as exc:
+            return Response({"ok": False, "error": exc.error}, status=exc.status)
+
+        if pase.instalacion_id != request.user.instalacion_id:
+            return Response({"ok": False, "error": "pase_de_otra_instalacion"}, status=status.HTTP_403_FORBIDDEN)
+
+        motivo = prohibiciones.motivo_vigente(pase.visita_id, pase.instalacion_id)
+        ultimo = Acceso.objects.filter(
+            visita_id=pase.visita_id, instalacion_id=pase.instalacion_id
+        ).order_by("-fecha_hora").values_list("tipo", "fecha_hora").first()
+
+        adentro = bool(ultimo) and ultimo[0] == "ingreso"
+        if adentro:
+            accion = "salida"
+        else:
+            accion = None if motivo is not None else "ingreso"
+
+        return Response({
+            "ok": accion is not None,
+            "visita_id": pase.visita_id,
+            "sector_id": pase.sector_id,
+            "valido_hasta": _fecha(pase.hasta),
+            "prohibido": motivo is not None,
+            "motivo_prohibicion": motivo,
+            "adentro": adentro,
+            "adentro_desde": timezone.localtime(ultimo[1]).isoformat() if adentro else None,
+            "accion": accion,
+        })
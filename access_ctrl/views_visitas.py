@@ -0,0 +1,115 @@
+from rest_framework.generics import ListAPIView, UpdateAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
+from .models import Visita
+from .busqueda import buscar_visitas
+from .campos import CamposPedidosViewMixin, columnas, pide
+from core.models import Sector
+from core.serializers import SectorSer
+from core.mixins import LecturaReplicaMixin
+from .serializers import VisitaInlineUpdateSerializer, VisitaSerializer, prohibiciones_vigentes
+from .views import es_admin_general
+
+
+class SectoresPorInstalacionView(ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = SectorSer
+
+    def get_queryset(self):
+        user = self.request.user
+        inst_id = self.kwargs.get("instalacion_id")
+
+        qs = Sector.objects.filter(instalacion_id=inst_id)
+
+        if es_admin_general(user):
+            return qs.order_by("nombre")
+
+        return qs.filter(instalacion__empresa_id=user.empresa_id).order_by("nombre")
+
+
+class VisitasCamposPedidosMixin(CamposPedidosViewMixin):
+    """``?fields=`` en listados de visitas: ``.only()`` las columnas pedidas y prohibiciones sólo con el motivo."""
+
+    def visitas(self):
+        qs = Visita.objects.all()
+        if self.campos is not None:
+            qs = qs.only(*columnas(self.get_serializer_class(), self.campos))
+        if pide(self.campos, "motivo_prohibicion"):
+            qs = qs.prefetch_related(prohibiciones_vigentes())
+        return qs
+
+
+class VisitasPorInstalacionView(VisitasCamposPedidosMixin, LecturaReplicaMixin, ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = VisitaSerializer
+
+    def get_queryset(self):
+        user = self.request.user
+        instalacion_id = self.kwargs.get("instalacion_id")
+
+        qs = self.visitas().filter(instalacion_id=instalacion_id)
+
+        if not es_admin_general(user):
+            qs = qs.filter(instalacion__empresa_id=user.empresa_id)
+
+        q = self.request.query_params.get("q")
+        if q:
+            return buscar_visitas(qs, q).order_by("rank_busqueda", "-creado_en")
+
+        return qs.order_by("-creado_en")
+
+
+class BusquedaVisitasPagination(PageNumberPagination):
+    page_size = 25
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class BuscarVisitasView(VisitasCamposPedidosMixin, LecturaReplicaMixin, ListAPIView):
+    """
+    Búsqueda paginada de visitas por nombre, apellido, RUT, DNI o patente.
+    Sin tildes ni puntuación; primero las coincidencias por prefijo.
+    El admin general busca en todas las instalaciones. Acepta ``?fields=``.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = VisitaSerializer
+    pagination_class = BusquedaVisitasPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        q = self.request.query_params.get("q", "")
+        instalacion_id = self.request.query_params.get("instalacion_id")
+
+        qs = self.visitas()
+
+        if es_admin_general(user):
+            if instalacion_id:
+                qs = qs.filter(instalacion_id=instalacion_id)
+
+        elif user.role == "admin":
+            qs = qs.filter(instalacion__empresa_id=user.empresa_id)
+            if instalacion_id:
+                qs = qs.filter(instalacion_id=instalacion_id)
+
+        elif user.instalacion_id:
+            qs = qs.filter(instalacion_id=user.instalacion_id)
+
+        else:
+            return Visita.objects.none()
+
+        return buscar_visitas(qs, q).order_by("rank_busqueda", "nombre", "apellido", "id")
+
+
+class VisitaUpdateView(UpdateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = VisitaInlineUpdateSerializer
+    queryset = Visita.objects.all()
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        user = self.request.user
+
+        if es_admin_general(user):
+            return qs
+
+        return qs.filter(instalacion__empresa_id=user.empresa_id)
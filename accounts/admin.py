@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 
+from core.mixins import ConteoEstimadoMixin, ReplicaChangelistMixin
 from .models import User
 
 
@@ -27,7 +28,7 @@ class CustomUserChangeForm(UserChangeForm):
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ReplicaChangelistMixin, ConteoEstimadoMixin, BaseUserAdmin):
     form = CustomUserChangeForm
     add_form = CustomUserCreationForm
     model = User
@@ -47,11 +48,14 @@ class UserAdmin(BaseUserAdmin):
         "is_superuser",
     )
 
+    list_select_related = ("empresa", "instalacion", "sector")
+    autocomplete_fields = ("empresa", "instalacion", "sector")
+
+    # sólo las empresas que tienen usuarios; instalación y sector se buscan por nombre
+    # (un filtro por cada una cargaría todas las filas en la barra lateral)
     list_filter = (
         "role",
-        "empresa",
-        "instalacion",
-        "sector",
+        ("empresa", admin.RelatedOnlyFieldListFilter),
         "is_staff",
         "is_active",
         "is_superuser",
@@ -86,6 +90,6 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
-    search_fields = ("username", "first_name", "last_name", "email")
+    search_fields = ("username", "first_name", "last_name", "email", "instalacion__nombre", "sector__nombre")
     ordering = ("id",)
     filter_horizontal = ("groups", "user_permissions")
\ No newline at end of file
@@ -5,6 +5,20 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Además de las vistas normales sirve el feed SSE de accesos
+(``/api/accesos/stream/``), que necesita un servidor ASGI para mantener
+muchas conexiones abiertas sin ocupar un worker por cliente, y con
+``GATE_VISTAS_ASYNC=1`` las consultas de portería en su versión async
+(access_ctrl/views_async.py):
+
+    GATE_VISTAS_ASYNC=1 gunicorn config.asgi:application -c config/gunicorn_conf.py
+
+(gunicorn con workers de uvicorn, ver config/gunicorn_conf.py; es lo que corre
+el Procfile).
+
+``python manage.py benchmark_concurrencia`` compara este despliegue con el de
+gunicorn sync.
 """
 
 import os
@@ -13,4 +27,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    # Django no maneja "lifespan": se responde aquí para detener el LISTEN del feed
+    if scope["type"] == "lifespan":
+        from access_ctrl.feed import hub
+
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                hub.detener()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    await django_application(scope, receive, send)
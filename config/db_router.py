@@ -0,0 +1,110 @@
+"""
+Ruteo de lecturas hacia la réplica de base de datos.
+
+Las vistas de reportes y listados se marcan con ``usa_replica = True``
+(ver ``LecturaReplicaMixin``). Mientras una de esas vistas atiende un GET,
+las lecturas del ORM van al alias ``replica`` si está configurado.
+
+Después de que un usuario escribe, sus lecturas quedan fijadas a la
+primaria durante ``REPLICA_FIJACION_SEGUNDOS`` para que vea sus propios
+cambios aunque la réplica venga atrasada. La fijación vive en el caché
+``default``: el siguiente GET puede caer en otro worker, por eso con réplica
+y varios workers settings exige Redis (``REDIS_URL``).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = "replica"
+
+_lectura_replica = ContextVar("lectura_replica", default=False)
+_hubo_escritura = ContextVar("hubo_escritura", default=False)
+
+
+def replica_configurada():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _clave_fijacion(user_id):
+    return f"db_router:primaria:{user_id}"
+
+
+def fijar_a_primaria(user):
+    if not getattr(user, "is_authenticated", False):
+        return
+    segundos = getattr(settings, "REPLICA_FIJACION_SEGUNDOS", 10)
+    cache.set(_clave_fijacion(user.pk), True, timeout=segundos)
+
+
+def fijado_a_primaria(user):
+    if not getattr(user, "is_authenticated", False):
+        return False
+    return bool(cache.get(_clave_fijacion(user.pk)))
+
+
+def puede_leer_replica(request):
+    if not replica_configurada():
+        return False
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        return False
+    return not fijado_a_primaria(request.user)
+
+
+def activar_replica():
+    return _lectura_replica.set(True)
+
+
+def desactivar_replica(token=None):
+    if token is not None:
+        _lectura_replica.reset(token)
+    else:
+        _lectura_replica.set(False)
+
+
+@contextmanager
+def lectura_replica(request):
+    """
+    Habilita la réplica dentro del bloque si la petición lo permite.
+    """
+    if not puede_leer_replica(request):
+        yield
+        return
+
+    token = activar_replica()
+    try:
+        yield
+    finally:
+        desactivar_replica(token)
+
+
+def iniciar_peticion():
+    _lectura_replica.set(False)
+    _hubo_escritura.set(False)
+
+
+def hubo_escritura():
+    return _hubo_escritura.get()
+
+
+class ReplicaRouter:
+    """
+    Envía las lecturas a la réplica sólo cuando la vista en curso lo permite.
+    Las escrituras siempre van a la primaria y quedan registradas para fijar
+    al usuario a la primaria al terminar la petición.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _lectura_replica.get() and replica_configurada():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        _hubo_escritura.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # primaria y réplica contienen los mismos datos
+        return True
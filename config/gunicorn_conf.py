@@ -0,0 +1,35 @@
+"""
+Configuración de gunicorn con workers de uvicorn (ASGI) y métricas multiproceso:
+
+    gunicorn config.asgi:application -c config/gunicorn_conf.py
+
+Con ASGI funciona el feed SSE de accesos (``/api/accesos/stream/``) y, con
+``GATE_VISTAS_ASYNC=1``, las consultas de portería async. Para workers sync
+clásicos: ``gunicorn config.wsgi:application -c config/gunicorn_conf.py
+--worker-class sync`` (sin feed).
+
+Cada worker escribe sus métricas en ``PROMETHEUS_MULTIPROC_DIR`` y ``/metrics``
+las agrega. El directorio se limpia al arrancar el master.
+"""
+import os
+import shutil
+from pathlib import Path
+
+multiproc_dir = Path(os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/inout_prometheus"))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# settings lo lee en los workers para elegir el caché: con más de uno y sin REDIS_URL
+# usa el caché en disco (compartido entre los workers de este host)
+workers = int(os.environ.setdefault("WEB_CONCURRENCY", "3"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def on_starting(server):
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    multiproc_dir.mkdir(parents=True, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
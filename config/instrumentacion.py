@@ -0,0 +1,240 @@
+"""
+Mediciones por petición: cantidad y tiempo de SQL, tiempo de serialización
+y tiempo de vista. Las usa ``InstrumentacionMiddleware``.
+
+La serialización es lo que corre dentro de ``midiendo_serializacion()``: el
+render de la respuesta (los renderers de config/renderers.py), el
+``serializer.data`` de los serializers con ``MideSerializacionMixin`` y la
+serialización rápida de listados (serializers_rapidos). El SQL que se ejecuta
+dentro (un queryset perezoso, un prefetch) cuenta como SQL, no como
+serialización.
+
+El costo fijo es bajo: un wrapper de ejecución por conexión (instalado una
+sola vez al abrirla) que suma contadores, y un heap acotado con las
+consultas más lentas. Fuera de una petición medida no hace nada.
+
+En desarrollo (``INSTRUMENTACION_DETECTAR_REPETIDAS``) además agrupa las
+consultas por forma y, cuando una se repite, guarda el primer punto del
+código del proyecto que la disparó: así un N+1 se reporta con su archivo y
+línea en vez de sólo con el SQL.
+"""
+import heapq
+import os
+import re
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+_medicion = ContextVar("medicion", default=None)
+
+MAX_CONSULTAS_LENTAS = 5
+
+_LISTA_IN = re.compile(r"IN \((?:%s, )*%s\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def forma_sql(sql):
+    """SQL sin la cantidad de parámetros de los ``IN (...)`` ni espacios extra."""
+    return _ESPACIOS.sub(" ", _LISTA_IN.sub("IN (...)", sql)).strip()
+
+
+def _codigo_propio(archivo):
+    raiz = str(settings.BASE_DIR) + os.sep
+    return (
+        archivo.startswith(raiz)
+        and "site-packages" not in archivo
+        and not archivo.startswith(raiz + "venv" + os.sep)
+        and archivo != __file__
+        and not archivo.endswith(os.path.join("config", "middleware.py"))
+    )
+
+
+def sitio_llamada():
+    """Primer frame del código del proyecto en la pila, como ``archivo:línea (función)``."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        archivo = frame.f_code.co_filename
+        if _codigo_propio(archivo):
+            relativo = os.path.relpath(archivo, settings.BASE_DIR)
+            return f"{relativo}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return None
+
+
+class Medicion:
+    __slots__ = (
+        "inicio", "inicio_vista", "fin_vista", "consultas", "sql_segundos",
+        "serializer_segundos", "serializando", "lentas", "formas",
+    )
+
+    def __init__(self, detectar_repetidas=False):
+        self.inicio = perf_counter()
+        self.inicio_vista = None
+        self.fin_vista = None
+        self.consultas = 0
+        self.sql_segundos = 0.0
+        self.serializer_segundos = 0.0
+        self.serializando = False
+        self.lentas = []
+        # forma -> [veces, sitio de la primera repetición]
+        self.formas = {} if detectar_repetidas else None
+
+    def registrar_sql(self, sql, segundos):
+        self.consultas += 1
+        self.sql_segundos += segundos
+        item = (segundos, self.consultas, sql)
+        if len(self.lentas) < MAX_CONSULTAS_LENTAS:
+            heapq.heappush(self.lentas, item)
+        elif segundos > self.lentas[0][0]:
+            heapq.heapreplace(self.lentas, item)
+
+        if self.formas is not None:
+            forma = forma_sql(sql)
+            registro = self.formas.get(forma)
+            if registro is None:
+                self.formas[forma] = [1, None]
+            else:
+                registro[0] += 1
+                if registro[1] is None:
+                    registro[1] = sitio_llamada()
+
+    def repetidas(self, umbral):
+        """Formas de consulta ejecutadas ``umbral`` o más veces, de la más repetida a la menos."""
+        if not self.formas:
+            return []
+        return [
+            {"veces": veces, "sitio": sitio, "sql": forma[:500]}
+            for forma, (veces, sitio) in sorted(self.formas.items(), key=lambda kv: -kv[1][0])
+            if veces >= umbral
+        ]
+
+    def consultas_lentas(self):
+        return [
+            {"ms": round(seg * 1000, 2), "sql": sql[:500]}
+            for seg, _, sql in sorted(self.lentas, reverse=True)
+        ]
+
+    @property
+    def total_segundos(self):
+        return perf_counter() - self.inicio
+
+    @property
+    def vista_segundos(self):
+        if self.inicio_vista is None:
+            return 0.0
+        return (self.fin_vista or perf_counter()) - self.inicio_vista
+
+
+def iniciar_medicion(detectar_repetidas=False):
+    medicion = Medicion(detectar_repetidas)
+    return medicion, _medicion.set(medicion)
+
+
+def terminar_medicion(token):
+    _medicion.reset(token)
+
+
+def medicion_actual():
+    return _medicion.get()
+
+
+def _medir_sql(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+
+    inicio = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.registrar_sql(sql, perf_counter() - inicio)
+
+
+class ContadorConsultas:
+    def __init__(self):
+        self.sql = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.sql.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.sql)
+
+
+@contextmanager
+def contar_consultas(alias=DEFAULT_DB_ALIAS):
+    """
+    Cuenta las consultas ejecutadas en el bloque. A diferencia de
+    ``CaptureQueriesContext`` sirve alrededor de peticiones completas:
+    ``request_started`` vacía ``connection.queries_log``.
+    """
+    contador = ContadorConsultas()
+    with connections[alias].execute_wrapper(contador):
+        yield contador
+
+
+def _instalar_wrapper(sender, connection, **kwargs):
+    # al principio: ``execute_wrapper()`` saca el último al salir y la conexión
+    # puede abrirse dentro de uno de esos bloques (p. ej. contar_consultas)
+    if _medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _medir_sql)
+
+
+@contextmanager
+def midiendo_serializacion():
+    """Suma el bloque al tiempo de serialización de la petición."""
+    medicion = _medicion.get()
+    # los bloques anidados (un render dentro de otro) se cuentan una sola vez
+    if medicion is None or medicion.serializando:
+        yield
+        return
+
+    medicion.serializando = True
+    inicio = perf_counter()
+    sql_inicio = medicion.sql_segundos
+    try:
+        yield
+    finally:
+        sql = medicion.sql_segundos - sql_inicio
+        medicion.serializer_segundos += perf_counter() - inicio - sql
+        medicion.serializando = False
+
+
+class MideSerializacionMixin:
+    """
+    Para serializers DRF: ``.data`` cuenta como serialización. En un
+    ListSerializer mide la lista completa (los hijos se arman con
+    ``to_representation``, sin pasar por su ``.data``).
+    """
+
+    @property
+    def data(self):
+        with midiendo_serializacion():
+            return super().data
+
+
+class ListaMedidaSerializer(MideSerializacionMixin, serializers.ListSerializer):
+    """``list_serializer_class`` para los serializers que no tienen uno propio."""
+
+
+_instalado = False
+
+
+def instalar():
+    """Engancha el wrapper de SQL en las conexiones. Idempotente."""
+    global _instalado
+    if _instalado:
+        return
+
+    connection_created.connect(_instalar_wrapper, dispatch_uid="instrumentacion_sql")
+    for conn in connections.all(initialized_only=True):
+        _instalar_wrapper(None, conn)
+
+    _instalado = True
@@ -0,0 +1,95 @@
+"""
+Métricas en formato Prometheus expuestas en ``/metrics``.
+
+Con varios workers cada uno es un proceso: si ``PROMETHEUS_MULTIPROC_DIR`` está
+definido, prometheus_client escribe los valores en archivos mmap de ese
+directorio y ``/metrics`` agrega los de todos los workers. Settings lo define
+cuando ``WEB_CONCURRENCY`` > 1, así que vale tanto para gunicorn
+(``config/gunicorn_conf.py``) como para ``uvicorn --workers``. Sin la variable
+se usa el registro en memoria del proceso, que basta para runserver.
+"""
+import os
+import secrets
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+PETICION_SEGUNDOS = Histogram(
+    "inout_peticion_segundos",
+    "Latencia de las peticiones por vista",
+    ["vista", "metodo"],
+)
+PETICIONES = Counter(
+    "inout_peticiones",
+    "Peticiones atendidas por vista y status",
+    ["vista", "metodo", "status"],
+)
+SQL_CONSULTAS = Histogram(
+    "inout_sql_consultas_por_peticion",
+    "Cantidad de consultas SQL por petición",
+    ["vista"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+SQL_SEGUNDOS = Histogram(
+    "inout_sql_segundos_por_peticion",
+    "Tiempo total en SQL por petición",
+    ["vista"],
+)
+GATE_RESULTADOS = Counter(
+    "inout_gate_resultados",
+    "Resultados de ingreso/salida en portería",
+    ["resultado"],
+)
+CACHE_OPERACIONES = Counter(
+    "inout_cache_operaciones",
+    "Lecturas de caché por resultado (hit/miss); ratio = hit / (hit + miss)",
+    ["cache", "resultado"],
+)
+
+
+def registrar_peticion(vista, metodo, status, segundos, consultas, sql_segundos):
+    vista = vista or "sin_ruta"
+    PETICION_SEGUNDOS.labels(vista, metodo).observe(segundos)
+    PETICIONES.labels(vista, metodo, str(status)).inc()
+    SQL_CONSULTAS.labels(vista).observe(consultas)
+    SQL_SEGUNDOS.labels(vista).observe(sql_segundos)
+
+
+def registrar_resultado_gate(resultado):
+    GATE_RESULTADOS.labels(resultado).inc()
+
+
+def registrar_cache(nombre, hit):
+    CACHE_OPERACIONES.labels(nombre, "hit" if hit else "miss").inc()
+
+
+def _autorizado(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    if token and secrets.compare_digest(header, f"Bearer {token}"):
+        return True
+
+    # también sirve el JWT de un superadmin
+    try:
+        resultado = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return False
+    return bool(resultado) and resultado[0].role == "superadmin"
+
+
+def metrics_view(request):
+    if not _autorizado(request):
+        return HttpResponse("No autorizado\n", status=401, content_type="text/plain")
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
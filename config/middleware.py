@@ -0,0 +1,193 @@
+import json
+import logging
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import instrumentacion, metricas, perfilado
+from .db_router import fijar_a_primaria, hubo_escritura, iniciar_peticion
+
+logger = logging.getLogger("config.rendimiento")
+
+
+class SyncAsyncMiddleware:
+    """
+    Base de los middlewares del proyecto: sirven tanto en WSGI como en ASGI.
+    Con un middleware sólo sync en la cadena Django pasa cada petición a un
+    thread y las vistas async de config/asgi.py pierden la ventaja.
+    Las subclases implementan ``__call__`` y ``__acall__``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+class ReplicaMiddleware(SyncAsyncMiddleware):
+    """
+    Limpia el estado de ruteo al inicio de cada petición y, si hubo escrituras,
+    fija las lecturas del usuario a la primaria durante una ventana corta.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        iniciar_peticion()
+        response = self.get_response(request)
+
+        # DRF deja el usuario autenticado por JWT en request.user
+        if hubo_escritura():
+            fijar_a_primaria(getattr(request, "user", None))
+
+        return response
+
+    async def __acall__(self, request):
+        iniciar_peticion()
+        response = await self.get_response(request)
+
+        if hubo_escritura():
+            await sync_to_async(fijar_a_primaria)(getattr(request, "user", None))
+
+        return response
+
+
+class InstrumentacionMiddleware(SyncAsyncMiddleware):
+    """
+    Mide cada petición (SQL, serialización, vista) y lo publica en el header
+    ``Server-Timing`` y en una línea de log JSON en nivel debug. Si la petición
+    supera ``INSTRUMENTACION_LENTO_MS`` se loguea como warning con las consultas más lentas.
+    Con ``INSTRUMENTACION_DETECTAR_REPETIDAS`` también avisa de las consultas
+    repetidas (N+1) con el punto del código que las disparó.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        instrumentacion.instalar()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        medicion, token = instrumentacion.iniciar_medicion(settings.INSTRUMENTACION_DETECTAR_REPETIDAS)
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentacion.terminar_medicion(token)
+        return self.registrar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion, token = instrumentacion.iniciar_medicion(settings.INSTRUMENTACION_DETECTAR_REPETIDAS)
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentacion.terminar_medicion(token)
+        # sólo arma headers, métricas y logs: no toca la base
+        return self.registrar(request, response, medicion)
+
+    def registrar(self, request, response, medicion):
+        if medicion.inicio_vista is not None and medicion.fin_vista is None:
+            medicion.fin_vista = perf_counter()
+
+        total_ms = medicion.total_segundos * 1000
+        sql_ms = medicion.sql_segundos * 1000
+        serializer_ms = medicion.serializer_segundos * 1000
+        vista_ms = medicion.vista_segundos * 1000
+
+        if settings.INSTRUMENTACION_SERVER_TIMING:
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={sql_ms:.1f};desc="{medicion.consultas} consultas"',
+                f"ser;dur={serializer_ms:.1f}",
+                f"vista;dur={vista_ms:.1f}",
+                f"total;dur={total_ms:.1f}",
+            ])
+
+        vista = getattr(request.resolver_match, "view_name", None)
+        metricas.registrar_peticion(
+            vista, request.method, response.status_code,
+            medicion.total_segundos, medicion.consultas, medicion.sql_segundos,
+        )
+
+        user = getattr(request, "user", None)
+        registro = {
+            "metodo": request.method,
+            "ruta": request.path,
+            "vista": vista,
+            "status": response.status_code,
+            "usuario_id": user.pk if getattr(user, "is_authenticated", False) else None,
+            "total_ms": round(total_ms, 1),
+            "vista_ms": round(vista_ms, 1),
+            "sql_ms": round(sql_ms, 1),
+            "sql_consultas": medicion.consultas,
+            "serializer_ms": round(serializer_ms, 1),
+        }
+
+        # sólo las lentas salen con el nivel por defecto; el resto con INSTRUMENTACION_LOG_LEVEL=DEBUG
+        if total_ms >= settings.INSTRUMENTACION_LENTO_MS:
+            registro["consultas_lentas"] = medicion.consultas_lentas()
+            logger.warning(json.dumps(registro, default=str))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(registro, default=str))
+
+        repetidas = medicion.repetidas(settings.INSTRUMENTACION_REPETIDAS_UMBRAL)
+        if repetidas:
+            logger.warning(json.dumps({
+                "evento": "consultas_repetidas",
+                "metodo": request.method,
+                "ruta": request.path,
+                "vista": vista,
+                "repetidas": repetidas,
+            }, default=str))
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicion = instrumentacion.medicion_actual()
+        if medicion is not None:
+            medicion.inicio_vista = perf_counter()
+        return None
+
+
+class PerfiladoMiddleware(SyncAsyncMiddleware):
+    """
+    Corre bajo cProfile + tracemalloc las peticiones que un superadmin marca
+    con ``X-Perfilar: 1`` o ``?perfilar=1`` (ver config/perfilado.py). El
+    resto pasa de largo sin costo.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        perfil = perfilado.iniciar(request) if perfilado.solicitado(request) else None
+        if perfil is None:
+            return self.get_response(request)
+
+        try:
+            with perfil:
+                response = self.get_response(request)
+            return perfil.guardar(response)
+        finally:
+            perfilado.liberar()
+
+    async def __acall__(self, request):
+        if not perfilado.solicitado(request):
+            return await self.get_response(request)
+
+        perfil = await sync_to_async(perfilado.iniciar)(request)
+        if perfil is None:
+            return await self.get_response(request)
+
+        # en ASGI cProfile sólo ve lo que corre en el thread del event loop
+        # (no lo que va a sync_to_async) y también lo de otras peticiones concurrentes
+        try:
+            with perfil:
+                response = await self.get_response(request)
+            return await sync_to_async(perfil.guardar)(response)
+        finally:
+            perfilado.liberar()
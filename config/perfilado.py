@@ -0,0 +1,234 @@
+"""
+Perfilado a pedido de una petición puntual, para reproducir en producción la
+lentitud que reporta un cliente.
+
+Un superadmin agrega ``X-Perfilar: 1`` (o ``?perfilar=1``) a la petición y
+``PerfiladoMiddleware`` la corre bajo cProfile y tracemalloc. En
+``PERFILES_DIR`` quedan el ``.prof`` (para ``pstats``/snakeviz) y un
+``.json`` con el resumen: funciones más costosas, consultas SQL con su
+duración, pico de memoria y las líneas que más memoria reservaron. La
+respuesta lleva el id en ``X-Perfil-Id``; ``/api/perfiles/`` lista los
+guardados y ``/api/perfiles/<id>/`` los descarga.
+
+Sin el header ni el parámetro el costo es revisar un header y la query
+string: no se autentica, no se perfila ni se instala nada.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+HEADER = "HTTP_X_PERFILAR"
+PARAMETRO = "perfilar"
+FUNCIONES_RESUMEN = 40
+LINEAS_MEMORIA = 15
+
+_ID = re.compile(r"^\d{8}_\d{6}_[0-9a-f]{8}$")
+
+# cProfile no admite dos perfiles activos a la vez en el proceso
+_en_curso = threading.Lock()
+
+
+def solicitado(request):
+    """¿La petición pide perfilarse? Sólo mira el header y la query string."""
+    if request.META.get(HEADER):
+        return True
+    return PARAMETRO in request.META.get("QUERY_STRING", "") and request.GET.get(PARAMETRO) not in (None, "", "0")
+
+
+def superadmin(request):
+    """Usuario del JWT si es superadmin, o None."""
+    try:
+        resultado = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    if resultado and resultado[0].role == "superadmin":
+        return resultado[0]
+    return None
+
+
+def directorio():
+    return Path(settings.PERFILES_DIR)
+
+
+class RegistroSQL:
+    """Execute wrapper que anota cada consulta con su duración."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append({
+                "alias": self.alias,
+                "ms": round((perf_counter() - inicio) * 1000, 3),
+                "sql": sql,
+            })
+
+
+class Perfil:
+    """Una petición perfilada: se usa como context manager alrededor de la vista."""
+
+    def __init__(self, request, usuario):
+        self.request = request
+        self.usuario = usuario
+        self.id = f"{timezone.localtime():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}"
+        self.perfil = cProfile.Profile()
+        self.registros = [RegistroSQL(alias) for alias in connections]
+        self._pila = ExitStack()
+        self._tracemalloc_propio = False
+
+    def __enter__(self):
+        for registro in self.registros:
+            self._pila.enter_context(connections[registro.alias].execute_wrapper(registro))
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc_propio = True
+        tracemalloc.reset_peak()
+        self._memoria_inicial = tracemalloc.get_traced_memory()[0]
+        self._snapshot_inicial = tracemalloc.take_snapshot()
+        self.inicio = perf_counter()
+        self.perfil.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.perfil.disable()
+        self.total_ms = (perf_counter() - self.inicio) * 1000
+        self.memoria_pico_kb = (tracemalloc.get_traced_memory()[1] - self._memoria_inicial) / 1024
+        self._snapshot_final = tracemalloc.take_snapshot()
+        if self._tracemalloc_propio:
+            tracemalloc.stop()
+        self._pila.close()
+        return False
+
+    def _resumen_funciones(self):
+        salida = io.StringIO()
+        pstats.Stats(self.perfil, stream=salida).sort_stats("cumulative").print_stats(FUNCIONES_RESUMEN)
+        return salida.getvalue()
+
+    def _lineas_memoria(self):
+        filtros = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diferencias = self._snapshot_final.filter_traces(filtros).compare_to(
+            self._snapshot_inicial.filter_traces(filtros), "lineno"
+        )
+        return [
+            {"linea": str(d.traceback), "kb": round(d.size_diff / 1024, 1), "bloques": d.count_diff}
+            for d in diferencias[:LINEAS_MEMORIA]
+        ]
+
+    def guardar(self, response):
+        consultas = [c for registro in self.registros for c in registro.consultas]
+        datos = {
+            "id": self.id,
+            "fecha": timezone.localtime().isoformat(),
+            "usuario": self.usuario.username,
+            "metodo": self.request.method,
+            "ruta": self.request.get_full_path(),
+            "vista": getattr(self.request.resolver_match, "view_name", None),
+            "status": response.status_code,
+            "total_ms": round(self.total_ms, 1),
+            "memoria_pico_kb": round(self.memoria_pico_kb, 1),
+            "sql_consultas": len(consultas),
+            "sql_ms": round(sum(c["ms"] for c in consultas), 1),
+            "sql": consultas,
+            "memoria_lineas": self._lineas_memoria(),
+            "funciones": self._resumen_funciones(),
+        }
+
+        carpeta = directorio()
+        carpeta.mkdir(parents=True, exist_ok=True)
+        self.perfil.dump_stats(carpeta / f"{self.id}.prof")
+        with open(carpeta / f"{self.id}.json", "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False, default=str)
+        _podar(carpeta)
+
+        response["X-Perfil-Id"] = self.id
+        return response
+
+
+def iniciar(request):
+    """
+    El ``Perfil`` a usar para la petición, o None si no lo pidió un
+    superadmin o ya hay otra perfilándose en el proceso.
+    """
+    usuario = superadmin(request)
+    if usuario is None or not _en_curso.acquire(blocking=False):
+        return None
+    return Perfil(request, usuario)
+
+
+def liberar():
+    _en_curso.release()
+
+
+def _podar(carpeta):
+    """Deja sólo los ``PERFILES_MAX`` más recientes."""
+    jsons = sorted(carpeta.glob("*.json"), reverse=True)
+    for viejo in jsons[settings.PERFILES_MAX:]:
+        viejo.unlink(missing_ok=True)
+        viejo.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def _no_autorizado():
+    return HttpResponse("No autorizado\n", status=401, content_type="text/plain")
+
+
+def perfiles_view(request):
+    """Perfiles guardados, del más reciente al más antiguo (sin el detalle)."""
+    if superadmin(request) is None:
+        return _no_autorizado()
+
+    perfiles = []
+    carpeta = directorio()
+    for ruta in sorted(carpeta.glob("*.json"), reverse=True) if carpeta.exists() else []:
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            continue
+        perfiles.append({
+            clave: datos.get(clave)
+            for clave in (
+                "id", "fecha", "usuario", "metodo", "ruta", "vista", "status",
+                "total_ms", "memoria_pico_kb", "sql_consultas", "sql_ms",
+            )
+        })
+    return JsonResponse({"perfiles": perfiles})
+
+
+def descargar_perfil_view(request, perfil_id):
+    """``?formato=json`` (por defecto) con el resumen o ``?formato=prof`` para pstats/snakeviz."""
+    if superadmin(request) is None:
+        return _no_autorizado()
+
+    formato = request.GET.get("formato", "json")
+    if not _ID.match(perfil_id) or formato not in ("json", "prof"):
+        raise Http404
+
+    try:
+        archivo = open(directorio() / f"{perfil_id}.{formato}", "rb")
+    except FileNotFoundError:
+        raise Http404
+
+    tipo = "application/json" if formato == "json" else "application/octet-stream"
+    return FileResponse(archivo, content_type=tipo, as_attachment=formato == "prof", filename=os.path.basename(archivo.name))
@@ -0,0 +1,113 @@
+"""
+Renderers y parsers más rápidos que los de DRF, elegidos por ``Accept`` /
+``Content-Type`` con la negociación normal de DRF (ver ``REST_FRAMEWORK``).
+
+- ``ORJSONRenderer`` / ``ORJSONParser``: ``application/json`` con orjson.
+  La salida es la misma que la de ``JSONRenderer``: fechas, decimales, UUID,
+  textos traducibles, etc. pasan por el mismo ``default`` de DRF
+  (``2025-01-01T12:00:00Z``, ``Decimal`` como número), se escapan
+  ``\\u2028``/``\\u2029`` y sin orjson instalado, con indentación pedida o ante
+  algo que orjson no sabe escribir (p. ej. enteros de más de 64 bits) se usa
+  el ``JSONRenderer`` de siempre. Diferencias: un float con exponente sale
+  en la forma de orjson (``1e16`` en vez de ``1e+16``, mismo valor) y NaN /
+  infinito salen como ``null`` en vez de un error 500.
+- ``MessagePackRenderer`` / ``MessagePackParser``: ``application/msgpack``,
+  para los teléfonos de portería con mala señal. Los valores son los mismos
+  que en JSON (las fechas siguen siendo texto ISO 8601); sólo se registran si
+  ``msgpack`` está instalado.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .instrumentacion import midiendo_serializacion
+
+try:
+    import orjson
+except ImportError:  # sin orjson se usa el json de la biblioteca estándar
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK = "application/msgpack"
+
+# las mismas conversiones que JSONRenderer para lo que no es JSON nativo
+_convertir = JSONEncoder().default
+
+
+def _escapar_separadores(contenido):
+    # JSONRenderer siempre escapa U+2028 y U+2029 (JSON como subconjunto de JavaScript)
+    if b"\xe2\x80\xa8" in contenido or b"\xe2\x80\xa9" in contenido:
+        contenido = contenido.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return contenido
+
+
+class ORJSONRenderer(JSONRenderer):
+    # ensure_ascii/compact de DRF no tienen equivalente en orjson
+    usa_orjson = orjson is not None and not JSONRenderer.ensure_ascii and JSONRenderer.compact
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # Server-Timing "ser" (config/instrumentacion.py)
+        with midiendo_serializacion():
+            if not self.usa_orjson or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+                return super().render(data, accepted_media_type, renderer_context)
+
+            try:
+                contenido = orjson.dumps(
+                    data, default=_convertir,
+                    option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+                )
+            except orjson.JSONEncodeError:
+                return super().render(data, accepted_media_type, renderer_context)
+            return _escapar_separadores(contenido)
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with midiendo_serializacion():
+            return msgpack.packb(data, default=_convertir, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = MSGPACK
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+
+
+def renderer_para(request):
+    """Renderer según el ``Accept``, para las vistas que no pasan por DRF (views_async)."""
+    if msgpack is not None and request.get_preferred_type(["application/json", MSGPACK]) == MSGPACK:
+        return MessagePackRenderer()
+    return ORJSONRenderer()
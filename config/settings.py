@@ -1,6 +1,7 @@
 # --- Arriba de todo ---
 import os
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 from dotenv import load_dotenv
 from urllib.parse import urlparse
@@ -59,6 +60,8 @@ INSTALLED_APPS = [
 # ⚙️ Middleware
 # =======================
 MIDDLEWARE = [
+    "config.middleware.InstrumentacionMiddleware",  # ✅ Server-Timing y log de rendimiento
+    "config.middleware.PerfiladoMiddleware",  # 🔬 cProfile a pedido de un superadmin
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # ✅ CORS
     "whitenoise.middleware.WhiteNoiseMiddleware",  # ✅ para servir static en Render
@@ -68,6 +71,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "config.middleware.ReplicaMiddleware",  # ✅ fijación a primaria tras escrituras
 ]
 
 # =======================
@@ -91,6 +95,141 @@ else:
         }
     }
 
+# Réplica de solo lectura para reportes y listados (opcional).
+# En local se puede probar con un segundo archivo SQLite:
+#   cp db.sqlite3 db_replica.sqlite3 && SQLITE_REPLICA=db_replica.sqlite3 python manage.py runserver
+if os.getenv("REPLICA_DATABASE_URL"):
+    import dj_database_url
+
+    DATABASES["replica"] = dj_database_url.parse(os.getenv("REPLICA_DATABASE_URL"), conn_max_age=600)
+elif os.getenv("SQLITE_REPLICA"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / os.getenv("SQLITE_REPLICA"),
+    }
+
+if "replica" in DATABASES:
+    # en tests la réplica apunta a la misma base que la primaria
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
+
+# Segundos que las lecturas de un usuario quedan en la primaria tras escribir
+REPLICA_FIJACION_SEGUNDOS = int(os.getenv("REPLICA_FIJACION_SEGUNDOS", "10"))
+
+# =======================
+# 🗄️ Caché
+# =======================
+# La fijación a la primaria (réplica) y la versión de prohibiciones (portería con pase QR)
+# tienen que verse en todos los workers:
+# - REDIS_URL: Redis, compartido entre workers y hosts.
+# - varios workers sin Redis: caché en disco, compartido sólo entre los workers de este host.
+#   Con réplica no alcanza (la fijación a la primaria tiene que seguir al usuario entre hosts).
+# - un solo proceso (runserver, tests, un worker): en memoria.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+elif WEB_CONCURRENCY > 1 and "replica" in DATABASES:
+    from django.core.exceptions import ImproperlyConfigured
+
+    raise ImproperlyConfigured(
+        f"WEB_CONCURRENCY={WEB_CONCURRENCY} con réplica necesita REDIS_URL: la fijación a la "
+        "primaria tras escribir tiene que verse desde cualquier worker"
+    )
+elif WEB_CONCURRENCY > 1:
+    import logging
+
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_DIR", "/tmp/inout_cache"),
+        }
+    }
+    logging.getLogger(__name__).warning(
+        "WEB_CONCURRENCY=%s sin REDIS_URL: caché en %s, compartido sólo entre los workers de este host",
+        WEB_CONCURRENCY, CACHES["default"]["LOCATION"],
+    )
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Archivo en frío de accesos (particiones mensuales en PostgreSQL)
+ACCESOS_RETENCION_MESES = int(os.getenv("ACCESOS_RETENCION_MESES", "24"))
+ACCESOS_ARCHIVO_DIR = Path(os.getenv("ACCESOS_ARCHIVO_DIR", BASE_DIR / "archivo_accesos"))
+
+# Feed SSE de accesos (/api/accesos/stream/)
+FEED_ACCESOS_HEARTBEAT = int(os.getenv("FEED_ACCESOS_HEARTBEAT", "15"))
+FEED_ACCESOS_COLA_MAX = int(os.getenv("FEED_ACCESOS_COLA_MAX", "1000"))
+FEED_ACCESOS_REPLAY_MAX = int(os.getenv("FEED_ACCESOS_REPLAY_MAX", "500"))
+FEED_ACCESOS_REPLAY_HORAS = int(os.getenv("FEED_ACCESOS_REPLAY_HORAS", "24"))
+# vigencia del ticket para abrir el feed con EventSource (POST /api/accesos/stream/ticket/)
+FEED_ACCESOS_TICKET_SEGUNDOS = int(os.getenv("FEED_ACCESOS_TICKET_SEGUNDOS", "60"))
+
+# ⚡ Consultas de portería (buscar RUT/DNI, último acceso, sectores) en su versión
+# async (access_ctrl/views_async.py). Activar sólo al servir con ASGI:
+#   GATE_VISTAS_ASYNC=1 gunicorn config.asgi:application -c config/gunicorn_conf.py
+GATE_VISTAS_ASYNC = os.getenv("GATE_VISTAS_ASYNC", "0") == "1"
+
+# =======================
+# ⏱️ Instrumentación de peticiones
+# =======================
+INSTRUMENTACION_LENTO_MS = int(os.getenv("INSTRUMENTACION_LENTO_MS", "1000"))
+INSTRUMENTACION_SERVER_TIMING = os.getenv("INSTRUMENTACION_SERVER_TIMING", "1") == "1"
+# 🔁 detector de N+1: agrupa consultas por forma y reporta el archivo:línea que las repite
+INSTRUMENTACION_DETECTAR_REPETIDAS = os.getenv("INSTRUMENTACION_DETECTAR_REPETIDAS", "1" if DEBUG else "0") == "1"
+INSTRUMENTACION_REPETIDAS_UMBRAL = int(os.getenv("INSTRUMENTACION_REPETIDAS_UMBRAL", "5"))
+
+# Admin: sobre esta cantidad de filas estimadas el changelist muestra la estimación
+# de PostgreSQL en vez de hacer COUNT(*) (ver core.mixins.PaginadorEstimado)
+ADMIN_CONTEO_ESTIMADO_DESDE = int(os.getenv("ADMIN_CONTEO_ESTIMADO_DESDE", "100000"))
+
+# 🎫 Pases QR firmados (access_ctrl/pases.py): vigencia por defecto al emitirlos y
+# segundos máximos que un worker usa su caché de prohibiciones sin recargarlo
+PASES_VIGENCIA_HORAS = int(os.getenv("PASES_VIGENCIA_HORAS", "24"))
+PROHIBICIONES_CACHE_SEGUNDOS = int(os.getenv("PROHIBICIONES_CACHE_SEGUNDOS", "30"))
+
+# Caché de visitas serializadas (access_ctrl/representaciones.py): entradas del LRU
+# por proceso, duración, y alias opcional de CACHES compartido entre workers
+REPRESENTACIONES_CACHE_MAX = int(os.getenv("REPRESENTACIONES_CACHE_MAX", "20000"))
+REPRESENTACIONES_CACHE_SEGUNDOS = int(os.getenv("REPRESENTACIONES_CACHE_SEGUNDOS", "300"))
+REPRESENTACIONES_CACHE_ALIAS = os.getenv("REPRESENTACIONES_CACHE_ALIAS") or None
+
+# 🔬 Perfilado a pedido (X-Perfilar: 1 de un superadmin); se guardan los últimos PERFILES_MAX
+PERFILES_DIR = Path(os.getenv("PERFILES_DIR", BASE_DIR / "perfiles"))
+PERFILES_MAX = int(os.getenv("PERFILES_MAX", "50"))
+
+# Token para que Prometheus lea /metrics (Authorization: Bearer <token>)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# 📈 Métricas multiproceso: con varios workers cada uno escribe las suyas en este directorio
+# y /metrics las agrega. gunicorn_conf.py lo define (y limpia) en el master; con
+# `uvicorn --workers N` (que también lee WEB_CONCURRENCY) se usa uno por arranque, colgado
+# del pid del proceso que supervisa a los workers. Tiene que quedar definido antes de
+# importar prometheus_client.
+if WEB_CONCURRENCY > 1:
+    Path(os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", f"/tmp/inout_prometheus/{os.getppid()}"
+    )).mkdir(parents=True, exist_ok=True)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "config.rendimiento": {
+            "handlers": ["console"],
+            "level": os.getenv("INSTRUMENTACION_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 # =======================
 # 🌍 Internacionalización
 # =======================
@@ -107,7 +246,13 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 MEDIA_URL = "/media/"
-MEDIA_ROOT = BASE_DIR / "media"
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", BASE_DIR / "media"))
+
+# 📷 Fotos de evidencia (access_ctrl/fotos.py)
+FOTOS_MAX_BYTES = int(os.getenv("FOTOS_MAX_BYTES", str(15 * 1024 * 1024)))
+FOTOS_SUBIDA_EXPIRA_HORAS = int(os.getenv("FOTOS_SUBIDA_EXPIRA_HORAS", "24"))
+# threads por proceso que generan miniaturas/WebP (access_ctrl/derivadas.py)
+FOTOS_DERIVADAS_WORKERS = int(os.getenv("FOTOS_DERIVADAS_WORKERS", "2"))
 
 # =======================
 # 🎨 Templates
@@ -140,6 +285,18 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    # ⚡ JSON con orjson y MessagePack con "Accept: application/msgpack" (ver config/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "config.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        *(["config.renderers.MessagePackRenderer"] if find_spec("msgpack") else []),
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "config.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        *(["config.renderers.MessagePackParser"] if find_spec("msgpack") else []),
+    ],
 }
 
 SIMPLE_JWT = {
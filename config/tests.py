@@ -0,0 +1,549 @@
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import uuid
+import warnings
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from access_ctrl import serializers_rapidos, views_async
+from access_ctrl.models import Acceso, Visita
+from access_ctrl.serializers import VisitaSerializer
+from access_ctrl.tests import InstalacionMixin, UsuariosPorRolMixin
+from accounts.models import User
+from core.models import Empresa
+
+from . import db_router, instrumentacion, perfilado, renderers
+from .instrumentacion import contar_consultas, forma_sql
+
+
+def vista_n_mas_1(request):
+    for v in Visita.objects.all():
+        list(v.prohibiciones.all())
+    return HttpResponse("ok")
+
+
+urlpatterns = [
+    path("n-mas-1/", vista_n_mas_1),
+]
+
+
+def arrancar(expresion, **entorno):
+    """Carga settings en otro proceso con ``entorno`` e imprime ``expresion``."""
+    env = {k: v for k, v in os.environ.items() if k not in (
+        "REDIS_URL", "REPLICA_DATABASE_URL", "SQLITE_REPLICA", "WEB_CONCURRENCY", "PROMETHEUS_MULTIPROC_DIR",
+    )}
+    env.update(DJANGO_SETTINGS_MODULE="config.settings", **entorno)
+    codigo = f"import os, django; django.setup(); from django.conf import settings; print({expresion})"
+    return subprocess.run([sys.executable, "-c", codigo], env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+
+
+class DetectorConsultasRepetidasTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Visita.objects.bulk_create([Visita(nombre=f"V{n}", instalacion=cls.instalacion) for n in range(6)])
+
+    def test_forma_ignora_largo_de_in(self):
+        self.assertEqual(
+            forma_sql('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            forma_sql('SELECT * FROM t  WHERE id IN (%s)'),
+        )
+
+    def test_reporta_sitio_de_la_repeticion(self):
+        instrumentacion.instalar()
+        medicion, token = instrumentacion.iniciar_medicion(detectar_repetidas=True)
+        try:
+            for v in Visita.objects.all():
+                list(v.prohibiciones.all())
+        finally:
+            instrumentacion.terminar_medicion(token)
+
+        repetidas = medicion.repetidas(umbral=5)
+        self.assertEqual(len(repetidas), 1)
+        self.assertEqual(repetidas[0]["veces"], 6)
+        self.assertIn("config/tests.py", repetidas[0]["sitio"])
+        self.assertIn("test_reporta_sitio_de_la_repeticion", repetidas[0]["sitio"])
+
+    def test_desactivado_no_agrupa(self):
+        instrumentacion.instalar()
+        medicion, token = instrumentacion.iniciar_medicion()
+        try:
+            for v in Visita.objects.all():
+                list(v.prohibiciones.all())
+        finally:
+            instrumentacion.terminar_medicion(token)
+        self.assertEqual(medicion.repetidas(umbral=2), [])
+
+    @override_settings(
+        ROOT_URLCONF="config.tests",
+        INSTRUMENTACION_DETECTAR_REPETIDAS=True,
+        INSTRUMENTACION_REPETIDAS_UMBRAL=5,
+    )
+    def test_middleware_loguea_repetidas(self):
+        with self.assertLogs("config.rendimiento", level="WARNING") as logs:
+            self.client.get("/n-mas-1/")
+
+        repetidas = [linea for linea in logs.output if "consultas_repetidas" in linea]
+        self.assertEqual(len(repetidas), 1, logs.output)
+        self.assertIn("config/tests.py", repetidas[0])
+        self.assertIn("vista_n_mas_1", repetidas[0])
+
+
+class PerfiladoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        admin_general = Empresa.objects.create(nombre="Administradora", es_administradora_general=True)
+        empresa = Empresa.objects.create(nombre="Cliente")
+        cls.superadmin = User.objects.create_user("superadmin", password="x", role="superadmin", empresa=admin_general)
+        cls.admin = User.objects.create_user("admin", password="x", role="admin", empresa=empresa)
+
+    def setUp(self):
+        self.perfiles = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.perfiles, ignore_errors=True)
+        ajustes = override_settings(PERFILES_DIR=self.perfiles)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _cliente(self, usuario):
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(usuario).access_token}")
+        return cliente
+
+    def test_superadmin_perfila_y_descarga(self):
+        cliente = self._cliente(self.superadmin)
+
+        r = cliente.get("/api/visitas/buscar/?q=ana", headers={"X-Perfilar": "1"})
+        self.assertEqual(r.status_code, 200)
+        perfil_id = r["X-Perfil-Id"]
+
+        listado = cliente.get("/api/perfiles/").json()["perfiles"]
+        self.assertEqual([p["id"] for p in listado], [perfil_id])
+        self.assertEqual(listado[0]["vista"], "buscar_visitas")
+        self.assertGreater(listado[0]["sql_consultas"], 0)
+
+        detalle = json.loads(b"".join(cliente.get(f"/api/perfiles/{perfil_id}/").streaming_content))
+        self.assertTrue(any("access_ctrl_visita" in c["sql"] for c in detalle["sql"]))
+        self.assertIn("memoria_pico_kb", detalle)
+        self.assertIn("cumulative", detalle["funciones"])
+
+        prof = cliente.get(f"/api/perfiles/{perfil_id}/?formato=prof")
+        self.assertEqual(prof.status_code, 200)
+        self.assertIn("attachment", prof["Content-Disposition"])
+
+    def test_otros_roles_no_perfilan_ni_listan(self):
+        cliente = self._cliente(self.admin)
+
+        r = cliente.get("/api/accesos/?perfilar=1")
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn("X-Perfil-Id", r)
+        self.assertEqual(cliente.get("/api/perfiles/").status_code, 401)
+        self.assertEqual(list(Path(self.perfiles).iterdir()), [])
+
+    def test_sin_pedirlo_no_autentica_ni_perfila(self):
+        with mock.patch.object(perfilado, "superadmin", wraps=perfilado.superadmin) as autenticar:
+            r = self._cliente(self.superadmin).get("/api/accesos/?q=perfilar")
+        self.assertNotIn("X-Perfil-Id", r)
+        # superadmin() sólo lo llama la vista de perfiles; el middleware ni lo intenta
+        autenticar.assert_not_called()
+
+
+class RenderersTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        visita = Visita.objects.create(rut="11111111-1", nombre="Ana", apellido="Muñoz")
+        Visita.objects.create(rut="22222222-2", nombre="Beto")
+        for n in range(3):
+            Acceso.objects.create(
+                visita=visita, instalacion=cls.instalacion, sector=cls.sector, tipo=("ingreso", "salida")[n % 2],
+                fecha_hora=timezone.now() - timedelta(hours=n, microseconds=n * 137), comentario="ñandú\u2028",
+                guardia=cls.guardia, empresa=cls.empresa,
+            )
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.guardia)
+
+    def test_orjson_igual_a_drf(self):
+        chile = timezone.get_fixed_timezone(-180)
+        data = {
+            "utc": datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.get_fixed_timezone(0)),
+            "local": datetime(2025, 1, 2, 3, 4, 5, tzinfo=chile),
+            "ingenua": datetime(2025, 1, 2, 3, 4, 5),
+            "fecha": date(2025, 1, 2),
+            "hora": time(8, 30),
+            "duracion": timedelta(minutes=90),
+            "monto": Decimal("1234.50"),
+            "uuid": uuid.UUID(int=7),
+            "texto": gettext_lazy("Acceso prohibido"),
+            "unicode": "ñandú \u2028 \u2029 😀",
+            "anidado": [{"n": 1, "ok": True, "nada": None}, ("tupla", 2.5)],
+            1: "clave entera",
+            "grande": 2 ** 70,
+        }
+        drf = JSONRenderer()
+        self.assertEqual(renderers.ORJSONRenderer().render(data), drf.render(data))
+        self.assertEqual(
+            renderers.ORJSONRenderer().render(data, "application/json; indent=2"),
+            drf.render(data, "application/json; indent=2"),
+        )
+        self.assertEqual(renderers.ORJSONRenderer().render(None), b"")
+
+    def test_listado_json(self):
+        r = self.cliente.get("/api/accesos/")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["Content-Type"], "application/json")
+        self.assertEqual(r.content, JSONRenderer().render(json.loads(r.content)))
+
+    @skipUnless(renderers.msgpack, "msgpack no está instalado")
+    def test_msgpack_por_accept(self):
+        esperado = self.cliente.get("/api/accesos/").json()
+        r = self.cliente.get("/api/accesos/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(r.content), esperado)
+        self.assertLess(len(r.content), len(JSONRenderer().render(esperado)))
+
+        token = str(RefreshToken.for_user(self.guardia).access_token)
+        request = AsyncRequestFactory().get(
+            "/api/enrolamiento/sectores/", headers={"authorization": f"Bearer {token}", "accept": "application/msgpack"},
+        )
+        r = async_to_sync(views_async.sectores_disponibles)(request)
+        self.assertEqual(r["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(r.content), [{"id": self.sector.id, "nombre": "Bodega"}])
+
+    @skipUnless(renderers.msgpack, "msgpack no está instalado")
+    def test_parser_msgpack(self):
+        cuerpo = {"personas": [{"documento": "11111111-1"}, {"documento": "22222222-2"}], "sector_id": self.sector.id}
+        r = self.cliente.post(
+            "/api/accesos/salida-grupo/", renderers.msgpack.packb(cuerpo), content_type="application/msgpack",
+        )
+        self.assertEqual(r.status_code, 201, r.content)
+        self.assertEqual([x["resultado"] for x in r.json()["resultados"]], ["salida_ok", "no_hay_ingreso_abierto"])
+
+        r = self.cliente.post("/api/accesos/salida-grupo/", b"\xc1", content_type="application/msgpack")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("MessagePack", r.json()["detail"])
+
+
+class ReplicaRouterTests(InstalacionMixin, TestCase):
+    """Lecturas a la réplica en las vistas marcadas y fijación a la primaria tras escribir."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Visita.objects.create(rut="12345678-5", nombre="Ana")
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.guardia)
+
+        # en los tests no hay alias "replica": se anota adónde iría cada lectura y se lee de la primaria
+        self.lecturas = []
+        original = db_router.ReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            self.lecturas.append(original(router, model, **hints))
+            return None
+
+        for patcher in (
+            mock.patch.object(db_router, "replica_configurada", return_value=True),
+            mock.patch.object(db_router.ReplicaRouter, "db_for_read", db_for_read),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _listar(self):
+        self.lecturas.clear()
+        r = self.cliente.get("/api/accesos/")
+        self.assertEqual(r.status_code, 200, r.content)
+        return set(self.lecturas)
+
+    def test_vista_marcada_lee_de_la_replica(self):
+        self.assertIn(db_router.REPLICA_DB_ALIAS, self._listar())
+        # las vistas sin el mixin siguen en la primaria
+        self.lecturas.clear()
+        self.cliente.get("/api/visitas/buscar-rut/12345678-5/")
+        self.assertNotIn(db_router.REPLICA_DB_ALIAS, self.lecturas)
+
+    def test_tras_escribir_lee_de_la_primaria(self):
+        r = self.cliente.post(
+            "/api/accesos/ingreso-grupo/", {"personas": [{"documento": "12345678-5"}], "sector_id": self.sector.id},
+            format="json",
+        )
+        self.assertEqual(r.status_code, 201, r.content)
+
+        # la fijación queda en el caché compartido: la ve cualquier worker
+        self.assertTrue(cache.get(db_router._clave_fijacion(self.guardia.pk)))
+        self.assertNotIn(db_router.REPLICA_DB_ALIAS, self._listar())
+
+        cache.delete(db_router._clave_fijacion(self.guardia.pk))
+        self.assertIn(db_router.REPLICA_DB_ALIAS, self._listar())
+
+    def test_lectura_no_fija(self):
+        self._listar()
+        self.assertFalse(db_router.fijado_a_primaria(self.guardia))
+
+    def _cache_con(self, **entorno):
+        return arrancar("settings.CACHES['default']['BACKEND']", **entorno)
+
+    def test_varios_workers_sin_redis(self):
+        # sin réplica arranca con el caché en disco, compartido entre los workers del host
+        r = self._cache_con(WEB_CONCURRENCY="3")
+        self.assertEqual(r.stdout.strip(), "django.core.cache.backends.filebased.FileBasedCache", r.stderr)
+        self.assertEqual(self._cache_con().stdout.strip(), "django.core.cache.backends.locmem.LocMemCache")
+
+        # con réplica la fijación a la primaria necesita Redis
+        r = self._cache_con(WEB_CONCURRENCY="3", SQLITE_REPLICA="replica.sqlite3")
+        self.assertNotEqual(r.returncode, 0)
+        self.assertIn("REDIS_URL", r.stderr)
+
+
+@skipUnless(connection.vendor == "sqlite", "la réplica de prueba es un segundo archivo SQLite")
+class ReplicaSqliteTests(InstalacionMixin, TestCase):
+    """
+    Primaria y réplica en dos archivos SQLite, sin simular el router. El
+    alias se agrega después de que TestCase preparó sus bases (el runner no
+    lo conoce) y se quita antes de que las suelte.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        directorio = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        replica = {**connections["default"].settings_dict, "NAME": os.path.join(directorio, "replica.sqlite3")}
+        cls.ajustes = override_settings(DATABASES={**settings.DATABASES, db_router.REPLICA_DB_ALIAS: replica})
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # "Overriding setting DATABASES can lead to unexpected behavior"
+            cls.ajustes.enable()
+        connections.settings[db_router.REPLICA_DB_ALIAS] = replica
+        cls.databases = cls.databases | {db_router.REPLICA_DB_ALIAS}
+        call_command("migrate", database=db_router.REPLICA_DB_ALIAS, verbosity=0)
+
+        ana = Visita.objects.create(nombre="Ana", instalacion=cls.instalacion)
+        # la réplica tiene lo que ya se replicó, más una visita propia para distinguir de dónde se leyó
+        for obj in (cls.empresa, cls.instalacion, cls.sector, ana):
+            obj.save(using=db_router.REPLICA_DB_ALIAS, force_insert=True)
+        Visita.objects.using(db_router.REPLICA_DB_ALIAS).create(nombre="Replicada", instalacion_id=cls.instalacion.id)
+        # y lo que todavía no llega
+        Visita.objects.create(nombre="Reciente", instalacion=cls.instalacion)
+
+    @classmethod
+    def tearDownClass(cls):
+        # antes que TestCase, que espera encontrar sólo las bases que preparó
+        connections[db_router.REPLICA_DB_ALIAS].close()
+        del connections[db_router.REPLICA_DB_ALIAS]
+        connections.settings.pop(db_router.REPLICA_DB_ALIAS)
+        del cls.databases
+        cls.ajustes.disable()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.guardia)
+
+    def _nombres(self, url):
+        r = self.cliente.get(url)
+        self.assertEqual(r.status_code, 200, r.content)
+        return {v["nombre"] for v in r.json()}
+
+    def test_vistas_marcadas_leen_de_la_replica(self):
+        self.assertEqual(self._nombres(f"/api/instalaciones/{self.instalacion.id}/visitas/"), {"Ana", "Replicada"})
+        self.assertEqual(self._nombres("/api/enrolamiento/personas/"), {"Ana", "Replicada"})
+        # las vistas sin marcar leen de la primaria
+        self.assertEqual(
+            {s["nombre"] for s in self.cliente.get("/api/enrolamiento/sectores/").json()}, {"Bodega"},
+        )
+        self.assertFalse(Visita.objects.filter(nombre="Replicada").exists())
+
+    def test_tras_escribir_lee_de_la_primaria(self):
+        r = self.cliente.post(
+            "/api/accesos/ingreso/", {"rut": "12345678-5", "nombre": "Beto", "sector_id": self.sector.id},
+            format="json",
+        )
+        self.assertEqual(r.status_code, 201, r.content)
+        self.assertEqual(
+            self._nombres(f"/api/instalaciones/{self.instalacion.id}/visitas/"), {"Ana", "Reciente", "Beto"},
+        )
+
+
+class InstrumentacionTests(InstalacionMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Visita.objects.bulk_create([Visita(nombre=f"V{n}", instalacion=cls.instalacion) for n in range(6)])
+        cls.admin = User.objects.create_user("admin", password="x", role="admin", empresa=cls.empresa)
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.admin)
+
+    def test_server_timing(self):
+        with contar_consultas() as consultas:
+            r = self.cliente.get(f"/api/instalaciones/{self.instalacion.id}/visitas/")
+        self.assertEqual(r.status_code, 200, r.content)
+        partes = re.fullmatch(
+            r'db;dur=[\d.]+;desc="(\d+) consultas", ser;dur=[\d.]+, vista;dur=[\d.]+, total;dur=[\d.]+',
+            r["Server-Timing"],
+        )
+        self.assertIsNotNone(partes, r["Server-Timing"])
+        self.assertEqual(int(partes.group(1)), len(consultas))
+
+        with override_settings(INSTRUMENTACION_SERVER_TIMING=False):
+            self.assertNotIn("Server-Timing", self.cliente.get(f"/api/instalaciones/{self.instalacion.id}/visitas/"))
+
+    def test_el_render_cuenta_como_serializacion(self):
+        # sin parchear DRF: lo mide el renderer
+        self.assertFalse(hasattr(VisitaSerializer.data.fget, "_instrumentado"))
+        medicion, token = instrumentacion.iniciar_medicion()
+        try:
+            renderers.ORJSONRenderer().render([{"n": n, "fecha": timezone.now()} for n in range(2000)])
+        finally:
+            instrumentacion.terminar_medicion(token)
+        self.assertGreater(medicion.serializer_segundos, 0)
+
+    def test_serializer_data_cuenta_como_serializacion(self):
+        with mock.patch.object(
+            instrumentacion, "midiendo_serializacion", wraps=instrumentacion.midiendo_serializacion,
+        ) as medir:
+            data = VisitaSerializer(Visita.objects.all(), many=True).data
+        self.assertEqual(len(data), 6)
+        # la lista una vez, no cada hijo
+        medir.assert_called_once_with()
+
+    def test_el_sql_no_cuenta_como_serializacion(self):
+        medicion, token = instrumentacion.iniciar_medicion()
+        try:
+            with mock.patch.object(instrumentacion, "perf_counter", side_effect=[0.0, 10.0]):
+                with instrumentacion.midiendo_serializacion():
+                    medicion.registrar_sql("SELECT 1", 3.0)
+        finally:
+            instrumentacion.terminar_medicion(token)
+        self.assertEqual(medicion.serializer_segundos, 7.0)
+
+        # la serialización rápida consulta antes de empezar a medir
+        Acceso.objects.create(
+            visita=Visita.objects.first(), instalacion=self.instalacion, sector=self.sector, tipo="ingreso",
+            fecha_hora=timezone.now(), guardia=self.guardia, empresa=self.empresa,
+        )
+        consultas_adentro = []
+
+        @contextmanager
+        def midiendo():
+            with contar_consultas() as consultas:
+                yield
+            consultas_adentro.append(len(consultas))
+
+        with mock.patch.object(serializers_rapidos, "midiendo_serializacion", midiendo):
+            self.assertEqual(len(serializers_rapidos.serializar_accesos(Acceso.objects.all())), 1)
+        self.assertEqual(consultas_adentro, [0])
+
+    def test_log_en_debug_salvo_las_lentas(self):
+        url = f"/api/instalaciones/{self.instalacion.id}/visitas/"
+        with self.assertNoLogs("config.rendimiento", level="INFO"):
+            self.cliente.get(url)
+
+        logger = logging.getLogger("config.rendimiento")
+        nivel = logger.level
+        logger.setLevel(logging.DEBUG)
+        self.addCleanup(logger.setLevel, nivel)
+        with self.assertLogs("config.rendimiento", level="DEBUG") as logs:
+            self.cliente.get(url)
+        self.assertEqual([r.levelname for r in logs.records], ["DEBUG"])
+
+        with override_settings(INSTRUMENTACION_LENTO_MS=0), self.assertLogs("config.rendimiento") as logs:
+            self.cliente.get(url)
+        self.assertEqual([r.levelname for r in logs.records], ["WARNING"])
+        self.assertIn("consultas_lentas", logs.output[0])
+
+    @override_settings(
+        ROOT_URLCONF="config.tests",
+        INSTRUMENTACION_DETECTAR_REPETIDAS=True,
+        INSTRUMENTACION_REPETIDAS_UMBRAL=7,
+    )
+    def test_repetidas_bajo_el_umbral_no_se_reportan(self):
+        with self.assertNoLogs("config.rendimiento", level="WARNING"):
+            self.client.get("/n-mas-1/")
+
+
+class MetricasTests(UsuariosPorRolMixin, TestCase):
+    def setUp(self):
+        self.visita = Visita.objects.create(rut="12345678-5", nombre="Ana")
+
+    def _metrics(self, autorizacion=None):
+        headers = {"authorization": autorizacion} if autorizacion else {}
+        return self.client.get("/metrics", headers=headers)
+
+    def _jwt(self, rol):
+        return f"Bearer {RefreshToken.for_user(self.usuarios[rol]).access_token}"
+
+    @override_settings(METRICS_TOKEN="secreto")
+    def test_token_de_prometheus(self):
+        r = self._metrics("Bearer secreto")
+        self.assertEqual(r.status_code, 200)
+        self.assertIn(b"inout_peticiones_total", r.content)
+        self.assertEqual(self._metrics("Bearer otro").status_code, 401)
+
+    def test_jwt_de_superadmin(self):
+        self.assertEqual(self._metrics(self._jwt("superadmin")).status_code, 200)
+        for rol in ("guardia", "admin"):
+            r = self._metrics(self._jwt(rol))
+            self.assertEqual(r.status_code, 401, rol)
+            self.assertEqual(r.content, b"No autorizado\n")
+
+    def test_sin_credenciales_ni_token_configurado(self):
+        # METRICS_TOKEN vacío no habilita "Bearer "
+        self.assertEqual(self._metrics().status_code, 401)
+        self.assertEqual(self._metrics("Bearer ").status_code, 401)
+
+    def test_resultados_de_porteria(self):
+        def valor(resultado):
+            return REGISTRY.get_sample_value("inout_gate_resultados_total", {"resultado": resultado}) or 0
+
+        antes = {r: valor(r) for r in ("ingreso_ok", "visita_ya_adentro", "salida_ok", "no_hay_ingreso_abierto")}
+        cliente = APIClient()
+        cliente.force_authenticate(self.guardia)
+        cuerpo = {"rut": "12345678-5", "sector_id": self.sector.id, "instalacion_id": self.instalacion.id}
+        for url, status in (
+            ("/api/accesos/ingreso/", 201), ("/api/accesos/ingreso/", 409),
+            ("/api/accesos/salida/", 201), ("/api/accesos/salida/", 409),
+        ):
+            self.assertEqual(cliente.post(url, cuerpo, format="json").status_code, status, url)
+
+        self.assertEqual({r: valor(r) - v for r, v in antes.items()}, dict.fromkeys(antes, 1))
+        texto = self._metrics(self._jwt("superadmin")).content.decode()
+        self.assertIn('inout_gate_resultados_total{resultado="salida_ok"}', texto)
+
+    def test_varios_workers_usan_el_directorio_multiproceso(self):
+        r = arrancar("os.environ.get('PROMETHEUS_MULTIPROC_DIR')", WEB_CONCURRENCY="3")
+        directorio = Path(r.stdout.strip())
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.assertTrue(directorio.is_dir(), r.stderr)
+        self.assertEqual(arrancar("os.environ.get('PROMETHEUS_MULTIPROC_DIR')").stdout.strip(), "None")
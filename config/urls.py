@@ -15,13 +15,46 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from django.urls import path, re_path, include
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+from access_ctrl.views_fotos import servir_derivada, servir_foto
+from config.metricas import metrics_view
+from config.perfilado import descargar_perfil_view, perfiles_view
+
+
+def vista_diferida(ruta, **initkwargs):
+    """
+    Vista de clase que recién se importa en el primer pedido. Para la
+    documentación de la API (drf-spectacular), que casi nadie pide y cuesta
+    importarla en cada worker.
+    """
+    vista = None
+
+    def diferida(request, *args, **kwargs):
+        nonlocal vista
+        if vista is None:
+            vista = import_string(ruta).as_view(**initkwargs)
+        return vista(request, *args, **kwargs)
+
+    return csrf_exempt(diferida)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema")),
+    path("metrics", metrics_view, name="metrics"),
+    re_path(
+        r"^media/fotos/(?P<prefijo>[0-9a-f]{2})/(?P<sha256>[0-9a-f]{64})\.(?P<extension>jpg|png|webp)$",
+        servir_foto, name="servir_foto",
+    ),
+    re_path(
+        r"^media/fotos/derivadas/(?P<prefijo>[0-9a-f]{2})/(?P<sha256>[0-9a-f]{64})_(?P<variante>mini|media|webp)\.webp$",
+        servir_derivada, name="servir_derivada",
+    ),
+    path("api/perfiles/", perfiles_view, name="perfiles"),
+    path("api/perfiles/<str:perfil_id>/", descargar_perfil_view, name="descargar_perfil"),
+    path("api/schema/", vista_diferida("drf_spectacular.views.SpectacularAPIView"), name="schema"),
+    path("api/docs/", vista_diferida("drf_spectacular.views.SpectacularSwaggerView", url_name="schema")),
     path("api/", include("core.urls")),
     path("api/", include("accounts.urls")),
     path('api/', include('access_ctrl.urls')),  # ✅ Asegúrate de tener esta línea
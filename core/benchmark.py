@@ -0,0 +1,318 @@
+"""
+Benchmark de los endpoints principales sobre un dataset sintético.
+
+Cada caso se ejecuta primero una vez con ``tracemalloc`` y captura de SQL
+(memoria pico y cantidad de consultas) y después ``iteraciones`` veces sin
+instrumentación extra para medir la latencia. Las peticiones pasan por todo
+el stack (middleware, autenticación JWT, serialización) con el cliente de
+pruebas de Django.
+
+Ver ``python manage.py benchmark_endpoints --help``.
+"""
+import json
+import logging
+import platform
+import random
+import statistics
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import perf_counter
+from typing import Callable
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from access_ctrl.models import Visita
+from config.instrumentacion import contar_consultas
+from core.seeding import cargar_dataset, crear_estructura, formatear_rut, generar_accesos, generar_visitas
+
+# métricas en las que un aumento es una regresión
+METRICAS_COMPARADAS = ("p95_ms", "consultas", "memoria_pico_kb")
+
+
+@dataclass
+class Caso:
+    nombre: str
+    usuario: str  # guardia | admin | superadmin
+    peticion: Callable  # (contexto) -> (url, data)
+    metodo: str = "get"
+    status_esperado: tuple = (200,)
+
+
+@dataclass
+class Contexto:
+    """Lo que necesitan los casos para armar peticiones variadas pero reproducibles."""
+    dataset: object
+    rnd: random.Random
+    instalacion_id: int = None
+    sector_id: int = None
+    clientes: dict = field(default_factory=dict)
+    # muestras de visitas existentes
+    ruts: list = field(default_factory=list)
+    dnis: list = field(default_factory=list)
+    apellidos: list = field(default_factory=list)
+    ruts_adentro: list = field(default_factory=list)
+    siguiente_rut: int = 90_000_000
+
+    def elegir(self, valores):
+        return self.rnd.choice(valores) if valores else "sin-datos"
+
+    def rut_nuevo(self):
+        self.siguiente_rut += 1
+        return formatear_rut(self.siguiente_rut)
+
+
+def _ingreso(ctx):
+    rut = ctx.rut_nuevo()
+    ctx.ruts_adentro.append(rut)
+    return "/api/accesos/ingreso/", {
+        "rut": rut, "nombre": "Bench", "apellido": "Ingreso", "sector_id": ctx.sector_id,
+    }
+
+
+def _salida(ctx):
+    return "/api/accesos/salida/", {
+        "rut": ctx.ruts_adentro.pop(), "instalacion_id": ctx.instalacion_id, "sector_id": ctx.sector_id,
+    }
+
+
+def _mes_actual(detalle):
+    def peticion(ctx):
+        hoy = timezone.localdate()
+        url = f"/api/accesos/por-mes/?year={hoy.year}&month={hoy.month}"
+        return (url + "&detail=1" if detalle else url), None
+    return peticion
+
+
+CASOS = [
+    Caso("accesos_lista", "guardia", lambda ctx: ("/api/accesos/", None)),
+    Caso("accesos_ultimas_24h", "admin", lambda ctx: ("/api/accesos/ultimas-24h/", None)),
+    Caso("accesos_dia_curso", "guardia", lambda ctx: ("/api/accesos/dia-curso/", None)),
+    Caso("accesos_por_mes", "admin", _mes_actual(detalle=False)),
+    Caso("accesos_por_mes_detalle", "admin", _mes_actual(detalle=True)),
+    Caso("visitas_buscar", "superadmin", lambda ctx: (f"/api/visitas/buscar/?q={ctx.elegir(ctx.apellidos)[:4]}", None)),
+    Caso(
+        "visitas_por_instalacion", "guardia",
+        lambda ctx: (f"/api/instalaciones/{ctx.instalacion_id}/visitas/?q={ctx.elegir(ctx.apellidos)[:4]}", None),
+    ),
+    Caso("buscar_rut", "guardia", lambda ctx: (f"/api/visitas/buscar-rut/{ctx.elegir(ctx.ruts)}/", None), status_esperado=(200, 403)),
+    Caso("buscar_dni", "guardia", lambda ctx: (f"/api/visitas/buscar-dni/{ctx.elegir(ctx.dnis)}/", None), status_esperado=(200, 403)),
+    Caso("buscar_ultimo", "guardia", lambda ctx: (f"/api/accesos/buscar-ultimo/{ctx.elegir(ctx.ruts)}/", None), status_esperado=(200, 404, 409)),
+    Caso("sectores_disponibles", "guardia", lambda ctx: ("/api/enrolamiento/sectores/", None)),
+    Caso("enrolados", "guardia", lambda ctx: ("/api/enrolamiento/personas/", None)),
+    Caso("permanencias_resumen", "admin", lambda ctx: ("/api/permanencias/resumen/?agrupar=sector", None)),
+    Caso("permanencias_excedidas", "admin", lambda ctx: ("/api/permanencias/excedidas/", None)),
+    Caso("ingreso", "guardia", _ingreso, metodo="post", status_esperado=(201,)),
+    Caso("salida", "guardia", _salida, metodo="post", status_esperado=(201,)),
+]
+
+
+@contextmanager
+def base_de_prueba(keepdb=False, sqlite_path=None):
+    """
+    Crea la base de prueba y apunta ``connection`` a ella mientras dura el
+    bloque. En SQLite es un archivo (``benchmark.sqlite3`` por defecto): la
+    base en memoria no sirve para millones de filas ni para otros procesos.
+    """
+    if connection.vendor == "sqlite":
+        connection.settings_dict["TEST"]["NAME"] = sqlite_path or str(settings.BASE_DIR / "benchmark.sqlite3")
+
+    # la réplica apunta a datos reales: todo se lee de la base de prueba
+    replica = settings.DATABASES.pop("replica", None)
+    rendimiento = logging.getLogger("config.rendimiento")
+    nivel = rendimiento.level
+    rendimiento.setLevel(logging.ERROR)
+
+    setup_test_environment()
+    nombre_original = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+        rendimiento.setLevel(nivel)
+        if replica is not None:
+            settings.DATABASES["replica"] = replica
+
+
+def preparar_dataset(instalaciones, visitas, accesos, dias, seed, keepdb=False, stdout=None, progreso=None):
+    """Dataset sintético en la base de prueba; con ``keepdb`` reutiliza el de una corrida anterior."""
+    ds = cargar_dataset(seed) if keepdb else None
+    if ds is not None:
+        if stdout:
+            stdout.write(f"Reutilizando dataset: {len(ds.visitas)} visitas, {ds.accesos} accesos")
+        return ds
+
+    if stdout:
+        stdout.write("Generando dataset...")
+    ds = crear_estructura(instalaciones=instalaciones, seed=seed)
+    generar_visitas(ds, visitas, seed=seed, progreso=progreso)
+    generar_accesos(ds, accesos, dias=dias, seed=seed, progreso=progreso)
+    return ds
+
+
+def percentiles(latencias):
+    if len(latencias) < 2:
+        valor = latencias[0] if latencias else 0.0
+        return valor, valor, valor
+    cortes = statistics.quantiles(latencias, n=100, method="inclusive")
+    return cortes[49], cortes[94], cortes[98]
+
+
+def _cliente(usuario):
+    token = RefreshToken.for_user(usuario).access_token
+    return Client(headers={"authorization": f"Bearer {token}"})
+
+
+def _preparar_contexto(ds, seed):
+    rnd = random.Random(seed)
+    ids = [ds.visitas[rnd.randrange(len(ds.visitas))] for _ in range(min(200, len(ds.visitas)))]
+    ctx = Contexto(dataset=ds, rnd=rnd)
+    for rut, dni, apellido in Visita.objects.filter(id__in=ids).values_list("rut", "dni_extranjero", "apellido"):
+        if rut:
+            ctx.ruts.append(rut)
+        if dni:
+            ctx.dnis.append(dni)
+        ctx.apellidos.append(apellido or "")
+
+    # guardia y admin de la primera instalación: el peor caso es similar en todas
+    ctx.instalacion_id = ds.instalaciones[0]
+    ctx.sector_id = ds.sectores[ctx.instalacion_id][0]
+    guardia = ds.guardias[ctx.instalacion_id]
+    ctx.clientes = {
+        "guardia": _cliente(guardia),
+        "admin": _cliente(ds.admins[guardia.empresa_id]),
+        "superadmin": _cliente(ds.superadmin),
+    }
+    return ctx
+
+
+def _ejecutar(ctx, caso):
+    url, data = caso.peticion(ctx)
+    cliente = ctx.clientes[caso.usuario]
+    if caso.metodo == "post":
+        return cliente.post(url, data=data, content_type="application/json")
+    return cliente.get(url)
+
+
+def medir_caso(ctx, caso, iteraciones):
+    # 1) una pasada instrumentada: memoria pico y consultas
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        with contar_consultas() as consultas:
+            response = _ejecutar(ctx, caso)
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # 2) latencia sin instrumentación extra
+    latencias = []
+    errores = 0 if response.status_code in caso.status_esperado else 1
+    for _ in range(iteraciones):
+        inicio = perf_counter()
+        r = _ejecutar(ctx, caso)
+        latencias.append((perf_counter() - inicio) * 1000)
+        if r.status_code not in caso.status_esperado:
+            errores += 1
+
+    p50, p95, p99 = percentiles(latencias)
+    return {
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+        "media_ms": round(statistics.fmean(latencias), 3) if latencias else 0.0,
+        "consultas": len(consultas),
+        "memoria_pico_kb": round(pico / 1024, 1),
+        "status": response.status_code,
+        "bytes": len(response.content),
+        "errores": errores,
+    }
+
+
+def correr(ds, iteraciones=30, casos=None, seed=1, salida=None):
+    """
+    Corre los casos (todos o los nombrados en ``casos``) y devuelve el
+    resultado serializable a JSON. ``salida`` recibe (nombre, resultado).
+    """
+    ctx = _preparar_contexto(ds, seed)
+    seleccion = [c for c in CASOS if not casos or c.nombre in casos]
+
+    # la salida necesita ingresos abiertos
+    if any(c.nombre == "salida" for c in seleccion):
+        ingreso = next(c for c in CASOS if c.nombre == "ingreso")
+        while len(ctx.ruts_adentro) < iteraciones + 1:
+            _ejecutar(ctx, ingreso)
+
+    resultados = {}
+    for caso in seleccion:
+        resultados[caso.nombre] = medir_caso(ctx, caso, iteraciones)
+        if salida:
+            salida(caso.nombre, resultados[caso.nombre])
+
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "motor": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "iteraciones": iteraciones,
+            "seed": seed,
+            "dataset": {
+                "instalaciones": len(ds.instalaciones),
+                "visitas": len(ds.visitas),
+                "accesos": ds.accesos,
+            },
+        },
+        "resultados": resultados,
+    }
+
+
+def guardar(resultado, ruta):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+def cargar(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def comparar(base, actual, umbral=0.2, tolerancia_ms=1.0, tolerancia_kb=64):
+    """
+    Compara dos corridas. Una métrica es regresión si crece más que ``umbral``
+    (fracción); latencia y memoria además deben crecer más de ``tolerancia_ms``
+    / ``tolerancia_kb`` para no marcar ruido en endpoints chicos. Las consultas
+    SQL son deterministas: cualquier aumento es regresión.
+    """
+    filas = []
+    for nombre, res in actual["resultados"].items():
+        anterior = base["resultados"].get(nombre)
+        if not anterior:
+            continue
+        for metrica in METRICAS_COMPARADAS:
+            antes, ahora = anterior[metrica], res[metrica]
+            delta = (ahora - antes) / antes if antes else (1.0 if ahora else 0.0)
+            if metrica == "consultas":
+                regresion = ahora > antes
+            elif metrica == "p95_ms":
+                regresion = delta > umbral and ahora - antes > tolerancia_ms
+            else:
+                regresion = delta > umbral and ahora - antes > tolerancia_kb
+            filas.append({
+                "endpoint": nombre,
+                "metrica": metrica,
+                "base": antes,
+                "actual": ahora,
+                "delta": round(delta, 4),
+                "regresion": regresion,
+            })
+    return filas
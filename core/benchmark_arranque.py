@@ -0,0 +1,165 @@
+"""
+Costo de arranque de la aplicación: cuánto tarda un proceso nuevo en importar
+todo (``django.setup()`` + resolver de URLs, que es lo que hace un worker al
+cargar ``config.wsgi``) y cuánta memoria queda ocupando, más el RSS de cada
+worker de gunicorn ya levantado.
+
+Se corre en procesos nuevos para no medir lo que este proceso ya importó.
+Para comparar antes/después se guarda el JSON de una corrida y se pasa con
+``--comparar`` en la siguiente. Ver ``python manage.py benchmark_arranque --help``.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from http.client import HTTPConnection
+from time import monotonic, sleep
+
+from django.conf import settings
+
+from core.benchmark_concurrencia import HOST, Servidor, _hijos, rss_mb
+
+# dependencias que no deberían cargarse hasta que un endpoint las use
+PESADOS = ("openpyxl", "PIL.Image", "drf_spectacular.views")
+
+_SCRIPT = """
+import json, os, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t2 = time.perf_counter()
+with open("/proc/self/status") as f:
+    rss_kb = int(f.read().split("VmRSS:")[1].split()[0])
+print(json.dumps({
+    "setup_s": t1 - t0,
+    "urls_s": t2 - t1,
+    "rss_mb": rss_kb / 1024,
+    "modulos": len(sys.modules),
+    "pesados": [m for m in json.loads(sys.argv[1]) if m in sys.modules],
+}))
+"""
+
+
+def _entorno():
+    entorno = dict(os.environ)
+    entorno.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    entorno["PYTHONPATH"] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), entorno.get("PYTHONPATH")]))
+    return entorno
+
+
+def medir_importacion(repeticiones=5):
+    """Mediana de ``repeticiones`` procesos nuevos importando la aplicación."""
+    corridas = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", _SCRIPT, json.dumps(PESADOS)], cwd=settings.BASE_DIR,
+            env=_entorno(), capture_output=True, text=True, check=True,
+        )
+        corridas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+    def mediana(clave, decimales):
+        return round(statistics.median(c[clave] for c in corridas), decimales)
+
+    return {
+        "setup_ms": round(mediana("setup_s", 6) * 1000, 1),
+        "urls_ms": round(mediana("urls_s", 6) * 1000, 1),
+        "rss_mb": mediana("rss_mb", 1),
+        "modulos": int(mediana("modulos", 0)),
+        "pesados": corridas[-1]["pesados"],
+    }
+
+
+def _calentar(puerto, pedidos, rondas=5):
+    """
+    Ráfagas de pedidos simultáneos para que cada worker sync atienda al menos
+    uno: Django recién carga las URLs (y lo que importan las vistas) en el
+    primer pedido.
+    """
+    def pedir():
+        conn = HTTPConnection(HOST, puerto, timeout=30)
+        try:
+            conn.request("GET", "/api/enrolamiento/sectores/")
+            conn.getresponse().read()
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    for _ in range(rondas):
+        hilos = [threading.Thread(target=pedir) for _ in range(pedidos)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        sleep(0.2)
+
+
+def _rss_workers(pid, workers, espera):
+    """RSS de cada worker, una vez que aparecieron todos y dejaron de crecer."""
+    limite = monotonic() + espera
+    anterior = None
+    while monotonic() < limite:
+        actual = sorted(rss_mb(hijo) for hijo in _hijos(pid))
+        if len(actual) == workers and actual == anterior:
+            return actual
+        anterior = actual
+        sleep(0.5)
+    return anterior or []
+
+
+def medir_workers(workers=3, espera=30):
+    """Levanta gunicorn como en producción y mide el arranque y la memoria de cada worker."""
+    servidor = Servidor("sync", workers)
+    inicio = monotonic()
+    servidor.iniciar(espera=espera)
+    primera_respuesta = monotonic() - inicio
+    try:
+        _calentar(servidor.puerto, workers * 8)
+        por_worker = _rss_workers(servidor.proceso.pid, workers, espera)
+        total = rss_mb(servidor.proceso.pid)
+    finally:
+        servidor.detener()
+
+    return {
+        "workers": workers,
+        "primera_respuesta_s": round(primera_respuesta, 2),
+        "rss_por_worker_mb": por_worker,
+        "rss_worker_medio_mb": round(statistics.mean(por_worker), 1) if por_worker else 0.0,
+        "rss_total_mb": total,
+    }
+
+
+def correr(repeticiones=5, workers=3, con_gunicorn=True):
+    resultado = {"importacion": medir_importacion(repeticiones)}
+    if con_gunicorn:
+        resultado["gunicorn"] = medir_workers(workers)
+    return resultado
+
+
+METRICAS_COMPARADAS = (
+    ("importacion", "setup_ms"),
+    ("importacion", "urls_ms"),
+    ("importacion", "rss_mb"),
+    ("importacion", "modulos"),
+    ("gunicorn", "primera_respuesta_s"),
+    ("gunicorn", "rss_worker_medio_mb"),
+    ("gunicorn", "rss_total_mb"),
+)
+
+
+def comparar(base, actual):
+    """Filas ``(metrica, antes, despues, cambio_relativo)`` presentes en las dos corridas."""
+    filas = []
+    for seccion, clave in METRICAS_COMPARADAS:
+        antes = base.get(seccion, {}).get(clave)
+        despues = actual.get(seccion, {}).get(clave)
+        if antes is None or despues is None:
+            continue
+        cambio = (despues - antes) / antes if antes else 0.0
+        filas.append((f"{seccion}.{clave}", antes, despues, cambio))
+    return filas
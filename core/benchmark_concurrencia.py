@@ -0,0 +1,260 @@
+"""
+Throughput con peticiones concurrentes de las consultas de portería en los
+dos despliegues: WSGI (gunicorn, workers sync y vistas DRF) y ASGI (uvicorn
+con ``GATE_VISTAS_ASYNC=1``).
+
+Los dos levantan la misma cantidad de procesos, así que comparan a igual
+memoria; igual se mide el RSS de todo el árbol de procesos al terminar y se
+reporta ``rps_por_100mb``. La carga la genera un pool de threads con
+conexiones keep-alive, cada una con un pedido en vuelo.
+
+Ver ``python manage.py benchmark_concurrencia --help``.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from http.client import HTTPConnection
+from time import monotonic, perf_counter, sleep
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmark import _preparar_contexto, percentiles
+
+HOST = "127.0.0.1"
+
+
+def _comando(modo, puerto, workers):
+    if modo == "sync":
+        return [
+            sys.executable, "-m", "gunicorn", "config.wsgi:application",
+            "-c", "config/gunicorn_conf.py", "--worker-class", "sync", "--workers", str(workers),
+            "--bind", f"{HOST}:{puerto}",
+        ]
+    return [
+        sys.executable, "-m", "uvicorn", "config.asgi:application", "--workers", str(workers),
+        "--host", HOST, "--port", str(puerto), "--no-access-log", "--log-level", "warning",
+    ]
+
+
+MODOS = ("sync", "async")
+
+
+def url_base_de_datos(settings_dict):
+    """DATABASE_URL de la base de prueba, para que los servidores la usen."""
+    if settings_dict["ENGINE"].endswith("sqlite3"):
+        return f"sqlite:///{os.path.abspath(settings_dict['NAME'])}"
+
+    usuario = quote(settings_dict.get("USER") or "", safe="")
+    clave = quote(settings_dict.get("PASSWORD") or "", safe="")
+    credenciales = f"{usuario}:{clave}@" if usuario else ""
+    puerto = f":{settings_dict['PORT']}" if settings_dict.get("PORT") else ""
+    return f"postgres://{credenciales}{settings_dict.get('HOST') or 'localhost'}{puerto}/{settings_dict['NAME']}"
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def _hijos(pid):
+    hijos = []
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                # el nombre del proceso va entre paréntesis y puede tener espacios
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            hijos.append(int(entrada))
+    return hijos
+
+
+def rss_mb(pid):
+    """RSS del proceso y todos sus descendientes (Linux)."""
+    total_kb = 0
+    pendientes = [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            with open(f"/proc/{actual}/status") as f:
+                for linea in f:
+                    if linea.startswith("VmRSS:"):
+                        total_kb += int(linea.split()[1])
+                        break
+        except OSError:
+            continue
+        pendientes.extend(_hijos(actual))
+    return round(total_kb / 1024, 1)
+
+
+class Servidor:
+    """Un despliegue levantado como subproceso apuntando a la base de prueba."""
+
+    def __init__(self, modo, workers):
+        self.modo = modo
+        self.workers = workers
+        self.puerto = _puerto_libre()
+        self.proceso = None
+        self.dir_metricas = tempfile.mkdtemp(prefix="inout_bench_")
+        self.log = tempfile.TemporaryFile()
+
+    def _entorno(self):
+        entorno = dict(os.environ)
+        for variable in ("REPLICA_DATABASE_URL", "SQLITE_REPLICA"):
+            entorno.pop(variable, None)
+        entorno.update({
+            "DATABASE_URL": url_base_de_datos(connection.settings_dict),
+            "GATE_VISTAS_ASYNC": "1" if self.modo == "async" else "0",
+            "ALLOWED_HOSTS": HOST,
+            "INSTRUMENTACION_LOG_LEVEL": "WARNING",
+            "PROMETHEUS_MULTIPROC_DIR": self.dir_metricas,
+            "SECRET_KEY": settings.SECRET_KEY,
+        })
+        return entorno
+
+    def iniciar(self, espera=30):
+        self.proceso = subprocess.Popen(
+            _comando(self.modo, self.puerto, self.workers), cwd=settings.BASE_DIR,
+            env=self._entorno(), stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        limite = monotonic() + espera
+        while monotonic() < limite:
+            if self.proceso.poll() is not None:
+                raise RuntimeError(f"El servidor {self.modo} terminó al iniciar:\n{self.salida()}")
+            try:
+                conn = HTTPConnection(HOST, self.puerto, timeout=2)
+                conn.request("GET", "/api/enrolamiento/sectores/")
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                sleep(0.2)
+        self.detener()
+        raise RuntimeError(f"El servidor {self.modo} no respondió en {espera} s:\n{self.salida()}")
+
+    def salida(self):
+        self.log.seek(0)
+        return self.log.read().decode(errors="replace")[-2000:]
+
+    def detener(self):
+        if self.proceso and self.proceso.poll() is None:
+            self.proceso.terminate()
+            try:
+                self.proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+                self.proceso.wait()
+        self.log.close()
+        shutil.rmtree(self.dir_metricas, ignore_errors=True)
+
+
+def rutas(ctx, cantidad):
+    """Mezcla de consultas de portería sobre visitas existentes."""
+    generadores = (
+        lambda: f"/api/visitas/buscar-rut/{ctx.elegir(ctx.ruts)}/",
+        lambda: f"/api/visitas/buscar-dni/{ctx.elegir(ctx.dnis)}/",
+        lambda: f"/api/accesos/buscar-ultimo/{ctx.elegir(ctx.ruts)}/",
+        lambda: "/api/enrolamiento/sectores/",
+    )
+    return [ctx.rnd.choice(generadores)() for _ in range(cantidad)]
+
+
+def generar_carga(puerto, token, rutas, concurrencia, duracion, calentamiento=2.0):
+    """
+    ``concurrencia`` clientes pidiendo sin pausa durante ``calentamiento`` +
+    ``duracion`` segundos; sólo se cuenta lo que termina después del calentamiento.
+    """
+    headers = {"Authorization": f"Bearer {token}"}
+    inicio = monotonic()
+    desde, hasta = inicio + calentamiento, inicio + calentamiento + duracion
+    latencias, errores = [], [0]
+    lock = threading.Lock()
+
+    def cliente(n):
+        propias, fallidas = [], 0
+        conn = HTTPConnection(HOST, puerto, timeout=30)
+        i = n
+        while monotonic() < hasta:
+            ruta = rutas[i % len(rutas)]
+            i += concurrencia
+            t0 = perf_counter()
+            try:
+                conn.request("GET", ruta, headers=headers)
+                r = conn.getresponse()
+                r.read()
+                ok = r.status < 500
+            except OSError:
+                conn.close()
+                conn = HTTPConnection(HOST, puerto, timeout=30)
+                ok = False
+            if monotonic() >= desde:
+                if ok:
+                    propias.append((perf_counter() - t0) * 1000)
+                else:
+                    fallidas += 1
+        conn.close()
+        with lock:
+            latencias.extend(propias)
+            errores[0] += fallidas
+
+    hilos = [threading.Thread(target=cliente, args=(n,)) for n in range(concurrencia)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    p50, p95, p99 = percentiles(latencias)
+    return {
+        "peticiones": len(latencias),
+        "rps": round(len(latencias) / duracion, 1),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+        "errores": errores[0],
+    }
+
+
+def correr(ds, modos=MODOS, workers=3, concurrencia=50, duracion=10.0, seed=1, salida=None):
+    """Levanta cada despliegue, lo somete a la misma carga y devuelve los resultados."""
+    ctx = _preparar_contexto(ds, seed)
+    token = str(RefreshToken.for_user(ds.guardias[ctx.instalacion_id]).access_token)
+    mezcla = rutas(ctx, 2000)
+
+    resultados = {}
+    for modo in modos:
+        servidor = Servidor(modo, workers)
+        servidor.iniciar()
+        try:
+            resultado = generar_carga(servidor.puerto, token, mezcla, concurrencia, duracion)
+            resultado["rss_mb"] = rss_mb(servidor.proceso.pid)
+        finally:
+            servidor.detener()
+
+        resultado["rps_por_100mb"] = (
+            round(resultado["rps"] / resultado["rss_mb"] * 100, 1) if resultado["rss_mb"] else 0.0
+        )
+        resultados[modo] = resultado
+        if salida:
+            salida(modo, resultado)
+
+    return {
+        "meta": {
+            "motor": connection.vendor,
+            "workers": workers,
+            "concurrencia": concurrencia,
+            "duracion_s": duracion,
+            "seed": seed,
+        },
+        "resultados": resultados,
+    }
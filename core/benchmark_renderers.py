@@ -0,0 +1,72 @@
+"""
+Render de los listados de accesos con cada renderer: ``JSONRenderer`` de
+DRF, ``ORJSONRenderer`` y ``MessagePackRenderer`` (config/renderers.py).
+
+Se mide sólo el render (la lista ya serializada, como la arman las vistas
+de accesos) y el tamaño de la respuesta, también comprimida con gzip para
+ver cuánto se ahorra en la red de los teléfonos. Verifica que orjson dé los
+mismos bytes que DRF y que MessagePack traiga los mismos valores. Ver
+``python manage.py benchmark_renderers --help``.
+"""
+import gzip
+import json
+import statistics
+from time import perf_counter
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from access_ctrl.serializers_rapidos import serializar_accesos
+from config import renderers
+from core.benchmark_serializacion import _queryset
+
+POR_FILAS = 10_000
+
+
+def _renderers():
+    lista = [("drf", JSONRenderer()), ("orjson", renderers.ORJSONRenderer())]
+    if renderers.msgpack is not None:
+        lista.append(("msgpack", renderers.MessagePackRenderer()))
+    return lista
+
+
+def _medir_render(renderer, data, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = perf_counter()
+        contenido = renderer.render(data)
+        tiempos.append(perf_counter() - inicio)
+    return statistics.median(tiempos), contenido
+
+
+def medir(filas=POR_FILAS, repeticiones=5, pagina=100):
+    """Por tamaño de listado (``filas`` y ``pagina``): ms por render, bytes y bytes con gzip de cada renderer."""
+    request = Request(APIRequestFactory().get("/api/accesos/"))
+    completo = serializar_accesos(_queryset(filas), request)
+    if not completo:
+        raise RuntimeError("No hay accesos para renderizar")
+
+    resultado = {"orjson_disponible": renderers.ORJSONRenderer.usa_orjson, "listados": []}
+    for data in (completo[:pagina], completo):
+        listado = {"filas": len(data), "renderers": {}}
+        for nombre, renderer in _renderers():
+            segundos, contenido = _medir_render(renderer, data, repeticiones)
+            listado["renderers"][nombre] = {
+                "ms": round(segundos * 1000, 3),
+                "bytes": len(contenido),
+                "gzip_bytes": len(gzip.compress(contenido, 6)),
+            }
+            if nombre == "drf":
+                referencia = contenido
+            elif nombre == "orjson":
+                listado["orjson_identico"] = contenido == referencia
+            else:
+                listado["msgpack_identico"] = renderers.msgpack.unpackb(contenido) == json.loads(referencia)
+
+        base = listado["renderers"]["drf"]
+        for nombre, r in listado["renderers"].items():
+            r["aceleracion"] = round(base["ms"] / r["ms"], 2) if r["ms"] else None
+            r["tamano_relativo"] = round(r["bytes"] / base["bytes"], 3)
+        resultado["listados"].append(listado)
+    return resultado
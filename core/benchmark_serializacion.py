@@ -0,0 +1,75 @@
+"""
+Serialización de listados de accesos: ``AccesoListaSerializer`` (DRF) contra
+``access_ctrl.serializers_rapidos``, en ms por cada 10.000 filas.
+
+Cada variante arma la lista y la renderiza a JSON como la respuesta real
+(consultas incluidas). DRF se mide con el caché de representaciones de
+visitas vacío y lleno; también se verifica que las dos salidas sean
+idénticas byte a byte. Ver ``python manage.py benchmark_serializacion --help``.
+"""
+import statistics
+from time import perf_counter
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from access_ctrl import representaciones
+from access_ctrl.models import Acceso
+from access_ctrl.serializers import AccesoListaSerializer, prohibiciones_vigentes
+from access_ctrl.serializers_rapidos import serializar_accesos
+
+POR_FILAS = 10_000
+
+
+def _queryset(filas):
+    # la misma consulta que arman las vistas de listados
+    return Acceso.objects.select_related(
+        "visita", "instalacion", "sector", "empresa", "guardia"
+    ).prefetch_related(
+        prohibiciones_vigentes("visita__prohibiciones")
+    ).order_by("-fecha_hora")[:filas]
+
+
+def _drf(queryset, request):
+    return AccesoListaSerializer(queryset, many=True, context={"request": request}).data
+
+
+def _cronometrar(funcion, repeticiones, antes=None):
+    tiempos, salida = [], None
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        inicio = perf_counter()
+        salida = JSONRenderer().render(funcion())
+        tiempos.append(perf_counter() - inicio)
+    return statistics.median(tiempos), salida
+
+
+def medir(filas=POR_FILAS, repeticiones=5):
+    request = Request(APIRequestFactory().get("/api/accesos/"))
+    queryset = _queryset(filas)
+    filas = queryset.count()
+    if not filas:
+        raise RuntimeError("No hay accesos para serializar")
+
+    drf, salida_drf = _cronometrar(
+        lambda: _drf(queryset.all(), request), repeticiones, antes=representaciones.local.clear,
+    )
+    drf_cache, _ = _cronometrar(lambda: _drf(queryset.all(), request), repeticiones)
+    rapido, salida_rapida = _cronometrar(lambda: serializar_accesos(queryset.all(), request), repeticiones)
+
+    def por_filas(segundos):
+        return round(segundos * 1000 * POR_FILAS / filas, 1)
+
+    return {
+        "filas": filas,
+        "repeticiones": repeticiones,
+        "drf_ms_10k": por_filas(drf),
+        "drf_con_cache_ms_10k": por_filas(drf_cache),
+        "rapido_ms_10k": por_filas(rapido),
+        "aceleracion": round(drf / rapido, 2),
+        "aceleracion_vs_cache": round(drf_cache / rapido, 2),
+        "bytes": len(salida_rapida),
+        "identica": salida_drf == salida_rapida,
+    }
@@ -0,0 +1,418 @@
+"""
+Importación de históricos de accesos desde CSV o NDJSON (onboarding de un
+cliente que trae años de registros de su sistema anterior). Ver
+``python manage.py importar_accesos --help``.
+
+- El archivo se lee en streaming (también ``.gz``) y se carga por lotes:
+  la memoria no crece con la cantidad de filas.
+- Visitas y sectores se resuelven con diccionarios armados una sola vez
+  (documento normalizado -> visita, id o nombre -> sector de la
+  instalación); las visitas que faltan se crean en bloque, con sus
+  columnas normalizadas.
+- Los accesos se cargan con ``COPY`` en PostgreSQL (creando antes las
+  particiones de los meses que falten) y con ``bulk_create`` en los demás
+  motores. Las filas de meses ya archivados se rechazan: ``archivar_accesos``
+  sobrescribiría el archivo del mes.
+- Cada lote es una transacción y al terminarlo se guarda el avance en el
+  checkpoint: si el proceso se corta, la siguiente corrida sigue desde ahí.
+  El primer lote tras retomar descarta los accesos ya cargados, porque el
+  corte pudo ocurrir entre el commit y el checkpoint.
+- Al final se rehacen las sesiones sólo de las visitas con accesos en el
+  rango de fechas importado (``desde``/``hasta`` del checkpoint), de a lotes
+  de visitas, sin tocar el resto de la instalación mientras la portería sigue
+  registrando; en PostgreSQL se actualizan las estadísticas del planificador.
+
+Las filas con errores no detienen la carga: quedan en un NDJSON aparte con
+su número de línea. Al retomar no se repiten las del lote que se vuelve a leer.
+"""
+import csv
+import gzip
+import itertools
+import json
+import os
+from pathlib import Path
+
+from django.db import connection, connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from access_ctrl.busqueda import completar_normalizados, normalizar_busqueda, normalizar_documento
+from access_ctrl.models import Acceso, SesionVisita, Visita
+from access_ctrl.particiones import crear_particion, esta_particionada, mes_archivado, particiones_existentes
+from access_ctrl.sesiones import reemparejar_sesiones
+from core.models import Sector
+from core.seeding import LOTE, insertar
+
+COLUMNAS = (
+    "fecha_hora", "tipo", "documento", "es_extranjero", "sector",
+    "nombre", "apellido", "empresa", "patente", "comentario",
+)
+TIPOS = ("ingreso", "salida")
+_VERDADERO = {"1", "true", "si", "sí", "s", "x"}
+
+CARGA = "carga"
+SESIONES = "sesiones"
+COMPLETA = "completa"
+
+
+class ImportacionInvalida(Exception):
+    pass
+
+
+class ErrorFila(ValueError):
+    pass
+
+
+# ----------------------------------------------------------------------------
+# Lectura
+# ----------------------------------------------------------------------------
+
+def leer_filas(ruta, formato=None, separador=","):
+    """``(línea, fila)`` del archivo en streaming; ``fila`` es un dict o el ``ErrorFila`` de una línea ilegible."""
+    ruta = Path(ruta)
+    comprimido = ruta.suffix == ".gz"
+    nombre = ruta.stem if comprimido else ruta.name
+    formato = formato or ("csv" if nombre.endswith(".csv") else "ndjson")
+    abrir = gzip.open if comprimido else open
+
+    with abrir(ruta, "rt", encoding="utf-8-sig", newline="") as f:
+        if formato == "csv":
+            lector = csv.DictReader(f, delimiter=separador)
+            for fila in lector:
+                yield lector.line_num, fila
+            return
+
+        for numero, linea in enumerate(f, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                fila = ErrorFila("JSON inválido")
+            if not isinstance(fila, (dict, ErrorFila)):
+                fila = ErrorFila("Se esperaba un objeto JSON por línea")
+            yield numero, fila
+
+
+def en_bloques(filas, tamano):
+    filas = iter(filas)
+    while bloque := list(itertools.islice(filas, tamano)):
+        yield bloque
+
+
+# ----------------------------------------------------------------------------
+# Checkpoint
+# ----------------------------------------------------------------------------
+
+def leer_checkpoint(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def guardar_checkpoint(ruta, estado):
+    # escribe y reemplaza: un corte a mitad nunca deja un checkpoint a medias
+    temporal = Path(f"{ruta}.tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temporal, ruta)
+
+
+# ----------------------------------------------------------------------------
+# Resolución de filas
+# ----------------------------------------------------------------------------
+
+def _largo_maximo(campo):
+    return Visita._meta.get_field(campo).max_length
+
+
+class Mapas:
+    """Visitas por ``(es_extranjero, documento normalizado)`` y sectores de la instalación, leídos una vez."""
+
+    def __init__(self, instalacion):
+        self.instalacion = instalacion
+        self.visitas = {}
+        visitas = Visita.objects.exclude(documento_normalizado="").order_by("id").values_list(
+            "es_extranjero", "documento_normalizado", "id"
+        )
+        for extranjero, documento, visita_id in visitas.iterator(chunk_size=LOTE):
+            # como en portería, con documentos repetidos gana la visita más antigua
+            self.visitas.setdefault((extranjero, documento), visita_id)
+
+        self.sectores = {}
+        for sector_id, nombre in Sector.objects.filter(instalacion=instalacion).values_list("id", "nombre"):
+            self.sectores[str(sector_id)] = sector_id
+            self.sectores.setdefault(normalizar_busqueda(nombre), sector_id)
+
+        self._archivados = {}
+
+    def archivado(self, fecha):
+        local = timezone.localtime(fecha)
+        mes = (local.year, local.month)
+        if mes not in self._archivados:
+            self._archivados[mes] = mes_archivado(*mes)
+        return self._archivados[mes]
+
+    def interpretar(self, fila):
+        """La fila como dict listo para armar el Acceso (y la Visita si falta), o ``ErrorFila``."""
+        if isinstance(fila, ErrorFila):
+            raise fila
+
+        def valor(columna):
+            v = fila.get(columna)
+            return "" if v is None else str(v).strip()
+
+        try:
+            fecha = parse_datetime(valor("fecha_hora"))
+        except ValueError:
+            fecha = None
+        if fecha is None:
+            raise ErrorFila(f"fecha_hora inválida: {valor('fecha_hora')!r}")
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+        if self.archivado(fecha):
+            raise ErrorFila(f"El mes {timezone.localtime(fecha):%Y-%m} está archivado")
+
+        tipo = valor("tipo").lower()
+        if tipo not in TIPOS:
+            raise ErrorFila(f"tipo inválido: {valor('tipo')!r} (ingreso o salida)")
+
+        extranjero = valor("es_extranjero").lower() in _VERDADERO
+        documento = valor("documento")
+        if not normalizar_documento(documento):
+            raise ErrorFila("documento vacío")
+
+        sector = valor("sector")
+        sector_id = self.sectores.get(sector) or self.sectores.get(normalizar_busqueda(sector))
+        if sector_id is None:
+            raise ErrorFila(f"Sector desconocido en la instalación: {sector!r}")
+
+        datos = {c: valor(c) or None for c in ("nombre", "apellido", "empresa", "patente")}
+        datos["dni_extranjero" if extranjero else "rut"] = documento
+        for campo, texto in datos.items():
+            if texto and len(texto) > _largo_maximo(campo):
+                raise ErrorFila(f"{campo} supera {_largo_maximo(campo)} caracteres")
+
+        return {
+            "clave": (extranjero, normalizar_documento(documento)),
+            "visita": datos,
+            "tipo": tipo,
+            "fecha_hora": fecha,
+            "sector_id": sector_id,
+            "comentario": valor("comentario") or None,
+        }
+
+    def visita_nueva(self, fila):
+        visita = Visita(
+            es_extranjero=fila["clave"][0],
+            instalacion_id=self.instalacion.id,
+            sector_id=fila["sector_id"],
+            **fila["visita"],
+        )
+        visita.nombre = visita.nombre or "Sin nombre"
+        # bulk_create/COPY no pasan por save()
+        return completar_normalizados(visita)
+
+
+# ----------------------------------------------------------------------------
+# Carga
+# ----------------------------------------------------------------------------
+
+def _insertar(modelo, objetos):
+    """COPY en PostgreSQL; en los demás motores ``bulk_create``."""
+    if not objetos:
+        return []
+    if connections[router.db_for_write(modelo)].vendor == "postgresql":
+        return insertar(modelo, objetos)
+    # seeding.insertar en SQLite toma ids desde MAX(id): sólo vale sin otras escrituras
+    return modelo.objects.bulk_create(objetos)
+
+
+def _sin_cargados(accesos, instalacion_id):
+    """Descarta los accesos que ya están en la base (misma visita, tipo y fecha_hora)."""
+    if not accesos:
+        return accesos
+    fechas = [a.fecha_hora for a in accesos]
+    cargados = set(
+        Acceso.objects.filter(
+            instalacion_id=instalacion_id, fecha_hora__gte=min(fechas), fecha_hora__lte=max(fechas)
+        ).values_list("visita_id", "tipo", "fecha_hora")
+    )
+    return [a for a in accesos if (a.visita_id, a.tipo, a.fecha_hora) not in cargados]
+
+
+def _asegurar_particiones(accesos, existentes):
+    """
+    Crea las particiones de los meses del lote que no tengan (``existentes``
+    se actualiza). Si la partición por defecto ya tenía filas de ese mes,
+    ``crear_particion`` las pasa a la nueva.
+    """
+    meses = {(f.year, f.month) for f in (timezone.localtime(a.fecha_hora) for a in accesos)} - existentes
+    for anio, mes in sorted(meses):
+        crear_particion(anio, mes)
+        existentes.add((anio, mes))
+
+
+def cargar_bloque(bloque, mapas, guardia, verificar_cargados=False, particiones=None):
+    """
+    Carga un lote en una transacción. Devuelve ``(accesos, visitas nuevas,
+    repetidos, errores, fechas)`` con los errores como dicts para el NDJSON y
+    ``fechas`` como ``(mínima, máxima)`` de las filas válidas, o None.
+    """
+    instalacion = mapas.instalacion
+    filas, errores, nuevas = [], [], {}
+    for numero, fila in bloque:
+        try:
+            datos = mapas.interpretar(fila)
+        except ErrorFila as exc:
+            errores.append({"linea": numero, "error": str(exc), "fila": fila if isinstance(fila, dict) else None})
+            continue
+        if datos["clave"] not in mapas.visitas and datos["clave"] not in nuevas:
+            nuevas[datos["clave"]] = mapas.visita_nueva(datos)
+        filas.append(datos)
+
+    with transaction.atomic():
+        creadas = dict(zip(nuevas, (v.id for v in _insertar(Visita, list(nuevas.values())))))
+        accesos = [
+            Acceso(
+                visita_id=mapas.visitas.get(f["clave"]) or creadas[f["clave"]],
+                instalacion_id=instalacion.id, sector_id=f["sector_id"], empresa_id=instalacion.empresa_id,
+                guardia_id=guardia.id, tipo=f["tipo"], fecha_hora=f["fecha_hora"],
+                comentario=f["comentario"], foto_url=[],
+            )
+            for f in filas
+        ]
+        repetidos = 0
+        if verificar_cargados:
+            total = len(accesos)
+            accesos = _sin_cargados(accesos, instalacion.id)
+            repetidos = total - len(accesos)
+        if particiones is not None:
+            _asegurar_particiones(accesos, particiones)
+        _insertar(Acceso, accesos)
+
+    # recién confirmado el lote: si falla, las visitas no quedan en el mapa
+    mapas.visitas.update(creadas)
+    fechas = [f["fecha_hora"] for f in filas]
+    # los repetidos cuentan para el rango: sus sesiones también hay que rehacerlas
+    return len(accesos), len(creadas), repetidos, errores, (min(fechas), max(fechas)) if fechas else None
+
+
+def reconstruir_sesiones(instalacion_id, desde, hasta, lote=LOTE):
+    """
+    Rehace las sesiones, en la instalación, de las visitas con accesos entre
+    ``desde`` y ``hasta`` (``reemparejar_sesiones`` con todo su log), una
+    transacción por cada ``lote`` visitas. Las demás sesiones no se tocan.
+    """
+    visitas = (
+        Acceso.objects
+        .filter(instalacion_id=instalacion_id, fecha_hora__gte=desde, fecha_hora__lte=hasta)
+        .order_by("visita_id")
+        .values_list("visita_id", flat=True)
+        .distinct()
+        .iterator(chunk_size=lote)
+    )
+    total = 0
+    for visita_ids in en_bloques(visitas, lote):
+        with transaction.atomic():
+            total += len(reemparejar_sesiones(visita_ids, [instalacion_id]))
+    return total
+
+
+def _ultima_linea_error(errores):
+    """Línea de la última fila anotada en el NDJSON de errores, o 0."""
+    ultima = 0
+    try:
+        with open(errores, encoding="utf-8") as f:
+            for linea in f:
+                if linea.strip():
+                    ultima = json.loads(linea)["linea"]
+    except FileNotFoundError:
+        pass
+    return ultima
+
+
+def _actualizar_estadisticas():
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for modelo in (Visita, Acceso, SesionVisita):
+            cursor.execute(f"ANALYZE {modelo._meta.db_table}")
+
+
+def importar(ruta, instalacion, guardia, checkpoint=None, errores=None, lote=LOTE, formato=None, separador=",",
+             progreso=None):
+    """
+    Importa ``ruta`` en la instalación, o sigue la importación que dejó
+    ``checkpoint`` (por defecto ``<archivo>.checkpoint.json``). Devuelve el
+    estado final, el mismo que queda en el checkpoint.
+    """
+    ruta = Path(ruta)
+    checkpoint = Path(checkpoint or f"{ruta}.checkpoint.json")
+    errores = Path(errores or f"{ruta}.errores.ndjson")
+    firma = {"archivo": str(ruta.resolve()), "bytes": ruta.stat().st_size, "instalacion_id": instalacion.id}
+
+    estado = leer_checkpoint(checkpoint)
+    retomando = estado is not None
+    if estado is None:
+        estado = {**firma, "fase": CARGA, "filas": 0, "accesos": 0, "visitas": 0, "repetidos": 0, "errores": 0}
+    elif any(estado.get(clave) != valor for clave, valor in firma.items()):
+        raise ImportacionInvalida(
+            f"El checkpoint {checkpoint} es de otra importación ({estado.get('archivo')}, "
+            f"instalación {estado.get('instalacion_id')}): bórrelo o use otro --checkpoint"
+        )
+
+    if estado["fase"] == CARGA:
+        mapas = Mapas(instalacion)
+        particiones = set(particiones_existentes()) if esta_particionada() else None
+        filas = itertools.islice(leer_filas(ruta, formato, separador), estado["filas"], None)
+        if retomando:
+            # el corte pudo ocurrir después de anotar los errores del lote y antes del checkpoint
+            anotados = _ultima_linea_error(errores)
+        else:
+            errores.unlink(missing_ok=True)
+            anotados = 0
+
+        for bloque in en_bloques(filas, lote):
+            accesos, visitas, repetidos, con_error, fechas = cargar_bloque(
+                bloque, mapas, guardia, verificar_cargados=retomando, particiones=particiones,
+            )
+            retomando = False
+            nuevos = [error for error in con_error if error["linea"] > anotados]
+            if nuevos:
+                with open(errores, "a", encoding="utf-8") as f:
+                    for error in nuevos:
+                        f.write(json.dumps(error, ensure_ascii=False, default=str) + "\n")
+
+            if fechas:
+                if estado.get("desde"):
+                    fechas = (
+                        min(fechas[0], parse_datetime(estado["desde"])), max(fechas[1], parse_datetime(estado["hasta"]))
+                    )
+                estado["desde"], estado["hasta"] = (f.isoformat() for f in fechas)
+            estado["filas"] += len(bloque)
+            # los repetidos los cargó la corrida anterior sin llegar a anotarlos
+            estado["accesos"] += accesos + repetidos
+            estado["visitas"] += visitas
+            estado["repetidos"] += repetidos
+            estado["errores"] += len(con_error)
+            guardar_checkpoint(checkpoint, estado)
+            if progreso:
+                progreso(estado)
+
+        estado["fase"] = SESIONES
+        guardar_checkpoint(checkpoint, estado)
+
+    if estado["fase"] == SESIONES:
+        estado["sesiones"] = 0
+        if estado.get("desde"):
+            estado["sesiones"] = reconstruir_sesiones(
+                instalacion.id, parse_datetime(estado["desde"]), parse_datetime(estado["hasta"]), lote,
+            )
+        _actualizar_estadisticas()
+        estado["fase"] = COMPLETA
+        guardar_checkpoint(checkpoint, estado)
+
+    return estado
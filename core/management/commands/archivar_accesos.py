@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from access_ctrl.particiones import archivar_particion, esta_particionada, meses_a_archivar
+
+
+class Command(BaseCommand):
+    help = "Archiva en disco (CSV comprimido) las particiones de accesos fuera de la retención"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retencion_meses",
+            type=int,
+            default=settings.ACCESOS_RETENCION_MESES,
+            help="Meses completos que se mantienen en la base de datos",
+        )
+        parser.add_argument(
+            "--dry_run",
+            action="store_true",
+            help="Sólo muestra los meses que se archivarían",
+        )
+
+    def handle(self, *args, **options):
+        if not esta_particionada():
+            self.stdout.write(
+                self.style.WARNING("La tabla de accesos no está particionada (sólo aplica a PostgreSQL)")
+            )
+            return
+
+        meses = meses_a_archivar(options["retencion_meses"])
+        if not meses:
+            self.stdout.write(self.style.SUCCESS("No hay meses para archivar."))
+            return
+
+        for anio, mes in meses:
+            if options["dry_run"]:
+                self.stdout.write(f" - se archivaría {anio:04d}-{mes:02d}")
+                continue
+
+            ruta = archivar_particion(anio, mes)
+            self.stdout.write(f" - {anio:04d}-{mes:02d} archivado en {ruta}")
+
+        if not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Meses archivados: {len(meses)}."))
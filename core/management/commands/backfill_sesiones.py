@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from access_ctrl.models import Acceso, SesionVisita
+from access_ctrl.sesiones import emparejar_accesos
+
+
+class Command(BaseCommand):
+    help = "Reconstruye las sesiones de visita emparejando ingresos y salidas históricos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Elimina las sesiones existentes antes de reconstruir",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=5000,
+            help="Tamaño de lote para lectura e inserción",
+        )
+
+    def handle(self, *args, **options):
+        lote_size = options["lote"]
+
+        if SesionVisita.objects.exists():
+            if not options["reset"]:
+                self.stdout.write(
+                    self.style.ERROR("Ya existen sesiones. Use --reset para reconstruirlas.")
+                )
+                return
+            borradas, _ = SesionVisita.objects.all().delete()
+            self.stdout.write(self.style.WARNING(f"Sesiones eliminadas: {borradas}"))
+
+        accesos = (
+            Acceso.objects
+            .only("id", "visita_id", "instalacion_id", "sector_id", "empresa_id", "tipo", "fecha_hora")
+            .order_by("visita_id", "instalacion_id", "fecha_hora", "id")
+            .iterator(chunk_size=lote_size)
+        )
+
+        total = 0
+        lote = []
+        for sesion in emparejar_accesos(accesos):
+            lote.append(sesion)
+            if len(lote) >= lote_size:
+                SesionVisita.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+                self.stdout.write(f" - {total} sesiones creadas...")
+
+        if lote:
+            SesionVisita.objects.bulk_create(lote)
+            total += len(lote)
+
+        self.stdout.write(self.style.SUCCESS(f"Backfill completado: {total} sesiones creadas."))
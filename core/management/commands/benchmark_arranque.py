@@ -0,0 +1,59 @@
+import importlib.util
+import subprocess
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark, benchmark_arranque
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de importación de la aplicación y el RSS de cada worker de gunicorn "
+        "al arrancar; con --comparar muestra la diferencia contra una corrida anterior"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=5, help="Procesos nuevos a medir (se toma la mediana)")
+        parser.add_argument("--workers", type=int, default=3, help="Workers de gunicorn a levantar")
+        parser.add_argument("--sin_gunicorn", action="store_true", help="Sólo mide la importación")
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+        parser.add_argument("--comparar", help="JSON de una corrida anterior (p. ej. antes de un cambio)")
+
+    def handle(self, *args, **options):
+        con_gunicorn = not options["sin_gunicorn"]
+        if con_gunicorn and importlib.util.find_spec("gunicorn") is None:
+            raise CommandError("Hace falta gunicorn instalado (o usar --sin_gunicorn)")
+
+        try:
+            resultado = benchmark_arranque.correr(
+                repeticiones=options["repeticiones"], workers=options["workers"], con_gunicorn=con_gunicorn,
+            )
+        except (RuntimeError, subprocess.CalledProcessError) as exc:
+            raise CommandError(getattr(exc, "stderr", None) or str(exc))
+
+        imp = resultado["importacion"]
+        self.stdout.write(
+            f" - importación: setup {imp['setup_ms']:.0f} ms  urls {imp['urls_ms']:.0f} ms  "
+            f"RSS {imp['rss_mb']:.1f} MB  {imp['modulos']} módulos"
+        )
+        if imp["pesados"]:
+            self.stdout.write(self.style.WARNING(f"   ⚠️ cargados al arrancar: {', '.join(imp['pesados'])}"))
+        if con_gunicorn:
+            g = resultado["gunicorn"]
+            self.stdout.write(
+                f" - gunicorn: {g['workers']} workers  primera respuesta {g['primera_respuesta_s']:.2f} s  "
+                f"RSS por worker {', '.join(f'{r:.1f}' for r in g['rss_por_worker_mb'])} MB  "
+                f"total {g['rss_total_mb']:.1f} MB"
+            )
+
+        ruta = options["salida"] or f"benchmark_arranque_{datetime.now():%Y%m%d_%H%M%S}.json"
+        benchmark.guardar(resultado, ruta)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {ruta}"))
+
+        if options["comparar"]:
+            self.stdout.write("Comparación (antes -> después):")
+            for metrica, antes, despues, cambio in benchmark_arranque.comparar(
+                benchmark.cargar(options["comparar"]), resultado
+            ):
+                self.stdout.write(f" - {metrica:<32} {antes:>9} -> {despues:>9}  ({cambio:+.0%})")
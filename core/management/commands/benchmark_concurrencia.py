@@ -0,0 +1,74 @@
+import importlib.util
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmark, benchmark_concurrencia
+from core.seeding import progreso_en
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput con peticiones concurrentes de las consultas de portería "
+        "entre el despliegue sync (gunicorn) y el async (uvicorn), con la misma cantidad de workers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--instalaciones", type=int, default=10)
+        parser.add_argument("--visitas", type=int, default=5000)
+        parser.add_argument("--accesos", type=int, default=50000)
+        parser.add_argument("--dias", type=int, default=90)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--workers", type=int, default=3, help="Procesos de cada despliegue")
+        parser.add_argument("--concurrencia", type=int, default=50, help="Clientes simultáneos")
+        parser.add_argument("--duracion", type=float, default=10.0, help="Segundos medidos por despliegue")
+        parser.add_argument(
+            "--modos",
+            default=",".join(benchmark_concurrencia.MODOS),
+            help="Despliegues a medir separados por coma (sync, async)",
+        )
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+        parser.add_argument("--keepdb", action="store_true")
+        parser.add_argument("--sqlite_path")
+
+    def handle(self, *args, **options):
+        modos = options["modos"].split(",")
+        desconocidos = set(modos) - set(benchmark_concurrencia.MODOS)
+        if desconocidos:
+            raise CommandError(f"Modos desconocidos: {', '.join(sorted(desconocidos))}")
+        for modo, modulo in (("sync", "gunicorn"), ("async", "uvicorn")):
+            if modo in modos and importlib.util.find_spec(modulo) is None:
+                raise CommandError(f"El modo {modo} necesita {modulo} instalado")
+
+        with benchmark.base_de_prueba(keepdb=options["keepdb"], sqlite_path=options["sqlite_path"]):
+            ds = benchmark.preparar_dataset(
+                options["instalaciones"], options["visitas"], options["accesos"], options["dias"],
+                seed=options["seed"], keepdb=options["keepdb"], stdout=self.stdout,
+                progreso=progreso_en(self.stdout),
+            )
+
+            self.stdout.write(
+                f"Midiendo en {connection.vendor}: {options['workers']} workers, "
+                f"{options['concurrencia']} clientes, {options['duracion']:.0f} s por despliegue"
+            )
+            try:
+                resultado = benchmark_concurrencia.correr(
+                    ds, modos=modos, workers=options["workers"], concurrencia=options["concurrencia"],
+                    duracion=options["duracion"], seed=options["seed"], salida=self._mostrar,
+                )
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+
+        ruta = options["salida"] or f"benchmark_concurrencia_{datetime.now():%Y%m%d_%H%M%S}.json"
+        benchmark.guardar(resultado, ruta)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {ruta}"))
+
+    def _mostrar(self, modo, r):
+        linea = (
+            f" - {modo:<6} {r['rps']:>8.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  p95 {r['p95_ms']:>8.2f} ms  "
+            f"p99 {r['p99_ms']:>8.2f} ms  RSS {r['rss_mb']:>7.1f} MB  {r['rps_por_100mb']:>7.1f} req/s por 100 MB"
+        )
+        if r["errores"]:
+            linea += f"  ⚠️ {r['errores']} errores"
+        self.stdout.write(linea)
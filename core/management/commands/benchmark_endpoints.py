@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmark
+from core.seeding import progreso_en
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95/p99), consultas SQL y memoria pico de los endpoints "
+        "principales sobre un dataset sintético en una base de datos de prueba"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--instalaciones", type=int, default=10)
+        parser.add_argument("--visitas", type=int, default=5000)
+        parser.add_argument("--accesos", type=int, default=50000)
+        parser.add_argument("--dias", type=int, default=90, help="Días hacia atrás que cubren los accesos")
+        parser.add_argument("--iteraciones", type=int, default=30, help="Repeticiones por endpoint")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--casos",
+            help=f"Endpoints a medir separados por coma ({', '.join(c.nombre for c in benchmark.CASOS)})",
+        )
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+        parser.add_argument("--comparar", help="JSON de una corrida anterior contra la que comparar")
+        parser.add_argument(
+            "--resultado",
+            help="Compara este JSON contra --comparar sin correr el benchmark",
+        )
+        parser.add_argument(
+            "--umbral",
+            type=float,
+            default=0.2,
+            help="Aumento relativo tolerado antes de marcar regresión (0.2 = 20%%)",
+        )
+        parser.add_argument(
+            "--tolerancia_ms",
+            type=float,
+            default=1.0,
+            help="Aumento absoluto de p95 por debajo del cual no se marca regresión",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Conserva la base de prueba y reutiliza el dataset si ya existe (datasets grandes)",
+        )
+        parser.add_argument(
+            "--sqlite_path",
+            help="Archivo de la base de prueba en SQLite (por defecto benchmark.sqlite3 junto a manage.py)",
+        )
+
+    def handle(self, *args, **options):
+        if options["resultado"]:
+            if not options["comparar"]:
+                raise CommandError("--resultado requiere --comparar")
+            self._comparar(benchmark.cargar(options["comparar"]), benchmark.cargar(options["resultado"]), options)
+            return
+
+        casos = options["casos"].split(",") if options["casos"] else None
+        if casos:
+            desconocidos = set(casos) - {c.nombre for c in benchmark.CASOS}
+            if desconocidos:
+                raise CommandError(f"Casos desconocidos: {', '.join(sorted(desconocidos))}")
+
+        resultado = self._correr_en_base_de_prueba(casos, options)
+
+        ruta = options["salida"] or f"benchmark_{resultado['meta']['motor']}_{datetime.now():%Y%m%d_%H%M%S}.json"
+        benchmark.guardar(resultado, ruta)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {ruta}"))
+
+        if options["comparar"]:
+            self._comparar(benchmark.cargar(options["comparar"]), resultado, options)
+
+    def _correr_en_base_de_prueba(self, casos, options):
+        with benchmark.base_de_prueba(keepdb=options["keepdb"], sqlite_path=options["sqlite_path"]):
+            ds = benchmark.preparar_dataset(
+                options["instalaciones"], options["visitas"], options["accesos"], options["dias"],
+                seed=options["seed"], keepdb=options["keepdb"], stdout=self.stdout,
+                progreso=progreso_en(self.stdout),
+            )
+
+            self.stdout.write(f"Midiendo en {connection.vendor} ({options['iteraciones']} iteraciones por endpoint)")
+            return benchmark.correr(
+                ds, iteraciones=options["iteraciones"], casos=casos, seed=options["seed"],
+                salida=self._mostrar,
+            )
+
+    def _mostrar(self, nombre, r):
+        linea = (
+            f" - {nombre:<26} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  "
+            f"p99 {r['p99_ms']:>9.2f} ms  {r['consultas']:>5} SQL  {r['memoria_pico_kb']:>10.1f} KB"
+        )
+        if r["errores"]:
+            linea += f"  ⚠️ {r['errores']} respuestas inesperadas (status {r['status']})"
+        self.stdout.write(linea)
+
+    def _comparar(self, base, actual, options):
+        filas = benchmark.comparar(base, actual, umbral=options["umbral"], tolerancia_ms=options["tolerancia_ms"])
+        regresiones = [f for f in filas if f["regresion"]]
+
+        self.stdout.write(f"Comparación contra la corrida del {base['meta']['fecha']} ({base['meta']['motor']}):")
+        for f in filas:
+            marca = "❌" if f["regresion"] else "  "
+            self.stdout.write(
+                f" {marca} {f['endpoint']:<26} {f['metrica']:<16} {f['base']:>10} -> {f['actual']:>10} "
+                f"({f['delta'] * 100:+.1f}%)"
+            )
+
+        if regresiones:
+            raise CommandError(f"{len(regresiones)} regresiones sobre el umbral de {options['umbral'] * 100:.0f}%")
+        self.stdout.write(self.style.SUCCESS("Sin regresiones."))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark, benchmark_renderers
+from core.seeding import progreso_en
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara tiempo de render y tamaño de los listados de accesos con JSONRenderer de DRF, "
+        "orjson y MessagePack sobre un dataset sintético en una base de datos de prueba"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=10000, help="Accesos del listado completo")
+        parser.add_argument("--pagina", type=int, default=100, help="Accesos del listado chico")
+        parser.add_argument("--visitas", type=int, default=2000)
+        parser.add_argument("--repeticiones", type=int, default=5, help="Renders por variante (se toma la mediana)")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Conserva la base de prueba y reutiliza el dataset si ya existe",
+        )
+        parser.add_argument(
+            "--sqlite_path",
+            help="Archivo de la base de prueba en SQLite (por defecto benchmark.sqlite3 junto a manage.py)",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark.base_de_prueba(keepdb=options["keepdb"], sqlite_path=options["sqlite_path"]):
+            benchmark.preparar_dataset(
+                2, options["visitas"], options["filas"], 30, seed=options["seed"], keepdb=options["keepdb"],
+                stdout=self.stdout, progreso=progreso_en(self.stdout),
+            )
+            try:
+                resultado = benchmark_renderers.medir(options["filas"], options["repeticiones"], options["pagina"])
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+
+        if not resultado["orjson_disponible"]:
+            self.stdout.write(self.style.WARNING("orjson no está instalado: ORJSONRenderer usa el json de siempre."))
+
+        distintos = []
+        for listado in resultado["listados"]:
+            self.stdout.write(f"Listado de {listado['filas']} accesos:")
+            for nombre, r in listado["renderers"].items():
+                self.stdout.write(
+                    f" - {nombre:<8} {r['ms']:>9.2f} ms (x{r['aceleracion']:.1f})  "
+                    f"{r['bytes']:>10} bytes ({r['tamano_relativo']:.0%})  {r['gzip_bytes']:>9} con gzip"
+                )
+            distintos += [clave for clave in ("orjson_identico", "msgpack_identico") if listado.get(clave) is False]
+
+        if distintos:
+            raise CommandError(f"Salidas distintas a las de JSONRenderer: {', '.join(sorted(set(distintos)))}")
+        self.stdout.write(self.style.SUCCESS("orjson idéntico byte a byte; MessagePack con los mismos valores."))
+
+        if options["salida"]:
+            benchmark.guardar(resultado, options["salida"])
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
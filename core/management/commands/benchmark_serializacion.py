@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmark, benchmark_serializacion
+from core.seeding import progreso_en
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara AccesoListaSerializer con la serialización rápida de listados de accesos "
+        "(ms por 10.000 filas) sobre un dataset sintético en una base de datos de prueba"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=10000, help="Accesos a serializar por corrida")
+        parser.add_argument("--visitas", type=int, default=2000)
+        parser.add_argument("--repeticiones", type=int, default=5, help="Corridas por variante (se toma la mediana)")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Conserva la base de prueba y reutiliza el dataset si ya existe",
+        )
+        parser.add_argument(
+            "--sqlite_path",
+            help="Archivo de la base de prueba en SQLite (por defecto benchmark.sqlite3 junto a manage.py)",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark.base_de_prueba(keepdb=options["keepdb"], sqlite_path=options["sqlite_path"]):
+            benchmark.preparar_dataset(
+                2, options["visitas"], options["filas"], 30, seed=options["seed"], keepdb=options["keepdb"],
+                stdout=self.stdout, progreso=progreso_en(self.stdout),
+            )
+            self.stdout.write(f"Midiendo en {connection.vendor}...")
+            try:
+                r = benchmark_serializacion.medir(options["filas"], options["repeticiones"])
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+
+        self.stdout.write(
+            f" - {r['filas']} filas, {r['bytes']} bytes de JSON\n"
+            f" - DRF:                 {r['drf_ms_10k']:>9.1f} ms / 10k filas\n"
+            f" - DRF con caché:       {r['drf_con_cache_ms_10k']:>9.1f} ms / 10k filas\n"
+            f" - rápida:              {r['rapido_ms_10k']:>9.1f} ms / 10k filas "
+            f"(x{r['aceleracion']:.1f}; x{r['aceleracion_vs_cache']:.1f} contra DRF con caché)"
+        )
+        if not r["identica"]:
+            raise CommandError("La salida rápida difiere de la de AccesoListaSerializer")
+        self.stdout.write(self.style.SUCCESS("Salidas idénticas byte a byte."))
+
+        if options["salida"]:
+            benchmark.guardar(r, options["salida"])
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
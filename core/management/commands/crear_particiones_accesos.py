@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from access_ctrl.particiones import crear_particiones_futuras, esta_particionada, particiones_existentes
+
+
+class Command(BaseCommand):
+    help = "Crea por adelantado las particiones mensuales de accesos (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=3,
+            help="Cantidad de meses futuros a dejar creados además del mes en curso",
+        )
+
+    def handle(self, *args, **options):
+        if not esta_particionada():
+            self.stdout.write(
+                self.style.WARNING("La tabla de accesos no está particionada (sólo aplica a PostgreSQL)")
+            )
+            return
+
+        creadas = crear_particiones_futuras(options["meses"])
+
+        for anio, mes in creadas:
+            self.stdout.write(f" - creada partición {anio:04d}-{mes:02d}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Particiones creadas: {len(creadas)}. Activas: {len(particiones_existentes())}."
+            )
+        )
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from access_ctrl import derivadas
+from access_ctrl.models import SubidaFoto
+
+
+class Command(BaseCommand):
+    help = "Genera las miniaturas/WebP que falten de las fotos de evidencia ya guardadas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.FOTOS_DERIVADAS_WORKERS)
+
+    def handle(self, *args, **options):
+        fotos = SubidaFoto.objects.filter(
+            completada_en__isnull=False
+        ).values_list("sha256", "extension").distinct()
+
+        pendientes = [(sha, ext) for sha, ext in fotos.iterator() if derivadas.faltantes(sha)]
+        self.stdout.write(f"Fotos con derivadas pendientes: {len(pendientes)}")
+
+        errores = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            futuros = {pool.submit(derivadas.generar, sha, ext): sha for sha, ext in pendientes}
+            for hechas, futuro in enumerate(as_completed(futuros), start=1):
+                try:
+                    futuro.result()
+                except Exception as exc:
+                    errores += 1
+                    self.stderr.write(f" - {futuros[futuro]}: {exc}")
+                if hechas % 100 == 0:
+                    self.stdout.write(f"   {hechas}/{len(pendientes)}")
+
+        estilo = self.style.WARNING if errores else self.style.SUCCESS
+        self.stdout.write(estilo(f"Derivadas generadas para {len(pendientes) - errores} fotos ({errores} errores)."))
@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from core.importacion import COMPLETA, ImportacionInvalida, importar, leer_checkpoint
+from core.models import Instalacion
+from core.seeding import LOTE
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa un histórico de accesos (CSV o NDJSON, también .gz) en una instalación. "
+        "Columnas: fecha_hora, tipo, documento, es_extranjero, sector, nombre, apellido, "
+        "empresa, patente, comentario. Si se corta, volver a correrlo sigue desde el checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del CSV o NDJSON a importar")
+        parser.add_argument(
+            "--instalacion_id",
+            type=int,
+            required=True,
+            help="ID de la instalación a la que pertenecen los accesos",
+        )
+        parser.add_argument(
+            "--guardia_id",
+            type=int,
+            required=True,
+            help="ID del usuario que queda como guardia de los accesos importados",
+        )
+        parser.add_argument(
+            "--formato",
+            choices=["csv", "ndjson"],
+            help="Formato del archivo (por defecto según la extensión)",
+        )
+        parser.add_argument(
+            "--separador",
+            default=",",
+            help="Separador de columnas del CSV",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE,
+            help="Filas por transacción y por checkpoint",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Archivo de avance (por defecto <archivo>.checkpoint.json)",
+        )
+        parser.add_argument(
+            "--errores",
+            help="NDJSON con las filas rechazadas (por defecto <archivo>.errores.ndjson)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            instalacion = Instalacion.objects.get(id=options["instalacion_id"])
+        except Instalacion.DoesNotExist:
+            raise CommandError("La instalación no existe")
+        try:
+            guardia = User.objects.get(id=options["guardia_id"])
+        except User.DoesNotExist:
+            raise CommandError("El guardia no existe")
+
+        checkpoint = options["checkpoint"] or f"{options['archivo']}.checkpoint.json"
+        previo = leer_checkpoint(checkpoint)
+        if previo and previo.get("fase") == COMPLETA:
+            self.stdout.write(self.style.WARNING(
+                f"Esta importación ya terminó ({previo['accesos']} accesos). "
+                f"Borre {checkpoint} para repetirla."
+            ))
+            return
+        if previo:
+            self.stdout.write(f"Retomando desde la fila {previo['filas']} (fase {previo['fase']}).")
+
+        def progreso(estado):
+            self.stdout.write(
+                f" - {estado['filas']} filas: {estado['accesos']} accesos, "
+                f"{estado['visitas']} visitas nuevas, {estado['errores']} con error"
+            )
+
+        try:
+            estado = importar(
+                options["archivo"], instalacion, guardia,
+                checkpoint=checkpoint, errores=options["errores"], lote=options["lote"],
+                formato=options["formato"], separador=options["separador"], progreso=progreso,
+            )
+        except (ImportacionInvalida, FileNotFoundError) as exc:
+            raise CommandError(str(exc))
+
+        if estado["errores"]:
+            self.stdout.write(self.style.WARNING(
+                f"Filas con error: {estado['errores']} "
+                f"(ver {options['errores'] or options['archivo'] + '.errores.ndjson'})"
+            ))
+        if estado["repetidos"]:
+            self.stdout.write(f"Accesos ya cargados omitidos al retomar: {estado['repetidos']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación completa: {estado['accesos']} accesos, {estado['visitas']} visitas nuevas, "
+            f"{estado['sesiones']} sesiones rehechas de las visitas importadas."
+        ))
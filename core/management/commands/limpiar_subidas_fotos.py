@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from access_ctrl.fotos import limpiar_subidas
+
+
+class Command(BaseCommand):
+    help = "Borra las subidas de fotos que quedaron incompletas (y sus archivos parciales)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas",
+            type=int,
+            default=settings.FOTOS_SUBIDA_EXPIRA_HORAS,
+            help="Antigüedad desde la que una subida incompleta se da por abandonada",
+        )
+
+    def handle(self, *args, **options):
+        cantidad = limpiar_subidas(timezone.now() - timedelta(hours=options["horas"]))
+        self.stdout.write(self.style.SUCCESS(f"Subidas incompletas borradas: {cantidad}."))
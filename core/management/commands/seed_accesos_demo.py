@@ -1,11 +1,8 @@
-import random
-from datetime import timedelta
-
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 
-from core.models import Empresa, Instalacion, Sector
-from access_ctrl.models import Visita, Acceso
+from core.models import Instalacion, Sector
+from core.seeding import Dataset, cargar_visitas, generar_accesos, progreso_en
+from access_ctrl.models import Visita
 from accounts.models import User
 
 
@@ -17,7 +14,7 @@ class Command(BaseCommand):
             "--cantidad",
             type=int,
             default=80,
-            help="Cantidad aproximada de ingresos a generar",
+            help="Cantidad aproximada de ingresos a generar; casi todos traen su salida (~2× accesos)",
         )
         parser.add_argument(
             "--instalacion_id",
@@ -43,6 +40,12 @@ class Command(BaseCommand):
             default=30,
             help="Rango de días hacia atrás para distribuir los accesos",
         )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=1,
+            help="Semilla: misma semilla y parámetros generan los mismos accesos",
+        )
 
     def handle(self, *args, **options):
         cantidad = options["cantidad"]
@@ -63,89 +66,32 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("El guardia no existe"))
             return
 
-        sectores = list(Sector.objects.filter(instalacion=instalacion))
+        sectores = list(Sector.objects.filter(instalacion=instalacion).values_list("id", flat=True))
         if not sectores:
             self.stdout.write(
                 self.style.ERROR("No hay sectores asociados a esa instalación")
             )
             return
 
-        visitas = list(Visita.objects.all())
-        if not visitas:
+        # sólo los ids de las visitas, no los objetos: con millones no cabrían en memoria
+        ds = Dataset()
+        ds.agregar_instalacion(instalacion.id, empresa_id, sectores, guardia)
+        cargar_visitas(ds, Visita.objects.all(), instalacion_id=instalacion.id)
+        if not ds.visitas:
             self.stdout.write(
                 self.style.ERROR("No hay visitas cargadas para usar en el seed")
             )
             return
 
-        creados = 0
-        salidas_creadas = 0
-
-        now = timezone.now()
-
-        for _ in range(cantidad):
-            visita = random.choice(visitas)
-            sector = random.choice(sectores)
-
-            # Elegimos un día aleatorio dentro del rango
-            dias_random = random.randint(0, dias_atras - 1)
-            base_date = now - timedelta(days=dias_random)
-
-            # Horario de ingreso aleatorio entre 07:00 y 19:30
-            ingreso_hour = random.randint(7, 19)
-            ingreso_minute = random.choice([0, 5, 10, 15, 20, 30, 40, 45, 50, 55])
-
-            fecha_ingreso = base_date.replace(
-                hour=ingreso_hour,
-                minute=ingreso_minute,
-                second=random.randint(0, 59),
-                microsecond=0,
-            )
-
-            # Evitar fechas futuras
-            if fecha_ingreso > now:
-                fecha_ingreso = now - timedelta(minutes=random.randint(10, 180))
-
-            acceso_ingreso = Acceso.objects.create(
-                visita=visita,
-                tipo="ingreso",
-                fecha_hora=fecha_ingreso,
-                comentario="Ingreso demo generado por seed",
-                foto_url=[],
-                instalacion=instalacion,
-                sector=sector,
-                guardia=guardia,
-                empresa_id=empresa_id,
-            )
-            creados += 1
-
-            # 80% de probabilidad de que tenga salida
-            generar_salida = random.random() < 0.8
-
-            if generar_salida:
-                horas_estadia = random.randint(1, 8)
-                minutos_extra = random.choice([0, 10, 15, 20, 30, 40, 50])
-
-                fecha_salida = fecha_ingreso + timedelta(
-                    hours=horas_estadia,
-                    minutes=minutos_extra,
-                )
-
-                if fecha_salida <= now:
-                    Acceso.objects.create(
-                        visita=visita,
-                        tipo="salida",
-                        fecha_hora=fecha_salida,
-                        comentario="Salida demo generada por seed",
-                        foto_url=[],
-                        instalacion=instalacion,
-                        sector=sector,
-                        guardia=guardia,
-                        empresa_id=empresa_id,
-                    )
-                    salidas_creadas += 1
-
+        # cada ingreso trae casi siempre su salida: ~2 accesos por ingreso
+        total = generar_accesos(
+            ds,
+            cantidad * 2,
+            dias=dias_atras,
+            seed=options["seed"],
+            progreso=progreso_en(self.stdout),
+            comentario="demo generado por seed",
+        )
         self.stdout.write(
-            self.style.SUCCESS(
-                f"Seed completado: {creados} ingresos y {salidas_creadas} salidas creadas."
-            )
-        )
\ No newline at end of file
+            self.style.SUCCESS(f"Seed completado: {total} accesos (ingresos y salidas) creados.")
+        )
@@ -4,12 +4,24 @@ from django.utils import timezone
 from datetime import timedelta
 
 from core.models import Empresa, Instalacion, Sector
+from core.seeding import (
+    Dataset, generar_accesos, generar_prohibiciones, generar_usuarios, generar_visitas, progreso_en,
+)
 from access_ctrl.models import Visita, Acceso
 
 
 class Command(BaseCommand):
     help = "Crea datos demo para probar el sistema"
 
+    def add_arguments(self, parser):
+        # volumen extra para pruebas de carga, sobre la instalación demo
+        parser.add_argument("--visitas", type=int, default=0, help="Visitas sintéticas adicionales")
+        parser.add_argument("--accesos", type=int, default=0, help="Accesos sintéticos (ingresos y salidas)")
+        parser.add_argument("--prohibiciones", type=int, default=0, help="Prohibiciones sobre visitas sintéticas")
+        parser.add_argument("--usuarios", type=int, default=0, help="Guardias sintéticos adicionales")
+        parser.add_argument("--dias_atras", type=int, default=90, help="Días que cubren los accesos sintéticos")
+        parser.add_argument("--seed", type=int, default=1, help="Semilla de la generación sintética")
+
     def handle(self, *args, **options):
         User = get_user_model()
 
@@ -216,8 +228,31 @@ class Command(BaseCommand):
                     empresa=empresa_cliente,
                 )
 
+        if options["visitas"] or options["accesos"] or options["prohibiciones"] or options["usuarios"]:
+            self._generar_volumen(instalacion, empresa_cliente, sectores, guardia, options)
+
         self.stdout.write(self.style.SUCCESS("Datos demo creados correctamente."))
         self.stdout.write(self.style.SUCCESS("Usuarios de prueba:"))
         self.stdout.write(" - admin_general / Admin12345.")
         self.stdout.write(" - admin_cliente / Admin12345.")
-        self.stdout.write(" - guardia_demo / Guardia12345.")
\ No newline at end of file
+        self.stdout.write(" - guardia_demo / Guardia12345.")
+
+    def _generar_volumen(self, instalacion, empresa, sectores, guardia, options):
+        ds = Dataset()
+        ds.agregar_instalacion(instalacion.id, empresa.id, [s.id for s in sectores], guardia)
+        progreso = progreso_en(self.stdout)
+        seed = options["seed"]
+
+        self.stdout.write(self.style.WARNING("Generando volumen sintético..."))
+        if options["usuarios"]:
+            generar_usuarios(ds, options["usuarios"], "Guardia12345.", seed=seed, progreso=progreso)
+        if options["visitas"]:
+            generar_visitas(ds, options["visitas"], seed=seed, progreso=progreso)
+
+        if not ds.visitas and (options["accesos"] or options["prohibiciones"]):
+            self.stdout.write(self.style.ERROR("Accesos y prohibiciones sintéticos requieren --visitas"))
+            return
+        if options["accesos"]:
+            generar_accesos(ds, options["accesos"], dias=options["dias_atras"], seed=seed, progreso=progreso)
+        if options["prohibiciones"]:
+            generar_prohibiciones(ds, options["prohibiciones"], seed=seed, progreso=progreso)
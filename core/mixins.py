@@ -0,0 +1,140 @@
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from config.db_router import activar_replica, desactivar_replica, lectura_replica, puede_leer_replica
+
+
+class LecturaReplicaMixin:
+    """
+    Marca una vista DRF como "réplica OK": sus lecturas pueden ir a la réplica.
+    Se evalúa después de autenticar, para respetar la fijación a la primaria
+    del usuario que acaba de escribir.
+    """
+    usa_replica = True
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.usa_replica and puede_leer_replica(request):
+            self._replica_token = activar_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            desactivar_replica(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaChangelistMixin:
+    """
+    Sirve los changelists del admin desde la réplica.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        with lectura_replica(request):
+            response = super().changelist_view(request, extra_context)
+            # el template se renderiza de forma diferida: hay que forzarlo aquí
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+
+def filas_estimadas(qs):
+    """Filas que el planificador de PostgreSQL estima para ``qs`` (sin ejecutarla)."""
+    plan = json.loads(qs.explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class PaginadorEstimado(Paginator):
+    """
+    En PostgreSQL, si el planificador estima más de ``ADMIN_CONTEO_ESTIMADO_DESDE``
+    filas usa esa estimación en vez de un ``COUNT(*)`` sobre millones de filas
+    (el total que muestra el admin queda aproximado). Con menos filas, o en
+    SQLite, cuenta de verdad.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and connections[qs.db].vendor == "postgresql":
+            try:
+                estimado = filas_estimadas(qs)
+            except (DatabaseError, KeyError, IndexError, ValueError):
+                estimado = 0
+            if estimado >= settings.ADMIN_CONTEO_ESTIMADO_DESDE:
+                return estimado
+        return super().count
+
+
+class ConteoEstimadoMixin:
+    """
+    Changelists de tablas grandes: total estimado (``PaginadorEstimado``) y sin
+    el segundo ``COUNT(*)`` de la tabla completa que hace el admin al filtrar.
+    """
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+
+def _periodos(primera, ultima, kind):
+    """Inicio de cada año/mes/día entre ``primera`` y ``ultima`` (inclusive)."""
+    actual = primera.replace(month=1, day=1) if kind == "year" else primera
+    actual = actual.replace(day=1) if kind == "month" else actual
+    while actual <= ultima:
+        yield actual
+        if kind == "year":
+            actual = actual.replace(year=actual.year + 1)
+        elif kind == "month":
+            actual = actual.replace(year=actual.year + actual.month // 12, month=actual.month % 12 + 1)
+        else:
+            actual += timedelta(days=1)
+
+
+class FechasPorRangoQuerySet(QuerySet):
+    """
+    ``dates()``/``datetimes()`` para el ``date_hierarchy`` del admin sin el
+    ``SELECT DISTINCT`` truncado que recorre todas las filas del rango: los
+    períodos se arman entre el mínimo y el máximo de la columna (dos lecturas
+    del índice). Pueden aparecer períodos sin filas.
+    """
+
+    def _periodos_del_rango(self, field_name, kind):
+        rango = self.aggregate(primera=Min(field_name), ultima=Max(field_name))
+        if rango["primera"] is None:
+            return []
+        primera, ultima = rango["primera"], rango["ultima"]
+        if isinstance(primera, datetime):
+            if timezone.is_aware(primera):
+                primera, ultima = timezone.localtime(primera), timezone.localtime(ultima)
+            primera, ultima = primera.date(), ultima.date()
+        return list(_periodos(primera, ultima, kind))
+
+    def dates(self, field_name, kind, order="ASC"):
+        periodos = self._periodos_del_rango(field_name, kind)
+        return periodos[::-1] if order == "DESC" else periodos
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None):
+        zona = tzinfo or timezone.get_current_timezone()
+        periodos = [
+            timezone.make_aware(datetime.combine(dia, datetime.min.time()), zona) if settings.USE_TZ
+            else datetime.combine(dia, datetime.min.time())
+            for dia in self._periodos_del_rango(field_name, kind)
+        ]
+        return periodos[::-1] if order == "DESC" else periodos
+
+
+class JerarquiaFechasIndexadaMixin:
+    """``date_hierarchy`` para tablas grandes (ver ``FechasPorRangoQuerySet``)."""
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        # un queryset nuevo sobre la misma consulta, sin tocar la clase del original
+        indexado = FechasPorRangoQuerySet(model=qs.model, query=qs.query.chain(), using=qs._db, hints=qs._hints)
+        indexado._prefetch_related_lookups = qs._prefetch_related_lookups
+        return indexado
@@ -0,0 +1,450 @@
+"""
+Generación de datasets sintéticos grandes (seeds demo, benchmarks y pruebas de carga).
+
+Todo se genera en streaming y se inserta por lotes, así la memoria no crece
+con la cantidad de filas: de las visitas sólo se guardan los ids en un
+``array``. En PostgreSQL los lotes se cargan con ``COPY`` y en SQLite con un
+``executemany`` directo (en ambos con ids reservados antes de insertar);
+en otros motores con ``bulk_create``. La
+semilla hace que dos corridas con los mismos parámetros generen los mismos
+datos (salvo las fechas, que son relativas a ahora).
+
+Los horarios siguen una distribución de portería: más movimiento en días
+hábiles, peaks de ingreso en la mañana y después de almuerzo, y estadías
+con distribución log-normal (mediana ~1,5 h).
+"""
+import csv
+import io
+import json
+import math
+import random
+from array import array
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+from access_ctrl import prohibiciones
+from access_ctrl.busqueda import completar_normalizados
+from access_ctrl.models import Acceso, ProhibicionAcceso, SesionVisita, Visita
+from core.models import Empresa, Instalacion, Sector
+
+LOTE = 5000
+
+NOMBRES = [
+    "José", "María", "Juan", "Ana", "Pedro", "Camila", "Luis", "Javiera", "Diego", "Valentina",
+    "Matías", "Catalina", "Felipe", "Fernanda", "Tomás", "Constanza", "Ignacio", "Sofía",
+]
+APELLIDOS = [
+    "González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras", "Silva", "Martínez",
+    "Sepúlveda", "Morales", "Rodríguez", "López", "Fuentes", "Hernández", "Torres", "Araya",
+]
+EMPRESAS_VISITA = [
+    "Proveedor Uno", "Transportes del Sur", "Servicios Generales", "Logística Andina",
+    "Mantención Industrial", "Particular", "Courier Express", "Aseo y Ornato",
+]
+MOTIVOS_PROHIBICION = [
+    "Incidente con personal de seguridad", "Documentación adulterada",
+    "Retiro de mercadería no autorizado", "Solicitud del cliente",
+]
+
+# peso relativo de ingresos por hora local (0-23)
+PESO_HORA = [
+    0.1, 0.05, 0.05, 0.05, 0.1, 0.3, 1.0, 3.0, 5.0, 4.5, 3.5, 3.0,
+    2.0, 2.5, 3.5, 3.0, 2.5, 2.0, 1.2, 0.8, 0.5, 0.3, 0.2, 0.1,
+]
+# lunes a domingo
+PESO_DIA_SEMANA = [1.0, 1.0, 1.0, 1.0, 0.95, 0.45, 0.2]
+ESTADIA_MEDIANA_MIN = 90
+ESTADIA_MAXIMA_MIN = 12 * 60
+
+
+def digito_verificador(numero):
+    suma, factor = 0, 2
+    for d in reversed(str(numero)):
+        suma += int(d) * factor
+        factor = 2 if factor == 7 else factor + 1
+    dv = 11 - suma % 11
+    return {10: "K", 11: "0"}.get(dv, str(dv))
+
+
+def formatear_rut(numero):
+    return f"{numero:,}".replace(",", ".") + f"-{digito_verificador(numero)}"
+
+
+def fecha_ingreso(rnd, ahora, dias):
+    """Fecha de ingreso en los últimos ``dias`` según día de semana y hora."""
+    hoy = timezone.localtime(ahora).date()
+    tz = timezone.get_current_timezone()
+    while True:
+        dia = hoy - timedelta(days=rnd.randrange(dias))
+        if rnd.random() > PESO_DIA_SEMANA[dia.weekday()]:
+            continue
+        hora = rnd.choices(range(24), weights=PESO_HORA)[0]
+        fecha = timezone.make_aware(
+            datetime.combine(dia, time(hora, rnd.randrange(60), rnd.randrange(60))), tz
+        )
+        if fecha <= ahora:
+            return fecha
+
+
+def duracion_estadia(rnd):
+    minutos = rnd.lognormvariate(math.log(ESTADIA_MEDIANA_MIN), 0.8)
+    return timedelta(minutes=min(max(minutos, 5), ESTADIA_MAXIMA_MIN))
+
+
+def progreso_en(stdout):
+    """Callback de progreso que reescribe una línea por tipo de fila."""
+    def progreso(que, hechos, total):
+        stdout.write(f"\r   {que}: {min(hechos, total)}/{total}", ending="")
+        if hechos >= total:
+            stdout.write("")
+    return progreso
+
+
+# ----------------------------------------------------------------------------
+# Inserción por lotes
+# ----------------------------------------------------------------------------
+
+def _preparadores(modelo, conn):
+    """
+    Un conversor por campo de objeto a valor para el motor. Más barato que
+    ``get_db_prep_save`` por valor, que es lo que más pesa en ``bulk_create``.
+    """
+    preparadores = []
+    for campo in modelo._meta.concrete_fields:
+        if isinstance(campo, models.JSONField):
+            preparadores.append(lambda obj, c=campo: None if getattr(obj, c.attname) is None else json.dumps(getattr(obj, c.attname)))
+        elif isinstance(campo, models.DateTimeField):
+            preparadores.append(lambda obj, c=campo: conn.ops.adapt_datetimefield_value(c.pre_save(obj, add=True)))
+        else:
+            preparadores.append(lambda obj, c=campo: getattr(obj, c.attname))
+    return preparadores
+
+
+def _reservar_ids(modelo, objetos, conn):
+    tabla = modelo._meta.db_table
+    with conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                [tabla, len(objetos)],
+            )
+            ids = [pk for (pk,) in cursor.fetchall()]
+        else:
+            # el seed es el único que escribe mientras corre
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {conn.ops.quote_name(tabla)}")
+            ultimo = cursor.fetchone()[0]
+            ids = range(ultimo + 1, ultimo + 1 + len(objetos))
+    for obj, pk in zip(objetos, ids):
+        obj.pk = pk
+
+
+def _insertar_directo(modelo, objetos, conn):
+    """COPY en PostgreSQL, ``executemany`` en SQLite; ids reservados antes para devolverlos."""
+    _reservar_ids(modelo, objetos, conn)
+    tabla = conn.ops.quote_name(modelo._meta.db_table)
+    columnas = ", ".join(conn.ops.quote_name(c.column) for c in modelo._meta.concrete_fields)
+    preparadores = _preparadores(modelo, conn)
+    filas = ([p(obj) for p in preparadores] for obj in objetos)
+
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for fila in filas:
+                writer.writerow([r"\N" if v is None else v for v in fila])
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {tabla} ({columnas}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        else:
+            marcas = ", ".join(["%s"] * len(preparadores))
+            cursor.executemany(f"INSERT INTO {tabla} ({columnas}) VALUES ({marcas})", list(filas))
+
+    for obj in objetos:
+        obj._state.adding = False
+        obj._state.db = conn.alias
+    return objetos
+
+
+def insertar(modelo, objetos):
+    """Inserta un lote y devuelve los objetos con su id."""
+    if not objetos:
+        return []
+    conn = connections[router.db_for_write(modelo)]
+    if conn.vendor in ("postgresql", "sqlite"):
+        return _insertar_directo(modelo, objetos, conn)
+    return modelo.objects.bulk_create(objetos)
+
+
+def _en_lotes(modelo, objetos, lote=LOTE, al_insertar=None):
+    buffer = []
+    total = 0
+    for obj in objetos:
+        buffer.append(obj)
+        if len(buffer) >= lote:
+            total += len(buffer)
+            creados = insertar(modelo, buffer)
+            if al_insertar:
+                al_insertar(creados, total)
+            buffer = []
+    if buffer:
+        total += len(buffer)
+        creados = insertar(modelo, buffer)
+        if al_insertar:
+            al_insertar(creados, total)
+    return total
+
+
+# ----------------------------------------------------------------------------
+# Dataset
+# ----------------------------------------------------------------------------
+
+class Dataset:
+    """Ids generados, para encadenar generadores y armar peticiones de benchmark."""
+
+    def __init__(self):
+        self.empresas = []
+        self.instalaciones = []
+        self.sectores = {}
+        self.empresa_de = {}
+        self.guardias = {}
+        self.admins = {}
+        self.superadmin = None
+        self.visitas = array("q")
+        self.visitas_instalacion = array("q")
+        self.accesos = 0
+
+    def agregar_instalacion(self, instalacion_id, empresa_id, sectores, guardia=None):
+        self.instalaciones.append(instalacion_id)
+        self.empresa_de[instalacion_id] = empresa_id
+        self.sectores[instalacion_id] = list(sectores)
+        if guardia is not None:
+            self.guardias[instalacion_id] = guardia
+
+
+def crear_estructura(instalaciones=10, sectores_por_instalacion=3, instalaciones_por_empresa=5, seed=1):
+    """Empresas, instalaciones, sectores y un usuario por rol."""
+    User = get_user_model()
+    rnd = random.Random(seed)
+    ds = Dataset()
+
+    admin_general, _ = Empresa.objects.get_or_create(
+        nombre="BENCH ADMINISTRADORA", defaults={"es_administradora_general": True}
+    )
+    ds.superadmin = User.objects.create_user(
+        f"bench_superadmin_{seed}", password="bench", role="superadmin", empresa=admin_general,
+    )
+
+    for n in range(instalaciones):
+        if n % instalaciones_por_empresa == 0:
+            empresa = Empresa.objects.create(nombre=f"Bench Empresa {seed}-{n // instalaciones_por_empresa}")
+            ds.empresas.append(empresa.id)
+            ds.admins[empresa.id] = User.objects.create_user(
+                f"bench_admin_{seed}_{empresa.id}", password="bench", role="admin", empresa=empresa,
+            )
+
+        inst = Instalacion.objects.create(empresa=empresa, nombre=f"Instalación {n}", comuna="Santiago")
+        sectores = Sector.objects.bulk_create([
+            Sector(instalacion=inst, nombre=f"Sector {s}", requiere_guia=rnd.random() < 0.3)
+            for s in range(sectores_por_instalacion)
+        ])
+        guardia = User.objects.create_user(
+            f"bench_guardia_{seed}_{inst.id}", password="bench", role="guardia",
+            empresa=empresa, instalacion=inst,
+        )
+        ds.agregar_instalacion(inst.id, empresa.id, [s.id for s in sectores], guardia)
+
+    return ds
+
+
+def cargar_dataset(seed=1):
+    """Reconstruye el ``Dataset`` de una corrida anterior con la misma semilla, o None."""
+    User = get_user_model()
+    ds = Dataset()
+    ds.superadmin = User.objects.filter(username=f"bench_superadmin_{seed}").first()
+    if ds.superadmin is None:
+        return None
+
+    for u in User.objects.filter(username__startswith=f"bench_admin_{seed}_"):
+        ds.admins[u.empresa_id] = u
+        ds.empresas.append(u.empresa_id)
+    sectores = {}
+    for sector_id, inst_id in Sector.objects.filter(instalacion__empresa_id__in=ds.empresas).values_list("id", "instalacion_id"):
+        sectores.setdefault(inst_id, []).append(sector_id)
+    for u in User.objects.filter(username__startswith=f"bench_guardia_{seed}_").order_by("instalacion_id"):
+        ds.agregar_instalacion(u.instalacion_id, u.empresa_id, sectores.get(u.instalacion_id, []), u)
+
+    cargar_visitas(ds, Visita.objects.filter(instalacion_id__in=ds.instalaciones))
+    ds.accesos = Acceso.objects.filter(instalacion_id__in=ds.instalaciones).count()
+    return ds
+
+
+def cargar_visitas(ds, qs, instalacion_id=None):
+    """
+    Agrega al dataset los ids de visitas existentes. Con ``instalacion_id``
+    todas quedan asignadas a esa instalación (seed de accesos de una sola).
+    """
+    for visita_id, inst_id in qs.order_by("id").values_list("id", "instalacion_id").iterator(chunk_size=LOTE):
+        ds.visitas.append(visita_id)
+        ds.visitas_instalacion.append(instalacion_id or inst_id)
+
+
+# ----------------------------------------------------------------------------
+# Generadores
+# ----------------------------------------------------------------------------
+
+def generar_visitas(ds, cantidad, seed=1, progreso=None):
+    rnd = random.Random(seed * 7919)
+    base_rut = 5_000_000 + seed * 10_000_000
+
+    def filas():
+        for n in range(cantidad):
+            inst_id = rnd.choice(ds.instalaciones)
+            extranjero = rnd.random() < 0.1
+            v = Visita(
+                rut=None if extranjero else formatear_rut(base_rut + n),
+                dni_extranjero=f"P{seed}{n:08d}" if extranjero else None,
+                es_extranjero=extranjero,
+                nombre=rnd.choice(NOMBRES),
+                apellido=f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+                empresa=rnd.choice(EMPRESAS_VISITA),
+                patente=f"{rnd.choice('BCDFGHJKLPRSTVWXYZ')}{rnd.choice('BCDFGHJKLPRSTVWXYZ')}{rnd.randint(1000, 9999)}",
+                instalacion_id=inst_id,
+                sector_id=rnd.choice(ds.sectores[inst_id]),
+            )
+            # bulk_create/COPY no pasan por save()
+            yield completar_normalizados(v)
+
+    def registrar(creadas, total):
+        for v in creadas:
+            ds.visitas.append(v.id)
+            ds.visitas_instalacion.append(v.instalacion_id)
+        if progreso:
+            progreso("visitas", total, cantidad)
+
+    return _en_lotes(Visita, filas(), al_insertar=registrar)
+
+
+def _sesiones_de_lote(creados):
+    """Los pares ingreso/salida vienen consecutivos dentro del lote."""
+    sesiones = []
+    for i, a in enumerate(creados):
+        if a.tipo != "ingreso":
+            continue
+        s = SesionVisita(
+            visita_id=a.visita_id, instalacion_id=a.instalacion_id, sector_id=a.sector_id,
+            empresa_id=a.empresa_id, ingreso_id=a.id, fecha_ingreso=a.fecha_hora,
+        )
+        siguiente = creados[i + 1] if i + 1 < len(creados) else None
+        if siguiente is not None and siguiente.tipo == "salida" and siguiente.visita_id == a.visita_id:
+            s.salida_id = siguiente.id
+            s.fecha_salida = siguiente.fecha_hora
+            s.duracion_segundos = int((siguiente.fecha_hora - a.fecha_hora).total_seconds())
+        sesiones.append(s)
+    return sesiones
+
+
+def generar_accesos(ds, cantidad, dias=90, seed=1, progreso=None, prob_olvido_salida=0.02, comentario=None):
+    """
+    ``cantidad`` accesos aproximados en pares ingreso/salida, con sus sesiones
+    de visita. Quedan sin salida las estadías que aún no terminan y un
+    ``prob_olvido_salida`` de las demás. Un par nunca queda partido entre lotes.
+    """
+    rnd = random.Random(seed * 104729)
+    ahora = timezone.now()
+    faltantes = set(ds.instalaciones) - set(ds.empresa_de)
+    if faltantes:
+        ds.empresa_de.update(Instalacion.objects.filter(id__in=faltantes).values_list("id", "empresa_id"))
+
+    def par():
+        i = rnd.randrange(len(ds.visitas))
+        visita_id, inst_id = ds.visitas[i], ds.visitas_instalacion[i]
+        comunes = dict(
+            visita_id=visita_id, instalacion_id=inst_id, sector_id=rnd.choice(ds.sectores[inst_id]),
+            guardia_id=ds.guardias[inst_id].id, empresa_id=ds.empresa_de[inst_id],
+            foto_url=[],
+        )
+        ingreso = fecha_ingreso(rnd, ahora, dias)
+        filas = [Acceso(tipo="ingreso", fecha_hora=ingreso, comentario=comentario and f"Ingreso {comentario}", **comunes)]
+        salida = ingreso + duracion_estadia(rnd)
+        if salida <= ahora and rnd.random() >= prob_olvido_salida:
+            filas.append(Acceso(tipo="salida", fecha_hora=salida, comentario=comentario and f"Salida {comentario}", **comunes))
+        return filas
+
+    total = 0
+    while total < cantidad:
+        lote = []
+        while len(lote) < LOTE and total + len(lote) < cantidad:
+            lote.extend(par())
+        creados = insertar(Acceso, lote)
+        insertar(SesionVisita, _sesiones_de_lote(creados))
+        total += len(creados)
+        if progreso:
+            progreso("accesos", total, cantidad)
+    ds.accesos += total
+    return total
+
+
+def generar_prohibiciones(ds, cantidad, seed=1, progreso=None):
+    """Prohibiciones vigentes, indefinidas y vencidas sobre visitas al azar."""
+    rnd = random.Random(seed * 15485863)
+    ahora = timezone.now()
+
+    def filas():
+        for _ in range(cantidad):
+            i = rnd.randrange(len(ds.visitas))
+            inicio = ahora - timedelta(days=rnd.uniform(0, 365))
+            tipo = rnd.random()
+            if tipo < 0.5:
+                fin = None
+            elif tipo < 0.8:
+                fin = ahora + timedelta(days=rnd.uniform(1, 180))
+            else:
+                fin = inicio + timedelta(days=rnd.uniform(1, 60))
+            yield ProhibicionAcceso(
+                visita_id=ds.visitas[i], instalacion_id=ds.visitas_instalacion[i],
+                motivo=rnd.choice(MOTIVOS_PROHIBICION), fecha_inicio=inicio, fecha_fin=fin,
+            )
+
+    def registrar(creadas, total):
+        if progreso:
+            progreso("prohibiciones", total, cantidad)
+
+    total = _en_lotes(ProhibicionAcceso, filas(), al_insertar=registrar)
+    prohibiciones.invalidar()
+    return total
+
+
+def generar_usuarios(ds, cantidad, password, seed=1, prefijo="guardia", progreso=None):
+    """
+    Guardias repartidos entre las instalaciones del dataset. El hash de la
+    contraseña se calcula una sola vez: hashear millones no termina nunca.
+    """
+    User = get_user_model()
+    rnd = random.Random(seed * 32452843)
+    hash_password = make_password(password)
+    ahora = timezone.now()
+
+    def filas():
+        for n in range(cantidad):
+            inst_id = rnd.choice(ds.instalaciones)
+            yield User(
+                username=f"{prefijo}_{seed}_{n}",
+                email=f"{prefijo}_{seed}_{n}@demo.cl",
+                first_name=rnd.choice(NOMBRES),
+                last_name=rnd.choice(APELLIDOS),
+                password=hash_password,
+                role="guardia",
+                empresa_id=ds.empresa_de[inst_id],
+                instalacion_id=inst_id,
+                is_active=True,
+                date_joined=ahora,
+            )
+
+    def registrar(creados, total):
+        if progreso:
+            progreso("usuarios", total, cantidad)
+
+    return _en_lotes(User, filas(), al_insertar=registrar)
@@ -1,11 +1,13 @@
 from rest_framework import serializers
+from config.instrumentacion import ListaMedidaSerializer, MideSerializacionMixin
+
 from .models import Empresa, Instalacion, Sector
 
-class EmpresaSer(serializers.ModelSerializer):
-    class Meta: model = Empresa; fields = "__all__"
+class EmpresaSer(MideSerializacionMixin, serializers.ModelSerializer):
+    class Meta: model = Empresa; fields = "__all__"; list_serializer_class = ListaMedidaSerializer
 
-class InstalacionSer(serializers.ModelSerializer):
-    class Meta: model = Instalacion; fields = "__all__"
+class InstalacionSer(MideSerializacionMixin, serializers.ModelSerializer):
+    class Meta: model = Instalacion; fields = "__all__"; list_serializer_class = ListaMedidaSerializer
 
-class SectorSer(serializers.ModelSerializer):
-    class Meta: model = Sector; fields = "__all__"
+class SectorSer(MideSerializacionMixin, serializers.ModelSerializer):
+    class Meta: model = Sector; fields = "__all__"; list_serializer_class = ListaMedidaSerializer
@@ -1,3 +1,289 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from access_ctrl import sesiones
+from access_ctrl.models import Acceso, ProhibicionAcceso, SesionVisita, Visita
+from access_ctrl.tests import InstalacionMixin
+from accounts.models import User
+
+from . import benchmark, importacion
+from .models import Empresa, Instalacion
+
+
+def manage(*argumentos):
+    """``manage.py`` en otro proceso, sobre SQLite (el benchmark crea y borra su propia base de prueba)."""
+    env = {k: v for k, v in os.environ.items() if k not in (
+        "DATABASE_URL", "REPLICA_DATABASE_URL", "SQLITE_REPLICA", "REDIS_URL", "WEB_CONCURRENCY",
+    )}
+    env["DJANGO_SETTINGS_MODULE"] = "config.settings"
+    return subprocess.run(
+        [sys.executable, "manage.py", *argumentos], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+
+
+class ArranqueTests(TestCase):
+    """Las dependencias pesadas se cargan recién cuando un endpoint las usa."""
+
+    def test_importar_la_aplicacion_no_carga_dependencias_pesadas(self):
+        from core.benchmark_arranque import medir_importacion
+
+        self.assertEqual(medir_importacion(repeticiones=1)["pesados"], [])
+
+    def test_plantilla_excel_sigue_generandose(self):
+        empresa = Empresa.objects.create(nombre="Cliente")
+        usuario = User.objects.create_user("admin", password="x", role="admin", empresa=empresa)
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+
+        response = cliente.get("/api/enrolamiento/plantilla/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b"PK"))
+
+
+class ImportacionAccesosTests(InstalacionMixin, TestCase):
+    CSV = (
+        "fecha_hora,tipo,documento,es_extranjero,sector,nombre,apellido,empresa,patente,comentario\n"
+        "2024-03-01 08:00,ingreso,11.111.111-1,,Bodega,,,,,\n"
+        "2024-03-01 09:00,ingreso,33333333-3,no,bodega,Eva,Soto,Contratista,,\n"
+        "2024-03-01 10:30,salida,11111111-1,,Bodega,,,,,\n"
+        "2024-03-01 11:00,salida,33.333.333-3,,Bodega,Eva,Soto,,,\n"
+        "2024-03-02 08:00,ingreso,P-998,si,Bodega,John,Smith,,,pasaporte\n"
+        "2024-03-02 08:00,ingreso,44444444-4,,Casino,Ivo,,,,\n"
+        "ayer,ingreso,44444444-4,,Bodega,Ivo,,,,\n"
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.ana = Visita.objects.create(rut="11111111-1", nombre="Ana")
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.archivo = Path(directorio) / "historico.csv"
+        self.archivo.write_text(self.CSV, encoding="utf-8")
+
+    def _importar(self, **kwargs):
+        return importacion.importar(self.archivo, self.instalacion, self.guardia, lote=2, **kwargs)
+
+    def test_importa_resuelve_visitas_y_arma_sesiones(self):
+        # una visita en la planta ahora mismo: su sesión no es parte de la importación
+        luis = Visita.objects.create(rut="22222222-2", nombre="Luis")
+        en_curso = sesiones.abrir_sesion(Acceso.objects.create(
+            visita=luis, instalacion=self.instalacion, sector=self.sector, tipo="ingreso",
+            fecha_hora=timezone.now(), guardia=self.guardia, empresa=self.empresa,
+        ))
+
+        estado = self._importar()
+
+        self.assertEqual(estado["fase"], importacion.COMPLETA)
+        self.assertEqual((estado["filas"], estado["accesos"], estado["visitas"], estado["errores"]), (7, 5, 2, 2))
+        self.assertEqual(Acceso.objects.filter(visita=self.ana).count(), 2)
+        eva = Visita.objects.get(documento_normalizado="333333333")
+        self.assertEqual((eva.nombre, eva.empresa, eva.instalacion_id), ("Eva", "Contratista", self.instalacion.id))
+        self.assertTrue(Visita.objects.get(es_extranjero=True, dni_extranjero="P-998").busqueda)
+
+        registradas = SesionVisita.objects.filter(instalacion=self.instalacion).exclude(visita=luis)
+        self.assertEqual(sorted(s.duracion_segundos for s in registradas if s.fecha_salida), [2 * 3600, int(2.5 * 3600)])
+        self.assertEqual(registradas.filter(fecha_salida__isnull=True).count(), 1)
+        self.assertEqual(estado["sesiones"], 3)
+        self.assertEqual(list(SesionVisita.objects.filter(visita=luis).values_list("pk", flat=True)), [en_curso.pk])
+
+        errores = [json.loads(l) for l in Path(f"{self.archivo}.errores.ndjson").read_text().splitlines()]
+        self.assertEqual([e["linea"] for e in errores], [7, 8])
+        self.assertIn("Sector desconocido", errores[0]["error"])
+
+        # completa: volver a correrla no carga nada
+        self._importar()
+        self.assertEqual(Acceso.objects.exclude(visita=luis).count(), 5)
+
+    def test_retoma_sin_duplicar_tras_un_corte(self):
+        guardar = importacion.guardar_checkpoint
+        llamadas = []
+
+        def cortar(ruta, estado):
+            llamadas.append(estado["filas"])
+            if len(llamadas) == 2:
+                # el lote ya se confirmó pero el checkpoint no alcanzó a guardarse
+                raise KeyboardInterrupt
+            guardar(ruta, estado)
+
+        with mock.patch.object(importacion, "guardar_checkpoint", cortar):
+            with self.assertRaises(KeyboardInterrupt):
+                self._importar()
+        self.assertEqual(Acceso.objects.count(), 4)
+
+        estado = self._importar()
+        self.assertEqual((estado["accesos"], estado["repetidos"], estado["visitas"]), (5, 2, 2))
+        self.assertEqual(Acceso.objects.count(), 5)
+        self.assertEqual(Visita.objects.filter(documento_normalizado="333333333").count(), 1)
+
+    def test_retoma_sin_repetir_errores(self):
+        guardar = importacion.guardar_checkpoint
+        llamadas = []
+
+        def cortar(ruta, estado):
+            llamadas.append(estado["filas"])
+            if len(llamadas) == 3:
+                # el lote de las líneas 6 y 7 ya anotó su error
+                raise KeyboardInterrupt
+            guardar(ruta, estado)
+
+        with mock.patch.object(importacion, "guardar_checkpoint", cortar):
+            with self.assertRaises(KeyboardInterrupt):
+                self._importar()
+
+        estado = self._importar()
+        errores = [json.loads(l)["linea"] for l in Path(f"{self.archivo}.errores.ndjson").read_text().splitlines()]
+        self.assertEqual(errores, [7, 8])
+        self.assertEqual((estado["errores"], estado["repetidos"], estado["accesos"]), (2, 1, 5))
+
+    def test_checkpoint_de_otro_archivo(self):
+        otro = self.archivo.with_name("otro.csv")
+        otro.write_text(self.CSV, encoding="utf-8")
+        importacion.guardar_checkpoint(f"{self.archivo}.checkpoint.json", {
+            "archivo": str(otro.resolve()), "bytes": otro.stat().st_size,
+            "instalacion_id": self.instalacion.id, "fase": importacion.CARGA, "filas": 0,
+        })
+        with self.assertRaises(importacion.ImportacionInvalida):
+            self._importar()
+
+
+class BenchmarkEndpointsTests(SimpleTestCase):
+    def setUp(self):
+        self.directorio = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def _corrida(self, **resultados):
+        """JSON de una corrida con ``resultados`` = {caso: (p95_ms, consultas, memoria_pico_kb)}."""
+        ruta = self.directorio / f"corrida_{len(list(self.directorio.iterdir()))}.json"
+        benchmark.guardar({
+            "meta": {"fecha": "2025-01-02T03:04:05", "motor": "sqlite"},
+            "resultados": {
+                caso: {"p95_ms": p95, "consultas": consultas, "memoria_pico_kb": kb}
+                for caso, (p95, consultas, kb) in resultados.items()
+            },
+        }, ruta)
+        return str(ruta)
+
+    def test_smoke(self):
+        salida = self.directorio / "resultado.json"
+        r = manage(
+            "benchmark_endpoints", "--visitas", "20", "--accesos", "50", "--iteraciones", "1",
+            "--casos", "accesos_lista", "--salida", str(salida),
+            "--sqlite_path", str(self.directorio / "benchmark.sqlite3"),
+        )
+        self.assertEqual(r.returncode, 0, r.stderr)
+
+        resultado = benchmark.cargar(salida)
+        self.assertEqual(resultado["meta"]["dataset"]["visitas"], 20)
+        self.assertEqual(list(resultado["resultados"]), ["accesos_lista"])
+        caso = resultado["resultados"]["accesos_lista"]
+        self.assertEqual((caso["status"], caso["errores"]), (200, 0))
+        self.assertGreater(caso["consultas"], 0)
+        # la base de prueba se borra al terminar
+        self.assertFalse((self.directorio / "benchmark.sqlite3").exists())
+
+    def test_comparar(self):
+        filas = benchmark.comparar(
+            benchmark.cargar(self._corrida(lista=(10.0, 3, 100.0), buscar=(1.0, 2, 50.0))),
+            benchmark.cargar(self._corrida(lista=(10.5, 4, 300.0), buscar=(1.8, 2, 50.0), nuevo=(1.0, 1, 1.0))),
+        )
+        regresiones = {(f["endpoint"], f["metrica"]) for f in filas if f["regresion"]}
+        # +5% de p95 no alcanza el umbral; +0.8 ms en buscar queda bajo la tolerancia; una consulta más sí cuenta
+        self.assertEqual(regresiones, {("lista", "consultas"), ("lista", "memoria_pico_kb")})
+        # los casos que no estaban en la base no se comparan
+        self.assertNotIn("nuevo", {f["endpoint"] for f in filas})
+
+    def test_comparar_desde_el_comando(self):
+        base = self._corrida(lista=(10.0, 3, 100.0))
+        igual = self._corrida(lista=(10.0, 3, 100.0))
+        peor = self._corrida(lista=(20.0, 3, 100.0))
+
+        salida = io.StringIO()
+        call_command("benchmark_endpoints", resultado=igual, comparar=base, stdout=salida)
+        self.assertIn("Sin regresiones.", salida.getvalue())
+
+        with self.assertRaisesMessage(CommandError, "1 regresiones"):
+            call_command("benchmark_endpoints", resultado=peor, comparar=base, stdout=io.StringIO())
+        # con más umbral ya no es regresión
+        call_command("benchmark_endpoints", resultado=peor, comparar=base, umbral=1.5, stdout=io.StringIO())
+
+        with self.assertRaisesMessage(CommandError, "--resultado requiere --comparar"):
+            call_command("benchmark_endpoints", resultado=igual)
+
+
+class SeedDemoTests(TestCase):
+    def _seed_demo(self, **opciones):
+        call_command("seed_demo", stdout=io.StringIO(), **opciones)
+
+    def assertSesionesEmparejadas(self, accesos):
+        ingresos = accesos.filter(tipo="ingreso")
+        sesiones = SesionVisita.objects.filter(ingreso_id__in=ingresos.values("id"))
+        self.assertEqual(sesiones.count(), ingresos.count())
+
+        tipos = dict(accesos.values_list("id", "tipo"))
+        con_salida = 0
+        for s in sesiones:
+            if s.salida_id is None:
+                continue
+            con_salida += 1
+            salida = accesos.get(id=s.salida_id)
+            self.assertEqual((tipos[s.salida_id], salida.visita_id), ("salida", s.visita_id))
+            self.assertEqual(s.duracion_segundos, int((s.fecha_salida - s.fecha_ingreso).total_seconds()))
+        # todas las salidas quedan en alguna sesión
+        self.assertEqual(con_salida, accesos.filter(tipo="salida").count())
+
+    def test_seed_demo(self):
+        self._seed_demo()
+        self.assertEqual((Visita.objects.count(), Acceso.objects.count(), User.objects.count()), (3, 5, 3))
+        self.assertFalse(Visita.objects.filter(documento_normalizado="").exists())
+        # sin volumen sintético no hay sesiones (los accesos demo no pasan por las vistas)
+        self.assertFalse(SesionVisita.objects.exists())
+
+    def test_seed_demo_con_volumen(self):
+        self._seed_demo(visitas=30, accesos=60, prohibiciones=5, usuarios=2)
+
+        self.assertEqual(Visita.objects.count(), 3 + 30)
+        self.assertFalse(Visita.objects.filter(documento_normalizado="").exists())
+        self.assertFalse(Visita.objects.filter(busqueda="").exists())
+        self.assertEqual(ProhibicionAcceso.objects.count(), 5)
+        self.assertEqual(User.objects.filter(role="guardia").count(), 1 + 2)
+
+        # un par ingreso/salida puede pasarse por uno
+        sinteticos = Acceso.objects.exclude(comentario__endswith=" demo")
+        self.assertIn(sinteticos.count(), (60, 61))
+        self.assertSesionesEmparejadas(sinteticos)
+
+    def test_seed_accesos_demo(self):
+        self._seed_demo()
+        instalacion = Instalacion.objects.get(nombre="Instalación Demo")
+        guardia = User.objects.get(username="guardia_demo")
+        salida = io.StringIO()
+
+        call_command(
+            "seed_accesos_demo", cantidad=20, instalacion_id=instalacion.id, guardia_id=guardia.id,
+            empresa_id=instalacion.empresa_id, stdout=salida,
+        )
+
+        nuevos = Acceso.objects.filter(comentario__endswith="demo generado por seed")
+        # --cantidad cuenta ingresos: se crean unos 2× accesos
+        self.assertIn(nuevos.count(), (40, 41))
+        self.assertGreaterEqual(nuevos.filter(tipo="ingreso").count(), 20)
+        self.assertIn(f"{nuevos.count()} accesos", salida.getvalue())
+        self.assertEqual(set(nuevos.values_list("instalacion_id", "guardia_id")), {(instalacion.id, guardia.id)})
+        self.assertSesionesEmparejadas(nuevos)